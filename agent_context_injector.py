@@ -7,7 +7,6 @@ Injects agent-customer conversations into OpenAI assistant threads for full cont
 
 import os
 import sys
-import sqlite3
 from datetime import datetime, timezone
 from dateutil.parser import isoparse
 import openai
@@ -15,6 +14,7 @@ import openai
 # Add the app directory to the path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 import config
+from app import sqlite_store
 from webhook_vs_api_comparator import (
     fetch_wati_api_messages, 
     find_customer_to_agent_messages,
@@ -27,28 +27,33 @@ ASSISTANT_GO_LIVE_DATE = datetime(2025, 7, 5, tzinfo=timezone.utc)
 # Operators that should be treated as the bot, not human agents
 BOT_OPERATOR_NAMES = {'Bot ', 'Bot'}
 
+# Schema check for agent_context_injected runs once per process, not on every turn
+_agent_context_column_checked = False
+
 def check_if_agent_context_injected(conversation_id):
     """Check if agent context has already been injected for this conversation"""
+    global _agent_context_column_checked
     db_path = "app/thread_store.db"
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Check if agent_context_injected field exists, if not create it
-        cursor.execute("PRAGMA table_info(threads)")
-        columns = [row[1] for row in cursor.fetchall()]
-        
-        if 'agent_context_injected' not in columns:
-            cursor.execute("ALTER TABLE threads ADD COLUMN agent_context_injected INTEGER DEFAULT 0")
-            conn.commit()
-        
-        # Check if context has been injected for this conversation
-        cursor.execute(
-            "SELECT agent_context_injected FROM threads WHERE thread_id = ?", 
-            (conversation_id,)
-        )
-        result = cursor.fetchone()
-        conn.close()
+        with sqlite_store.connection(db_path) as conn:
+            cursor = conn.cursor()
+            
+            # Check if agent_context_injected field exists, if not create it
+            if not _agent_context_column_checked:
+                cursor.execute("PRAGMA table_info(threads)")
+                columns = [row[1] for row in cursor.fetchall()]
+                
+                if 'agent_context_injected' not in columns:
+                    cursor.execute("ALTER TABLE threads ADD COLUMN agent_context_injected INTEGER DEFAULT 0")
+                    conn.commit()
+                _agent_context_column_checked = True
+            
+            # Check if context has been injected for this conversation
+            cursor.execute(
+                "SELECT agent_context_injected FROM threads WHERE thread_id = ?", 
+                (conversation_id,)
+            )
+            result = cursor.fetchone()
         
         return result and result[0] == 1
         
@@ -60,15 +65,12 @@ def mark_agent_context_injected(conversation_id):
     """Mark that agent context has been injected for this conversation"""
     db_path = "app/thread_store.db"
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute(
-            "UPDATE threads SET agent_context_injected = 1 WHERE thread_id = ?", 
-            (conversation_id,)
-        )
-        conn.commit()
-        conn.close()
+        with sqlite_store.connection(db_path) as conn:
+            conn.execute(
+                "UPDATE threads SET agent_context_injected = 1 WHERE thread_id = ?", 
+                (conversation_id,)
+            )
+            conn.commit()
         return True
         
     except Exception as e:
@@ -167,17 +169,12 @@ def check_if_5_minutes_since_last_webhook_message(wa_id):
     """
     try:
         db_path = "app/thread_store.db"
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Get the last_webhook_timestamp for this wa_id from threads table
-        cursor.execute("""
-            SELECT last_webhook_timestamp FROM threads 
-            WHERE wa_id = ?
-        """, (wa_id,))
-        
-        result = cursor.fetchone()
-        conn.close()
+        with sqlite_store.connection(db_path) as conn:
+            # Get the last_webhook_timestamp for this wa_id from threads table
+            result = conn.execute("""
+                SELECT last_webhook_timestamp FROM threads 
+                WHERE wa_id = ?
+            """, (wa_id,)).fetchone()
         
         if not result or not result[0]:
             # No webhook timestamp found, this is likely the first message
@@ -433,20 +430,15 @@ def inject_agent_context_to_thread(wa_id, context_message):
             print("[ERROR] thread_store.db not found!")
             return False
         
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT thread_id FROM threads WHERE wa_id = ?", (wa_id,))
-        thread_result = cursor.fetchone()
+        with sqlite_store.connection(db_path) as conn:
+            thread_result = conn.execute("SELECT thread_id FROM threads WHERE wa_id = ?", (wa_id,)).fetchone()
         
         if not thread_result:
             print(f"[ERROR] No thread found for waId: {wa_id}")
-            conn.close()
             return False
         
         thread_id = thread_result[0]
         print(f"[DEBUG] Found thread_id: {thread_id} for waId: {wa_id}")
-        conn.close()
         
         # Add system message to OpenAI conversation using Responses API
         openai.api_key = config.OPENAI_API_KEY
@@ -518,26 +510,25 @@ def update_last_agent_context_check(wa_id):
     db_path = "app/thread_store.db"
     
     try:
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
-        # Check if last_agent_context_check column exists, if not add it
-        cursor.execute("PRAGMA table_info(threads)")
-        columns = [column[1] for column in cursor.fetchall()]
-        
-        if 'last_agent_context_check' not in columns:
-            print("[DB] Adding last_agent_context_check column...")
-            cursor.execute("ALTER TABLE threads ADD COLUMN last_agent_context_check TEXT")
-        
-        # Update timestamp
-        current_time = datetime.now().isoformat()
-        cursor.execute(
-            "UPDATE threads SET last_agent_context_check = ? WHERE wa_id = ?", 
-            (current_time, wa_id)
-        )
-        
-        conn.commit()
-        conn.close()
+        with sqlite_store.connection(db_path) as conn:
+            cursor = conn.cursor()
+            
+            # Check if last_agent_context_check column exists, if not add it
+            cursor.execute("PRAGMA table_info(threads)")
+            columns = [column[1] for column in cursor.fetchall()]
+            
+            if 'last_agent_context_check' not in columns:
+                print("[DB] Adding last_agent_context_check column...")
+                cursor.execute("ALTER TABLE threads ADD COLUMN last_agent_context_check TEXT")
+            
+            # Update timestamp
+            current_time = datetime.now().isoformat()
+            cursor.execute(
+                "UPDATE threads SET last_agent_context_check = ? WHERE wa_id = ?", 
+                (current_time, wa_id)
+            )
+            
+            conn.commit()
         
         print(f"[DB] Updated last agent context check for waId: {wa_id}")
         return True
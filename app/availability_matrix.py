@@ -0,0 +1,103 @@
+"""
+Per-night room occupancy matrix for Las Hojas Resort.
+
+Instead of asking MySQL "is anything free from X to Y?" once per sub-period,
+the smart availability checker fetches every occupied room-night in the
+requested window from room_nights in ONE query and builds a bitset per room,
+where bit ``i`` means "room is occupied on night ``window_start + i``".
+
+Any contiguous sub-stay can then be answered in memory: a stay of ``n`` nights
+starting at offset ``a`` is available for a room type when at least one of its
+rooms has a free run of ``n`` or more nights starting at ``a``.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Room catalogue used by database_client.check_room_availability
+# (room 17 has never been categorised, so it is not offered).
+ROOM_TYPE_ORDER = ["bungalow_familiar", "bungalow_junior", "habitacion"]
+ROOMS_BY_TYPE: Dict[str, List[str]] = {
+    "bungalow_familiar": [str(n) for n in range(1, 17)],
+    "bungalow_junior": [str(n) for n in range(18, 60)],
+    "habitacion": [f"{n}A" for n in range(1, 15)],
+}
+
+
+def parse_room_list(raw: Optional[str]) -> List[str]:
+    """
+    Split a booking's room field into room numbers.
+
+    Handles both "1-ROOM1+ROOM2" and "ROOM1+ROOM2" formats, exactly like the
+    SUBSTRING_INDEX parsing the availability SQL used before room_nights.
+    """
+    if not raw:
+        return []
+    if "-" in raw:
+        raw = raw[raw.index("-") + 1:]
+    return [token.strip().upper() for token in raw.replace("+", ",").split(",") if token.strip()]
+
+
+def matrix_from_room_nights(room_nights: Iterable[Tuple[str, date]], window_start: date) -> Dict[str, int]:
+    """
+    Build ``{room_number: occupied_bitmask}`` from materialized (room_number, night) rows inside the window.
+    """
+    matrix: Dict[str, int] = {}
+    for room, night in room_nights:
+        room = room.upper()
+        matrix[room] = matrix.get(room, 0) | 1 << (night - window_start).days
+    return matrix
+
+
+def _free_runs(occupied: int, nights: int) -> List[int]:
+    """For each night offset, how many consecutive free nights start there."""
+    runs = [0] * (nights + 1)
+    for offset in range(nights - 1, -1, -1):
+        runs[offset] = 0 if occupied >> offset & 1 else runs[offset + 1] + 1
+    return runs[:nights]
+
+
+def longest_free_runs_by_type(matrix: Dict[str, int], nights: int) -> Dict[str, List[int]]:
+    """
+    For each room type and night offset, the longest free run any room of that type has.
+    """
+    result = {}
+    for room_type in ROOM_TYPE_ORDER:
+        best = [0] * nights
+        for room in ROOMS_BY_TYPE[room_type]:
+            runs = _free_runs(matrix.get(room, 0), nights)
+            best = [max(a, b) for a, b in zip(best, runs)]
+        result[room_type] = best
+    return result
+
+
+def availability_for_period(runs_by_type: Dict[str, List[int]], start_offset: int, nights: int) -> Dict[str, str]:
+    """
+    Availability by room type for a sub-stay, in check_room_availability's format.
+    """
+    return {
+        room_type: "Available" if runs_by_type[room_type][start_offset] >= nights else "Not Available"
+        for room_type in ROOM_TYPE_ORDER
+    }
+
+
+def enumerate_sub_stays(runs_by_type: Dict[str, List[int]], window_start: date, total_nights: int) -> List[Dict]:
+    """
+    Every contiguous sub-stay (1..total_nights nights) with at least one room type free.
+    """
+    options = []
+    for nights in range(1, total_nights + 1):
+        for start_offset in range(total_nights - nights + 1):
+            detail = availability_for_period(runs_by_type, start_offset, nights)
+            available_types = [room_type for room_type, status in detail.items() if status == "Available"]
+            if not available_types:
+                continue
+            sub_checkin = window_start + timedelta(days=start_offset)
+            options.append({
+                "check_in": sub_checkin.strftime("%Y-%m-%d"),
+                "check_out": (sub_checkin + timedelta(days=nights)).strftime("%Y-%m-%d"),
+                "nights": nights,
+                "available_room_types": available_types,
+                "availability_detail": detail
+            })
+    return options
@@ -4,44 +4,53 @@ Staged Retry/Escalation System for Bank Transfer Validation
 This module provides automatic retry logic for bank transfer validation and booking
 with escalation to human agents when needed.
 """
-import os
-import json
 import logging
-import asyncio
-import threading
-import time
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 from .bank_transfer_tool import sync_bank_transfers, validate_bank_transfer
 from .database_client import check_room_availability, check_room_availability_counts
 from .wati_client import update_chat_status, send_wati_message
+from .retry_scheduler import retry_scheduler
 
 logger = logging.getLogger(__name__)
 
-# File to store retry state for each customer
-RETRY_STATE_FILE = "/tmp/bank_transfer_retry_state.json"
+# Retry jobs are rows in the shared retry scheduler's SQLite table (see retry_scheduler)
+RETRY_JOB_KIND = "bank_transfer"
 
+# Stage -> (interval between attempts in minutes, state key holding the stage's max attempts)
+RETRY_STAGES = {
+    1: (5, "max_attempts_stage_1"),
+    2: (30, "max_attempts_stage_2"),
+    3: (60, "max_attempts_stage_3"),
+}
 
-def _load_retry_state() -> Dict[str, Any]:
-    """Load retry state from file."""
+
+def _get_retry_state(phone_number: str) -> Optional[Dict[str, Any]]:
+    """Retry state for one customer, or None if no retry is pending."""
     try:
-        if os.path.exists(RETRY_STATE_FILE):
-            with open(RETRY_STATE_FILE, 'r') as f:
-                return json.load(f)
+        return retry_scheduler.get_state(RETRY_JOB_KIND, phone_number)
     except Exception as e:
         logger.error(f"Failed to load retry state: {e}")
-    return {}
+        return None
 
 
-def _save_retry_state(state: Dict[str, Any]) -> None:
-    """Save retry state to file."""
+def _update_retry_state(phone_number: str, **changes: Any) -> None:
+    """Merge changes into a customer's retry state (no-op if no retry is pending)."""
     try:
-        with open(RETRY_STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        retry_scheduler.update_state(RETRY_JOB_KIND, phone_number, **changes)
     except Exception as e:
         logger.error(f"Failed to save retry state: {e}")
 
 
+def _clear_retry_state(phone_number: str) -> bool:
+    """Drop a customer's pending retry job."""
+    try:
+        return retry_scheduler.cancel(RETRY_JOB_KIND, phone_number)
+    except Exception as e:
+        logger.error(f"Failed to clear retry state: {e}")
+        return False
+
+
 async def start_bank_transfer_retry_process(phone_number: str, payment_data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Start the staged retry process for bank transfer validation and booking.
@@ -229,11 +238,8 @@ async def start_bank_transfer_retry_process(phone_number: str, payment_data: Dic
     
     logger.info(f"Starting staged retry process for {phone_number}")
     
-    # Load current retry state
-    retry_state = _load_retry_state()
-    
     # Initialize retry state for this customer
-    retry_state[phone_number] = {
+    customer_state = {
         "start_time": datetime.now().isoformat(),
         "payment_data": payment_data,
         "stage": 1,  # Stage 1: 5-min intervals, Stage 2: 30-min intervals, Stage 3: 1-hour intervals
@@ -246,155 +252,126 @@ async def start_bank_transfer_retry_process(phone_number: str, payment_data: Dic
         "start_after": payment_data.get("start_after"),  # UTC ISO datetime; None = start immediately
     }
     
-    _save_retry_state(retry_state)
-    
-    # Start the retry process in a separate thread to avoid blocking
-    def run_retry_process():
-        try:
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(_execute_retry_process(phone_number))
-        except Exception as e:
-            logger.exception(f"Error in retry thread for {phone_number}: {e}")
-        finally:
-            loop.close()
+    # Delayed start for UNI transfers: first attempt when the bank is expected to process the transfer
+    delay_seconds = _seconds_until_start_after(phone_number, customer_state["start_after"])
     
-    thread = threading.Thread(target=run_retry_process, daemon=True)
-    thread.start()
+    # Durable job on the shared scheduler (survives restarts; replaces any pending retry for this customer)
+    retry_scheduler.schedule(RETRY_JOB_KIND, phone_number, customer_state, delay=delay_seconds)
     
-    logger.info(f"Retry process thread started for {phone_number}")
+    logger.info(f"Retry process scheduled for {phone_number}")
     
     return {"success": True, "message": "Retry process started"}
 
 
-async def _execute_retry_process(phone_number: str) -> None:
+def _seconds_until_start_after(phone_number: str, start_after_str: Optional[str]) -> float:
+    """Seconds until the UNI start_after time (0 if unset, past or unparseable)."""
+    if not start_after_str:
+        return 0.0
+    try:
+        from pytz import utc as _utc
+        start_after_dt = datetime.fromisoformat(start_after_str)
+        if start_after_dt.tzinfo is None:
+            start_after_dt = _utc.localize(start_after_dt)
+        wait_seconds = (start_after_dt - datetime.now(_utc)).total_seconds()
+        if wait_seconds > 0:
+            logger.info(
+                f"[UNI_DELAY] {phone_number}: UNI transfer detected. "
+                f"Waiting {wait_seconds / 3600:.1f}h until {start_after_str} (SV 9:00 AM) "
+                f"before first BAC retry."
+            )
+            return wait_seconds
+    except Exception as e:
+        logger.warning(f"[UNI_DELAY] Could not parse start_after '{start_after_str}': {e}")
+    return 0.0
+
+
+async def _prepare_retry_batch() -> Dict[str, Any]:
+    """One bank sync shared by every customer whose retry is due in this batch."""
+    try:
+        return await sync_bank_transfers()
+    except Exception as e:
+        logger.exception(f"Bank transfer sync failed for retry batch: {e}")
+        return {"success": False, "error": str(e)}
+
+
+async def _run_retry_attempt(phone_number: str, customer_state: Dict[str, Any], sync_result: Dict[str, Any]) -> Optional[float]:
     """
-    Execute the staged retry process for a customer.
-    This runs in a continuous loop and handles all retry attempts.
+    Execute one staged retry attempt for a customer (called by the retry scheduler).
+    
+    Returns:
+        Seconds until the next attempt, or None when the retry process is over
+        (booked, escalated or exhausted).
     """
     try:
-        # Delayed start for UNI transfers: wait until the bank is expected to process the transfer
-        retry_state = _load_retry_state()
-        customer_state = retry_state.get(phone_number, {})
-        start_after_str = customer_state.get("start_after")
-        if start_after_str:
-            try:
-                from pytz import utc as _utc
-                start_after_dt = datetime.fromisoformat(start_after_str)
-                if start_after_dt.tzinfo is None:
-                    start_after_dt = _utc.localize(start_after_dt)
-                now_utc = datetime.now(_utc)
-                wait_seconds = (start_after_dt - now_utc).total_seconds()
-                if wait_seconds > 0:
-                    logger.info(
-                        f"[UNI_DELAY] {phone_number}: UNI transfer detected. "
-                        f"Waiting {wait_seconds / 3600:.1f}h until {start_after_str} (SV 9:00 AM) "
-                        f"before first BAC retry."
-                    )
-                    await asyncio.sleep(wait_seconds)
-                    logger.info(f"[UNI_DELAY] {phone_number}: Wait complete, starting retries now.")
-            except Exception as e:
-                logger.warning(f"[UNI_DELAY] Could not parse start_after '{start_after_str}': {e}")
-
-        while True:
-            retry_state = _load_retry_state()
-            customer_state = retry_state.get(phone_number)
+        if customer_state.get("escalated"):
+            logger.info(f"Retry process ended for {phone_number} - escalated")
+            return None
             
-            if not customer_state or customer_state.get("escalated"):
-                logger.info(f"Retry process ended for {phone_number} - no state or escalated")
-                return
-                
-            payment_data = customer_state["payment_data"]
-            stage = customer_state["stage"]
-            attempt_count = customer_state["attempt_count"]
+        payment_data = customer_state["payment_data"]
+        stage = customer_state["stage"]
+        attempt_count = customer_state["attempt_count"]
+        
+        # Determine retry interval and max attempts based on stage
+        if stage not in RETRY_STAGES:
+            # All stages completed, escalate
+            await _escalate_to_human(phone_number, "All retry stages completed without success")
+            return None
+        interval_minutes, max_attempts_key = RETRY_STAGES[stage]
+        max_attempts = customer_state[max_attempts_key]
+        stage_name = f"Stage {stage} ({interval_minutes}-min intervals)"
             
-            # Determine retry interval and max attempts based on stage
-            if stage == 1:
-                interval_minutes = 5
-                max_attempts = customer_state["max_attempts_stage_1"]
-                stage_name = "Stage 1 (5-min intervals)"
-            elif stage == 2:
-                interval_minutes = 30
-                max_attempts = customer_state["max_attempts_stage_2"]
-                stage_name = "Stage 2 (30-min intervals)"
-            elif stage == 3:
-                interval_minutes = 60
-                max_attempts = customer_state["max_attempts_stage_3"]
-                stage_name = "Stage 3 (1-hour intervals)"
-            else:
-                # All stages completed, escalate
-                await _escalate_to_human(phone_number, "All retry stages completed without success")
-                return
-                
-            logger.info(f"Executing {stage_name} attempt #{attempt_count + 1} for {phone_number}")
+        logger.info(f"Executing {stage_name} attempt #{attempt_count + 1} for {phone_number}")
+        
+        # Check if customer has become frustrated or requested refund
+        if customer_state.get("customer_frustrated"):
+            logger.info(f"Retry process halted for {phone_number} due to customer frustration")
+            await _escalate_to_human(phone_number, "Customer expressed frustration")
+            return None
             
-            # Check if customer has become frustrated or requested refund
-            if customer_state.get("customer_frustrated"):
-                logger.info(f"Retry process halted for {phone_number} due to customer frustration")
-                await _escalate_to_human(phone_number, "Customer expressed frustration")
-                return
-                
-            # Attempt validation and booking
-            success = await _attempt_validation_and_booking(phone_number, payment_data)
+        # Attempt validation and booking
+        success = await _attempt_validation_and_booking(phone_number, payment_data, sync_result=sync_result)
+        
+        if success:
+            logger.info(f"Validation and booking successful for {phone_number} on {stage_name} attempt #{attempt_count + 1}")
+            return None
             
-            if success:
-                logger.info(f"Validation and booking successful for {phone_number} on {stage_name} attempt #{attempt_count + 1}")
-                # Remove from retry state
-                retry_state = _load_retry_state()
-                if phone_number in retry_state:
-                    del retry_state[phone_number]
-                    _save_retry_state(retry_state)
-                return
+        # Update attempt count
+        attempt_count += 1
+        
+        # Check if we've reached max attempts for current stage
+        if attempt_count >= max_attempts:
+            if stage < 3:
+                # Special handling when transitioning from Stage 1 to Stage 2 (around 60 minutes)
+                if stage == 1:
+                    logger.info(f"Stage 1 completed for {phone_number}, checking for Transferencia UNI vs 365")
+                    # Check if customer used Transferencia UNI instead of recommended Transferencia 365
+                    uni_check_result = await _check_transferencia_uni_vs_365(phone_number, payment_data)
+                    if uni_check_result == "escalated":
+                        # Customer used UNI, case escalated
+                        return None
+                    # Customer used 365 or no response yet: continue with Stage 2 anyway
                 
-            # Update attempt count
-            retry_state = _load_retry_state()
-            customer_state = retry_state.get(phone_number, {})
-            customer_state["attempt_count"] = attempt_count + 1
-            
-            # Check if we've reached max attempts for current stage
-            if customer_state["attempt_count"] >= max_attempts:
-                if stage < 3:
-                    # Special handling when transitioning from Stage 1 to Stage 2 (around 60 minutes)
-                    if stage == 1:
-                        logger.info(f"Stage 1 completed for {phone_number}, checking for Transferencia UNI vs 365")
-                        # Check if customer used Transferencia UNI instead of recommended Transferencia 365
-                        uni_check_result = await _check_transferencia_uni_vs_365(phone_number, payment_data)
-                        if uni_check_result == "escalated":
-                            # Customer used UNI, case escalated
-                            return
-                        elif uni_check_result == "continue":
-                            # Customer used 365, continue retrying
-                            pass
-                        # If no response or other result, continue with Stage 2 anyway
-                    
-                    # Move to next stage
-                    customer_state["stage"] = stage + 1
-                    customer_state["attempt_count"] = 0
-                    logger.info(f"Moving {phone_number} to stage {stage + 1}")
-                    retry_state[phone_number] = customer_state
-                    _save_retry_state(retry_state)
-                    # Continue immediately to next stage
-                    continue
-                else:
-                    # All stages completed, escalate
-                    await _escalate_to_human(phone_number, "All retry attempts exhausted")
-                    return
+                # Move to next stage and continue immediately
+                logger.info(f"Moving {phone_number} to stage {stage + 1}")
+                _update_retry_state(phone_number, stage=stage + 1, attempt_count=0)
+                return 0.0
             else:
-                # Continue with current stage - save state and wait for next attempt
-                retry_state[phone_number] = customer_state
-                _save_retry_state(retry_state)
-                
-                # Wait for the retry interval before next attempt
-                logger.info(f"Waiting {interval_minutes} minutes before next attempt for {phone_number}")
-                await asyncio.sleep(interval_minutes * 60)
+                # All stages completed, escalate
+                await _escalate_to_human(phone_number, "All retry attempts exhausted")
+                return None
+        
+        # Continue with current stage - save state and wait for next attempt
+        _update_retry_state(phone_number, attempt_count=attempt_count)
+        logger.info(f"Waiting {interval_minutes} minutes before next attempt for {phone_number}")
+        return interval_minutes * 60
                 
     except Exception as e:
         logger.exception(f"Error in retry process for {phone_number}: {e}")
         await _escalate_to_human(phone_number, f"Retry process error: {e}")
+        return None
 
 
-async def _attempt_validation_and_booking(phone_number: str, payment_data: Dict[str, Any]) -> bool:
+async def _attempt_validation_and_booking(phone_number: str, payment_data: Dict[str, Any], sync_result: Optional[Dict[str, Any]] = None) -> bool:
     """
     Attempt to validate bank transfer and complete booking.
     
@@ -404,15 +381,16 @@ async def _attempt_validation_and_booking(phone_number: str, payment_data: Dict[
     try:
         logger.info(f"Attempting validation and booking for {phone_number}")
         
-        # First sync bank transfers
-        sync_result = await sync_bank_transfers()
+        # First sync bank transfers (unless this batch already did)
+        if sync_result is None:
+            sync_result = await sync_bank_transfers()
         if not sync_result.get("success"):
             logger.warning(f"Bank transfer sync failed for {phone_number}: {sync_result.get('error')}")
             return False
             
         # Validate the payment — try original slip_date first
         slip_date = payment_data["slip_date"]
-        validation_result = validate_bank_transfer(
+        validation_result = await validate_bank_transfer(
             slip_date=slip_date,
             slip_amount=payment_data["slip_amount"],
             booking_amount=payment_data["booking_amount"]
@@ -436,7 +414,7 @@ async def _attempt_validation_and_booking(phone_number: str, payment_data: Dict[
                         f"[DATE_SHIFT] Original date {slip_date} not found, trying next-day date "
                         f"{next_day_str} (late-night Transfer365 scenario) for {phone_number}"
                     )
-                    alt_result = validate_bank_transfer(
+                    alt_result = await validate_bank_transfer(
                         slip_date=next_day_str,
                         slip_amount=payment_data["slip_amount"],
                         booking_amount=payment_data["booking_amount"]
@@ -541,11 +519,7 @@ async def _attempt_validation_and_booking(phone_number: str, payment_data: Dict[
                 await send_wati_message(phone_number, ask_message)
                 
                 # Mark state so we know we're waiting for customer data
-                retry_state = _load_retry_state()
-                if phone_number in retry_state:
-                    retry_state[phone_number]["waiting_for_data"] = True
-                    retry_state[phone_number]["missing_fields"] = missing_fields
-                    _save_retry_state(retry_state)
+                _update_retry_state(phone_number, waiting_for_data=True, missing_fields=missing_fields)
                 
                 return False  # Don't continue retrying with bad data
             
@@ -574,13 +548,13 @@ async def _escalate_to_human(phone_number: str, reason: str) -> None:
         )
         await send_wati_message(phone_number, escalation_message)
         
-        # Update retry state to mark as escalated
-        retry_state = _load_retry_state()
-        if phone_number in retry_state:
-            retry_state[phone_number]["escalated"] = True
-            retry_state[phone_number]["escalation_reason"] = reason
-            retry_state[phone_number]["escalation_time"] = datetime.now().isoformat()
-            _save_retry_state(retry_state)
+        # Update retry state to mark as escalated (the scheduled job ends at its next run)
+        _update_retry_state(
+            phone_number,
+            escalated=True,
+            escalation_reason=reason,
+            escalation_time=datetime.now().isoformat(),
+        )
             
         logger.info(f"Successfully escalated {phone_number} to human agent")
         
@@ -596,11 +570,7 @@ async def mark_customer_frustrated(phone_number: str) -> None:
     try:
         logger.info(f"Marking customer {phone_number} as frustrated, halting retry process")
         
-        retry_state = _load_retry_state()
-        if phone_number in retry_state:
-            retry_state[phone_number]["customer_frustrated"] = True
-            retry_state[phone_number]["frustration_time"] = datetime.now().isoformat()
-            _save_retry_state(retry_state)
+        _update_retry_state(phone_number, customer_frustrated=True, frustration_time=datetime.now().isoformat())
             
         # Immediately escalate to human
         await _escalate_to_human(phone_number, "Customer expressed frustration or requested refund")
@@ -775,10 +745,7 @@ async def _handle_transferencia_uni_escalation(phone_number: str, payment_data:
             await _escalate_to_human(phone_number, "Transferencia UNI - requires human tracking")
         
         # Remove from retry state
-        retry_state = _load_retry_state()
-        if phone_number in retry_state:
-            del retry_state[phone_number]
-            _save_retry_state(retry_state)
+        if _clear_retry_state(phone_number):
             logger.info(f"Removed {phone_number} from retry state due to UNI escalation")
             
     except Exception as e:
@@ -861,8 +828,7 @@ async def handle_customer_transferencia_type_response(phone_number: str, respons
             logger.info(f"Customer {phone_number} confirmed using Transferencia UNI")
             
             # Get payment data from retry state
-            retry_state = _load_retry_state()
-            customer_state = retry_state.get(phone_number, {})
+            customer_state = _get_retry_state(phone_number) or {}
             payment_data = customer_state.get("payment_data", {})
             
             # Escalate UNI case
@@ -885,3 +851,6 @@ async def handle_customer_transferencia_type_response(phone_number: str, respons
     except Exception as e:
         logger.exception(f"Error handling transferencia type response from {phone_number}: {e}")
         return "unclear"
+
+
+retry_scheduler.register(RETRY_JOB_KIND, _run_retry_attempt, prepare=_prepare_retry_batch)
@@ -12,67 +12,22 @@ import json
 import logging
 import asyncio
 import random
-import fcntl
-import time
 from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict
-from playwright.async_api import async_playwright, Page
+from playwright.async_api import Page
 import mysql.connector
 from mysql.connector import Error as MySQLError
-from .database_client import get_db_connection, execute_with_retry
+from .database_client import get_db_connection, release_db_connection, run_db, run_in_db_executor
 from .wati_client import update_chat_status, send_wati_message
+from .single_flight import SingleFlight
+from .clients import browser_pool
+from . import config
 from dotenv import load_dotenv
 
-# Process-safe lock to prevent concurrent bank sync sessions across workers/processes
+# One BAC session at a time across workers; concurrent callers share the result
 BANK_SYNC_LOCK_FILE = "/tmp/bank_sync.lock"
-_last_sync_time = None
-_sync_cooldown_seconds = 30  # Minimum time between sync operations
-
-class ProcessSafeLock:
-    """File-based lock that works across multiple processes/workers"""
-    
-    def __init__(self, lock_file_path):
-        self.lock_file_path = lock_file_path
-        self.lock_file = None
-    
-    async def __aenter__(self):
-        """Acquire the lock"""
-        logger.info(f"[LOCK] Attempting to acquire process-safe lock: {self.lock_file_path}")
-        
-        # Try to acquire lock with timeout
-        max_wait = 300  # 5 minutes maximum wait
-        start_time = time.time()
-        
-        while time.time() - start_time < max_wait:
-            try:
-                self.lock_file = open(self.lock_file_path, 'w')
-                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
-                logger.info(f"[LOCK] Successfully acquired process-safe lock")
-                return self
-            except (IOError, OSError) as e:
-                if self.lock_file:
-                    self.lock_file.close()
-                    self.lock_file = None
-                # Lock is held by another process, wait and retry
-                logger.info(f"[LOCK] Lock held by another process, waiting...")
-                await asyncio.sleep(5)  # Wait 5 seconds before retrying
-        
-        # Timeout reached
-        raise Exception(f"Failed to acquire process lock within {max_wait} seconds")
-    
-    async def __aexit__(self, exc_type, exc_val, exc_tb):
-        """Release the lock"""
-        if self.lock_file:
-            try:
-                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
-                self.lock_file.close()
-                os.unlink(self.lock_file_path)
-                logger.info(f"[LOCK] Released process-safe lock")
-            except Exception as e:
-                logger.error(f"[LOCK] Error releasing lock: {e}")
-            finally:
-                self.lock_file = None
+_bank_sync = SingleFlight("bank_sync", BANK_SYNC_LOCK_FILE, config.BANK_SYNC_FRESHNESS_SECONDS)
 
 # Load environment variables from .env file
 load_dotenv()
@@ -85,6 +40,37 @@ logger = logging.getLogger(__name__)
 BAC_URL = 'https://www1.sucursalelectronica.com/redir/showLogin.go'
 DOWNLOAD_PATH = '/tmp/bank_transfers'
 
+# Warm browser only: every sync logs in on a fresh context and logs out again
+BAC_PORTAL = browser_pool.Portal(
+    name="bac",
+    launch_args=(
+        '--no-sandbox',
+        '--disable-setuid-sandbox',
+        '--disable-web-security',
+        '--disable-features=IsolateOrigins',
+        '--disable-site-isolation-trials',
+    ),
+    context_options={
+        'user_agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+        'extra_http_headers': {
+            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
+            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8'
+        },
+    },
+    # --- Browser Evasion Setup from JS example ---
+    init_script="""
+        () => {
+            Object.defineProperty(navigator, 'webdriver', { get: () => false });
+            window.chrome = { runtime: {} };
+            Object.defineProperty(navigator, 'languages', { get: () => ['es-ES', 'es', 'en-US', 'en'] });
+            window.Notification = { permission: 'default' };
+            Object.defineProperty(navigator, 'plugins', { 
+                get: () => [ { name: 'Chrome PDF Plugin', filename: 'internal-pdf-viewer' } ]
+            });
+        }
+    """,
+)
+
 # Ensure download directory exists
 if not os.path.exists(DOWNLOAD_PATH):
     os.makedirs(DOWNLOAD_PATH)
@@ -382,141 +368,105 @@ async def login_and_download_csv(page: Page, username: str, password: str) -> st
 async def sync_bank_transfers() -> dict:
     """
     Main function to orchestrate the bank transfer sync process.
+
+    Single-flight across workers: callers arriving while a sync is running
+    share its result, and a sync that finished less than
+    BANK_SYNC_FRESHNESS_SECONDS ago is reused instead of logging in again.
+    """
+    return await _bank_sync.run(_run_bank_sync)
+
+
+def get_sync_metrics() -> dict:
+    """Single-flight counters (calls, BAC logins, joined/fresh reuses) for this worker."""
+    return _bank_sync.metrics()
+
+
+async def _run_bank_sync() -> dict:
+    """
+    Log in to BAC, download the transfers CSV and import it.
     INFINITE RETRY: Never give up on syncing bank transfers to avoid leaving customers hanging.
-    Uses global locking to prevent concurrent sessions that could be terminated by the bank.
+    Only call through sync_bank_transfers(): concurrent BAC sessions get terminated by the bank.
     """
-    global _last_sync_time
-    
-    async with ProcessSafeLock(BANK_SYNC_LOCK_FILE):
-        # Check cooldown period to prevent too frequent sync operations
-        now = datetime.now()
-        if _last_sync_time and (now - _last_sync_time).total_seconds() < _sync_cooldown_seconds:
-            remaining_cooldown = _sync_cooldown_seconds - (now - _last_sync_time).total_seconds()
-            logger.info(f"Bank sync in cooldown period. {remaining_cooldown:.1f} seconds remaining.")
-            return {
-                "success": True, 
-                "data": {"message": f"Sync skipped - cooldown active ({remaining_cooldown:.1f}s remaining)"}, 
-                "error": None
-            }
-        
-        logger.info("Starting bank transfer sync (with concurrency protection)")
-        
-        username = os.getenv('BAC_USERNAME')
-        password = os.getenv('BAC_PASSWORD')
+    logger.info("Starting bank transfer sync (single-flight)")
+
+    username = os.getenv('BAC_USERNAME')
+    password = os.getenv('BAC_PASSWORD')
 
-        if not username or not password:
-            error_msg = "BAC credentials not found in environment variables"
-            logger.error(error_msg)
-            return {"success": False, "data": {}, "error": error_msg}
+    if not username or not password:
+        error_msg = "BAC credentials not found in environment variables"
+        logger.error(error_msg)
+        return {"success": False, "data": {}, "error": error_msg}
 
     # INFINITE RETRY LOOP - Never give up on bank transfer sync
-        retry_count = 0
+    retry_count = 0
     while True:
-            retry_count += 1
-            logger.info(f"Bank transfer sync attempt #{retry_count}")
-            
-            async with async_playwright() as p:
-                browser = None
+        retry_count += 1
+        logger.info(f"Bank transfer sync attempt #{retry_count}")
+        
+        try:
+            async with browser_pool.page(BAC_PORTAL) as page:
                 try:
-                    logger.info('Launching browser...')
-                    browser = await p.chromium.launch(
-                        headless=True, 
-                        args=[
-                            '--no-sandbox',
-                            '--disable-setuid-sandbox',
-                            '--disable-web-security',
-                            '--disable-features=IsolateOrigins',
-                            '--disable-site-isolation-trials',
-                        ]
-                    )
-
-                    context = await browser.new_context(
-                        user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
-                        extra_http_headers={
-                            'Accept-Language': 'es-ES,es;q=0.9,en;q=0.8',
-                            'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,image/apng,*/*;q=0.8'
-                        }
-                    )
-                    page = await context.new_page()
-
-                    # --- Browser Evasion Setup from JS example ---
-                    await page.add_init_script("""
-                        () => {
-                            Object.defineProperty(navigator, 'webdriver', { get: () => false });
-                            window.chrome = { runtime: {} };
-                            Object.defineProperty(navigator, 'languages', { get: () => ['es-ES', 'es', 'en-US', 'en'] });
-                            window.Notification = { permission: 'default' };
-                            Object.defineProperty(navigator, 'plugins', { 
-                                get: () => [ { name: 'Chrome PDF Plugin', filename: 'internal-pdf-viewer' } ]
-                            });
-                        }
-                    """)
-                    
-                    client = await context.new_cdp_session(page)
+                    client = await page.context.new_cdp_session(page)
                     await client.send('Page.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': DOWNLOAD_PATH})
 
                     file_path = await login_and_download_csv(page, username, password)
-                    
-                    # Perform logout within the main try block if login was successful
-                    try:
-                        logger.info('Logging out...')
-                        await human_click(page, 'p.bel-typography.bel-typography-p.header-text-color.padding-right-xs', options={'timeout': 10000})
-                        await page.wait_for_load_state('networkidle', timeout=30000)
-                        logger.info('Logout successful')
-                    except Exception as e:
-                        logger.error(f'Logout failed: {e}')
-
-                    # Process data after logging out
-                    result = await process_csv_and_insert_to_db(file_path)
-                    
-                    # Update last sync time on success
-                    _last_sync_time = datetime.now()
-                    
-                    conclusion = f"Successfully synced {result['rows_inserted']} new bank transfers."
-                    logger.info(conclusion)
-                    return {
-                        "success": True,
-                        "data": {
-                            "rows_inserted": result['rows_inserted'],
-                            "rows_skipped": result['rows_skipped'],
-                            "last_sync_timestamp": datetime.utcnow().isoformat()
-                        },
-                        "error": ""
-                    }
-
-                except Exception as e:
-                    error_message = str(e)
-                    logger.exception(f"Bank transfer sync attempt #{retry_count} failed: {e}")
-                    
-                    # Check if it's a Playwright browser missing error
-                    if "Executable doesn't exist" in error_message or "playwright" in error_message.lower():
-                        logger.warning("[PLAYWRIGHT_ERROR] Detected missing browser error!")
-                        
-                        # Attempt auto-recovery
-                        if reinstall_playwright_browsers():
-                            logger.info("[PLAYWRIGHT_RECOVERY] Browsers reinstalled! Retrying immediately...")
-                            await asyncio.sleep(2)  # Short delay before retry
-                            continue
-                        else:
-                            logger.error("[PLAYWRIGHT_RECOVERY] Auto-recovery failed! Continuing with normal retry...")
-                    
-                    if 'page' in locals() and page and not page.is_closed():
+                except Exception:
+                    if not page.is_closed():
                         timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
                         screenshot_path = f"error-{timestamp}.png"
-                        await page.screenshot(path=screenshot_path, full_page=True)
-                        logger.info(f"Error screenshot saved to {screenshot_path}")
+                        try:
+                            await page.screenshot(path=screenshot_path, full_page=True)
+                            logger.info(f"Error screenshot saved to {screenshot_path}")
+                        except Exception as screenshot_err:
+                            logger.error(f"Failed to take screenshot: {screenshot_err}")
                         logger.error(f"Current URL at error: {page.url}")
-                    
-                    # Wait 10 seconds before retrying
-                    logger.info(f"Waiting 10 seconds before retry #{retry_count + 1}...")
-                    await asyncio.sleep(10)
-                    
-                finally:
-                    if browser:
-                        await browser.close()
-                        logger.info('Browser closed')
-                
-                # Continue the infinite retry loop
+                    raise
+
+                # Logout after a successful download (BAC terminates sessions that stay open)
+                try:
+                    logger.info('Logging out...')
+                    await human_click(page, 'p.bel-typography.bel-typography-p.header-text-color.padding-right-xs', options={'timeout': 10000})
+                    await page.wait_for_load_state('networkidle', timeout=30000)
+                    logger.info('Logout successful')
+                except Exception as e:
+                    logger.error(f'Logout failed: {e}')
+
+            # Process data after logging out (the warm browser is free for the next sync)
+            result = await process_csv_and_insert_to_db(file_path)
+
+            conclusion = f"Successfully synced {result['rows_inserted']} new bank transfers."
+            logger.info(conclusion)
+            return {
+                "success": True,
+                "data": {
+                    "rows_inserted": result['rows_inserted'],
+                    "rows_skipped": result['rows_skipped'],
+                    "last_sync_timestamp": datetime.utcnow().isoformat()
+                },
+                "error": ""
+            }
+
+        except Exception as e:
+            error_message = str(e)
+            logger.exception(f"Bank transfer sync attempt #{retry_count} failed: {e}")
+
+            # Check if it's a Playwright browser missing error
+            if "Executable doesn't exist" in error_message or "playwright" in error_message.lower():
+                logger.warning("[PLAYWRIGHT_ERROR] Detected missing browser error!")
+
+                # Attempt auto-recovery
+                if reinstall_playwright_browsers():
+                    logger.info("[PLAYWRIGHT_RECOVERY] Browsers reinstalled! Retrying immediately...")
+                    await asyncio.sleep(2)  # Short delay before retry
+                    continue
+                else:
+                    logger.error("[PLAYWRIGHT_RECOVERY] Auto-recovery failed! Continuing with normal retry...")
+
+            # Wait 10 seconds before retrying
+            logger.info(f"Waiting 10 seconds before retry #{retry_count + 1}...")
+            await asyncio.sleep(10)
+
+        # Continue the infinite retry loop
 
 async def download_bank_csv_standalone() -> str:
     """
@@ -532,41 +482,106 @@ async def download_bank_csv_standalone() -> str:
     if not username or not password:
         raise Exception("BAC credentials not found in environment variables")
     
-    async with async_playwright() as p:
-        browser = None
+    async with browser_pool.page(BAC_PORTAL) as page:
+        client = await page.context.new_cdp_session(page)
+        await client.send('Page.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': DOWNLOAD_PATH})
+
+        file_path = await login_and_download_csv(page, username, password)
+
+        # Logout
         try:
-            browser = await p.chromium.launch(
-                headless=True,
-                args=['--no-sandbox', '--disable-setuid-sandbox']
-            )
-            context = await browser.new_context(
-                user_agent='Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-            )
-            page = await context.new_page()
-            
-            client = await context.new_cdp_session(page)
-            await client.send('Page.setDownloadBehavior', {'behavior': 'allow', 'downloadPath': DOWNLOAD_PATH})
-            
-            file_path = await login_and_download_csv(page, username, password)
-            
-            # Logout
-            try:
-                await human_click(page, 'p.bel-typography.bel-typography-p.header-text-color.padding-right-xs', options={'timeout': 10000})
-                await page.wait_for_load_state('networkidle', timeout=30000)
-            except Exception:
-                pass
-            
-            logger.info(f"[CSV_REDOWNLOAD] Successfully downloaded: {file_path}")
-            return file_path
-        finally:
-            if browser:
-                await browser.close()
+            await human_click(page, 'p.bel-typography.bel-typography-p.header-text-color.padding-right-xs', options={'timeout': 10000})
+            await page.wait_for_load_state('networkidle', timeout=30000)
+        except Exception:
+            pass
+
+        logger.info(f"[CSV_REDOWNLOAD] Successfully downloaded: {file_path}")
+        return file_path
+
+
+BAC_CSV_HEADERS = ['date', 'reference', 'code', 'description', 'debit', 'credit', 'balance']
+BAC_INSERT_BATCH_SIZE = 500
+_bac_schema_ready = False
+
+
+def _ensure_bac_schema(conn, cursor) -> None:
+    """Create the bac and watermark tables once per process."""
+    global _bac_schema_ready
+    if _bac_schema_ready:
+        return
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS bac (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        date VARCHAR(255),
+        reference VARCHAR(255),
+        code VARCHAR(255),
+        description VARCHAR(255),
+        debit VARCHAR(255),
+        credit VARCHAR(255),
+        balance VARCHAR(255),
+        used DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE KEY unique_transaction (date, reference, code, debit, credit)
+    )
+    """)
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS bac_ingest_watermark (
+        account VARCHAR(64) PRIMARY KEY,
+        last_date DATE NOT NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """)
+    conn.commit()
+    _bac_schema_ready = True
+    logger.info("'bac' tables are ready.")
+
+
+def _parse_bac_date(value: str):
+    try:
+        return datetime.strptime(value, '%d/%m/%Y').date()
+    except ValueError:
+        return None
+
+
+def parse_bac_csv(file_path: str) -> dict:
+    """
+    Parse a BAC statement CSV.
+
+    Returns:
+        {"account": account number from the statement header (or "default"),
+         "rows": list of row dicts keyed by BAC_CSV_HEADERS}
+    """
+    account = None
+    rows = []
+    header_found = False
+    with open(file_path, mode='r', encoding='latin-1') as csvfile:
+        for row_values in csv.reader(csvfile):
+            if not header_found:
+                if any(cell and 'Fecha de Transacci' in cell for cell in row_values):
+                    header_found = True
+                    logger.info('CSV header found.')
+                elif account is None and any(cell and 'Cuenta' in cell for cell in row_values):
+                    digits = [''.join(ch for ch in cell if ch.isdigit()) for cell in row_values if cell]
+                    account = next((d for d in digits if len(d) >= 6), None)
+                continue
+
+            if not (row_values and row_values[0]) or any('Resumen de Estado Bancario' in cell for cell in row_values if cell):
+                logger.info('Reached end of relevant data in CSV.')
+                break
+            if len(row_values) == len(BAC_CSV_HEADERS):
+                rows.append({h: v.strip() if v else '' for h, v in zip(BAC_CSV_HEADERS, row_values)})
+    return {"account": account or "default", "rows": rows}
 
 
 async def process_csv_and_insert_to_db(file_path: str) -> dict:
     """
     Processes the downloaded CSV file and inserts data into the bac table.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
+
+    Rows are written in executemany() batches with INSERT IGNORE on the
+    unique_transaction key. Rows older than the account's watermark (the
+    latest transaction date already ingested, minus BAC_WATERMARK_LOOKBACK_DAYS
+    for late-posted transfers) are not sent to the database at all.
     
     If file is missing mid-retry, triggers re-download and continues.
     """
@@ -574,86 +589,61 @@ async def process_csv_and_insert_to_db(file_path: str) -> dict:
     current_file = [file_path]
     
     def _execute_csv_processing():
+        statement = parse_bac_csv(current_file[0])
+        account, rows = statement["account"], statement["rows"]
+
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor()
+            _ensure_bac_schema(conn, cursor)
+
+            cursor.execute("SELECT last_date FROM bac_ingest_watermark WHERE account = %s", (account,))
+            watermark_row = cursor.fetchone()
+            cutoff = None
+            if watermark_row:
+                cutoff = watermark_row[0] - timedelta(days=config.BAC_WATERMARK_LOOKBACK_DAYS)
+
+            pending = []
+            newest = None
+            for row in rows:
+                row_date = _parse_bac_date(row['date'])
+                if row_date is not None:
+                    if cutoff is not None and row_date < cutoff:
+                        continue
+                    newest = row_date if newest is None else max(newest, row_date)
+                pending.append(row)
+            below_watermark = len(rows) - len(pending)
 
-            create_table_query = """
-            CREATE TABLE IF NOT EXISTS bac (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                date VARCHAR(255),
-                reference VARCHAR(255),
-                code VARCHAR(255),
-                description VARCHAR(255),
-                debit VARCHAR(255),
-                credit VARCHAR(255),
-                balance VARCHAR(255),
-                used DECIMAL(10, 2) NOT NULL DEFAULT 0.00,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE KEY unique_transaction (date, reference, code, debit, credit)
-            )
-            """
-            cursor.execute(create_table_query)
-            conn.commit()
-            logger.info("'bac' table is ready.")
-
+            insert_query = """INSERT IGNORE INTO bac (date, reference, code, description, debit, credit, balance, used) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
             rows_inserted = 0
-            rows_skipped = 0
-            header_found = False
-            headers = ['date', 'reference', 'code', 'description', 'debit', 'credit', 'balance']
-
-            with open(current_file[0], mode='r', encoding='latin-1') as csvfile:
-                reader = csv.reader(csvfile)
-                for row_values in reader:
-                    if not header_found and any(cell and 'Fecha de Transacci' in cell for cell in row_values):
-                        header_found = True
-                        logger.info('CSV header found.')
-                        continue
-                    
-                    if header_found:
-                        if not (row_values and row_values[0]) or any('Resumen de Estado Bancario' in cell for cell in row_values if cell):
-                            logger.info('Reached end of relevant data in CSV.')
-                            break
-                        
-                        if len(row_values) == len(headers):
-                            row_data = {h: v.strip() if v else '' for h, v in zip(headers, row_values)}
-                            
-                            # Exactly match JavaScript duplicate detection logic
-                            check_query = """SELECT 1 FROM bac WHERE date = %s AND reference = %s AND code = %s AND debit = %s AND credit = %s LIMIT 1"""
-                            cursor.execute(check_query, (row_data['date'], row_data['reference'], row_data['code'], row_data['debit'], row_data['credit']))
-                            
-                            if cursor.fetchone():
-                                rows_skipped += 1
-                                continue
-
-                            # Insert new record if no duplicate was found
-                            try:
-                                insert_query = """INSERT INTO bac (date, reference, code, description, debit, credit, balance, used) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"""
-                                cursor.execute(insert_query, (
-                                    row_data['date'], 
-                                    row_data['reference'], 
-                                    row_data['code'], 
-                                    row_data['description'], 
-                                    row_data['debit'], 
-                                    row_data['credit'], 
-                                    row_data['balance'],
-                                    0.00
-                                ))
-                                rows_inserted += 1
-                            except Exception as e:
-                                logger.error(f"Error inserting row: {row_data}. Error: {e}")
-                                rows_skipped += 1
+            for start in range(0, len(pending), BAC_INSERT_BATCH_SIZE):
+                batch = pending[start:start + BAC_INSERT_BATCH_SIZE]
+                cursor.executemany(insert_query, [
+                    (r['date'], r['reference'], r['code'], r['description'], r['debit'], r['credit'], r['balance'], 0.00)
+                    for r in batch
+                ])
+                rows_inserted += max(cursor.rowcount, 0)
+
+            if newest is not None:
+                # Same transaction as the inserts: the watermark never runs ahead of the data
+                cursor.execute(
+                    """INSERT INTO bac_ingest_watermark (account, last_date) VALUES (%s, %s)
+                    ON DUPLICATE KEY UPDATE last_date = GREATEST(last_date, VALUES(last_date))""",
+                    (account, newest)
+                )
 
             conn.commit()
-            logger.info(f"Rows inserted: {rows_inserted}, Rows skipped: {rows_skipped}")
-            return {"rows_inserted": rows_inserted, "rows_skipped": rows_skipped}
+            rows_skipped = len(rows) - rows_inserted
+            # INSERT IGNORE reports no per-row errors: anything sent but not inserted was a duplicate or rejected
+            rows_ignored = len(pending) - rows_inserted
+            logger.info(
+                f"Rows inserted: {rows_inserted}, Rows skipped: {rows_skipped} "
+                f"({below_watermark} older than watermark {cutoff}, {rows_ignored} ignored by the database, account {account})"
+            )
+            return {"rows_inserted": rows_inserted, "rows_skipped": rows_skipped, "rows_ignored": rows_ignored}
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
     # Custom retry loop that handles FileNotFoundError by re-downloading
     retry_count = 0
@@ -662,7 +652,7 @@ async def process_csv_and_insert_to_db(file_path: str) -> dict:
     
     while True:
         try:
-            result = _execute_csv_processing()
+            result = await run_in_db_executor(_execute_csv_processing)
             if retry_count > 0:
                 logger.info(f"[CSV_SYNC] Succeeded after {retry_count} retries")
             return result
@@ -686,11 +676,11 @@ async def process_csv_and_insert_to_db(file_path: str) -> dict:
             await asyncio.sleep(delay)
             delay = min(delay * 2, max_delay)
 
-def validate_bank_transfer(slip_date: str, slip_amount: float, booking_amount: float) -> dict:
+async def validate_bank_transfer(slip_date: str, slip_amount: float, booking_amount: float) -> dict:
     """
     Validates a bank transfer by finding a deposit matching the slip details
     and checking if it has enough balance to cover the booking amount.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     
     IMPORTANT: This function only validates - it does NOT update the database.
     Use reserve_bank_transfer() to actually reserve the amount after booking succeeds.
@@ -716,7 +706,7 @@ def validate_bank_transfer(slip_date: str, slip_amount: float, booking_amount: f
                 "message": f"🚨 FECHA ILÓGICA: La fecha del comprobante ({slip_date}) está en el futuro. Esto es imposible para una transferencia ya realizada. ACCIÓN REQUERIDA: (1) Primero intente re-analizar el comprobante con analyze_payment_proof (el OCR probablemente leyó mal el año), (2) Si aún sale incorrecta, pregunte al cliente: '¿En qué fecha realizó la transferencia?' (ejemplo: 13/12/2025)"
             }
     except ValueError as e:
-        # 🚨 CRITICAL: Return error immediately for invalid date format - do NOT proceed to infinite retry loop
+        # 🚨 CRITICAL: Return error immediately for invalid date format - do NOT proceed to the DB retry loop
         logger.error(f"INVALID DATE FORMAT: slip_date '{slip_date}' is not a valid date: {e}")
         return {
             "success": False,
@@ -728,6 +718,7 @@ def validate_bank_transfer(slip_date: str, slip_amount: float, booking_amount: f
     
     def _execute_validation():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True)
 
@@ -824,20 +815,15 @@ def validate_bank_transfer(slip_date: str, slip_amount: float, booking_amount: f
                 "available_balance": available_balance
             }
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_validation, f"validate_bank_transfer({slip_date}, {slip_amount}, {booking_amount})")
+    return await run_db(_execute_validation, f"validate_bank_transfer({slip_date}, {slip_amount}, {booking_amount})")
 
 
-def reserve_bank_transfer(transfer_id: int, booking_amount: float) -> dict:
+async def reserve_bank_transfer(transfer_id: int, booking_amount: float) -> dict:
     """
     Reserves a bank transfer amount by updating the 'used' column.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     This should only be called after successful booking validation and just before the booking HTTP call.
 
     Args:
@@ -851,6 +837,7 @@ def reserve_bank_transfer(transfer_id: int, booking_amount: float) -> dict:
     
     def _execute_reservation():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True)
 
@@ -879,11 +866,6 @@ def reserve_bank_transfer(transfer_id: int, booking_amount: float) -> dict:
             logger.info(f"Successfully reserved {booking_amount} from transfer ID {transfer_id}. New used amount: {used_amount + booking_amount}")
             return {"success": True, "message": f"Cantidad {booking_amount:.2f} reservada exitosamente"}
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_reservation, f"reserve_bank_transfer({transfer_id}, {booking_amount})")
+    return await run_db(_execute_reservation, f"reserve_bank_transfer({transfer_id}, {booking_amount})")
@@ -0,0 +1,142 @@
+"""
+Async message batching scheduler.
+
+Every conversation (WATI wa_id or ManyChat "{channel}:{user_id}") gets at most
+one pending batch task on the FastAPI event loop. The task debounces incoming
+messages with ``asyncio.sleep`` instead of parking an OS thread, and the
+OpenAI turn itself runs inside ``turn_slot()`` so a promo burst can't fire an
+unbounded number of concurrent model calls.
+
+All methods must be called from the event loop thread.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """Per-conversation debounce tasks plus a concurrency cap for OpenAI turns."""
+
+    def __init__(self, max_concurrent_turns: int):
+        self.max_concurrent_turns = max_concurrent_turns
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._scheduled_at: Dict[str, float] = {}
+        self._turn_semaphore: Optional[asyncio.Semaphore] = None
+        self._waiting_for_turn = 0
+        self._running_turns = 0
+        self._stats = {
+            "batches_scheduled": 0,
+            "batches_cancelled": 0,
+            "batches_failed": 0,
+            "turns_completed": 0,
+            "turn_wait_ms_total": 0.0,
+            "turn_wait_ms_max": 0.0,
+            "batch_latency_ms_total": 0.0,
+            "batch_latency_ms_max": 0.0,
+        }
+
+    def is_scheduled(self, key: str) -> bool:
+        return key in self._tasks
+
+    def schedule(self, key: str, batch_fn: Callable[..., Awaitable[Any]], *args) -> bool:
+        """
+        Start ``batch_fn(*args)`` for this conversation unless one is already pending.
+
+        Returns:
+            True if a new batch task was started, False if one is already running.
+        """
+        if key in self._tasks:
+            return False
+        task = asyncio.get_running_loop().create_task(self._run(key, batch_fn, *args), name=f"batch:{key}")
+        self._tasks[key] = task
+        self._scheduled_at[key] = time.monotonic()
+        self._stats["batches_scheduled"] += 1
+        return True
+
+    def release(self, key: str) -> None:
+        """
+        Drop this conversation's entry from inside its own batch task.
+
+        Lets the batch re-schedule itself (orphaned messages) before it returns.
+        """
+        self._tasks.pop(key, None)
+        self._scheduled_at.pop(key, None)
+
+    def cancel(self, key: str) -> bool:
+        """Cancel a pending batch (e.g. while it is still debouncing)."""
+        task = self._tasks.pop(key, None)
+        self._scheduled_at.pop(key, None)
+        if task is None:
+            return False
+        task.cancel()
+        self._stats["batches_cancelled"] += 1
+        return True
+
+    async def _run(self, key: str, batch_fn: Callable[..., Awaitable[Any]], *args) -> None:
+        try:
+            await batch_fn(*args)
+        except asyncio.CancelledError:
+            logger.info(f"[BATCH_SCHEDULER] Batch for {key} cancelled")
+        except Exception:
+            self._stats["batches_failed"] += 1
+            logger.exception(f"[BATCH_SCHEDULER] Unhandled error in batch for {key}")
+        finally:
+            # The batch may already have replaced itself with an orphan-message batch
+            if self._tasks.get(key) is asyncio.current_task():
+                self.release(key)
+
+    @asynccontextmanager
+    async def turn_slot(self, key: str):
+        """Hold one of the bounded OpenAI turn slots for the duration of the block."""
+        if self._turn_semaphore is None:
+            self._turn_semaphore = asyncio.Semaphore(self.max_concurrent_turns)
+
+        requested = time.monotonic()
+        self._waiting_for_turn += 1
+        try:
+            await self._turn_semaphore.acquire()
+        finally:
+            self._waiting_for_turn -= 1
+
+        acquired = time.monotonic()
+        wait_ms = (acquired - requested) * 1000
+        self._stats["turn_wait_ms_total"] += wait_ms
+        self._stats["turn_wait_ms_max"] = max(self._stats["turn_wait_ms_max"], wait_ms)
+        scheduled_at = self._scheduled_at.get(key)
+        if scheduled_at is not None:
+            latency_ms = (acquired - scheduled_at) * 1000
+            self._stats["batch_latency_ms_total"] += latency_ms
+            self._stats["batch_latency_ms_max"] = max(self._stats["batch_latency_ms_max"], latency_ms)
+        if wait_ms > 1000:
+            logger.warning(f"[BATCH_SCHEDULER] {key} waited {wait_ms:.0f}ms for an OpenAI turn slot")
+
+        self._running_turns += 1
+        try:
+            yield
+        finally:
+            self._running_turns -= 1
+            self._stats["turns_completed"] += 1
+            self._turn_semaphore.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Snapshot of queue depth and wait times for the internal metrics endpoint."""
+        completed = self._stats["turns_completed"]
+        return {
+            **self._stats,
+            "pending_batches": len(self._tasks),
+            "waiting_for_turn": self._waiting_for_turn,
+            "running_turns": self._running_turns,
+            "max_concurrent_turns": self.max_concurrent_turns,
+            "turn_wait_ms_avg": round(self._stats["turn_wait_ms_total"] / completed, 2) if completed else 0.0,
+            "batch_latency_ms_avg": round(self._stats["batch_latency_ms_total"] / completed, 2) if completed else 0.0,
+        }
+
+
+batch_scheduler = BatchScheduler(config.MAX_CONCURRENT_OPENAI_TURNS)
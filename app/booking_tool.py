@@ -10,22 +10,23 @@ after payment verification. It handles:
 5. Database updates for payment records
 """
 
-import os
 import logging
 import asyncio
-import random
 import mysql.connector
 from datetime import datetime, timedelta
 from pytz import timezone
 import holidays
 from typing import Dict, List, Optional, Any
-from .database_client import get_db_connection, get_price_for_date, execute_with_retry
+from .database_client import (
+    get_db_connection, release_db_connection, run_db, run_in_db_executor
+)
+from .rate_calendar import get_prices_for_range
 from .wati_client import send_wati_message, update_chat_status
 from .bank_transfer_tool import reserve_bank_transfer
-import httpx
 from app import config
-import json
-import os
+from .clients import http_pool
+from . import room_availability, room_allocation, pending_bookings
+from .room_allocation import ROOM_CAPACITY
 from . import thread_store, openai_agent
 
 # Configure logging
@@ -37,17 +38,10 @@ EL_SALVADOR_TZ = timezone('America/El_Salvador')
 # El Salvador holidays
 EL_SALVADOR_HOLIDAYS = holidays.country_holidays('SV')
 
-# Room capacity constraints - ALIGNED WITH system_instructions_new.txt (line 1300-1302)
-# Format: {"min_occupancy": X, "max_occupancy": Y}
-# Occupancy formula: adults + (children_6_10 * 0.5). Children 0-5 = 0
-# NOTE: "Doble" is normalized to "Habitación" by _normalize_bungalow_type(), so no separate entry needed
-ROOM_CAPACITY = {
-    "Familiar": {"min_occupancy": 5, "max_occupancy": 8},    # Rooms 1-17
-    "Junior": {"min_occupancy": 1, "max_occupancy": 8},      # Rooms 18-59 (+$20/room/night if adults==1 AND children_6_10<2)
-    "Habitación": {"min_occupancy": 1, "max_occupancy": 4},  # Rooms 1A-14A (also called "Doble") (+$20/room/night if adults==1 AND children_6_10<2)
-    "Matrimonial": {"min_occupancy": 2, "max_occupancy": 2}, # Junior subset: 22,42,47,48,53
-    "Pasadía": {"min_occupancy": 0, "max_occupancy": 999}    # No room capacity for day pass
-}
+# DB deadline for writing the booking code onto the payment row (booking already created)
+PAYMENT_RECORD_DEADLINE_SECONDS = 300
+
+BOOKING_API_URL = "https://booking.lashojasresort.club/api/addBookingUserRest"
 
 def _get_conversation_history_for_error(wa_id: str, user_identifier: str = None, channel: str = None) -> str:
     """
@@ -87,17 +81,9 @@ def _get_conversation_history_for_error(wa_id: str, user_identifier: str = None,
 # Replaces the old in-memory dict which was process-local and didn't work
 # across uvicorn worker processes (root cause of duplicate booking 28201/28202).
 
-def _reserve_authorization_atomic(auth_code: str, wa_id: str) -> tuple:
-    """
-    ATOMIC check-and-reserve using MySQL booking_locks table.
-    INSERT with PRIMARY KEY fails atomically if another worker already locked this payment.
-    Works across all uvicorn worker processes (unlike the old in-memory dict).
-    Returns (success, message). If success=False, another booking is using this auth.
-    """
-    if not auth_code:
-        return True, ""
-    
+def _reserve_authorization_atomic_sync(auth_code: str, wa_id: str) -> tuple:
     conn = get_db_connection()
+    cursor = None
     try:
         cursor = conn.cursor()
         # Clean stale locks older than 10 minutes (handles crashed workers)
@@ -120,25 +106,30 @@ def _reserve_authorization_atomic(auth_code: str, wa_id: str) -> tuple:
         # On DB error, allow booking to proceed (fail-open) rather than blocking legitimate bookings
         return True, ""
     finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
+        release_db_connection(conn, cursor)
 
 
-def _release_authorization(auth_code: str, wa_id: str) -> None:
+async def _reserve_authorization_atomic(auth_code: str, wa_id: str) -> tuple:
     """
-    Release a reserved authorization if booking fails.
-    Deletes the lock row only if it belongs to the same wa_id.
+    ATOMIC check-and-reserve using MySQL booking_locks table.
+    INSERT with PRIMARY KEY fails atomically if another worker already locked this payment.
+    Works across all uvicorn worker processes (unlike the old in-memory dict).
+    Returns (success, message). If success=False, another booking is using this auth.
     """
     if not auth_code:
-        return
+        return True, ""
     
+    try:
+        return await run_in_db_executor(_reserve_authorization_atomic_sync, auth_code, wa_id)
+    except Exception as e:
+        # Pool exhausted / unreachable: same fail-open policy as a query error
+        logger.error(f"[DUPLICATE_BOOKING_PREVENTION] DB unavailable reserving {auth_code}: {e}")
+        return True, ""
+
+
+def _release_authorization_sync(auth_code: str, wa_id: str) -> None:
     conn = get_db_connection()
+    cursor = None
     try:
         cursor = conn.cursor()
         cursor.execute(
@@ -148,45 +139,49 @@ def _release_authorization(auth_code: str, wa_id: str) -> None:
         conn.commit()
         if cursor.rowcount > 0:
             logger.info(f"[DUPLICATE_BOOKING_PREVENTION] RELEASED {auth_code} for {wa_id} (booking failed)")
-    except Exception as e:
-        logger.error(f"[DUPLICATE_BOOKING_PREVENTION] DB error releasing {auth_code}: {e}")
     finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
+        release_db_connection(conn, cursor)
 
 
-def _mark_authorization_used(auth_code: str, wa_id: str) -> None:
+async def _release_authorization(auth_code: str, wa_id: str) -> None:
     """
-    Remove lock after successful booking.
-    The payment record's codreser column (set by _update_payment_record) serves as
-    the permanent "used" marker. The lock row is just for the booking-in-progress window.
+    Release a reserved authorization if booking fails.
+    Deletes the lock row only if it belongs to the same wa_id.
     """
     if not auth_code:
         return
     
+    try:
+        await run_in_db_executor(_release_authorization_sync, auth_code, wa_id)
+    except Exception as e:
+        logger.error(f"[DUPLICATE_BOOKING_PREVENTION] DB error releasing {auth_code}: {e}")
+
+
+def _mark_authorization_used_sync(auth_code: str, wa_id: str) -> None:
     conn = get_db_connection()
+    cursor = None
     try:
         cursor = conn.cursor()
         cursor.execute("DELETE FROM booking_locks WHERE payment_ref = %s", (auth_code,))
         conn.commit()
         logger.info(f"[DUPLICATE_BOOKING_PREVENTION] CONFIRMED {auth_code} used for {wa_id} — lock removed")
+    finally:
+        release_db_connection(conn, cursor)
+
+
+async def _mark_authorization_used(auth_code: str, wa_id: str) -> None:
+    """
+    Remove lock after successful booking.
+    The payment record's codreser column (set by _update_payment_record) serves as
+    the permanent "used" marker. The lock row is just for the booking-in-progress window.
+    """
+    if not auth_code:
+        return
+    
+    try:
+        await run_in_db_executor(_mark_authorization_used_sync, auth_code, wa_id)
     except Exception as e:
         logger.error(f"[DUPLICATE_BOOKING_PREVENTION] DB error confirming {auth_code}: {e}")
-    finally:
-        try:
-            cursor.close()
-        except Exception:
-            pass
-        try:
-            conn.close()
-        except Exception:
-            pass
 
 # Shared Normalization and Assistant Classification Functions
 
@@ -385,20 +380,20 @@ def _suggest_room_for_group(adults: int, children_0_5: int, children_6_10: int)
     Uses same occupancy formula: adults + (children_6_10 * 0.5)
     """
     occupancy = adults + (children_6_10 * 0.5)
-    
-    if occupancy <= 2:
-        return "Junior, Habitación, o Matrimonial"
-    elif occupancy <= 4:
-        return "Junior o Habitación"
-    elif occupancy <= 8:
-        if occupancy >= 5:
-            return "Familiar o Junior"  # Both valid for 5-8
-        else:
-            return "Junior"  # 4.5 or less, only Junior valid
-    else:
-        # Need multiple rooms (occupancy > 8)
-        rooms_needed = -(-int(occupancy) // 8)  # Ceiling division by max Junior capacity
-        return f"Se necesitan {rooms_needed} habitaciones para {int(occupancy)} personas"
+    mixes = room_allocation.feasible_mixes(adults, children_0_5, children_6_10)
+    
+    single_room_types = [mix[0] for mix in mixes if len(mix) == 1]
+    if single_room_types:
+        if occupancy == 2:
+            single_room_types.append("Matrimonial")
+        if len(single_room_types) == 1:
+            return single_room_types[0]
+        return ", ".join(single_room_types[:-1]) + (", o " if len(single_room_types) > 2 else " o ") + single_room_types[-1]
+    if mixes:
+        # Need multiple rooms: the best mix from the precomputed table
+        return f"Se necesitan {len(mixes[0])} habitaciones para {occupancy:g} personas ({room_allocation.describe_mix(mixes[0])})"
+    rooms_needed = max(-(-int(occupancy) // 8), 1)  # Ceiling division by max Junior capacity
+    return f"Se necesitan {rooms_needed} habitaciones para {int(occupancy)} personas"
 
 
 async def _get_multiple_rooms(
@@ -466,114 +461,69 @@ async def _get_multiple_rooms(
     all_available_rooms = availability["rooms"]  # {"1": "24", "2": "25", ...}
     logger.info(f"[MULTI_ROOM] All available rooms: {all_available_rooms}")
     
-    # STEP 3: Select rooms for each request from the pool
-    selected_rooms = []
-    room_details = []
-    excluded = []  # Track already-selected rooms to prevent duplicates
-    
-    for i, request in enumerate(room_requests):
-        bungalow_type = request["bungalow_type"]
-        
-        # Normalize bungalow_type for _select_room (handles "bungalow familiar" -> "Familiar", etc.)
-        norm_result = _normalize_bungalow_type(bungalow_type)
-        normalized_type = norm_result["type"] if norm_result["success"] else bungalow_type
-        
-        # Select a room of this type (excluding already-selected ones)
-        selected = _select_room(
-            all_available_rooms, 
-            normalized_type,
-            package_type,
-            excluded_rooms=excluded
-        )
-        
-        if not selected:
-            # 🚨 FALLBACK: Calculate single-room and alternative multi-room options
-            total_adults = sum(r.get("adults", 0) for r in room_requests)
-            total_children_6_10 = sum(r.get("children_6_10", 0) for r in room_requests)
-            total_occupancy = total_adults + (total_children_6_10 * 0.5)
-            
-            capacity_rules = {
-                'bungalow_familiar': (5, 8),
-                'bungalow_junior': (1, 8),
-                'habitacion': (1, 4),
-            }
-            type_display_names = {
-                'bungalow_familiar': 'Bungalow Familiar',
-                'bungalow_junior': 'Bungalow Junior',
-                'habitacion': 'Habitación Doble',
-            }
-            
-            # Count available rooms by type
-            room_counts = {'bungalow_familiar': 0, 'bungalow_junior': 0, 'habitacion': 0}
-            for room_idx, room_num in all_available_rooms.items():
-                if room_num == "Pasadía":
-                    continue
-                elif isinstance(room_num, str) and room_num.endswith('A'):
-                    room_counts['habitacion'] += 1
-                else:
-                    try:
-                        num = int(room_num)
-                        if 1 <= num <= 17:
-                            room_counts['bungalow_familiar'] += 1
-                        elif 18 <= num <= 59:
-                            room_counts['bungalow_junior'] += 1
-                    except (ValueError, TypeError):
-                        pass
-            
-            # Check single-room alternatives (if group fits in one room)
-            compatible_single_room = []
-            for room_type, (min_cap, max_cap) in capacity_rules.items():
-                if room_counts.get(room_type, 0) > 0 and min_cap <= total_occupancy <= max_cap:
-                    compatible_single_room.append(type_display_names.get(room_type, room_type))
-            
-            # Check alternative multi-room options
-            compatible_multi_room = []
-            rooms_needed = len(room_requests)
-            for room_type, (min_cap, max_cap) in capacity_rules.items():
-                available_count = room_counts.get(room_type, 0)
-                if available_count >= rooms_needed:
-                    per_room = total_occupancy / rooms_needed
-                    if min_cap <= per_room <= max_cap:
-                        compatible_multi_room.append(f"{rooms_needed}x {type_display_names.get(room_type, room_type)}")
-            
-            logger.info(f"[MULTI_ROOM] Not enough {bungalow_type}. Single-room options: {compatible_single_room}, Multi-room options: {compatible_multi_room}")
-            
-            # Build instruction based on alternatives
-            all_alternatives = compatible_single_room + compatible_multi_room
-            if compatible_single_room:
-                instruction = f"No hay suficientes {bungalow_type} disponibles. Sin embargo, su grupo de {total_adults} adultos{' y ' + str(total_children_6_10) + ' niños' if total_children_6_10 > 0 else ''} SÍ cabe en UNA SOLA habitación: {', '.join(compatible_single_room)}. El precio se recalculará. ¿Desea cambiar o buscar otras fechas?"
-            elif compatible_multi_room:
-                instruction = f"No hay suficientes {bungalow_type} disponibles. Alternativas: {', '.join(compatible_multi_room)}. ¿Desea cambiar o buscar otras fechas?"
-            else:
-                instruction = f"🚨 No hay suficientes {bungalow_type} disponibles y NO HAY ALTERNATIVAS compatibles. DEBES ofrecer: 1) Buscar otras fechas, o 2) Reembolso completo."
-            
-            return {
-                "success": False,
-                "error": f"No available {bungalow_type} rooms (need {len(room_requests) - i} more)",
-                "partial_rooms": selected_rooms,
-                "customer_message": f"No hay suficientes habitaciones {bungalow_type} disponibles.",
-                "compatible_single_room": compatible_single_room,
-                "compatible_multi_room": compatible_multi_room,
-                "total_occupancy": total_occupancy,
-                "group_size": {"adults": total_adults, "children_6_10": total_children_6_10},
-                "assistant_instruction": instruction
-            }
+    # STEP 3: Pick every room in one pass over the availability bitset
+    normalized_types = []
+    for request in room_requests:
+        if package_type == "Pasadía":
+            normalized_types.append("Pasadía")
+            continue
+        # Normalize bungalow_type (handles "bungalow familiar" -> "Familiar", etc.)
+        norm_result = _normalize_bungalow_type(request["bungalow_type"])
+        normalized_types.append(norm_result["type"] if norm_result["success"] else request["bungalow_type"])
+    picked = room_allocation.pick_rooms(all_available_rooms, normalized_types)
+    
+    if None in picked:
+        bungalow_type = room_requests[picked.index(None)]["bungalow_type"]
+        selected_rooms = [room for room in picked if room]
+        
+        # 🚨 FALLBACK: Single-room and alternative multi-room options from the allocation table
+        total_adults = sum(r.get("adults", 0) for r in room_requests)
+        total_children_0_5 = sum(r.get("children_0_5", 0) for r in room_requests)
+        total_children_6_10 = sum(r.get("children_6_10", 0) for r in room_requests)
+        total_occupancy = total_adults + (total_children_6_10 * 0.5)
+        
+        room_counts = room_allocation.counts_by_type(room_allocation.available_mask(all_available_rooms))
+        mixes = room_allocation.feasible_mixes(total_adults, total_children_0_5, total_children_6_10, room_counts)
+        compatible_single_room = [room_allocation.DISPLAY_NAMES[mix[0]] for mix in mixes if len(mix) == 1]
+        compatible_multi_room = [room_allocation.describe_mix(mix) for mix in mixes if len(mix) > 1][:3]
+        
+        logger.info(f"[MULTI_ROOM] Not enough {bungalow_type}. Single-room options: {compatible_single_room}, Multi-room options: {compatible_multi_room}")
+        
+        # Build instruction based on alternatives
+        if compatible_single_room:
+            instruction = f"No hay suficientes {bungalow_type} disponibles. Sin embargo, su grupo de {total_adults} adultos{' y ' + str(total_children_6_10) + ' niños' if total_children_6_10 > 0 else ''} SÍ cabe en UNA SOLA habitación: {', '.join(compatible_single_room)}. El precio se recalculará. ¿Desea cambiar o buscar otras fechas?"
+        elif compatible_multi_room:
+            instruction = f"No hay suficientes {bungalow_type} disponibles. Alternativas: {', '.join(compatible_multi_room)}. ¿Desea cambiar o buscar otras fechas?"
+        else:
+            instruction = f"🚨 No hay suficientes {bungalow_type} disponibles y NO HAY ALTERNATIVAS compatibles. DEBES ofrecer: 1) Buscar otras fechas, o 2) Reembolso completo."
         
-        selected_rooms.append(selected)
-        excluded.append(selected)
+        return {
+            "success": False,
+            "error": f"No available {bungalow_type} rooms (need {picked.count(None)} more)",
+            "partial_rooms": selected_rooms,
+            "customer_message": f"No hay suficientes habitaciones {bungalow_type} disponibles.",
+            "compatible_single_room": compatible_single_room,
+            "compatible_multi_room": compatible_multi_room,
+            "suggested_room_bookings": room_allocation.split_group(mixes[0], total_adults, total_children_0_5, total_children_6_10) if mixes else [],
+            "total_occupancy": total_occupancy,
+            "group_size": {"adults": total_adults, "children_6_10": total_children_6_10},
+            "assistant_instruction": instruction
+        }
+    
+    room_details = []
+    for i, (request, selected) in enumerate(zip(room_requests, picked)):
         room_details.append({
             "room": selected,
-            "type": bungalow_type,
+            "type": request["bungalow_type"],
             "adults": request["adults"],
             "children_0_5": request.get("children_0_5", 0),
             "children_6_10": request.get("children_6_10", 0)
         })
-        
-        logger.info(f"[MULTI_ROOM] Room {i+1}: Selected {selected} ({bungalow_type})")
+        logger.info(f"[MULTI_ROOM] Room {i+1}: Selected {selected} ({request['bungalow_type']})")
     
     return {
         "success": True,
-        "rooms": selected_rooms,
+        "rooms": picked,
         "room_details": room_details
     }
 
@@ -751,7 +701,7 @@ async def make_multi_room_booking(
     if payment_method == "Depósito BAC" and payment_ref is None:
         logger.critical(f"[DEFENSE_IN_DEPTH] make_multi_room_booking reached duplicate prevention with Depósito BAC but payment_ref=None for {wa_id}. Gate may have been bypassed!")
     if payment_ref:
-        reserve_success, dup_message = _reserve_authorization_atomic(payment_ref, wa_id)
+        reserve_success, dup_message = await _reserve_authorization_atomic(payment_ref, wa_id)
         if not reserve_success:
             logger.warning(f"[DUPLICATE_BOOKING_PREVENTION] Blocking duplicate multi-room booking for {wa_id} with payment ref {payment_ref}")
             return {
@@ -802,7 +752,7 @@ async def make_multi_room_booking(
             logger.warning(f"[MULTI_ROOM] Missing required fields (incl. placeholders): {missing_list}")
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": "missing_customer_data",
@@ -818,7 +768,7 @@ async def make_multi_room_booking(
             if check_out <= check_in:
                 # RELEASE the atomic reservation since booking failed
                 if payment_ref:
-                    _release_authorization(payment_ref, wa_id)
+                    await _release_authorization(payment_ref, wa_id)
                 return {
                     "success": False,
                     "error": "Check-out date must be after check-in date",
@@ -827,7 +777,7 @@ async def make_multi_room_booking(
         except ValueError:
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": "Invalid date format",
@@ -842,7 +792,7 @@ async def make_multi_room_booking(
         if not room_result["success"]:
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": room_result["error"],
@@ -855,11 +805,11 @@ async def make_multi_room_booking(
         # Step 2: Reserve payment (full amount for all rooms)
         if payment_method == "Depósito BAC" and transfer_id:
             from .bank_transfer_tool import reserve_bank_transfer
-            reserve_result = reserve_bank_transfer(int(transfer_id), payment_amount)
+            reserve_result = await reserve_bank_transfer(int(transfer_id), payment_amount)
             if not reserve_result.get("success"):
                 # RELEASE the atomic reservation since booking failed
                 if payment_ref:
-                    _release_authorization(payment_ref, wa_id)
+                    await _release_authorization(payment_ref, wa_id)
                 return {
                     "success": False,
                     "error": "Payment reservation failed",
@@ -872,7 +822,7 @@ async def make_multi_room_booking(
             if not reserve_result.get("success"):
                 # RELEASE the atomic reservation since booking failed
                 if payment_ref:
-                    _release_authorization(payment_ref, wa_id)
+                    await _release_authorization(payment_ref, wa_id)
                 return {
                     "success": False,
                     "error": "CompraClick reservation failed",
@@ -891,7 +841,7 @@ async def make_multi_room_booking(
             if not retry_result["success"]:
                 # RELEASE the atomic reservation since booking failed
                 if payment_ref:
-                    _release_authorization(payment_ref, wa_id)
+                    await _release_authorization(payment_ref, wa_id)
                 return {
                     "success": False,
                     "error": "Rooms became unavailable during booking",
@@ -901,7 +851,7 @@ async def make_multi_room_booking(
             room_details = retry_result["room_details"]
         
         # Step 3.5: Calculate actual booking total from DB rates (includes surcharges per room)
-        multi_total_result = _calculate_multi_room_booking_total(
+        multi_total_result = await _calculate_multi_room_booking_total(
             check_in_date, check_out_date, room_bookings, package_type
         )
         if multi_total_result.get("success"):
@@ -974,7 +924,7 @@ async def make_multi_room_booking(
         if not booking_result["success"]:
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": booking_result.get("error"),
@@ -997,7 +947,7 @@ async def make_multi_room_booking(
         
         # DUPLICATE BOOKING PREVENTION: Mark auth as used ONLY after successful booking
         if payment_ref:
-            _mark_authorization_used(payment_ref, wa_id)
+            await _mark_authorization_used(payment_ref, wa_id)
         
         return {
             "success": True,
@@ -1022,7 +972,7 @@ Los detalles han sido enviados a su correo electrónico. ¡Esperamos verle pront
         logger.error(f"[MULTI_ROOM] Unexpected error: {e}")
         # RELEASE the atomic reservation since booking failed with exception
         if payment_ref:
-            _release_authorization(payment_ref, wa_id)
+            await _release_authorization(payment_ref, wa_id)
         return {
             "success": False,
             "error": f"Unexpected error: {e}",
@@ -1032,11 +982,12 @@ Los detalles han sido enviados a su correo electrónico. ¡Esperamos verle pront
 
 async def _get_openai_thread_id(wa_id: str) -> Optional[str]:
     """
-    Get OpenAI thread ID for a customer with infinite retry.
+    Get OpenAI thread ID for a customer with retry until the per-call DB deadline.
     This function should be implemented based on your database schema.
     """
     def _execute_query():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor()
             query = "SELECT thread_id FROM customer_threads WHERE wa_id = %s ORDER BY created_at DESC LIMIT 1"
@@ -1044,14 +995,9 @@ async def _get_openai_thread_id(wa_id: str) -> Optional[str]:
             result = cursor.fetchone()
             return result[0] if result else None
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_query, f"_get_openai_thread_id({wa_id})")
+    return await run_db(_execute_query, f"_get_openai_thread_id({wa_id})")
 
 async def _get_full_conversation_context(wa_id: str) -> str:
     """
@@ -1270,7 +1216,7 @@ async def make_booking(
     if payment_method == "Depósito BAC" and payment_ref is None:
         logger.critical(f"[DEFENSE_IN_DEPTH] make_booking reached duplicate prevention with Depósito BAC but payment_ref=None for {wa_id}. Gate may have been bypassed!")
     if payment_ref:
-        reserve_success, dup_message = _reserve_authorization_atomic(payment_ref, wa_id)
+        reserve_success, dup_message = await _reserve_authorization_atomic(payment_ref, wa_id)
         if not reserve_success:
             logger.warning(f"[DUPLICATE_BOOKING_PREVENTION] Blocking duplicate booking for {wa_id} with payment ref {payment_ref}")
             return {
@@ -1303,7 +1249,7 @@ async def make_booking(
             logger.warning(f"Booking validation failed: {validation_result['error']}")
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": validation_result["error"],
@@ -1319,7 +1265,7 @@ async def make_booking(
             logger.warning(f"Room availability check failed: {availability_result['error']}")
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": availability_result["error"],
@@ -1405,7 +1351,7 @@ async def make_booking(
             
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": "No suitable room available",
@@ -1426,12 +1372,12 @@ async def make_booking(
             logger.debug(f"Reserving bank transfer ID {transfer_id} for amount {payment_amount}")
             from .bank_transfer_tool import reserve_bank_transfer
             
-            reservation_result = reserve_bank_transfer(int(transfer_id), payment_amount)
+            reservation_result = await reserve_bank_transfer(int(transfer_id), payment_amount)
             if not reservation_result["success"]:
                 logger.error(f"Bank transfer reservation failed: {reservation_result['message']}")
                 # RELEASE the atomic reservation since booking failed
                 if payment_ref:
-                    _release_authorization(payment_ref, wa_id)
+                    await _release_authorization(payment_ref, wa_id)
                 return {
                     "success": False,
                     "error": f"Bank transfer reservation failed: {reservation_result['message']}",
@@ -1453,7 +1399,7 @@ async def make_booking(
                 logger.error(f"CompraClick payment reservation failed (validation required): {reservation_result['error']}")
                 # RELEASE the atomic reservation since booking failed
                 if payment_ref:
-                    _release_authorization(payment_ref, wa_id)
+                    await _release_authorization(payment_ref, wa_id)
                 return {
                     "success": False,
                     "error": f"Payment validation required before booking: {reservation_result['error']}",
@@ -1476,7 +1422,7 @@ async def make_booking(
             logger.error(f"Enhanced booking process failed: {booking_result['error']}")
             # RELEASE the atomic reservation since booking failed
             if payment_ref:
-                _release_authorization(payment_ref, wa_id)
+                await _release_authorization(payment_ref, wa_id)
             return {
                 "success": False,
                 "error": booking_result["error"],
@@ -1487,7 +1433,7 @@ async def make_booking(
         
         # DUPLICATE BOOKING PREVENTION: Mark auth as used ONLY after successful booking
         if payment_ref:
-            _mark_authorization_used(payment_ref, wa_id)
+            await _mark_authorization_used(payment_ref, wa_id)
         
         # Internal Chain of Thought: Update payment record in database
         try:
@@ -1520,7 +1466,7 @@ Los detalles de su reserva han sido enviados a su correo electrónico. Si tiene
         logger.error(f"Unexpected error in make_booking: {e}")
         # RELEASE the atomic reservation since booking failed with exception
         if payment_ref:
-            _release_authorization(payment_ref, wa_id)
+            await _release_authorization(payment_ref, wa_id)
         return {
             "success": False,
             "error": f"Unexpected error in booking process: {e}",
@@ -1528,7 +1474,7 @@ Los detalles de su reserva han sido enviados a su correo electrónico. Si tiene
         }
 
 
-def _calculate_booking_total(
+async def _calculate_booking_total(
     check_in_date: str, check_out_date: str, adults: int, children_0_5: int, 
     children_6_10: int, package_type: str
 ) -> dict:
@@ -1583,17 +1529,16 @@ def _calculate_booking_total(
         child_rates_sum = 0.0
         rates_per_night = []  # For breakdown logging
         
-        for night_offset in range(nights):
-            current_night = check_in_dt + timedelta(days=night_offset)
-            current_night_str = current_night.strftime("%Y-%m-%d")
-            
-            pricing_data = get_price_for_date(current_night_str)
-            if "error" in pricing_data:
-                return {
-                    "success": False,
-                    "error": f"Could not get pricing data for {current_night_str}: {pricing_data['error']}"
-                }
-            
+        # One cached range lookup for all nights (Pasadía: check_in == check_out still prices 1 day)
+        range_end = (check_in_dt + timedelta(days=nights)).strftime("%Y-%m-%d")
+        nightly_prices = await get_prices_for_range(check_in_date, range_end)
+        if not nightly_prices["success"]:
+            return {
+                "success": False,
+                "error": f"Could not get pricing data for {nightly_prices['missing_dates'][0]}: {nightly_prices['error']}"
+            }
+        
+        for current_night_str, pricing_data in nightly_prices["prices"]:
             night_adult_rate = float(pricing_data.get(rate_fields["adult_field"], 0))
             night_child_rate = float(pricing_data.get(rate_fields["child_field"], 0))
             
@@ -1704,7 +1649,7 @@ def _calculate_booking_total(
         }
 
 
-def _calculate_multi_room_booking_total(
+async def _calculate_multi_room_booking_total(
     check_in_date: str, check_out_date: str,
     room_bookings: List[Dict[str, Any]], package_type: str
 ) -> dict:
@@ -1751,17 +1696,15 @@ def _calculate_multi_room_booking_total(
         child_rates_sum = 0.0
         rates_per_night = []
 
-        for night_offset in range(nights):
-            current_night = check_in_dt + timedelta(days=night_offset)
-            current_night_str = current_night.strftime("%Y-%m-%d")
-
-            pricing_data = get_price_for_date(current_night_str)
-            if "error" in pricing_data:
-                return {
-                    "success": False,
-                    "error": f"Could not get pricing data for {current_night_str}: {pricing_data['error']}"
-                }
+        range_end = (check_in_dt + timedelta(days=nights)).strftime("%Y-%m-%d")
+        nightly_prices = await get_prices_for_range(check_in_date, range_end)
+        if not nightly_prices["success"]:
+            return {
+                "success": False,
+                "error": f"Could not get pricing data for {nightly_prices['missing_dates'][0]}: {nightly_prices['error']}"
+            }
 
+        for current_night_str, pricing_data in nightly_prices["prices"]:
             night_adult_rate = float(pricing_data.get(rate_fields["adult_field"], 0))
             night_child_rate = float(pricing_data.get(rate_fields["child_field"], 0))
 
@@ -2043,33 +1986,24 @@ async def _check_room_availability(check_in_date: str, check_out_date: str) -> d
     NEVER expose API details to customers.
     """
     try:
-        url = "https://booking.lashojasresort.club/api/getRooms"
-        params = {
-            "checkIn": check_in_date,
-            "checkOut": check_out_date
-        }
+        # Shared with the other availability checks of this turn; dropped on every booking
+        data = await room_availability.get_rooms(check_in_date, check_out_date)
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=300.0)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # DEBUG: Log available rooms for double-booking investigation
-            logger.info(f"[ROOM_DEBUG] Available rooms for {check_in_date} to {check_out_date}: {data}")
-            
-            if "info" not in data:
-                return {
-                    "success": False,
-                    "error": "Invalid response format from room availability API",
-                    "customer_message": "Error al verificar disponibilidad de habitaciones."
-                }
-            
+        # DEBUG: Log available rooms for double-booking investigation
+        logger.info(f"[ROOM_DEBUG] Available rooms for {check_in_date} to {check_out_date}: {data}")
+        
+        if "info" not in data:
             return {
-                "success": True,
-                "rooms": data["info"]
+                "success": False,
+                "error": "Invalid response format from room availability API",
+                "customer_message": "Error al verificar disponibilidad de habitaciones."
             }
-            
+        
+        return {
+            "success": True,
+            "rooms": data["info"]
+        }
+        
     except Exception as e:
         logger.error(f"Room availability check failed: {e}")
         return {
@@ -2111,96 +2045,13 @@ def _select_room(
         normalized_bungalow_type = bungalow_type
         logger.warning(f"[ROOM_DEBUG] Normalization failed for '{bungalow_type}', using original input")
     
-    # CRITICAL FIX: API response format is {"api_index": "room_number"}
-    # Keys are API indices, values are ACTUAL room numbers
-    room_number_to_index = {}  # Maps actual room number to API index (for booking API call)
-    available_room_numbers = []  # List of actual room numbers available
-    
-    for api_index, room_number in available_rooms.items():
-        try:
-            # Parse room number (the VALUE in the API response)
-            if room_number == "Pasadía":
-                # Special case: Pasadía
-                room_number_to_index["Pasadía"] = api_index
-                available_room_numbers.append("Pasadía")
-            elif isinstance(room_number, str) and room_number.endswith('A'):
-                # Room with 'A' suffix (like "10A", "7A")
-                room_number_to_index[room_number] = api_index
-                available_room_numbers.append(room_number)
-            else:
-                # Regular numeric room - room_number is the VALUE (e.g., "5" means room 5)
-                room_num = int(room_number)
-                room_number_to_index[room_num] = api_index
-                available_room_numbers.append(room_num)
-        except (ValueError, TypeError):
-            logger.warning(f"[ROOM_DEBUG] Could not parse room number: {room_number} (api_index: {api_index})")
-            continue
-    
-    logger.info(f"[ROOM_DEBUG] Available room numbers: {available_room_numbers}")
-    logger.info(f"[ROOM_DEBUG] Room number to index mapping: {room_number_to_index}")
-    
-    # Filter out already-selected rooms to prevent duplicates in multi-room booking
-    if excluded_rooms:
-        # Handle mixed types: available_room_numbers contains int (24) and str ("10A")
-        excluded_set = set(str(x) for x in excluded_rooms)
-        available_room_numbers = [
-            r for r in available_room_numbers 
-            if str(r) not in excluded_set
-        ]
-        logger.info(f"[ROOM_DEBUG] After excluding {excluded_rooms}: {available_room_numbers}")
-    
-    # Special case: Pasadía package can only use Pasadía
-    if package_type == "Pasadía":
-        if "Pasadía" in available_room_numbers:
-            logger.info(f"[ROOM_DEBUG] Selected Pasadía for Pasadía package")
-            return "Pasadía"  # Return room name, not API index, for consistency
-        else:
-            logger.info(f"[ROOM_DEBUG] Pasadía not available for Pasadía package")
-            return None
-    
-    # Filter rooms based on normalized bungalow type using ACTUAL room numbers
-    suitable_room_numbers = []
-    
-    if normalized_bungalow_type == "Familiar":
-        # Bungalow Familiar: rooms 1-17
-        suitable_room_numbers = [r for r in available_room_numbers if isinstance(r, int) and 1 <= r <= 17]
-        logger.info(f"[ROOM_DEBUG] Familiar bungalow - suitable room numbers: {suitable_room_numbers}")
-    elif normalized_bungalow_type == "Junior":
-        # Bungalow Junior: rooms 18-59, avoid Matrimonial rooms if possible
-        matrimonial_rooms = {22, 42, 47, 48, 53}
-        regular_junior = [r for r in available_room_numbers if isinstance(r, int) and 18 <= r <= 59 and r not in matrimonial_rooms]
-        if regular_junior:
-            suitable_room_numbers = regular_junior
-            logger.info(f"[ROOM_DEBUG] Junior bungalow - using regular junior room numbers: {suitable_room_numbers}")
-        else:
-            # If no regular junior rooms, allow Matrimonial rooms
-            suitable_room_numbers = [r for r in available_room_numbers if isinstance(r, int) and 18 <= r <= 59]
-            logger.info(f"[ROOM_DEBUG] Junior bungalow - falling back to matrimonial room numbers: {suitable_room_numbers}")
-    elif normalized_bungalow_type == "Matrimonial":
-        # Bungalow Matrimonial: ONLY rooms 22, 42, 47, 48, 53
-        matrimonial_rooms = {22, 42, 47, 48, 53}
-        suitable_room_numbers = [r for r in available_room_numbers if isinstance(r, int) and r in matrimonial_rooms]
-        logger.info(f"[ROOM_DEBUG] Matrimonial bungalow - suitable room numbers: {suitable_room_numbers}")
-    elif normalized_bungalow_type == "Habitación":
-        # Habitación: rooms with 'A' suffix (1A-14A) - the room_number itself has 'A'
-        suitable_room_numbers = []
-        for room_number in available_room_numbers:
-            if isinstance(room_number, str) and room_number.endswith('A'):
-                try:
-                    # Extract number from room_number like "10A"
-                    num = int(room_number[:-1])
-                    if 1 <= num <= 14:
-                        suitable_room_numbers.append(room_number)
-                except ValueError:
-                    continue
-        logger.info(f"[ROOM_DEBUG] Habitación - suitable room numbers: {suitable_room_numbers}")
-    
-    # Randomly select from suitable rooms and return the actual room number
-    if suitable_room_numbers:
-        selected_room_number = random.choice(suitable_room_numbers)
-        selected_index = room_number_to_index[selected_room_number]
-        logger.info(f"[ROOM_DEBUG] Final selected room number: {selected_room_number} (API index: {selected_index}) from suitable rooms: {suitable_room_numbers}")
-        return str(selected_room_number)
+    # API response format is {"api_index": "room_number"}; values are ACTUAL room numbers.
+    # Pasadía package can only use Pasadía; Junior avoids Matrimonial rooms if possible.
+    room_type = "Pasadía" if package_type == "Pasadía" else normalized_bungalow_type
+    selected_room_number = room_allocation.pick_rooms(available_rooms, [room_type], excluded_rooms or ())[0]
+    if selected_room_number:
+        logger.info(f"[ROOM_DEBUG] Final selected room number: {selected_room_number} ({room_type})")
+        return selected_room_number
     
     logger.info(f"[ROOM_DEBUG] No suitable rooms found for {normalized_bungalow_type} {package_type}")
     return None
@@ -2419,7 +2270,7 @@ async def _make_booking_api_call(
     nights = (check_out_dt - check_in_dt).days
     
     # Calculate actual booking total using database rates (excluding extra beds)
-    booking_total_result = _calculate_booking_total(
+    booking_total_result = await _calculate_booking_total(
         check_in_date, check_out_date, adults, children_0_5, children_6_10,
         package_type
     )
@@ -2587,13 +2438,17 @@ async def _make_booking_api_call(
     logger.info(f"[BOOKING_API] Payment: {payment_method} ${payment_amount:.2f} (booking total: ${booking_total:.2f})")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://booking.lashojasresort.club/api/addBookingUserRest",
-                data=payload,
-                headers={"content-type": "application/x-www-form-urlencoded"},
-                timeout=300
-            )
+        async with http_pool.client_for(BOOKING_API_URL) as client:
+            try:
+                response = await client.post(
+                    BOOKING_API_URL,
+                    data=payload,
+                    headers={"content-type": "application/x-www-form-urlencoded"},
+                    timeout=300
+                )
+            finally:
+                # The booking may exist now even if the call failed: cached availability is stale
+                room_availability.invalidate()
             
             logger.info(f"[BOOKING_API] Response status: {response.status_code}")
             
@@ -2842,13 +2697,17 @@ async def _make_multi_room_api_call(
     logger.info(f"[MULTI_ROOM_API] PAX distribution: {adultcount}")
     
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.post(
-                "https://booking.lashojasresort.club/api/addBookingUserRest",
-                data=payload,
-                headers={"content-type": "application/x-www-form-urlencoded"},
-                timeout=300
-            )
+        async with http_pool.client_for(BOOKING_API_URL) as client:
+            try:
+                response = await client.post(
+                    BOOKING_API_URL,
+                    data=payload,
+                    headers={"content-type": "application/x-www-form-urlencoded"},
+                    timeout=300
+                )
+            finally:
+                # The booking may exist now even if the call failed: cached availability is stale
+                room_availability.invalidate()
             
             if response.status_code != 200:
                 logger.error(f"[MULTI_ROOM_API] Failed: {response.status_code} - {response.text[:200]}")
@@ -2893,10 +2752,11 @@ async def _update_payment_record(
     """
     Internal Chain of Thought: Update payment record with booking reference.
     NEVER expose database operations to customers.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     """
     def _execute_update():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor()
             codreser = f"HR{reserva}"
@@ -2920,14 +2780,14 @@ async def _update_payment_record(
             conn.commit()
             logger.info(f"Payment record updated: {payment_method}, reserva: {reserva}")
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    execute_with_retry(_execute_update, f"_update_payment_record({payment_method}, {reserva})")
+    # The booking already exists at this point, so the codreser marker gets a longer budget
+    await run_db(
+        _execute_update,
+        f"_update_payment_record({payment_method}, {reserva})",
+        deadline_seconds=PAYMENT_RECORD_DEADLINE_SECONDS
+    )
 
 
 def _get_no_availability_message(check_in_date: str, check_out_date: str) -> str:
@@ -2957,7 +2817,7 @@ Quedamos a su entera disposición."""
 async def _is_payment_already_used(payment_method: str, authorization_number: str = None, transfer_id: str = None) -> bool:
     """
     Check if a payment has already been used for a booking by checking codereser column.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     
     Args:
         payment_method: "CompraClick" or "Depósito BAC"
@@ -2970,6 +2830,7 @@ async def _is_payment_already_used(payment_method: str, authorization_number: st
     """
     def _execute_check():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor()
             
@@ -3004,14 +2865,9 @@ async def _is_payment_already_used(payment_method: str, authorization_number: st
             logger.warning(f"Invalid payment method or missing identifiers: {payment_method}, auth={authorization_number}, transfer_id={transfer_id}")
             return True  # Invalid parameters - assume used
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_check, f"_is_payment_already_used({payment_method})")
+    return await run_db(_execute_check, f"_is_payment_already_used({payment_method})")
 
 
 def _is_explicit_booking_confirmation(message: str) -> bool:
@@ -3066,26 +2922,12 @@ def _is_explicit_booking_confirmation(message: str) -> bool:
 
 # PENDING Booking Management Functions
 
-PENDING_BOOKINGS_FILE = "/tmp/pending_bookings.json"
-
 async def _store_pending_booking(phone_number: str, booking_data: Dict[str, Any]) -> None:
     """
-    Store PENDING booking data with timestamp for later processing.
+    Store PENDING booking data for later processing (see pending_bookings).
     """
     try:
-        # Load existing pending bookings
-        if os.path.exists(PENDING_BOOKINGS_FILE):
-            with open(PENDING_BOOKINGS_FILE, 'r') as f:
-                pending_bookings = json.load(f)
-        else:
-            pending_bookings = {}
-        
-        # Store the booking data
-        pending_bookings[phone_number] = booking_data
-        
-        # Save back to file
-        with open(PENDING_BOOKINGS_FILE, 'w') as f:
-            json.dump(pending_bookings, f, indent=2)
+        pending_bookings.put(phone_number, booking_data)
         
         # Mark conversation as PENDING
         await update_chat_status(phone_number, "PENDING")
@@ -3100,12 +2942,6 @@ async def _get_pending_booking(phone_number: str) -> Optional[Dict[str, Any]]:
     Retrieve PENDING booking data for a phone number.
     """
     try:
-        if not os.path.exists(PENDING_BOOKINGS_FILE):
-            return None
-        
-        with open(PENDING_BOOKINGS_FILE, 'r') as f:
-            pending_bookings = json.load(f)
-        
         return pending_bookings.get(phone_number)
         
     except Exception as e:
@@ -3117,18 +2953,7 @@ async def _remove_pending_booking(phone_number: str) -> None:
     Remove PENDING booking data after processing.
     """
     try:
-        if not os.path.exists(PENDING_BOOKINGS_FILE):
-            return
-        
-        with open(PENDING_BOOKINGS_FILE, 'r') as f:
-            pending_bookings = json.load(f)
-        
-        if phone_number in pending_bookings:
-            del pending_bookings[phone_number]
-            
-            with open(PENDING_BOOKINGS_FILE, 'w') as f:
-                json.dump(pending_bookings, f, indent=2)
-            
+        if pending_bookings.remove(phone_number):
             logger.info(f"Removed PENDING booking for {phone_number}")
         
     except Exception as e:
@@ -0,0 +1,285 @@
+"""Warm Playwright browsers for the payment portals.
+
+Creating a CompraClick link or syncing a report used to launch Chromium and
+log in from scratch every time, tens of seconds before any real work. The
+pool keeps one Chromium per portal (CompraClick, BAC) running per worker:
+
+- ``persist_session`` portals keep one long-lived context whose cookies and
+  localStorage are also saved to ``BROWSER_STATE_DIR/<portal>.json``, so a
+  relaunched browser (or another worker) starts already logged in.
+  Callers check whether the page is still authenticated and only log in when
+  it is not.
+- Other portals get a fresh context per use on the warm browser (BAC logs
+  out after every sync and terminates reused sessions).
+- At most ``max_pages`` pages per portal are open at once; extra callers wait.
+- Before a page is handed out the browser is probed (still connected, can
+  open a page); a dead browser is relaunched. A page that raised (or was
+  passed to ``discard_session()``) gets its context dropped, so a broken
+  session is not handed to the next caller.
+- Browsers idle for BROWSER_POOL_IDLE_SECONDS are closed.
+
+Usage:
+
+    async with browser_pool.page(COMPRACLICK_PORTAL) as page:
+        await page.goto(...)
+
+The warm browsers belong to the FastAPI event loop registered by ``start()``.
+Code running on any other loop gets a one-off browser that is closed on
+exit, exactly like before.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from playwright.async_api import Browser, BrowserContext, Page, Playwright, async_playwright
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Portal:
+    name: str
+    launch_args: Tuple[str, ...] = ("--no-sandbox", "--disable-setuid-sandbox")
+    context_options: Dict[str, Any] = field(default_factory=dict)
+    init_script: Optional[str] = None
+    # Keep one logged-in context and save its storage_state between operations
+    persist_session: bool = False
+    max_pages: int = 1
+
+
+class _Slot:
+    """Warm browser (and shared context) for one portal."""
+
+    def __init__(self, portal: Portal):
+        self.portal = portal
+        self.browser: Optional[Browser] = None
+        self.context: Optional[BrowserContext] = None
+        self.pages = asyncio.Semaphore(portal.max_pages)
+        self.lock = asyncio.Lock()
+        self.in_use = 0
+        self.last_used = time.monotonic()
+
+
+_playwright: Optional[Playwright] = None
+_slots: Dict[str, _Slot] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_reaper: Optional[asyncio.Task] = None
+_stats = {"launches": 0, "pages": 0, "contexts_created": 0, "contexts_discarded": 0, "idle_closes": 0, "one_off": 0}
+
+
+def _state_path(portal: Portal) -> str:
+    return os.path.join(config.BROWSER_STATE_DIR, f"{portal.name}.json")
+
+
+async def _launch(portal: Portal) -> Browser:
+    global _playwright
+    if _playwright is None:
+        _playwright = await async_playwright().start()
+    browser = await _playwright.chromium.launch(headless=True, args=list(portal.launch_args))
+    _stats["launches"] += 1
+    logger.info(f"[BROWSER_POOL] Launched Chromium for {portal.name}")
+    return browser
+
+
+async def _new_context(browser: Browser, portal: Portal) -> BrowserContext:
+    options = dict(portal.context_options)
+    if portal.persist_session and os.path.exists(_state_path(portal)):
+        options["storage_state"] = _state_path(portal)
+    context = await browser.new_context(**options)
+    if portal.init_script:
+        await context.add_init_script(portal.init_script)
+    _stats["contexts_created"] += 1
+    return context
+
+
+async def _save_session(slot: _Slot) -> None:
+    """Write the shared context's cookies/localStorage atomically (other workers read the file)."""
+    try:
+        state = await slot.context.storage_state()
+        os.makedirs(config.BROWSER_STATE_DIR, exist_ok=True)
+        path = _state_path(slot.portal)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f)
+        os.chmod(tmp_path, 0o600)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"[BROWSER_POOL] Could not save {slot.portal.name} session: {e}")
+
+
+async def _close_quietly(target: Any) -> None:
+    try:
+        await target.close()
+    except Exception:
+        pass
+
+
+async def _discard_browser(slot: _Slot) -> None:
+    context, browser = slot.context, slot.browser
+    slot.context = None
+    slot.browser = None
+    if context is not None:
+        await _close_quietly(context)
+    if browser is not None:
+        await _close_quietly(browser)
+
+
+async def _open_page(slot: _Slot) -> Tuple[Page, BrowserContext]:
+    """Health-probed page on the warm browser; relaunches once if the browser is dead."""
+    portal = slot.portal
+    async with slot.lock:
+        for attempt in (1, 2):
+            if slot.browser is not None and not slot.browser.is_connected():
+                logger.warning(f"[BROWSER_POOL] {portal.name} browser disconnected, relaunching")
+                await _discard_browser(slot)
+            if slot.browser is None:
+                slot.browser = await _launch(portal)
+            try:
+                if portal.persist_session:
+                    if slot.context is None:
+                        slot.context = await _new_context(slot.browser, portal)
+                    context = slot.context
+                else:
+                    context = await _new_context(slot.browser, portal)
+                return await context.new_page(), context
+            except Exception as e:
+                if attempt == 2:
+                    raise
+                logger.warning(f"[BROWSER_POOL] {portal.name} browser failed health probe ({e}), relaunching")
+                await _discard_browser(slot)
+
+
+@asynccontextmanager
+async def _one_off_page(portal: Portal) -> AsyncIterator[Page]:
+    _stats["one_off"] += 1
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=list(portal.launch_args))
+        try:
+            context = await browser.new_context(**portal.context_options)
+            if portal.init_script:
+                await context.add_init_script(portal.init_script)
+            yield await context.new_page()
+        finally:
+            await browser.close()
+
+
+@asynccontextmanager
+async def page(portal: Portal) -> AsyncIterator[Page]:
+    """Yield a page on the portal's warm browser; the browser stays open after the block."""
+    try:
+        on_shared_loop = _loop is not None and asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        on_shared_loop = False
+
+    if not on_shared_loop:
+        async with _one_off_page(portal) as one_off:
+            yield one_off
+        return
+
+    slot = _slots.get(portal.name)
+    if slot is None:
+        slot = _slots[portal.name] = _Slot(portal)
+
+    async with slot.pages:
+        slot.in_use += 1
+        try:
+            new_page, context = await _open_page(slot)
+            _stats["pages"] += 1
+            ok = False
+            try:
+                yield new_page
+                ok = True
+            finally:
+                if not ok:
+                    # The session may be what broke: next caller starts from a new context
+                    discard_session(portal, new_page)
+                await _close_quietly(new_page)
+                if not portal.persist_session:
+                    await _close_quietly(context)
+                elif context is slot.context:
+                    await _save_session(slot)
+                elif not context.pages:
+                    # Discarded context: close it once its last page is done
+                    await _close_quietly(context)
+        finally:
+            slot.in_use -= 1
+            slot.last_used = time.monotonic()
+
+
+def discard_session(portal: Portal, page: Page) -> None:
+    """Stop reusing ``page``'s session (e.g. an operation failed halfway); the next page gets a new context."""
+    slot = _slots.get(portal.name)
+    if slot is not None and slot.context is not None and slot.context is page.context:
+        slot.context = None
+        _stats["contexts_discarded"] += 1
+
+
+async def _close_idle() -> None:
+    """Close warm browsers unused for BROWSER_POOL_IDLE_SECONDS (or already disconnected)."""
+    now = time.monotonic()
+    for slot in list(_slots.values()):
+        if slot.browser is None or slot.in_use:
+            continue
+        if now - slot.last_used >= config.BROWSER_POOL_IDLE_SECONDS or not slot.browser.is_connected():
+            async with slot.lock:
+                if slot.in_use:
+                    continue
+                await _discard_browser(slot)
+            _stats["idle_closes"] += 1
+            logger.info(f"[BROWSER_POOL] Closed idle {slot.portal.name} browser")
+
+
+async def _reap_idle() -> None:
+    interval = max(5.0, min(60.0, config.BROWSER_POOL_IDLE_SECONDS / 2))
+    while True:
+        await asyncio.sleep(interval)
+        await _close_idle()
+
+
+def start() -> None:
+    """Bind the pool to the running event loop (call from an async startup hook)."""
+    global _loop, _reaper
+    _loop = asyncio.get_running_loop()
+    _reaper = _loop.create_task(_reap_idle(), name="browser_pool_reaper")
+    logger.info("[BROWSER_POOL] Warm browser pool enabled")
+
+
+async def aclose() -> None:
+    """Close every warm browser and Playwright itself (call from the shutdown hook)."""
+    global _loop, _reaper, _playwright
+    _loop = None
+    if _reaper is not None:
+        _reaper.cancel()
+        _reaper = None
+    slots = list(_slots.values())
+    _slots.clear()
+    for slot in slots:
+        await _discard_browser(slot)
+    if _playwright is not None:
+        try:
+            await _playwright.stop()
+        except Exception as e:
+            logger.warning(f"[BROWSER_POOL] Error stopping Playwright: {e}")
+        _playwright = None
+    logger.info(f"[BROWSER_POOL] Closed {len(slots)} portal browsers")
+
+
+def get_metrics() -> Dict[str, Any]:
+    """Launch/page counters plus which portal browsers are warm right now."""
+    return {
+        **_stats,
+        "portals": {
+            name: {"warm": slot.browser is not None, "pages_in_use": slot.in_use,
+                   "idle_seconds": round(time.monotonic() - slot.last_used, 1)}
+            for name, slot in _slots.items()
+        },
+    }
@@ -0,0 +1,180 @@
+"""Shared httpx client registry.
+
+One long-lived, keep-alive (and HTTP/2 when ``h2`` is installed) AsyncClient
+per known upstream host (WATI, ManyChat, OpenAI, the booking API; see
+HTTP_POOL_SHARED_HOSTS), so sending a message or calling the booking API
+reuses an open connection instead of paying a TCP+TLS handshake per call.
+Any other host, such as the CDN behind a customer's media link, gets a
+one-off client, so the registry never grows with the hosts customers send.
+
+Usage mirrors the old per-call clients:
+
+    async with http_pool.client_for(url) as client:
+        response = await client.post(url, ...)
+
+The shared clients belong to the FastAPI event loop registered by ``start()``.
+Code running on any other loop (worker threads with their own loop, CLI scripts) gets a
+one-off client that is closed on exit, exactly like before.
+
+Waiting for a free pooled connection has its own (longer) ``pool`` timeout,
+so a burst queues for a connection instead of failing after the 5s request timeout.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, FrozenSet, Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401  (installed via httpx[http2])
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_clients: Dict[str, httpx.AsyncClient] = {}
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_metrics: Dict[str, Dict[str, Any]] = {}
+_metrics_lock = threading.Lock()  # one-off clients on other threads record too
+OTHER_HOSTS = "other"  # metrics bucket for hosts without a shared client
+
+
+def _record(host: str, elapsed_ms: float, status_code: Optional[int]) -> None:
+    with _metrics_lock:
+        stats = _metrics.setdefault(host, {
+            "requests": 0,
+            "errors": 0,
+            "server_errors": 0,
+            "latency_ms_total": 0.0,
+            "latency_ms_max": 0.0,
+        })
+        stats["requests"] += 1
+        if status_code is None:
+            stats["errors"] += 1
+        elif status_code >= 500:
+            stats["server_errors"] += 1
+        stats["latency_ms_total"] += elapsed_ms
+        stats["latency_ms_max"] = max(stats["latency_ms_max"], elapsed_ms)
+
+
+class _TimedTransport(httpx.AsyncHTTPTransport):
+    """Connection-pooling transport that records time-to-response-headers per host."""
+
+    def __init__(self, host: str, **kwargs):
+        super().__init__(**kwargs)
+        self._host = host
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        started = time.perf_counter()
+        try:
+            response = await super().handle_async_request(request)
+        except Exception:
+            _record(self._host, (time.perf_counter() - started) * 1000, None)
+            raise
+        _record(self._host, (time.perf_counter() - started) * 1000, response.status_code)
+        return response
+
+
+def _build_client(host: str) -> httpx.AsyncClient:
+    limits = httpx.Limits(
+        max_connections=config.HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=config.HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=config.HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    http2 = config.HTTP_POOL_HTTP2 and HTTP2_AVAILABLE
+    return httpx.AsyncClient(
+        transport=_TimedTransport(host, http2=http2, limits=limits),
+        timeout=httpx.Timeout(
+            config.HTTP_TIMEOUT_SECONDS,
+            connect=config.HTTP_CONNECT_TIMEOUT_SECONDS,
+            pool=config.HTTP_POOL_ACQUIRE_TIMEOUT_SECONDS,
+        ),
+    )
+
+
+def _host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def shared_hosts() -> FrozenSet[str]:
+    """Hosts that get a long-lived shared client."""
+    hosts = {host.strip().lower() for host in config.HTTP_POOL_SHARED_HOSTS.split(",") if host.strip()}
+    for url in (config.WATI_API_URL, config.MANYCHAT_API_URL):
+        if url:
+            hosts.add(_host_of(url))
+    return frozenset(hosts)
+
+
+def start() -> None:
+    """Bind the registry to the running event loop (call from an async startup hook)."""
+    global _loop
+    _loop = asyncio.get_running_loop()
+    if config.HTTP_POOL_HTTP2 and not HTTP2_AVAILABLE:
+        logger.warning("[HTTP_POOL] h2 not installed, shared clients will use HTTP/1.1 keep-alive only")
+    logger.info("[HTTP_POOL] Shared HTTP clients enabled")
+
+
+async def aclose() -> None:
+    """Close every shared client (call from the shutdown hook)."""
+    global _loop
+    clients = list(_clients.items())
+    _clients.clear()
+    _loop = None
+    for host, client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:
+            logger.warning(f"[HTTP_POOL] Error closing client for {host}: {e}")
+    logger.info(f"[HTTP_POOL] Closed {len(clients)} shared HTTP clients")
+
+
+@asynccontextmanager
+async def client_for(url: str) -> AsyncIterator[httpx.AsyncClient]:
+    """Yield the shared client for ``url``'s host; the client stays open after the block."""
+    host = _host_of(url)
+    try:
+        on_shared_loop = _loop is not None and asyncio.get_running_loop() is _loop
+    except RuntimeError:
+        on_shared_loop = False
+
+    if host not in shared_hosts():
+        host = OTHER_HOSTS
+        on_shared_loop = False
+
+    if not on_shared_loop:
+        async with _build_client(host) as client:
+            yield client
+        return
+
+    client = _clients.get(host)
+    if client is None or client.is_closed:
+        client = _build_client(host)
+        _clients[host] = client
+        logger.info(f"[HTTP_POOL] Opened shared client for {host} (http2={config.HTTP_POOL_HTTP2 and HTTP2_AVAILABLE})")
+    yield client
+
+
+def get_metrics() -> Dict[str, Dict[str, Any]]:
+    """Per-host request counts and latency (time to response headers); unknown hosts are summed under "other"."""
+    snapshot = {}
+    with _metrics_lock:
+        items = [(host, dict(stats)) for host, stats in _metrics.items()]
+    for host, stats in items:
+        requests = stats["requests"]
+        snapshot[host] = {
+            **stats,
+            "latency_ms_total": round(stats["latency_ms_total"], 2),
+            "latency_ms_max": round(stats["latency_ms_max"], 2),
+            "latency_ms_avg": round(stats["latency_ms_total"] / requests, 2) if requests else 0.0,
+            "shared_client_open": host in _clients,
+        }
+    return snapshot
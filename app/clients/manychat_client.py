@@ -10,7 +10,7 @@ Notes:
 """
 from __future__ import annotations
 
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 import logging
 import os
 from pathlib import Path
@@ -18,6 +18,7 @@ from pathlib import Path
 import httpx
 
 from app import config
+from app.clients import http_pool
 
 logger = logging.getLogger(__name__)
 
@@ -44,7 +45,7 @@ async def send_ig_text_message(subscriber_id: str, text: str) -> Optional[Dict[s
         "subscriber_id": subscriber_id,
         "data": message_data,
     }
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -63,7 +64,7 @@ async def mark_ig_conversation_as_open(subscriber_id: str) -> Optional[Dict[str,
         "Content-Type": "application/json",
     }
     payload = {"subscriber_id": subscriber_id}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -82,7 +83,7 @@ async def mark_ig_conversation_as_closed(subscriber_id: str) -> Optional[Dict[st
         "Content-Type": "application/json",
     }
     payload = {"subscriber_id": subscriber_id}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -114,7 +115,7 @@ async def send_text_message(subscriber_id: str, text: str) -> Optional[Dict[str,
         "subscriber_id": subscriber_id,
         "data": message_data,
     }
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -142,7 +143,7 @@ async def send_image(subscriber_id: str, url: str, caption: str = "") -> Optiona
         "content": {"messages": messages},
     }
     payload = {"subscriber_id": subscriber_id, "data": message_data}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -169,7 +170,7 @@ async def send_file(subscriber_id: str, url: str) -> Optional[Dict[str, Any]]:
         },
     }
     payload = {"subscriber_id": subscriber_id, "data": message_data}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -188,7 +189,7 @@ async def mark_conversation_as_open(subscriber_id: str) -> Optional[Dict[str, An
         "Content-Type": "application/json",
     }
     payload = {"subscriber_id": subscriber_id}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -207,7 +208,7 @@ async def mark_conversation_as_closed(subscriber_id: str) -> Optional[Dict[str,
         "Content-Type": "application/json",
     }
     payload = {"subscriber_id": subscriber_id}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -229,7 +230,7 @@ async def add_tag_to_subscriber(subscriber_id: str, tag_name: str) -> Optional[D
         "Content-Type": "application/json",
     }
     payload = {"subscriber_id": subscriber_id, "tag_name": tag_name}
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -241,20 +242,8 @@ async def add_tag_to_subscriber(subscriber_id: str, tag_name: str) -> Optional[D
 
 
 # ---------------------- Shared/Channel-dependent ------------------
-async def send_media_message(
-    subscriber_id: str,
-    file_path: str,
-    media_type: str,
-    channel: str,
-    caption: str = "",
-) -> Optional[Dict[str, Any]]:
-    """Send media using a public URL derived from file_path.
-
-    - If file_path is already a URL, use it.
-    - Otherwise, compute a public URL under PUBLIC_MEDIA_BASE_URL.
-    - media_type: one of 'image', 'audio', 'video', 'file'/'document'.
-    - channel: 'facebook' | 'instagram'
-    """
+def _public_media_url(file_path: str) -> str:
+    """Public URL for a local file under resources/ (served via /pictures/ or /files/)."""
     if file_path.startswith("http://") or file_path.startswith("https://"):
         public_url = file_path
     else:
@@ -284,6 +273,24 @@ async def send_media_message(
 
         # Debug log to verify the exact media URL being sent
         logger.info(f"[ManyChat] public URL for media: {public_url}")
+    return public_url
+
+
+async def send_media_message(
+    subscriber_id: str,
+    file_path: str,
+    media_type: str,
+    channel: str,
+    caption: str = "",
+) -> Optional[Dict[str, Any]]:
+    """Send media using a public URL derived from file_path.
+
+    - If file_path is already a URL, use it.
+    - Otherwise, compute a public URL under PUBLIC_MEDIA_BASE_URL.
+    - media_type: one of 'image', 'audio', 'video', 'file'/'document'.
+    - channel: 'facebook' | 'instagram'
+    """
+    public_url = _public_media_url(file_path)
 
     att_type = media_type.lower()
     if att_type == "document":
@@ -330,7 +337,7 @@ async def send_media_message(
         # Mirror fbbot3 behavior: add message_tag for Facebook media
         payload["message_tag"] = "POST_PURCHASE_UPDATE"
 
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(api_url) as client:
         try:
             response = await client.post(api_url, json=payload, headers=headers)
             response.raise_for_status()
@@ -339,3 +346,48 @@ async def send_media_message(
         except httpx.HTTPStatusError as e:
             logger.error(f"[{channel.upper()}] Error sending media to {subscriber_id}: {e.response.text}")
             return None
+
+
+# ManyChat accepts at most 10 messages per sendContent call
+MAX_MESSAGES_PER_CONTENT = 10
+
+
+async def send_image_batch(
+    subscriber_id: str,
+    items: List[Tuple[str, str]],
+    channel: str,
+) -> Optional[Dict[str, Any]]:
+    """Send several (file_path, caption) images in one sendContent call, in order.
+
+    Each image is preceded by its caption as a text message, exactly like
+    send_media_message. ``items`` must fit in MAX_MESSAGES_PER_CONTENT messages.
+    """
+    messages: list = []
+    for file_path, caption in items:
+        if caption:
+            messages.append({"type": "text", "text": caption})
+        messages.append({"type": "image", "url": _public_media_url(file_path)})
+    if len(messages) > MAX_MESSAGES_PER_CONTENT:
+        raise ValueError(f"{len(messages)} messages exceed the ManyChat limit of {MAX_MESSAGES_PER_CONTENT}")
+
+    api_url = f"{config.MANYCHAT_API_URL}/fb/sending/sendContent"
+    if channel == "instagram":
+        api_key = config.MANYCHAT_INSTAGRAM_API_KEY
+        content: Dict[str, Any] = {"type": "instagram", "messages": messages}
+    else:
+        api_key = config.MANYCHAT_API_KEY
+        content = {"messages": messages}
+    headers = {"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"}
+    payload: Dict[str, Any] = {"subscriber_id": subscriber_id, "data": {"version": "v2", "content": content}}
+    if channel != "instagram":
+        payload["message_tag"] = "POST_PURCHASE_UPDATE"
+
+    async with http_pool.client_for(api_url) as client:
+        try:
+            response = await client.post(api_url, json=payload, headers=headers)
+            response.raise_for_status()
+            logger.info(f"[{channel.upper()}] {len(items)} images sent to {subscriber_id}")
+            return response.json()
+        except httpx.HTTPStatusError as e:
+            logger.error(f"[{channel.upper()}] Error sending images to {subscriber_id}: {e.response.text}")
+            return None
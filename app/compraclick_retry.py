@@ -4,11 +4,7 @@ Staged Retry/Escalation System for CompraClick Payment Validation
 This module provides automatic retry logic for CompraClick payment validation and booking
 with escalation to human agents when needed.
 """
-import os
-import json
 import logging
-import asyncio
-import threading
 from typing import Dict, Any, Optional
 from datetime import datetime, timedelta
 # Delayed imports to avoid circular dependency
@@ -16,29 +12,25 @@ from datetime import datetime, timedelta
 # from .booking_tool import make_booking
 from .database_client import check_room_availability, check_room_availability_counts
 from .wati_client import update_chat_status, send_wati_message
+from .retry_scheduler import retry_scheduler
 
 logger = logging.getLogger(__name__)
 
-# File to store retry state for each customer
-RETRY_STATE_FILE = "/tmp/compraclick_retry_state.json"
+# Retry jobs are rows in the shared retry scheduler's SQLite table (see retry_scheduler)
+RETRY_JOB_KIND = "compraclick"
 
-
-def _load_retry_state() -> Dict[str, Any]:
-    """Load retry state from file."""
-    try:
-        if os.path.exists(RETRY_STATE_FILE):
-            with open(RETRY_STATE_FILE, 'r') as f:
-                return json.load(f)
-    except Exception as e:
-        logger.error(f"Failed to load CompraClick retry state: {e}")
-    return {}
+# Stage -> (interval between attempts in minutes, state key holding the stage's max attempts)
+RETRY_STAGES = {
+    1: (5, "max_attempts_stage_1"),
+    2: (30, "max_attempts_stage_2"),
+    3: (60, "max_attempts_stage_3"),
+}
 
 
-def _save_retry_state(state: Dict[str, Any]) -> None:
-    """Save retry state to file."""
+def _update_retry_state(phone_number: str, **changes: Any) -> None:
+    """Merge changes into a customer's retry state (no-op if no retry is pending)."""
     try:
-        with open(RETRY_STATE_FILE, 'w') as f:
-            json.dump(state, f, indent=2)
+        retry_scheduler.update_state(RETRY_JOB_KIND, phone_number, **changes)
     except Exception as e:
         logger.error(f"Failed to save CompraClick retry state: {e}")
 
@@ -209,11 +201,8 @@ async def start_compraclick_retry_process(phone_number: str, payment_data: Dict[
         
         logger.info(f"[AVAILABILITY_GATE] Availability confirmed: {available_types} available for CompraClick retry")
     
-    # Load current retry state
-    retry_state = _load_retry_state()
-    
     # Initialize retry state for this customer
-    retry_state[phone_number] = {
+    customer_state = {
         "start_time": datetime.now().isoformat(),
         "payment_data": payment_data,
         "stage": 1,  # Stage 1: 5-min intervals, Stage 2: 30-min intervals, Stage 3: 1-hour intervals
@@ -225,108 +214,84 @@ async def start_compraclick_retry_process(phone_number: str, payment_data: Dict[
         "customer_frustrated": False
     }
     
-    _save_retry_state(retry_state)
-    
-    # Start the retry process in a separate thread to avoid blocking
-    def run_retry_process():
-        try:
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(_execute_retry_process(phone_number))
-        except Exception as e:
-            logger.exception(f"Error in CompraClick retry thread for {phone_number}: {e}")
-        finally:
-            loop.close()
+    # Durable job on the shared scheduler (survives restarts; replaces any pending retry for this customer)
+    retry_scheduler.schedule(RETRY_JOB_KIND, phone_number, customer_state)
     
-    thread = threading.Thread(target=run_retry_process, daemon=True)
-    thread.start()
-    
-    logger.info(f"CompraClick retry process thread started for {phone_number}")
+    logger.info(f"CompraClick retry process scheduled for {phone_number}")
     
     return {"success": True, "message": "Retry process started"}
 
 
-async def _execute_retry_process(phone_number: str) -> None:
+async def _prepare_retry_batch() -> Dict[str, Any]:
+    """One CompraClick sync shared by every customer whose retry is due in this batch."""
+    from .compraclick_tool import sync_compraclick_payments
+    try:
+        return await sync_compraclick_payments()
+    except Exception as e:
+        logger.exception(f"CompraClick sync failed for retry batch: {e}")
+        return {"success": False, "error": str(e)}
+
+
+async def _run_retry_attempt(phone_number: str, customer_state: Dict[str, Any], sync_result: Dict[str, Any]) -> Optional[float]:
     """
-    Execute the staged retry process for a customer.
-    This runs in a continuous loop and handles all retry attempts.
+    Execute one staged retry attempt for a customer (called by the retry scheduler).
+    
+    Returns:
+        Seconds until the next attempt, or None when the retry process is over
+        (booked, escalated or exhausted).
     """
     try:
-        while True:
-            retry_state = _load_retry_state()
-            customer_state = retry_state.get(phone_number)
-            
-            if not customer_state or customer_state.get("escalated"):
-                logger.info(f"CompraClick retry process ended for {phone_number} - no state or escalated")
-                return
-                
-            payment_data = customer_state["payment_data"]
-            stage = customer_state["stage"]
-            attempt_count = customer_state["attempt_count"]
+        if customer_state.get("escalated"):
+            logger.info(f"CompraClick retry process ended for {phone_number} - escalated")
+            return None
             
-            # Determine retry interval and max attempts based on stage
-            if stage == 1:
-                interval_minutes = 5
-                max_attempts = customer_state["max_attempts_stage_1"]
-                stage_name = "Stage 1 (5-minute intervals)"
-            elif stage == 2:
-                interval_minutes = 30
-                max_attempts = customer_state["max_attempts_stage_2"]
-                stage_name = "Stage 2 (30-minute intervals)"
-            elif stage == 3:
-                interval_minutes = 60
-                max_attempts = customer_state["max_attempts_stage_3"]
-                stage_name = "Stage 3 (1-hour intervals)"
+        payment_data = customer_state["payment_data"]
+        stage = customer_state["stage"]
+        attempt_count = customer_state["attempt_count"]
+        
+        # Determine retry interval and max attempts based on stage
+        if stage not in RETRY_STAGES:
+            # All stages complete - escalate to human
+            await _escalate_to_human(phone_number, "All retry attempts exhausted")
+            return None
+        interval_minutes, max_attempts_key = RETRY_STAGES[stage]
+        max_attempts = customer_state[max_attempts_key]
+        stage_name = f"Stage {stage} ({interval_minutes}-minute intervals)"
+        
+        logger.info(f"CompraClick retry {stage_name} - Attempt {attempt_count + 1}/{max_attempts} for {phone_number}")
+        
+        # Attempt sync and validation
+        success = await _attempt_sync_and_validation(phone_number, payment_data, sync_result=sync_result)
+        
+        if success:
+            logger.info(f"CompraClick payment validation and booking successful for {phone_number}")
+            return None
+        
+        # Update attempt count
+        attempt_count += 1
+        
+        # Check if we need to move to next stage
+        if attempt_count >= max_attempts:
+            if stage < 3:
+                logger.info(f"Moving {phone_number} to next CompraClick retry stage: {stage + 1}")
+                _update_retry_state(phone_number, stage=stage + 1, attempt_count=0)
             else:
-                # All stages complete - escalate to human
+                # All stages exhausted
                 await _escalate_to_human(phone_number, "All retry attempts exhausted")
-                return
-            
-            logger.info(f"CompraClick retry {stage_name} - Attempt {attempt_count + 1}/{max_attempts} for {phone_number}")
-            
-            # Attempt sync and validation
-            success = await _attempt_sync_and_validation(phone_number, payment_data)
-            
-            if success:
-                logger.info(f"CompraClick payment validation and booking successful for {phone_number}")
-                # Remove from retry state
-                retry_state = _load_retry_state()
-                if phone_number in retry_state:
-                    del retry_state[phone_number]
-                    _save_retry_state(retry_state)
-                return
-            
-            # Update attempt count
-            retry_state = _load_retry_state()
-            if phone_number in retry_state and not retry_state[phone_number].get("escalated"):
-                retry_state[phone_number]["attempt_count"] += 1
-                
-                # Check if we need to move to next stage
-                if retry_state[phone_number]["attempt_count"] >= max_attempts:
-                    if stage < 3:
-                        retry_state[phone_number]["stage"] += 1
-                        retry_state[phone_number]["attempt_count"] = 0
-                        logger.info(f"Moving {phone_number} to next CompraClick retry stage: {retry_state[phone_number]['stage']}")
-                    else:
-                        # All stages exhausted
-                        await _escalate_to_human(phone_number, "All retry attempts exhausted")
-                        return
-                
-                _save_retry_state(retry_state)
-                
-                # Wait for next attempt
-                await asyncio.sleep(interval_minutes * 60)
-            else:
-                # State changed or escalated
-                return
+                return None
+        else:
+            _update_retry_state(phone_number, attempt_count=attempt_count)
+        
+        # Wait for next attempt
+        return interval_minutes * 60
                 
     except Exception as e:
         logger.exception(f"Error in CompraClick retry process for {phone_number}: {e}")
         await _escalate_to_human(phone_number, f"Error in retry process: {e}")
+        return None
 
 
-async def _attempt_sync_and_validation(phone_number: str, payment_data: Dict[str, Any]) -> bool:
+async def _attempt_sync_and_validation(phone_number: str, payment_data: Dict[str, Any], sync_result: Optional[Dict[str, Any]] = None) -> bool:
     """
     Attempt to sync CompraClick payments and validate/complete booking.
     
@@ -343,8 +308,9 @@ async def _attempt_sync_and_validation(phone_number: str, payment_data: Dict[str
         
         logger.info(f"Attempting CompraClick sync and validation for {phone_number}, auth: {authorization_number}")
         
-        # Step 1: Sync CompraClick payments
-        sync_result = await sync_compraclick_payments()
+        # Step 1: Sync CompraClick payments (unless this batch already did)
+        if sync_result is None:
+            sync_result = await sync_compraclick_payments()
         if not sync_result.get("success"):
             logger.warning(f"CompraClick sync failed for {phone_number}: {sync_result.get('error')}")
             return False
@@ -444,11 +410,7 @@ async def _attempt_sync_and_validation(phone_number: str, payment_data: Dict[str
                 await send_wati_message(phone_number, ask_message)
                 
                 # Mark state so we know we're waiting for customer data
-                retry_state = _load_retry_state()
-                if phone_number in retry_state:
-                    retry_state[phone_number]["waiting_for_data"] = True
-                    retry_state[phone_number]["missing_fields"] = missing_fields
-                    _save_retry_state(retry_state)
+                _update_retry_state(phone_number, waiting_for_data=True, missing_fields=missing_fields)
                 
                 return False  # Don't continue retrying with bad data
             
@@ -477,13 +439,13 @@ async def _escalate_to_human(phone_number: str, reason: str) -> None:
         )
         await send_wati_message(phone_number, escalation_message)
         
-        # Update retry state to mark as escalated
-        retry_state = _load_retry_state()
-        if phone_number in retry_state:
-            retry_state[phone_number]["escalated"] = True
-            retry_state[phone_number]["escalation_reason"] = reason
-            retry_state[phone_number]["escalation_time"] = datetime.now().isoformat()
-            _save_retry_state(retry_state)
+        # Update retry state to mark as escalated (the scheduled job ends at its next run)
+        _update_retry_state(
+            phone_number,
+            escalated=True,
+            escalation_reason=reason,
+            escalation_time=datetime.now().isoformat(),
+        )
             
         logger.info(f"Successfully escalated {phone_number} to human agent")
         
@@ -499,14 +461,13 @@ async def mark_customer_frustrated(phone_number: str) -> None:
     try:
         logger.info(f"Marking customer {phone_number} as frustrated, halting CompraClick retry process")
         
-        retry_state = _load_retry_state()
-        if phone_number in retry_state:
-            retry_state[phone_number]["customer_frustrated"] = True
-            retry_state[phone_number]["frustration_time"] = datetime.now().isoformat()
-            _save_retry_state(retry_state)
+        _update_retry_state(phone_number, customer_frustrated=True, frustration_time=datetime.now().isoformat())
             
         # Immediately escalate to human
         await _escalate_to_human(phone_number, "Customer expressed frustration or requested refund")
         
     except Exception as e:
         logger.exception(f"Failed to mark customer {phone_number} as frustrated: {e}")
+
+
+retry_scheduler.register(RETRY_JOB_KIND, _run_retry_attempt, prepare=_prepare_retry_batch)
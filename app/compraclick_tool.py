@@ -11,10 +11,12 @@ import time
 import logging
 import pandas as pd
 from typing import Dict, Optional, Any
-from playwright.async_api import async_playwright, Page, Browser, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import Page, TimeoutError as PlaywrightTimeoutError
 from . import config
-from .database_client import get_db_connection, execute_with_retry, check_room_availability, check_room_availability_counts
+from .clients import browser_pool
+from .database_client import get_db_connection, release_db_connection, run_db, check_room_availability, check_room_availability_counts
 from .wati_client import send_wati_message
+from . import room_allocation
 from .compraclick_retry import start_compraclick_retry_process
 from datetime import datetime
 
@@ -25,6 +27,14 @@ logger = logging.getLogger(__name__)
 COMPRACLICK_URL = 'https://miposafiliados.credomatic.com'
 DOWNLOAD_PATH = '/tmp/compraclick'
 
+# Warm browser with a saved session: link creation and report sync skip the login when it is still valid
+COMPRACLICK_PORTAL = browser_pool.Portal(
+    name="compraclick",
+    launch_args=('--no-sandbox', '--disable-setuid-sandbox', '--start-maximized'),
+    persist_session=True,
+    max_pages=config.COMPRACLICK_MAX_PAGES,
+)
+
 # Ensure download directory exists
 if not os.path.exists(DOWNLOAD_PATH):
     os.makedirs(DOWNLOAD_PATH)
@@ -85,9 +95,7 @@ async def sync_compraclick_payments() -> dict:
     max_attempts = 2
     for attempt in range(1, max_attempts + 1):
         try:
-            async with async_playwright() as p:
-                browser = await p.chromium.launch(headless=True, args=['--no-sandbox', '--disable-setuid-sandbox'])
-                page = await browser.new_page()
+            async with browser_pool.page(COMPRACLICK_PORTAL) as page:
                 try:
                     # Step 1: Login and Download
                     chain_of_thought["steps"].append({"step": 1, "action": "Login and Download Report", "reasoning": "Access CompraClick portal to get latest transactions", "result": "In progress..."})
@@ -116,11 +124,9 @@ async def sync_compraclick_payments() -> dict:
 
                 except Exception as e:
                     logger.exception("Error during CompraClick sync process")
+                    browser_pool.discard_session(COMPRACLICK_PORTAL, page)
                     chain_of_thought["steps"].append({"step": "error", "action": "Sync Failed", "reasoning": str(e), "result": "Failure"})
                     return {"success": False, "chain_of_thought": chain_of_thought, "data": {}, "error": f"An error occurred: {e}"}
-                finally:
-                    await logout(page)
-                    await browser.close()
         except Exception as e:
             error_message = str(e)
             logger.exception(f"Failed to initialize browser for CompraClick sync (attempt {attempt}/{max_attempts}): {error_message}")
@@ -148,13 +154,8 @@ async def sync_compraclick_payments() -> dict:
     return {"success": False, "data": {}, "error": "Unexpected error in browser automation"}
 
 async def login_and_download_report(page: Page, email: str, password: str) -> str:
-    """Logs in, navigates to sales, and downloads the transaction report."""
-    await page.goto(COMPRACLICK_URL, timeout=120000)
-    await page.type('input[placeholder="E-mail"]', email)
-    await page.type('input[placeholder="Contraseña"]', password)
-    await page.click('button[type="submit"].btn-secondary')
-    await page.wait_for_load_state('networkidle', timeout=120000)
-    logger.info("Login successful.")
+    """Logs in (unless the saved session is still valid), navigates to sales, and downloads the transaction report."""
+    await ensure_logged_in(page, email, password)
 
     await page.locator('//span[text()="Ventas"]').click()
     logger.info("Clicked Ventas button.")
@@ -173,161 +174,136 @@ async def login_and_download_report(page: Page, email: str, password: str) -> st
     logger.info(f"File downloaded and saved to {download_file_path}")
     return download_file_path
 
+# Report columns (0-based, matching the JS reference) mapped to the compraclick table
+COMPRACLICK_COLUMN_MAP = {
+    'date': 0,           # Date column (timestamp)
+    'sucursal': 2,       # Branch name 
+    'usuario': 3,        # User name
+    'estado': 4,         # Status
+    'cliente': 5,        # Client name
+    'documento': 6,      # Document number
+    'email': 7,          # Email
+    'direccion': 8,      # Address
+    'marcatarjeta': 9,   # Card brand (Visa, Mastercard)
+    'tarjeta': 10,       # Card number
+    'importe': 13,       # Amount
+    'autorizacion': 16,  # Authorization number
+    'descripcion': 21    # Description
+}
+COMPRACLICK_TEXT_COLUMNS = [c for c in COMPRACLICK_COLUMN_MAP if c not in ('date', 'importe')]
+COMPRACLICK_INSERT_BATCH_SIZE = 500
+_compraclick_schema_ready = False
+
+
+def ensure_compraclick_schema() -> None:
+    """
+    One-time migrations for the compraclick table ('used' column, UNIQUE key).
+    Called from the startup hook; the first sync runs it instead if startup could not.
+    """
+    global _compraclick_schema_ready
+    if _compraclick_schema_ready:
+        return
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        # Schema Migration: Ensure 'used' column exists
+        try:
+            cursor.execute("ALTER TABLE compraclick ADD COLUMN used DECIMAL(10, 2) NOT NULL DEFAULT 0.00")
+            conn.commit()
+            logger.info("Added 'used' column to 'compraclick' table.")
+        except Exception as e:
+            if "Duplicate column name" in str(e):
+                conn.rollback()
+            else:
+                raise e
+
+        # Schema Migration: Ensure UNIQUE index on (autorizacion, importe, tarjeta)
+        try:
+            cursor.execute("ALTER TABLE compraclick ADD UNIQUE INDEX uq_auth_importe_tarjeta (autorizacion, importe, tarjeta)")
+            conn.commit()
+            logger.info("Added UNIQUE index uq_auth_importe_tarjeta to 'compraclick' table.")
+        except Exception as e:
+            if "Duplicate key name" in str(e):
+                conn.rollback()
+            else:
+                raise e
+        _compraclick_schema_ready = True
+        logger.info("'compraclick' schema is up to date.")
+    finally:
+        release_db_connection(conn, cursor)
+
+
+def read_compraclick_report(file_path: str) -> pd.DataFrame:
+    """
+    Read the mapped columns of a CompraClick report into a clean, date-ordered frame.
+
+    Rows without a parseable date or amount are dropped. Text columns are read
+    as text and stripped ('' for blanks, NOT NULL in the table); importe is float.
+    """
+    # Codes (autorizacion, tarjeta, documento, ...) stay text: as numbers "000111" would become "111.0"
+    df = pd.read_excel(
+        file_path,
+        header=None,
+        usecols=sorted(COMPRACLICK_COLUMN_MAP.values()),
+        dtype={COMPRACLICK_COLUMN_MAP[column]: str for column in COMPRACLICK_TEXT_COLUMNS}
+    )
+    logger.info(f"Found {len(df)} rows in the file")
+
+    # Skip first row which might be header or empty (matching JS logic)
+    df = df.iloc[1:].rename(columns={index: name for name, index in COMPRACLICK_COLUMN_MAP.items()})
+
+    raw_importe = df['importe'].where(df['importe'].notna(), '').astype(str).str.strip().str.replace(',', '', regex=False)
+    df['importe'] = pd.to_numeric(raw_importe.where(raw_importe != ''), errors='coerce')
+    df['date'] = pd.to_datetime(df['date'], errors='coerce')
+
+    valid = df['date'].notna() & df['importe'].notna()
+    if not valid.all():
+        logger.info(f"Skipping {int((~valid).sum())} rows: missing/unparseable date or importe")
+    df = df[valid].copy()
+
+    for column in COMPRACLICK_TEXT_COLUMNS:
+        df[column] = df[column].where(df[column].notna(), '').astype(str).str.strip()
+
+    # Sort rows by date in ascending order (CRITICAL - matching JS logic)
+    df = df.sort_values('date', kind='stable')
+    df['date'] = df['date'].dt.strftime('%Y-%m-%d %H:%M:%S')
+    logger.info(f"Processing {len(df)} valid rows in date order")
+    return df
+
+
 async def process_xls_and_insert_to_db(file_path: str) -> dict:
     """
     Processes the downloaded XLS file and inserts data into the compraclick table.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
+
+    Rows go in executemany() batches; INSERT IGNORE on uq_auth_importe_tarjeta
+    skips authorizations that are already stored.
     """
     logger.info(f"Starting process with file: {file_path}")
     
     # --- FILE PARSING PHASE (no retry needed - file is read once) ---
     try:
-        # Read Excel file without header assumption (read as raw data)
-        df = pd.read_excel(file_path, header=None)
-        logger.info(f"Found {len(df)} rows in the file")
-        
-        # Skip first row which might be header or empty (matching JS logic)
-        data_rows = df.iloc[1:].values.tolist()
-        logger.info(f"Processing {len(data_rows)} data rows (skipped first row)")
-        
-        # Define column mappings from Excel file to database schema (matching JS reference)
-        column_map = {
-            'date': 0,           # Date column (timestamp)
-            'sucursal': 2,       # Branch name 
-            'usuario': 3,        # User name
-            'estado': 4,         # Status
-            'cliente': 5,        # Client name
-            'documento': 6,      # Document number
-            'email': 7,          # Email
-            'direccion': 8,      # Address
-            'marcatarjeta': 9,   # Card brand (Visa, Mastercard)
-            'tarjeta': 10,       # Card number
-            'importe': 13,       # Amount
-            'autorizacion': 16,  # Authorization number
-            'descripcion': 21    # Description
-        }
-        
-        logger.info(f"Using mapped columns to database schema: {column_map}")
-        
-        # Function to clean decimal values (matching JS cleanDecimalValue function)
-        def clean_decimal_value(value):
-            if value is None or pd.isna(value):
-                return None
-            string_value = str(value).strip()
-            if string_value == '':
-                return None
-            cleaned_value = string_value.replace(',', '')
-            try:
-                return float(cleaned_value)
-            except ValueError:
-                logger.warning(f"Could not parse decimal value '{string_value}' - returning None")
-                return None
-        
-        def safe_string(value):
-            """Convert None or NaN values to empty string for NOT NULL columns"""
-            if value is None or pd.isna(value):
-                return ''
-            return str(value).strip()
-        
-        # Collect valid rows to be processed
-        valid_rows = []
-        
-        # First pass: collect valid rows (matching JS logic)
-        for i, row in enumerate(data_rows):
-            if not row or len(row) < max(column_map.values()) + 1:
-                logger.info(f"Skipping row {i + 1}: insufficient columns")
-                continue
-            
-            try:
-                date = row[column_map['date']] if len(row) > column_map['date'] else None
-                sucursal = row[column_map['sucursal']] if len(row) > column_map['sucursal'] else ''
-                usuario = row[column_map['usuario']] if len(row) > column_map['usuario'] else ''
-                estado = row[column_map['estado']] if len(row) > column_map['estado'] else ''
-                cliente = row[column_map['cliente']] if len(row) > column_map['cliente'] else ''
-                documento = row[column_map['documento']] if len(row) > column_map['documento'] else ''
-                email = row[column_map['email']] if len(row) > column_map['email'] else ''
-                direccion = row[column_map['direccion']] if len(row) > column_map['direccion'] else ''
-                marcatarjeta = row[column_map['marcatarjeta']] if len(row) > column_map['marcatarjeta'] else ''
-                tarjeta = row[column_map['tarjeta']] if len(row) > column_map['tarjeta'] else ''
-                raw_importe = row[column_map['importe']] if len(row) > column_map['importe'] else None
-                autorizacion = row[column_map['autorizacion']] if len(row) > column_map['autorizacion'] else ''
-                descripcion = row[column_map['descripcion']] if len(row) > column_map['descripcion'] else ''
-                
-                importe = clean_decimal_value(raw_importe)
-                
-                if not date or importe is None:
-                    logger.info(f"Skipping row {i + 1}: missing date or importe")
-                    continue
-                
-                if not isinstance(date, pd.Timestamp):
-                    try:
-                        date = pd.to_datetime(date)
-                    except:
-                        logger.warning(f"Could not parse date '{date}' in row {i + 1}")
-                        continue
-                
-                valid_rows.append({
-                    'row_index': i + 1,
-                    'date': date,
-                    'sucursal': safe_string(sucursal),
-                    'usuario': safe_string(usuario),
-                    'estado': safe_string(estado),
-                    'cliente': safe_string(cliente),
-                    'documento': safe_string(documento),
-                    'email': safe_string(email),
-                    'direccion': safe_string(direccion),
-                    'marcatarjeta': safe_string(marcatarjeta),
-                    'tarjeta': safe_string(tarjeta),
-                    'importe': importe,
-                    'autorizacion': safe_string(autorizacion),
-                    'descripcion': safe_string(descripcion)
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing row {i + 1}: {e}")
-                continue
-        
-        # Sort rows by date in ascending order (CRITICAL - matching JS logic)
-        valid_rows.sort(key=lambda x: x['date'])
-        logger.info(f"Processing {len(valid_rows)} valid rows in date order")
-        
+        df = read_compraclick_report(file_path)
     except Exception as e:
         logger.error(f"Fatal error during file parsing: {e}")
         return {"success": False, "inserted": 0, "skipped": 0, "message": str(e)}
+
+    columns = ['date', 'sucursal', 'usuario', 'estado', 'cliente', 'documento', 'email', 'direccion',
+               'marcatarjeta', 'tarjeta', 'importe', 'autorizacion', 'descripcion']
+    # astype(object): plain Python floats/strings for the MySQL driver
+    rows = [(*values, 0.0) for values in df[columns].astype(object).itertuples(index=False, name=None)]
     
-    # --- DATABASE INSERTION PHASE (with infinite retry) ---
+    # --- DATABASE INSERTION PHASE (retried until the DB deadline) ---
     def _execute_database_insertion():
+        ensure_compraclick_schema()
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor()
             
             inserted_count = 0
-            skipped_count = 0
             error_count = 0
-
-            # Schema Migration: Ensure 'used' column exists
-            try:
-                cursor.execute("ALTER TABLE compraclick ADD COLUMN used DECIMAL(10, 2) NOT NULL DEFAULT 0.00")
-                conn.commit()
-                logger.info("Added 'used' column to 'compraclick' table.")
-            except Exception as e:
-                if "Duplicate column name" in str(e):
-                    logger.info("'used' column already exists.")
-                    conn.rollback()
-                else:
-                    raise e
-            
-            # Schema Migration: Ensure UNIQUE index on (autorizacion, importe, tarjeta)
-            try:
-                cursor.execute("ALTER TABLE compraclick ADD UNIQUE INDEX uq_auth_importe_tarjeta (autorizacion, importe, tarjeta)")
-                conn.commit()
-                logger.info("Added UNIQUE index uq_auth_importe_tarjeta to 'compraclick' table.")
-            except Exception as e:
-                if "Duplicate key name" in str(e):
-                    logger.info("UNIQUE index uq_auth_importe_tarjeta already exists.")
-                    conn.rollback()
-                else:
-                    raise e
             
             insert_query = """
                 INSERT IGNORE INTO compraclick 
@@ -336,39 +312,24 @@ async def process_xls_and_insert_to_db(file_path: str) -> dict:
                 VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
             
-            for row in valid_rows:
+            for start in range(0, len(rows), COMPRACLICK_INSERT_BATCH_SIZE):
+                batch = rows[start:start + COMPRACLICK_INSERT_BATCH_SIZE]
                 try:
-                    mysql_date = row['date'] if isinstance(row['date'], str) else row['date'].strftime('%Y-%m-%d %H:%M:%S')
-                    
-                    cursor.execute(insert_query, (
-                        mysql_date,
-                        row['sucursal'],
-                        row['usuario'],
-                        row['estado'],
-                        row['cliente'],
-                        row['documento'],
-                        row['email'],
-                        row['direccion'],
-                        row['marcatarjeta'],
-                        row['tarjeta'],
-                        row['importe'],
-                        row['autorizacion'],
-                        row['descripcion'],
-                        0.0
-                    ))
-                    
-                    if cursor.rowcount > 0:
-                        inserted_count += 1
-                        logger.info(f"Inserted row {row['row_index']}: {row['cliente']}, {row['date']}, {row['importe']}")
-                    else:
-                        skipped_count += 1
-                        logger.info(f"Skipping row {row['row_index']}: duplicate entry detected ({row['cliente']}, {row['date']})")
-                    
+                    cursor.executemany(insert_query, batch)
+                    inserted_count += max(cursor.rowcount, 0)
                 except Exception as e:
-                    logger.error(f"Error inserting row {row['row_index']}: {e}")
-                    error_count += 1
+                    # Fall back to single rows so one bad row doesn't drop the whole batch
+                    logger.error(f"Batch insert of rows {start + 1}-{start + len(batch)} failed ({e}), inserting one by one")
+                    for row in batch:
+                        try:
+                            cursor.execute(insert_query, row)
+                            inserted_count += max(cursor.rowcount, 0)
+                        except Exception as row_err:
+                            logger.error(f"Error inserting row {row[4]}, {row[0]}, {row[10]}: {row_err}")
+                            error_count += 1
             
             conn.commit()
+            skipped_count = len(rows) - inserted_count - error_count
             
             logger.info(f"Rows inserted: {inserted_count}")
             logger.info(f"Rows skipped: {skipped_count}")
@@ -381,26 +342,22 @@ async def process_xls_and_insert_to_db(file_path: str) -> dict:
                 "errors": error_count
             }
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
             logger.info("Database connection closed")
     
-    return execute_with_retry(_execute_database_insertion, f"process_xls_and_insert_to_db({file_path})")
+    return await run_db(_execute_database_insertion, f"process_xls_and_insert_to_db({file_path})")
 
 async def validate_compraclick_payment(authorization_number: str, booking_total: float) -> dict:
     """
     Validates a CompraClick payment by checking the remaining balance against the booking total.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     
     IMPORTANT: This function only validates - it does NOT update the database.
     Use reserve_compraclick_payment() to actually reserve the amount after booking succeeds.
     """
     def _execute_validation():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True, buffered=True)
             query = "SELECT importe, used, codreser, dateused FROM compraclick WHERE autorizacion = %s"
@@ -492,14 +449,9 @@ async def validate_compraclick_payment(authorization_number: str, booking_total:
                     "customer_message": customer_message
                 }
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_validation, f"validate_compraclick_payment({authorization_number})")
+    return await run_db(_execute_validation, f"validate_compraclick_payment({authorization_number})")
 
 
 async def validate_compraclick_payment_fallback(
@@ -511,7 +463,7 @@ async def validate_compraclick_payment_fallback(
     """
     Fallback validation for CompraClick payments when authorization code is not available.
     Validates by matching credit card last 4 digits, amount, and payment date.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     
     Args:
         card_last_four: Last 4 digits of the credit card used for payment
@@ -582,9 +534,10 @@ async def validate_compraclick_payment_fallback(
             "customer_message": "Por favor, proporcione exactamente los últimos 4 dígitos de su tarjeta de crédito. 💳"
         }
     
-    # --- DATABASE QUERY PHASE (with infinite retry) ---
+    # --- DATABASE QUERY PHASE (retried until the DB deadline) ---
     def _execute_fallback_validation():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True)
             
@@ -764,20 +717,15 @@ async def validate_compraclick_payment_fallback(
                     "customer_message": customer_message
                 }
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_fallback_validation, f"validate_compraclick_payment_fallback({card_last_four_clean})")
+    return await run_db(_execute_fallback_validation, f"validate_compraclick_payment_fallback({card_last_four_clean})")
 
 
 async def reserve_compraclick_payment(authorization_number: str, booking_total: float) -> dict:
     """
     Reserves a CompraClick payment amount by updating the 'used' column.
-    Uses infinite retry for database operations.
+    Retries on the DB executor until the per-call deadline.
     This should only be called after successful booking validation and just before the booking HTTP call.
 
     Args:
@@ -791,6 +739,7 @@ async def reserve_compraclick_payment(authorization_number: str, booking_total:
     
     def _execute_reservation():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True)
             query = "SELECT importe, used FROM compraclick WHERE autorizacion = %s FOR UPDATE"
@@ -817,14 +766,28 @@ async def reserve_compraclick_payment(authorization_number: str, booking_total:
             logger.info(f"Successfully reserved {booking_total} from CompraClick auth '{authorization_number}'. New used amount: {new_used_amount}")
             return {"success": True, "message": f"Cantidad {booking_total:.2f} reservada exitosamente"}
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
     
-    return execute_with_retry(_execute_reservation, f"reserve_compraclick_payment({authorization_number})")
+    return await run_db(_execute_reservation, f"reserve_compraclick_payment({authorization_number})")
+
+
+# bungalow_type as the assistant writes it -> room_allocation room type
+ROOM_TYPE_ALIASES = {
+    'familiar': 'Familiar', 'bungalow familiar': 'Familiar',
+    'junior': 'Junior', 'bungalow junior': 'Junior',
+    'habitación': 'Habitación', 'habitacion': 'Habitación', 'doble': 'Habitación',
+    'matrimonial': 'Matrimonial',
+}
+
+
+def _single_room_alternatives(adults: int, children_6_10: int, available_types: list) -> list:
+    """Display names of the available room types the whole group fits into on its own."""
+    counts = {availability_key: 1 for availability_key in available_types}
+    return [
+        room_allocation.DISPLAY_NAMES[mix[0]]
+        for mix in room_allocation.feasible_mixes(adults, 0, children_6_10, counts)
+        if len(mix) == 1
+    ]
 
 
 async def create_compraclick_link(
@@ -944,30 +907,17 @@ async def create_compraclick_link(
         # 🚨 OCCUPANCY GATE: Block payment if group doesn't fit the requested room type
         if bungalow_type and adults > 0:
             total_occupancy = adults + (children_6_10 * 0.5)
-            occupancy_limits = {
-                'familiar': (5, 8), 'bungalow familiar': (5, 8),
-                'junior': (1, 8), 'bungalow junior': (1, 8),
-                'habitación': (1, 4), 'habitacion': (1, 4), 'doble': (1, 4),
-                'matrimonial': (2, 2),
-            }
-            occ_key = bungalow_type.lower().strip()
-            occ_range = occupancy_limits.get(occ_key)
-            if occ_range:
-                min_occ, max_occ = occ_range
+            requested_type = ROOM_TYPE_ALIASES.get(bungalow_type.lower().strip())
+            if requested_type:
+                min_occ = room_allocation.ROOM_CAPACITY[requested_type]["min_occupancy"]
+                max_occ = room_allocation.ROOM_CAPACITY[requested_type]["max_occupancy"]
                 if total_occupancy < min_occ or total_occupancy > max_occ:
                     logger.warning(
                         f"[OCCUPANCY_GATE] BLOCKED: {bungalow_type} requires {min_occ}-{max_occ} occupancy "
                         f"but group has {total_occupancy} (adults={adults}, children_6_10={children_6_10})"
                     )
                     # Find valid alternatives from what's available
-                    valid_alternatives = []
-                    capacity_rules = {'bungalow_familiar': (5, 8), 'bungalow_junior': (1, 8), 'habitacion': (1, 4)}
-                    display_names = {'bungalow_familiar': 'Bungalow Familiar', 'bungalow_junior': 'Bungalow Junior', 'habitacion': 'Habitación Doble'}
-                    for avail_type in available_types:
-                        if avail_type in capacity_rules:
-                            a_min, a_max = capacity_rules[avail_type]
-                            if a_min <= total_occupancy <= a_max:
-                                valid_alternatives.append(display_names.get(avail_type, avail_type))
+                    valid_alternatives = _single_room_alternatives(adults, children_6_10, available_types)
                     if valid_alternatives:
                         alt_str = ', '.join(valid_alternatives)
                         instruction = (
@@ -1013,6 +963,7 @@ async def create_compraclick_link(
                 # 🚨 MULTI-ROOM COUNT CHECK: For multi-room bookings, verify enough rooms available
                 not_enough_rooms = False
                 available_count = 0
+                room_counts = None
                 if num_rooms > 1 and specific_availability == 'Available':
                     try:
                         room_counts = await check_room_availability_counts(check_in_date, check_out_date)
@@ -1033,47 +984,30 @@ async def create_compraclick_link(
                     compatible_multi_room = []
                     total_occupancy = adults + (children_6_10 * 0.5) if adults > 0 else 0
                     
-                    # Room capacity rules: {type: (min, max)}
-                    capacity_rules = {
-                        'bungalow_familiar': (5, 8),
-                        'bungalow_junior': (1, 8),
-                        'habitacion': (1, 4),
-                    }
-                    type_display_names = {
-                        'bungalow_familiar': 'Bungalow Familiar',
-                        'bungalow_junior': 'Bungalow Junior',
-                        'habitacion': 'Habitación Doble',
-                    }
-                    
                     if adults > 0:
                         # Check single-room alternatives
-                        for avail_type in available_types:
-                            if avail_type in capacity_rules:
-                                min_cap, max_cap = capacity_rules[avail_type]
-                                if min_cap <= total_occupancy <= max_cap:
-                                    compatible_single_room.append(type_display_names.get(avail_type, avail_type))
-                                    logger.info(f"[AVAILABILITY_GATE] Single-room compatible: {avail_type} (occupancy {total_occupancy} fits {min_cap}-{max_cap})")
+                        compatible_single_room = _single_room_alternatives(adults, children_6_10, available_types)
                         
-                        # 🚨 MULTI-ROOM ALTERNATIVES: If no single-room fits, check multi-room options
+                        # 🚨 MULTI-ROOM ALTERNATIVES: If no single-room fits, best mixes from the allocation table
                         if not compatible_single_room and total_occupancy > 0:
                             try:
-                                room_counts = await check_room_availability_counts(check_in_date, check_out_date)
+                                if room_counts is None or "error" in room_counts:
+                                    room_counts = await check_room_availability_counts(check_in_date, check_out_date)
                                 if "error" not in room_counts:
                                     logger.info(f"[AVAILABILITY_GATE] Room counts for multi-room check: {room_counts}")
                                     
-                                    for room_type, (min_cap, max_cap) in capacity_rules.items():
-                                        available_count = room_counts.get(room_type, 0)
-                                        if available_count >= 2:
-                                            # Calculate rooms needed: distribute group evenly
-                                            for num_rooms_needed in range(2, min(available_count + 1, 5)):  # Max 4 rooms
-                                                per_room = total_occupancy / num_rooms_needed
-                                                if min_cap <= per_room <= max_cap:
-                                                    display_name = type_display_names.get(room_type, room_type)
-                                                    multi_option = f"{num_rooms_needed}x {display_name} ({available_count} disponibles)"
-                                                    if multi_option not in compatible_multi_room:
-                                                        compatible_multi_room.append(multi_option)
-                                                        logger.info(f"[AVAILABILITY_GATE] Multi-room compatible: {num_rooms_needed}x {room_type} (per-room {per_room:.1f} fits {min_cap}-{max_cap})")
-                                                    break  # Found minimum rooms needed for this type
+                                    for mix in room_allocation.feasible_mixes(adults, 0, children_6_10, room_counts):
+                                        if len(mix) < 2:
+                                            continue
+                                        if len(set(mix)) == 1:
+                                            type_count = room_counts.get(room_allocation.AVAILABILITY_KEYS[mix[0]], 0)
+                                            multi_option = f"{room_allocation.describe_mix(mix)} ({type_count} disponibles)"
+                                        else:
+                                            multi_option = room_allocation.describe_mix(mix)
+                                        compatible_multi_room.append(multi_option)
+                                        logger.info(f"[AVAILABILITY_GATE] Multi-room compatible: {multi_option}")
+                                        if len(compatible_multi_room) == 3:
+                                            break
                             except Exception as e:
                                 logger.warning(f"[AVAILABILITY_GATE] Multi-room check failed: {e}")
                         
@@ -1137,17 +1071,7 @@ async def create_compraclick_link(
     max_attempts = 2
     for attempt in range(1, max_attempts + 1):
         try:
-            async with async_playwright() as p:
-                # Launch browser with proper configuration
-                browser = await p.chromium.launch(
-                    headless=True,
-                    args=['--no-sandbox', '--disable-setuid-sandbox', '--start-maximized']
-                )
-                
-                # Create a context with proper download behavior
-                context = await browser.new_context()
-                page = await context.new_page()
-                
+            async with browser_pool.page(COMPRACLICK_PORTAL) as page:
                 try:
                     logger.info(f"Starting CompraClick link creation for customer: {customer_name}, "
                               f"amount: {actual_payment_amount} ({payment_percentage})")
@@ -1178,6 +1102,7 @@ async def create_compraclick_link(
                 
                 except Exception as e:
                     logger.exception(f"Error in CompraClick automation: {str(e)}")
+                    browser_pool.discard_session(COMPRACLICK_PORTAL, page)
                     # Take a screenshot on error for debugging
                     screenshot_path = f"/tmp/compraclick_error_{int(time.time())}.png"
                     error_message = f"CompraClick automation error: {str(e)}"
@@ -1189,17 +1114,6 @@ async def create_compraclick_link(
                         logger.error(f"Failed to take screenshot: {screenshot_err}")
                     
                     return {"success": False, "link": "", "error": error_message}
-                
-                finally:
-                    # Always attempt to logout and close resources
-                    try:
-                        await logout(page)
-                    except Exception as logout_err:
-                        logger.warning(f"Error during logout (non-critical): {str(logout_err)}")
-                    finally:
-                        await context.close()
-                        await browser.close()
-                        logger.info("Browser closed")
         
         except Exception as e:
             error_message = str(e)
@@ -1228,6 +1142,27 @@ async def create_compraclick_link(
     return {"success": False, "link": "", "error": "Unexpected error in browser automation"}
 
 
+async def ensure_logged_in(page: Page, email: str, password: str) -> None:
+    """
+    Open the portal and log in only if the pooled session is no longer authenticated.
+
+    The portal shows either the login form or the account menu once it has loaded.
+    """
+    logger.info(f"Navigating to {COMPRACLICK_URL}")
+    await page.goto(COMPRACLICK_URL, timeout=120000)
+    await page.wait_for_selector('input[placeholder="E-mail"], i.mdi-account-circle', timeout=60000)
+    if not await page.locator('input[placeholder="E-mail"]').is_visible():
+        logger.info("Reusing saved CompraClick session")
+        return
+
+    logger.info("Filling login form")
+    await page.type('input[placeholder="E-mail"]', email)
+    await page.type('input[placeholder="Contraseña"]', password)
+    await page.click('button[type="submit"].btn-secondary')
+    await page.wait_for_load_state('networkidle', timeout=120000)
+    logger.info("Login successful")
+
+
 async def authenticate_and_navigate(page: Page, email: str, password: str) -> Optional[str]:
     """
     Authenticate to the CompraClick system and navigate to the CompraClick section
@@ -1241,22 +1176,7 @@ async def authenticate_and_navigate(page: Page, email: str, password: str) -> Op
         Optional[str]: If there's an error but we have a link, return it, otherwise None
     """
     try:
-        # Navigate to the login page and wait for it to load
-        logger.info(f"Navigating to {COMPRACLICK_URL}")
-        await page.goto(COMPRACLICK_URL, timeout=120000)
-        
-        # Wait for the login form and fill it
-        logger.info("Filling login form")
-        await page.wait_for_selector('input[placeholder="E-mail"]', timeout=60000)
-        await page.type('input[placeholder="E-mail"]', email)
-        await page.type('input[placeholder="Contraseña"]', password)
-        
-        # Submit login form
-        await page.click('button[type="submit"].btn-secondary')
-        
-        # Wait for navigation to complete
-        await page.wait_for_load_state('networkidle', timeout=120000)
-        logger.info("Login successful")
+        await ensure_logged_in(page, email, password)
 
         # Click on "COMPRA-CLICK" in the navigation menu
         logger.info("Navigating to COMPRA-CLICK section")
@@ -1358,43 +1278,6 @@ async def create_new_compraclick(
         raise Exception(f"Failed to create CompraClick link: {str(e)}")
 
 
-async def logout(page: Page) -> None:
-    """
-    Performs logout operation
-    
-    Args:
-        page: Playwright page object
-    """
-    try:
-        logger.info("Attempting to log out...")
-        
-        # Click on the account circle icon
-        account_icon = await page.query_selector('i.mdi-account-circle')
-        if account_icon:
-            await account_icon.click()
-            await page.wait_for_selector('button.nav-menu-item.dropdown-item', timeout=30000)
-            
-            # Find and click the logout button
-            await page.evaluate('''
-            () => {
-                const logoutButton = Array.from(document.querySelectorAll('button.nav-menu-item.dropdown-item'))
-                  .find(el => el.querySelector('span') && el.querySelector('span').textContent.trim() === 'Cerrar Sesión');
-                if (logoutButton) {
-                  logoutButton.click();
-                }
-            }
-            ''')
-            
-            # Wait a moment for logout to complete
-            await page.wait_for_timeout(5000)
-            logger.info("Logged out successfully")
-        else:
-            logger.warning("Could not find account icon for logout")
-    
-    except Exception as e:
-        logger.warning(f"Error during logout (non-critical): {str(e)}")
-
-
 async def trigger_compraclick_retry_for_missing_payment(phone_number: str, authorization_number: str, booking_total: float, booking_data: Dict[str, Any]) -> dict:
     """
     Triggers the CompraClick retry mechanism when a valid payment proof was provided
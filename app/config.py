@@ -52,3 +52,113 @@ RAG_ENABLED = os.getenv("RAG_ENABLED", "false").lower() == "true"
 # Proactively rotate conversation at this turn limit to cap O(n^2) token accumulation.
 # Override via env var without code deploy: THREAD_ROTATION_TURN_LIMIT=20
 THREAD_ROTATION_TURN_LIMIT = int(os.getenv("THREAD_ROTATION_TURN_LIMIT", "15"))
+
+# MySQL Pool Configuration
+# Connections are shared through a bounded pool and every DB call runs on a
+# dedicated executor sized to the pool, so blocking I/O never runs on the event loop.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))  # mysql-connector caps pools at 32
+DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("DB_CONNECT_TIMEOUT_SECONDS", "10"))
+DB_CALL_DEADLINE_SECONDS = float(os.getenv("DB_CALL_DEADLINE_SECONDS", "30"))
+
+# Rate Calendar Configuration (in-memory copy of tarifarios)
+RATE_CACHE_TTL_SECONDS = int(os.getenv("RATE_CACHE_TTL_SECONDS", "600"))
+RATE_CACHE_MISS_RELOAD_SECONDS = int(os.getenv("RATE_CACHE_MISS_RELOAD_SECONDS", "60"))
+
+# Message Batching Configuration
+# Per-conversation debounce runs as asyncio tasks on the FastAPI loop; this caps
+# how many OpenAI turns run at once during a burst (the rest queue for a slot).
+MAX_CONCURRENT_OPENAI_TURNS = int(os.getenv("MAX_CONCURRENT_OPENAI_TURNS", "16"))
+
+# Shared HTTP client pool (one keep-alive client per known upstream host)
+# Hosts of WATI_API_URL and MANYCHAT_API_URL are always shared; any other host
+# (e.g. ManyChat/Facebook CDN media links) gets a one-off client
+HTTP_POOL_SHARED_HOSTS = os.getenv("HTTP_POOL_SHARED_HOSTS", "api.openai.com,booking.lashojasresort.club")
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "20"))  # per host
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "10"))
+HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS = float(os.getenv("HTTP_POOL_KEEPALIVE_EXPIRY_SECONDS", "60"))
+HTTP_POOL_HTTP2 = os.getenv("HTTP_POOL_HTTP2", "true").lower() == "true"
+# Defaults match httpx's own; calls that need longer pass timeout= per request
+HTTP_TIMEOUT_SECONDS = float(os.getenv("HTTP_TIMEOUT_SECONDS", "5"))
+HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("HTTP_CONNECT_TIMEOUT_SECONDS", "5"))
+# Wait for a free pooled connection, kept apart from the request timeout so bursts queue instead of failing
+HTTP_POOL_ACQUIRE_TIMEOUT_SECONDS = float(os.getenv("HTTP_POOL_ACQUIRE_TIMEOUT_SECONDS", "30"))
+
+# System instructions registry (parsed once, hot-reloaded when the file changes)
+INSTRUCTIONS_RELOAD_CHECK_SECONDS = float(os.getenv("INSTRUCTIONS_RELOAD_CHECK_SECONDS", "5"))
+
+# Local SQLite state (thread_store, message_buffer, conversation_log): seconds to wait on a locked database
+SQLITE_BUSY_TIMEOUT_SECONDS = float(os.getenv("SQLITE_BUSY_TIMEOUT_SECONDS", "5"))
+
+# Payment retry jobs (bank transfer / CompraClick) persisted in SQLite and run on the main loop
+RETRY_JOBS_DB_PATH = os.getenv("RETRY_JOBS_DB_PATH", "app/retry_jobs.db")
+# How often other workers' (or a crashed worker's) jobs are picked up
+RETRY_SCHEDULER_RESCAN_SECONDS = float(os.getenv("RETRY_SCHEDULER_RESCAN_SECONDS", "60"))
+# An attempt (sync + validation + booking) must finish within the lease or another worker may retry it
+RETRY_JOB_LEASE_SECONDS = float(os.getenv("RETRY_JOB_LEASE_SECONDS", "1800"))
+RETRY_JOB_ERROR_BACKOFF_SECONDS = float(os.getenv("RETRY_JOB_ERROR_BACKOFF_SECONDS", "300"))
+
+# Single-flight syncs (BAC bank transfers): a successful sync is shared with every caller for this long
+SINGLE_FLIGHT_DB_PATH = os.getenv("SINGLE_FLIGHT_DB_PATH", "app/single_flight.db")
+BANK_SYNC_FRESHNESS_SECONDS = float(os.getenv("BANK_SYNC_FRESHNESS_SECONDS", "60"))
+
+# Warm Playwright browsers for CompraClick / BAC (one Chromium per portal per worker)
+BROWSER_POOL_IDLE_SECONDS = float(os.getenv("BROWSER_POOL_IDLE_SECONDS", "900"))
+# Concurrent CompraClick pages sharing the logged-in session. Pages of one context share
+# cookies and the portal's session state, so parallel flows are not known to be safe: keep 1
+COMPRACLICK_MAX_PAGES = int(os.getenv("COMPRACLICK_MAX_PAGES", "1"))
+# Saved portal sessions (cookies/localStorage); contains live credentials, keep it private
+BROWSER_STATE_DIR = os.getenv("BROWSER_STATE_DIR", "/tmp/browser_state")
+
+# BAC statement ingest: re-check this many days before the newest ingested transaction (late-posted transfers)
+BAC_WATERMARK_LOOKBACK_DAYS = int(os.getenv("BAC_WATERMARK_LOOKBACK_DAYS", "3"))
+
+# Menu PDFs are rasterized once per content hash at this resolution and reused for every request
+MENU_RENDER_DPI = int(os.getenv("MENU_RENDER_DPI", "144"))
+
+# Photo galleries: messaging variants (longest side / JPEG quality) and delivery pacing
+GALLERY_MAX_DIMENSION = int(os.getenv("GALLERY_MAX_DIMENSION", "1600"))
+GALLERY_JPEG_QUALITY = int(os.getenv("GALLERY_JPEG_QUALITY", "82"))
+GALLERY_PREPARE_CONCURRENCY = int(os.getenv("GALLERY_PREPARE_CONCURRENCY", "4"))
+GALLERY_SEND_INTERVAL_SECONDS = float(os.getenv("GALLERY_SEND_INTERVAL_SECONDS", "1"))
+
+# Customer images sent to the vision models: longest side per use case, JPEG quality, memoized encodings.
+# Classifier and receipt analyzer see the same upload back to back; equal limits let them share one encoding.
+VISION_MAX_DIMENSION_CLASSIFY = int(os.getenv("VISION_MAX_DIMENSION_CLASSIFY", "2048"))
+VISION_MAX_DIMENSION_INQUIRY = int(os.getenv("VISION_MAX_DIMENSION_INQUIRY", "1536"))
+VISION_MAX_DIMENSION_RECEIPT = int(os.getenv("VISION_MAX_DIMENSION_RECEIPT", "2048"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+VISION_PREPROCESS_CACHE_SIZE = int(os.getenv("VISION_PREPROCESS_CACHE_SIZE", "32"))
+
+# Vision result cache (classifier / payment proof analyzer) for images a customer sends again
+VISION_CACHE_DB_PATH = os.getenv("VISION_CACHE_DB_PATH", "app/vision_cache.db")
+VISION_CACHE_TTL_SECONDS = float(os.getenv("VISION_CACHE_TTL_SECONDS", "604800"))
+# Max differing bits (of 256) for a recompressed/resized copy to count as the same image.
+# Classification only: payment proofs must match byte-for-byte (two receipts differ in only a few digits).
+VISION_CACHE_CLASSIFY_MAX_DISTANCE = int(os.getenv("VISION_CACHE_CLASSIFY_MAX_DISTANCE", "24"))
+
+# PDF payment proofs: rasterized in memory with PyMuPDF on a small dedicated thread pool
+PDF_RENDER_DPI = int(os.getenv("PDF_RENDER_DPI", "200"))
+PDF_RENDER_WORKERS = int(os.getenv("PDF_RENDER_WORKERS", "2"))
+
+# Voice note transcription: concurrent Whisper jobs per worker, ffmpeg timeout, transcripts cached by audio hash
+TRANSCRIBE_CONCURRENCY = int(os.getenv("TRANSCRIBE_CONCURRENCY", "4"))
+TRANSCRIBE_FFMPEG_TIMEOUT_SECONDS = float(os.getenv("TRANSCRIBE_FFMPEG_TIMEOUT_SECONDS", "60"))
+TRANSCRIPT_CACHE_SIZE = int(os.getenv("TRANSCRIPT_CACHE_SIZE", "256"))
+
+# Office closure rules (Asterisk timegroups): reload interval, retry after a failed reload, connect timeout
+OFFICE_RULES_TTL_SECONDS = float(os.getenv("OFFICE_RULES_TTL_SECONDS", "300"))
+OFFICE_RULES_RETRY_SECONDS = float(os.getenv("OFFICE_RULES_RETRY_SECONDS", "60"))
+OFFICE_DB_CONNECT_TIMEOUT_SECONDS = int(os.getenv("OFFICE_DB_CONNECT_TIMEOUT_SECONDS", "10"))
+
+# getRooms (booking engine availability): responses shared for this long; any booking from this process drops them
+ROOM_AVAILABILITY_TTL_SECONDS = float(os.getenv("ROOM_AVAILABILITY_TTL_SECONDS", "5"))
+
+# Room-night occupancy table: bookings re-read per batch, ids re-read for out-of-order inserts, cancellation/edit recheck interval
+ROOM_NIGHTS_SYNC_BATCH = int(os.getenv("ROOM_NIGHTS_SYNC_BATCH", "1000"))
+ROOM_NIGHTS_ID_OVERLAP = int(os.getenv("ROOM_NIGHTS_ID_OVERLAP", "50"))
+ROOM_NIGHTS_RECHECK_SECONDS = float(os.getenv("ROOM_NIGHTS_RECHECK_SECONDS", "30"))
+
+# Pending bookings awaiting customer confirmation: SQLite store, expiry, phones remembered as having none
+PENDING_BOOKINGS_DB_PATH = os.getenv("PENDING_BOOKINGS_DB_PATH", "app/pending_bookings.db")
+PENDING_BOOKING_TTL_SECONDS = float(os.getenv("PENDING_BOOKING_TTL_SECONDS", "604800"))
+PENDING_BOOKINGS_NEGATIVE_CACHE_SIZE = int(os.getenv("PENDING_BOOKINGS_NEGATIVE_CACHE_SIZE", "10000"))
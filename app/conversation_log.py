@@ -6,17 +6,14 @@ import sqlite3
 import os
 from datetime import datetime
 from typing import Optional, List, Dict
-from contextlib import contextmanager
+
+from app import sqlite_store
 
 DB_PATH = os.environ.get("CONVERSATION_LOG_DB_PATH", "app/conversation_log.db")
 
-@contextmanager
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """This thread's shared WAL connection (see sqlite_store); use as a context manager."""
+    return sqlite_store.connection(DB_PATH)
 
 def init_conversation_log_db():
     """Initialize the conversation log database"""
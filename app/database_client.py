@@ -1,6 +1,11 @@
 import mysql.connector
+from mysql.connector import pooling
+import asyncio
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 from typing import Callable, Any, Optional, Dict
 from . import config
 
@@ -13,58 +18,162 @@ RETRY_DELAY_SECONDS = 5  # Wait between retries
 MAX_RETRY_DELAY_SECONDS = 60  # Cap for exponential backoff
 
 
-def get_db_connection():
+class DatabaseDeadlineExceeded(TimeoutError):
+    """Raised when a database call keeps failing past its deadline."""
+
+
+# Connection pool (created lazily so the app can start while MySQL is down)
+_pool: Optional[pooling.MySQLConnectionPool] = None
+_pool_lock = threading.Lock()
+POOL_ACQUIRE_POLL_SECONDS = 0.05  # Re-check interval while the pool is exhausted
+
+# Dedicated executor: one worker per pooled connection keeps DB calls off the event loop
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+# Pool metrics (guarded by _metrics_lock)
+_metrics_lock = threading.Lock()
+_metrics = {
+    "acquired": 0,
+    "in_use": 0,
+    "exhausted_waits": 0,
+    "acquire_wait_ms_total": 0.0,
+    "acquire_wait_ms_max": 0.0,
+    "executor_queued": 0,
+    "executor_running": 0,
+    "queue_wait_ms_max": 0.0,
+    "retries": 0,
+    "deadline_exceeded": 0,
+}
+
+
+def _bump(**deltas) -> None:
+    with _metrics_lock:
+        for key, value in deltas.items():
+            _metrics[key] += value
+
+
+def _get_pool() -> pooling.MySQLConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(
+                    pool_name="watibot",
+                    pool_size=config.DB_POOL_SIZE,
+                    pool_reset_session=True,
+                    host=config.DB_HOST,
+                    user=config.DB_USER,
+                    password=config.DB_PASSWORD,
+                    database=config.DB_NAME,
+                    connection_timeout=config.DB_CONNECT_TIMEOUT_SECONDS
+                )
+                logger.info(f"[DB_POOL] Created MySQL pool with {config.DB_POOL_SIZE} connections")
+    return _pool
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=config.DB_POOL_SIZE, thread_name_prefix="db")
+    return _executor
+
+
+def get_db_connection(timeout: Optional[float] = None):
     """
-    Establishes a connection to the MySQL database with infinite retry.
-    
+    Borrows a health-checked connection from the shared MySQL pool.
+
+    The pool pings each connection on checkout and transparently reconnects
+    dead ones. Calling ``close()`` on the returned connection hands it back to
+    the pool (use ``release_db_connection`` so that always happens).
+
+    Args:
+        timeout: Max seconds to wait for a free connection (defaults to the call deadline).
+
     Returns:
-        MySQL connection object (never returns None - retries forever)
+        Pooled MySQL connection object
+
+    Raises:
+        DatabaseDeadlineExceeded: If no connection becomes available in time.
+        mysql.connector.Error: If the pool cannot be created or a connection cannot be opened.
     """
-    retry_count = 0
-    delay = RETRY_DELAY_SECONDS
-    
+    timeout = config.DB_CALL_DEADLINE_SECONDS if timeout is None else timeout
+    started = time.monotonic()
+    waited = False
+
     while True:
         try:
-            conn = mysql.connector.connect(
-                host=config.DB_HOST,
-                user=config.DB_USER,
-                password=config.DB_PASSWORD,
-                database=config.DB_NAME,
-                connection_timeout=60
-            )
-            if retry_count > 0:
-                logger.info(f"[DB_RETRY] Successfully connected after {retry_count} retries")
-            return conn
-        except mysql.connector.Error as err:
-            retry_count += 1
-            logger.error(f"[DB_RETRY] Connection attempt #{retry_count} failed: {err}. Retrying in {delay}s...")
-            time.sleep(delay)
-            # Exponential backoff with cap
-            delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
+            conn = _get_pool().get_connection()
+            break
+        except pooling.PoolError as err:
+            if "exhausted" not in str(err).lower():
+                raise
+            if time.monotonic() - started >= timeout:
+                raise DatabaseDeadlineExceeded(f"No pooled MySQL connection available after {timeout}s")
+            if not waited:
+                waited = True
+                _bump(exhausted_waits=1)
+            time.sleep(POOL_ACQUIRE_POLL_SECONDS)
+
+    wait_ms = (time.monotonic() - started) * 1000
+    with _metrics_lock:
+        _metrics["acquired"] += 1
+        _metrics["in_use"] += 1
+        _metrics["acquire_wait_ms_total"] += wait_ms
+        _metrics["acquire_wait_ms_max"] = max(_metrics["acquire_wait_ms_max"], wait_ms)
+    return conn
+
+
+def release_db_connection(conn, cursor=None) -> None:
+    """
+    Closes the cursor and returns a pooled connection, even if it went stale.
+    """
+    if cursor is not None:
+        try:
+            cursor.close()
+        except Exception:
+            pass
+    if conn is None:
+        return
+    try:
+        conn.close()
+    except Exception as e:
+        logger.warning(f"[DB_POOL] Error returning connection to pool: {e}")
+    finally:
+        _bump(in_use=-1)
 
 
-def execute_with_retry(operation: Callable[[], Any], operation_name: str = "database operation") -> Any:
+def execute_with_retry(
+    operation: Callable[[], Any],
+    operation_name: str = "database operation",
+    deadline_seconds: Optional[float] = None
+) -> Any:
     """
-    Execute a database operation with infinite retry on connection or query failure.
+    Execute a database operation, retrying failures until a per-call deadline.
     
     This wrapper handles:
     - Connection failures (retries connection)
     - Query failures (retries the entire operation)
-    - Automatic connection cleanup on failure
+    - Exponential backoff, never sleeping past the deadline
     
     Args:
         operation: A callable that performs the database operation.
                    Should return a tuple of (success: bool, result: Any)
                    or raise an exception on failure.
         operation_name: Human-readable name for logging purposes.
+        deadline_seconds: Total time budget for all attempts
+                          (defaults to config.DB_CALL_DEADLINE_SECONDS).
     
     Returns:
         The result from the operation.
     
-    Note:
-        This function will retry FOREVER until success. Use with caution
-        for operations that should have a timeout.
+    Raises:
+        DatabaseDeadlineExceeded: If the operation is still failing when the deadline passes.
     """
+    deadline_seconds = config.DB_CALL_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+    deadline = time.monotonic() + deadline_seconds
     retry_count = 0
     delay = RETRY_DELAY_SECONDS
     
@@ -76,197 +185,131 @@ def execute_with_retry(operation: Callable[[], Any], operation_name: str = "data
             return result
         except (mysql.connector.Error, Exception) as err:
             retry_count += 1
-            logger.error(f"[DB_RETRY] {operation_name} attempt #{retry_count} failed: {err}. Retrying in {delay}s...")
-            time.sleep(delay)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _bump(deadline_exceeded=1)
+                logger.error(f"[DB_RETRY] {operation_name} gave up after {retry_count} attempts ({deadline_seconds}s deadline): {err}")
+                raise DatabaseDeadlineExceeded(f"{operation_name} failed after {deadline_seconds}s: {err}") from err
+            _bump(retries=1)
+            sleep_for = min(delay, remaining)
+            logger.error(f"[DB_RETRY] {operation_name} attempt #{retry_count} failed: {err}. Retrying in {sleep_for:.1f}s...")
+            time.sleep(sleep_for)
             # Exponential backoff with cap
             delay = min(delay * 2, MAX_RETRY_DELAY_SECONDS)
 
 
+async def run_in_db_executor(func: Callable[..., Any], *args) -> Any:
+    """
+    Runs a blocking DB callable on the pool-sized executor without retry.
+    """
+    submitted = time.monotonic()
+    _bump(executor_queued=1)
+
+    def _run():
+        queue_wait_ms = (time.monotonic() - submitted) * 1000
+        with _metrics_lock:
+            _metrics["executor_queued"] -= 1
+            _metrics["executor_running"] += 1
+            _metrics["queue_wait_ms_max"] = max(_metrics["queue_wait_ms_max"], queue_wait_ms)
+        try:
+            return func(*args)
+        finally:
+            _bump(executor_running=-1)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), _run)
+
+
+async def run_db(
+    operation: Callable[[], Any],
+    operation_name: str = "database operation",
+    deadline_seconds: Optional[float] = None
+) -> Any:
+    """
+    Async entry point for tools: ``execute_with_retry`` on the DB executor.
+
+    Awaiting this never blocks the event loop, so one slow MySQL round-trip
+    only delays the customer whose turn issued it.
+    """
+    return await run_in_db_executor(execute_with_retry, operation, operation_name, deadline_seconds)
+
+
+def get_pool_metrics() -> Dict[str, Any]:
+    """Snapshot of pool and executor counters for the internal metrics endpoint."""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    snapshot["pool_size"] = config.DB_POOL_SIZE
+    snapshot["pool_created"] = _pool is not None
+    snapshot["acquire_wait_ms_avg"] = round(snapshot["acquire_wait_ms_total"] / snapshot["acquired"], 2) if snapshot["acquired"] else 0.0
+    return snapshot
+
+
 async def check_room_availability(check_in_date: str, check_out_date: str) -> dict:
     """
-    Checks room availability for a given date range with infinite retry.
+    Checks room availability for a given date range.
     
-    This function will retry forever until it successfully retrieves availability.
+    Reads the materialized room-night table (an indexed range scan on night)
+    after syncing it with new/cancelled bookings; see ``room_nights``.
+    Runs on the DB executor with retry until the per-call deadline.
     """
+    from . import room_nights
+    from .availability_matrix import ROOM_TYPE_ORDER, ROOMS_BY_TYPE
+
+    try:
+        check_in = datetime.strptime(check_in_date, "%Y-%m-%d").date()
+        check_out = datetime.strptime(check_out_date, "%Y-%m-%d").date()
+    except ValueError:
+        return {"error": "Invalid date format. Please use YYYY-MM-DD."}
+
     def _execute_availability_check():
         conn = get_db_connection()
         try:
-            cursor = conn.cursor(dictionary=True)
-            
-            # NOTE: Session variables don't work inside CTEs in MySQL
-            # We use string formatting for dates (safe since dates are validated upstream)
-            query = f"""
-                WITH
-                all_rooms AS (
-                    SELECT '1'  AS room_number UNION ALL SELECT '2'  UNION ALL SELECT '3'  UNION ALL SELECT '4'  UNION ALL SELECT '5'  UNION ALL
-                    SELECT '6'  UNION ALL SELECT '7'  UNION ALL SELECT '8'  UNION ALL SELECT '9'  UNION ALL SELECT '10' UNION ALL
-                    SELECT '11' UNION ALL SELECT '12' UNION ALL SELECT '13' UNION ALL SELECT '14' UNION ALL SELECT '15' UNION ALL
-                    SELECT '16' UNION ALL SELECT '17' UNION ALL SELECT '18' UNION ALL SELECT '19' UNION ALL SELECT '20' UNION ALL
-                    SELECT '21' UNION ALL SELECT '22' UNION ALL SELECT '23' UNION ALL SELECT '24' UNION ALL SELECT '25' UNION ALL
-                    SELECT '26' UNION ALL SELECT '27' UNION ALL SELECT '28' UNION ALL SELECT '29' UNION ALL SELECT '30' UNION ALL
-                    SELECT '31' UNION ALL SELECT '32' UNION ALL SELECT '33' UNION ALL SELECT '34' UNION ALL SELECT '35' UNION ALL
-                    SELECT '36' UNION ALL SELECT '37' UNION ALL SELECT '38' UNION ALL SELECT '39' UNION ALL SELECT '40' UNION ALL
-                    SELECT '41' UNION ALL SELECT '42' UNION ALL SELECT '43' UNION ALL SELECT '44' UNION ALL SELECT '45' UNION ALL
-                    SELECT '46' UNION ALL SELECT '47' UNION ALL SELECT '48' UNION ALL SELECT '49' UNION ALL SELECT '50' UNION ALL
-                    SELECT '51' UNION ALL SELECT '52' UNION ALL SELECT '53' UNION ALL SELECT '54' UNION ALL SELECT '55' UNION ALL
-                    SELECT '56' UNION ALL SELECT '57' UNION ALL SELECT '58' UNION ALL SELECT '59' UNION ALL
-                    SELECT '1A' UNION ALL SELECT '2A'  UNION ALL SELECT '3A'  UNION ALL SELECT '4A'  UNION ALL SELECT '5A'  UNION ALL
-                    SELECT '6A' UNION ALL SELECT '7A'  UNION ALL SELECT '8A'  UNION ALL SELECT '9A'  UNION ALL SELECT '10A' UNION ALL
-                    SELECT '11A' UNION ALL SELECT '12A' UNION ALL SELECT '13A' UNION ALL SELECT '14A' UNION ALL
-                    SELECT 'Pasadía'
-                ),
-                booked_rooms_in_range AS (
-                    /* Parse user_books.reserverooms - handles both "1-ROOM1+ROOM2" and "ROOM1+ROOM2" formats */
-                    SELECT DISTINCT
-                        TRIM(
-                            SUBSTRING_INDEX(
-                                SUBSTRING_INDEX(
-                                    REPLACE(
-                                        CASE
-                                            WHEN reserverooms LIKE '%-%' THEN SUBSTRING(reserverooms, LOCATE('-', reserverooms) + 1)
-                                            ELSE reserverooms
-                                        END,
-                                        '+', ','
-                                    ),
-                                    ',', numbers.n
-                                ),
-                                ',', -1
-                            )
-                        ) AS room_number
-                    FROM user_books
-                    CROSS JOIN (
-                        /* Numbers 1-200 using cross join for efficiency (handles large event bookings) */
-                        SELECT a.n + b.n * 10 + 1 as n
-                        FROM (SELECT 0 n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) a
-                        CROSS JOIN (SELECT 0 n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9 UNION ALL SELECT 10 UNION ALL SELECT 11 UNION ALL SELECT 12 UNION ALL SELECT 13 UNION ALL SELECT 14 UNION ALL SELECT 15 UNION ALL SELECT 16 UNION ALL SELECT 17 UNION ALL SELECT 18 UNION ALL SELECT 19) b
-                        WHERE a.n + b.n * 10 + 1 <= 200
-                    ) numbers
-                    WHERE cancel_flag != 'yes'
-                      AND checkIn  IS NOT NULL AND checkIn  != ''
-                      AND checkOut IS NOT NULL AND checkOut != ''
-                      AND STR_TO_DATE(checkIn , '%m/%d/%Y') < STR_TO_DATE('{check_out_date}', '%Y-%m-%d')
-                      AND STR_TO_DATE(checkOut, '%m/%d/%Y') > STR_TO_DATE('{check_in_date}', '%Y-%m-%d')
-                      AND numbers.n <= (
-                          LENGTH(REPLACE(
-                              CASE
-                                  WHEN reserverooms LIKE '%-%' THEN SUBSTRING(reserverooms, LOCATE('-', reserverooms) + 1)
-                                  ELSE reserverooms
-                              END,
-                              '+', ','
-                          )) -
-                          LENGTH(REPLACE(REPLACE(
-                              CASE
-                                  WHEN reserverooms LIKE '%-%' THEN SUBSTRING(reserverooms, LOCATE('-', reserverooms) + 1)
-                                  ELSE reserverooms
-                              END,
-                              '+', ','
-                          ), ',', '')) + 1
-                      )
-
-                    UNION
-
-                    /* Parse member_books.room_number - handles both "1-ROOM1+ROOM2" and "ROOM1+ROOM2" formats */
-                    SELECT DISTINCT
-                        TRIM(
-                            SUBSTRING_INDEX(
-                                SUBSTRING_INDEX(
-                                    REPLACE(
-                                        CASE
-                                            WHEN room_number LIKE '%-%' THEN SUBSTRING(room_number, LOCATE('-', room_number) + 1)
-                                            ELSE room_number
-                                        END,
-                                        '+', ','
-                                    ),
-                                    ',', numbers.n
-                                ),
-                                ',', -1
-                            )
-                        ) AS room_number
-                    FROM member_books
-                    CROSS JOIN (
-                        /* Numbers 1-200 using cross join for efficiency (handles large event bookings) */
-                        SELECT a.n + b.n * 10 + 1 as n
-                        FROM (SELECT 0 n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9) a
-                        CROSS JOIN (SELECT 0 n UNION ALL SELECT 1 UNION ALL SELECT 2 UNION ALL SELECT 3 UNION ALL SELECT 4 UNION ALL SELECT 5 UNION ALL SELECT 6 UNION ALL SELECT 7 UNION ALL SELECT 8 UNION ALL SELECT 9 UNION ALL SELECT 10 UNION ALL SELECT 11 UNION ALL SELECT 12 UNION ALL SELECT 13 UNION ALL SELECT 14 UNION ALL SELECT 15 UNION ALL SELECT 16 UNION ALL SELECT 17 UNION ALL SELECT 18 UNION ALL SELECT 19) b
-                        WHERE a.n + b.n * 10 + 1 <= 200
-                    ) numbers
-                    WHERE cancel_flag != 'yes'
-                      AND checkIn  IS NOT NULL AND checkIn  != ''
-                      AND checkOut IS NOT NULL AND checkOut != ''
-                      AND STR_TO_DATE(checkIn , '%m/%d/%Y') < STR_TO_DATE('{check_out_date}', '%Y-%m-%d')
-                      AND STR_TO_DATE(checkOut, '%m/%d/%Y') > STR_TO_DATE('{check_in_date}', '%Y-%m-%d')
-                      AND numbers.n <= (
-                          LENGTH(REPLACE(
-                              CASE
-                                  WHEN room_number LIKE '%-%' THEN SUBSTRING(room_number, LOCATE('-', room_number) + 1)
-                                  ELSE room_number
-                              END,
-                              '+', ','
-                          )) -
-                          LENGTH(REPLACE(REPLACE(
-                              CASE
-                                  WHEN room_number LIKE '%-%' THEN SUBSTRING(room_number, LOCATE('-', room_number) + 1)
-                                  ELSE room_number
-                              END,
-                              '+', ','
-                          ), ',', '')) + 1
-                      )
-                ),
-                available_rooms_categorized AS (
-                    SELECT
-                        ar.room_number,
-                        CASE
-                            WHEN ar.room_number REGEXP '^[1-9]$|^1[0-6]$'  THEN 'bungalow_familiar'
-                            WHEN ar.room_number REGEXP '^(1[8-9]|[2-5][0-9])$' THEN 'bungalow_junior'
-                            WHEN ar.room_number REGEXP '^[1-9]A$|^1[0-4]A$'   THEN 'habitacion'
-                            ELSE 'other'
-                        END AS bungalow_type
-                    FROM all_rooms ar
-                    WHERE ar.room_number NOT IN (SELECT room_number FROM booked_rooms_in_range)
-                      AND ar.room_number <> 'Pasadía'
-                )
-                SELECT
-                    bt.bungalow_type,
-                    CASE
-                        WHEN COUNT(arc.room_number) > 0 THEN 1
-                        ELSE 0
-                    END AS bungalow_availability
-                FROM (
-                    SELECT 'bungalow_familiar' AS bungalow_type
-                    UNION ALL
-                    SELECT 'bungalow_junior'
-                    UNION ALL
-                    SELECT 'habitacion'
-                ) bt
-                LEFT JOIN available_rooms_categorized arc
-                       ON bt.bungalow_type = arc.bungalow_type
-                GROUP BY bt.bungalow_type
-                ORDER BY
-                    CASE
-                        WHEN bt.bungalow_type = 'bungalow_familiar' THEN 1
-                        WHEN bt.bungalow_type = 'bungalow_junior'   THEN 2
-                        WHEN bt.bungalow_type = 'habitacion'        THEN 3
-                    END;
-            """
-            
-            results = {}
-            for result in cursor.execute(query, multi=True):
-                if result.with_rows:
-                    rows = result.fetchall()
-                    for row in rows:
-                        results[row['bungalow_type']] = 'Available' if row['bungalow_availability'] == 1 else 'Not Available'
+            room_nights.sync(conn)
+            booked = room_nights.booked_rooms(conn, check_in, check_out)
 
+            results = {
+                room_type: "Available" if any(room not in booked for room in ROOMS_BY_TYPE[room_type]) else "Not Available"
+                for room_type in ROOM_TYPE_ORDER
+            }
             logger.info(f"Availability for {check_in_date} to {check_out_date}: {results}")
-            return results if results else {"error": "Could not retrieve availability."}
+            return results
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn)
     
-    return execute_with_retry(_execute_availability_check, f"check_room_availability({check_in_date}, {check_out_date})")
+    return await run_db(_execute_availability_check, f"check_room_availability({check_in_date}, {check_out_date})")
+
+
+async def get_occupancy_matrix(check_in_date: str, check_out_date: str) -> dict:
+    """
+    Fetches a per-night, per-room occupancy bitset for the whole window in ONE query.
+
+    The query is a range scan of the materialized room-night table (see ``room_nights``).
+
+    Returns:
+        {"window_start": date, "nights": int, "matrix": {room_number: occupied_bitmask}}
+        or {"error": str}
+    """
+    from . import room_nights
+    from .availability_matrix import matrix_from_room_nights
+
+    window_start = datetime.strptime(check_in_date, "%Y-%m-%d").date()
+    window_end = datetime.strptime(check_out_date, "%Y-%m-%d").date()
+    nights = (window_end - window_start).days
+    if nights <= 0:
+        return {"error": "check_out_date must be after check_in_date"}
+
+    def _execute_matrix_query():
+        conn = get_db_connection()
+        try:
+            room_nights.sync(conn)
+            rows = room_nights.occupied_room_nights(conn, window_start, window_end)
+            matrix = matrix_from_room_nights(rows, window_start)
+            logger.info(f"[OCCUPANCY_MATRIX] {check_in_date} to {check_out_date}: {len(rows)} occupied room-nights, {len(matrix)} occupied rooms")
+            return {"window_start": window_start, "nights": nights, "matrix": matrix}
+        finally:
+            release_db_connection(conn)
+
+    return await run_db(_execute_matrix_query, f"get_occupancy_matrix({check_in_date}, {check_out_date})")
 
 
 async def check_room_availability_counts(check_in_date: str, check_out_date: str) -> dict:
@@ -277,124 +320,92 @@ async def check_room_availability_counts(check_in_date: str, check_out_date: str
     Use this for multi-room bookings where knowing exact counts is critical.
     Returns: {'bungalow_familiar': X, 'bungalow_junior': Y, 'habitacion': Z, 'total': T}
     """
-    import httpx
+    from . import room_availability
     
     try:
-        url = "https://booking.lashojasresort.club/api/getRooms"
-        params = {
-            "checkIn": check_in_date,
-            "checkOut": check_out_date
+        # Shared with booking_tool's availability checks (coalesced, cached for a few seconds)
+        data = await room_availability.get_rooms(check_in_date, check_out_date)
+        
+        if "info" not in data:
+            return {"error": "Invalid response format from room availability API"}
+        
+        available_rooms = data["info"]  # {"index": "room_number", ...}
+        
+        # Parse room numbers from API response
+        room_numbers = []
+        for room_index, room_number in available_rooms.items():
+            if room_number == "Pasadía":
+                continue  # Skip Pasadía for counting
+            elif room_number.endswith('A'):
+                room_numbers.append(room_number)  # Keep as string like "10A"
+            else:
+                try:
+                    room_numbers.append(int(room_number))
+                except ValueError:
+                    continue
+        
+        # Count by type using same logic as booking_tool.py _select_room
+        # Familiar: rooms 1-17
+        familiar_count = len([r for r in room_numbers if isinstance(r, int) and 1 <= r <= 17])
+        
+        # Junior: rooms 18-59 (excluding matrimonial rooms 22, 42, 47, 48, 53)
+        matrimonial_rooms = {22, 42, 47, 48, 53}
+        junior_count = len([r for r in room_numbers if isinstance(r, int) and 18 <= r <= 59 and r not in matrimonial_rooms])
+        
+        # Habitación: rooms with 'A' suffix (1A-14A)
+        habitacion_count = 0
+        for room_name in room_numbers:
+            if isinstance(room_name, str) and room_name.endswith('A'):
+                try:
+                    num = int(room_name[:-1])
+                    if 1 <= num <= 14:
+                        habitacion_count += 1
+                except ValueError:
+                    continue
+        
+        results = {
+            'bungalow_familiar': familiar_count,
+            'bungalow_junior': junior_count,
+            'habitacion': habitacion_count,
+            'total': familiar_count + junior_count + habitacion_count
         }
         
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params, timeout=300.0)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            if "info" not in data:
-                return {"error": "Invalid response format from room availability API"}
-            
-            available_rooms = data["info"]  # {"index": "room_number", ...}
-            
-            # Parse room numbers from API response
-            room_numbers = []
-            for room_index, room_number in available_rooms.items():
-                if room_number == "Pasadía":
-                    continue  # Skip Pasadía for counting
-                elif room_number.endswith('A'):
-                    room_numbers.append(room_number)  # Keep as string like "10A"
-                else:
-                    try:
-                        room_numbers.append(int(room_number))
-                    except ValueError:
-                        continue
-            
-            # Count by type using same logic as booking_tool.py _select_room
-            # Familiar: rooms 1-17
-            familiar_count = len([r for r in room_numbers if isinstance(r, int) and 1 <= r <= 17])
-            
-            # Junior: rooms 18-59 (excluding matrimonial rooms 22, 42, 47, 48, 53)
-            matrimonial_rooms = {22, 42, 47, 48, 53}
-            junior_count = len([r for r in room_numbers if isinstance(r, int) and 18 <= r <= 59 and r not in matrimonial_rooms])
-            
-            # Habitación: rooms with 'A' suffix (1A-14A)
-            habitacion_count = 0
-            for room_name in room_numbers:
-                if isinstance(room_name, str) and room_name.endswith('A'):
-                    try:
-                        num = int(room_name[:-1])
-                        if 1 <= num <= 14:
-                            habitacion_count += 1
-                    except ValueError:
-                        continue
-            
-            results = {
-                'bungalow_familiar': familiar_count,
-                'bungalow_junior': junior_count,
-                'habitacion': habitacion_count,
-                'total': familiar_count + junior_count + habitacion_count
-            }
-            
-            logger.info(f"Availability COUNTS for {check_in_date} to {check_out_date}: {results}")
-            return results
-            
+        logger.info(f"Availability COUNTS for {check_in_date} to {check_out_date}: {results}")
+        return results
+        
     except Exception as e:
         logger.error(f"Room availability count check failed: {e}")
         return {"error": f"Room availability count check failed: {e}"}
 
 
-from datetime import datetime
-
-
-def get_price_for_date(date_str: str) -> dict:
+async def get_price_for_date(date_str: str) -> dict:
     """
-    Fetches the price for different packages from the database for a given date.
+    Fetches the price for different packages for a given date.
     
-    Uses infinite retry for database connection and query execution.
+    Served from the in-process rate calendar (see rate_calendar), which
+    loads tarifarios in bulk instead of full-scanning it per night.
     Note: ValueError for invalid date format is NOT retried (user input error).
     """
-    # Validate input format BEFORE retry loop (user input error, not transient)
+    from .rate_calendar import get_prices_for_range
+
+    # Validate input format BEFORE touching the cache (user input error, not transient)
     try:
-        datetime.strptime(date_str, '%Y-%m-%d')
+        night = datetime.strptime(date_str, '%Y-%m-%d')
     except ValueError:
         logger.error(f"Invalid date format provided: {date_str}. Expected YYYY-MM-DD.")
         return {"error": "Invalid date format. Please use YYYY-MM-DD."}
     
-    def _execute_price_query():
-        conn = get_db_connection()
-        try:
-            cursor = conn.cursor(dictionary=True)
-            query = """
-                SELECT lh_adulto, lh_nino, pa_adulto, pa_nino, es_adulto, es_nino
-                FROM tarifarios
-                WHERE STR_TO_DATE(date, '%m/%d/%Y') = %s
-            """
-            params = (date_str,)
-            logger.info(f"Executing query: {query.strip()} with params: {params}")
-
-            cursor.execute(query, params)
-            result = cursor.fetchone()
-            logger.info(f"Raw query result for {date_str}: {result}")
-
-            if result:
-                logger.info(f"Prices for {date_str}: {result}")
-                return result
-            else:
-                logger.warning(f"No prices found for date: {date_str}")
-                return {"error": f"No prices found for {date_str}."}
-        finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+    next_day = (night + timedelta(days=1)).strftime('%Y-%m-%d')
+    result = await get_prices_for_range(date_str, next_day)
+    if not result["success"]:
+        return {"error": result["error"]}
     
-    return execute_with_retry(_execute_price_query, f"get_price_for_date({date_str})")
+    prices = result["prices"][0][1]
+    logger.info(f"Prices for {date_str}: {prices}")
+    return prices
 
 
-def lookup_booking(reservation_code: str) -> dict:
+async def lookup_booking(reservation_code: str) -> dict:
     """
     Looks up a booking in user_books by reservation code.
 
@@ -423,6 +434,7 @@ def lookup_booking(reservation_code: str) -> dict:
 
     def _execute_lookup():
         conn = get_db_connection()
+        cursor = None
         try:
             cursor = conn.cursor(dictionary=True)
             query = """
@@ -473,11 +485,6 @@ def lookup_booking(reservation_code: str) -> dict:
                         f"check-in={booking['fecha_entrada']}, cancelled={booking['cancelada']}")
             return booking
         finally:
-            if conn and conn.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                conn.close()
+            release_db_connection(conn, cursor)
 
-    return execute_with_retry(_execute_lookup, f"lookup_booking({code})")
+    return await run_db(_execute_lookup, f"lookup_booking({code})")
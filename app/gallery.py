@@ -0,0 +1,229 @@
+"""
+Photo galleries (bungalows, public areas) prepared for messaging.
+
+send_bungalow_pictures / send_public_areas_pictures used to re-list the
+picture directories on every request and upload the full-size originals one
+by one. This module keeps:
+
+- An in-memory index per gallery: sorted photos with their captions already
+  generated. A directory is only re-listed when its mtime changes.
+- Messaging variants: each original is resized to GALLERY_MAX_DIMENSION and
+  recompressed as JPEG, cached under ``resources/pictures/_variants`` by
+  content hash. Variants sit under /pictures, so ManyChat can fetch them by
+  URL. If a variant would not be smaller than the original, the original is
+  used. Variants for photos that left the galleries are deleted by
+  ``prepare_all()``.
+- ``deliver()``: variants are prepared concurrently (at most
+  GALLERY_PREPARE_CONCURRENCY at a time). Photos are still sent strictly in
+  gallery order, each as soon as it and every photo before it are ready.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+PICTURES_DIR = Path(__file__).resolve().parent / "resources" / "pictures"
+VARIANTS_DIR = PICTURES_DIR / "_variants"
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".webp")
+
+# Gallery name (as the assistant passes it) -> picture directory
+GALLERIES = {
+    "Bungalow Familiar": "bungalow_familiar",
+    "Bungalow Junior": "bungalow_junior",
+    "Habitacion": "habitacion",
+    "Áreas Públicas": "public_areas",
+}
+
+
+def generate_caption_from_filename(filename: str, bungalow_type: str) -> str:
+    """Generates a user-friendly Spanish caption from a filename."""
+    name_part = os.path.splitext(filename)[0]
+
+    bungalow_map = {
+        "Bungalow Familiar": "bungalow_familiar",
+        "Bungalow Junior": "bungalow_junior",
+        "Habitacion": "habitacion"
+    }
+    prefix_to_remove = bungalow_map.get(bungalow_type, "").lower().replace(" ", "_") + "_"
+    if name_part.startswith(prefix_to_remove):
+        name_part = name_part[len(prefix_to_remove):]
+
+    name_part = name_part.replace('_', ' ').replace('-', ' ')
+
+    translations = {
+        "livingroom": "Sala de Estar",
+        "masterbedroom": "Habitación Principal",
+        "outside": "Vista Exterior",
+        "terrace": "Terraza",
+        "cuarto": "Habitación",
+        "room": "Habitación",
+        "bathroom": "Baño"
+    }
+
+    parts = re.findall(r'[a-zA-Z]+|\d+', name_part)
+
+    description_parts = []
+    for part in parts:
+        if part.lower() in translations:
+            description_parts.append(translations[part.lower()])
+        else:
+            description_parts.append(part.capitalize())
+
+    description = " ".join(description_parts)
+
+    return f"{description} - {bungalow_type}"
+
+
+@dataclass(frozen=True)
+class GalleryPhoto:
+    path: str
+    caption: str
+
+
+_index: Dict[str, Tuple[float, List[GalleryPhoto]]] = {}
+# original path -> ((mtime, size), path to send, cached variant file)
+_variants: Dict[str, Tuple[Tuple[float, int], str, str]] = {}
+_lock = threading.Lock()
+_stats = {"photos_sent": 0, "bytes_original": 0, "bytes_sent": 0, "variants_built": 0}
+
+
+def get_gallery(name: str) -> Optional[List[GalleryPhoto]]:
+    """
+    Photos of a gallery in send order, or None if the gallery/directory doesn't exist.
+    """
+    dir_name = GALLERIES.get(name)
+    if not dir_name:
+        return None
+    picture_dir = PICTURES_DIR / dir_name
+    try:
+        mtime = picture_dir.stat().st_mtime
+    except OSError:
+        return None
+
+    cached = _index.get(name)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    photos = [
+        GalleryPhoto(str(picture_dir / f), generate_caption_from_filename(f, name))
+        for f in sorted(os.listdir(picture_dir))
+        if os.path.isfile(picture_dir / f)
+    ]
+    _index[name] = (mtime, photos)
+    logger.info(f"[GALLERY] Indexed {len(photos)} photos for {name}")
+    return photos
+
+
+def _build_variant(original: str, variant_path: Path) -> None:
+    from PIL import Image, ImageOps
+
+    with Image.open(original) as img:
+        img = ImageOps.exif_transpose(img)
+        if img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        img.thumbnail((config.GALLERY_MAX_DIMENSION, config.GALLERY_MAX_DIMENSION))
+        VARIANTS_DIR.mkdir(parents=True, exist_ok=True)
+        tmp_path = VARIANTS_DIR / f".{variant_path.name}.{os.getpid()}.tmp"
+        img.save(tmp_path, "JPEG", quality=config.GALLERY_JPEG_QUALITY, optimize=True, progressive=True)
+    os.replace(tmp_path, variant_path)
+    _stats["variants_built"] += 1
+
+
+def get_variant(original: str) -> str:
+    """Path of the messaging variant of ``original`` (built on first use), or the original itself."""
+    if not original.lower().endswith(IMAGE_EXTENSIONS):
+        return original
+    stat = os.stat(original)
+    signature = (stat.st_mtime, stat.st_size)
+    cached = _variants.get(original)
+    if cached is not None and cached[0] == signature and os.path.exists(cached[1]):
+        return cached[1]
+
+    with open(original, "rb") as f:
+        digest = hashlib.sha256(f.read()).hexdigest()[:16]
+    variant_path = VARIANTS_DIR / f"{digest}_{config.GALLERY_MAX_DIMENSION}q{config.GALLERY_JPEG_QUALITY}.jpg"
+    try:
+        if not variant_path.exists():
+            _build_variant(original, variant_path)
+        chosen = str(variant_path) if variant_path.stat().st_size < stat.st_size else original
+    except Exception as e:
+        logger.warning(f"[GALLERY] Could not build variant for {original}, sending original: {e}")
+        chosen = original
+    with _lock:
+        _variants[original] = (signature, chosen, str(variant_path))
+    return chosen
+
+
+def prepare_all() -> None:
+    """Index every gallery, build missing variants and delete unused ones (startup hook)."""
+    photos = [photo for name in GALLERIES for photo in get_gallery(name) or []]
+    for photo in photos:
+        get_variant(photo.path)
+    in_use = {_variants[photo.path][2] for photo in photos if photo.path in _variants}
+    removed = 0
+    if VARIANTS_DIR.exists():
+        for path in VARIANTS_DIR.iterdir():
+            if path.is_file() and str(path) not in in_use and not path.name.startswith("."):
+                path.unlink()
+                removed += 1
+    logger.info(f"[GALLERY] {len(photos)} photos ready, removed {removed} stale variants")
+
+
+async def deliver(
+    photos: List[GalleryPhoto],
+    send: Callable[[List[Tuple[str, str]]], Awaitable[None]],
+    batch_size: int = 1,
+    interval: float = 0.0,
+) -> int:
+    """
+    Prepare variants concurrently and hand them to ``send`` in gallery order.
+
+    Args:
+        photos: Photos in the order the customer must receive them.
+        send: Coroutine sending a batch of (file_path, caption) in order; raises on failure.
+        batch_size: Photos per ``send`` call (ManyChat takes several per request).
+        interval: Seconds to wait between ``send`` calls.
+
+    Returns:
+        Number of photos sent.
+    """
+    loop = asyncio.get_running_loop()
+    limit = asyncio.Semaphore(config.GALLERY_PREPARE_CONCURRENCY)
+
+    async def prepare(photo: GalleryPhoto) -> str:
+        async with limit:
+            return await loop.run_in_executor(None, get_variant, photo.path)
+
+    prepared = [asyncio.ensure_future(prepare(photo)) for photo in photos]
+    sent = 0
+    try:
+        for start in range(0, len(photos), batch_size):
+            batch = []
+            for photo, task in zip(photos[start:start + batch_size], prepared[start:start + batch_size]):
+                path = await task
+                batch.append((path, photo.caption))
+                _stats["bytes_original"] += os.path.getsize(photo.path)
+                _stats["bytes_sent"] += os.path.getsize(path)
+            if sent and interval:
+                await asyncio.sleep(interval)
+            await send(batch)
+            sent += len(batch)
+            _stats["photos_sent"] += len(batch)
+    finally:
+        for task in prepared:
+            task.cancel()
+    return sent
+
+
+def get_metrics() -> dict:
+    return {**_stats, "galleries_indexed": len(_index), "variants_cached": len(_variants)}
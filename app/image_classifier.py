@@ -10,13 +10,13 @@ Uses gpt-5-mini model with Flex tier for cost optimization (upgraded from gpt-4o
 import os
 import json
 import logging
-import base64
 import asyncio
-import httpx
 from typing import Dict, Any, List, Optional
 from openai import AsyncOpenAI
 
 from .flex_tier_handler import call_with_flex_fallback
+from .clients import http_pool
+from . import vision_preprocess, vision_result_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -46,7 +46,8 @@ async def classify_image_with_context(
     conversation_context: str,
     wa_id: str,
     caption: str = None,
-    reply_context_id: str = None
+    reply_context_id: str = None,
+    cache_scope: str = None
 ) -> Dict[str, Any]:
     """
     Classifies an uploaded image using both image content and conversation context.
@@ -55,6 +56,8 @@ async def classify_image_with_context(
         image_path: Path to the image file to classify
         conversation_context: Recent conversation messages for context
         wa_id: WhatsApp ID for logging purposes
+        cache_scope: Customer key for reusing the classification of an image they already sent (no caching if None);
+            only confident payment_proof verdicts are reused, and only under the same conversation context
     
     Returns:
         dict: {
@@ -70,11 +73,15 @@ async def classify_image_with_context(
     try:
         logger.info(f"[IMAGE_CLASSIFIER] Starting contextual image classification for waId: {wa_id}")
         
-        # Step 1: Load and encode the image
+        # Step 1: Load, downscale and encode the image
         try:
-            with open(image_path, 'rb') as img_file:
-                img_content = img_file.read()
-            img_base64 = base64.b64encode(img_content).decode('utf-8')
+            fingerprint = await vision_result_cache.fingerprint(image_path)
+            cache_context = conversation_context or ""
+            cached = await asyncio.to_thread(
+                vision_result_cache.lookup, cache_scope, "classification", fingerprint, context=cache_context
+            )
+            if cached is None:
+                img_data_url = await vision_preprocess.to_data_url(image_path, "classify")
         except Exception as e:
             logger.exception(f"[IMAGE_CLASSIFIER] Error loading image: {str(e)}")
             return {
@@ -87,6 +94,10 @@ async def classify_image_with_context(
                 "error": f"Image loading error: {str(e)}"
             }
         
+        # Same image already classified for this customer: skip the model call
+        if cached is not None:
+            return await _classification_result(cached, image_path, wa_id, caption, reply_context_id)
+
         # Step 2: Prepare the classification prompt
         classification_prompt = f"""
         You are an intelligent image classifier for a hotel booking system. Your task is to classify uploaded images based on both the image content and the conversation context.
@@ -134,7 +145,7 @@ async def classify_image_with_context(
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{img_base64}"
+                            "url": img_data_url
                         }
                     }
                 ]
@@ -198,53 +209,11 @@ async def classify_image_with_context(
                 }
             
             parsed_result = json.loads(result_text)
-            
-            # Validate and set defaults
-            classification = parsed_result.get("classification", "unknown")
-            confidence = float(parsed_result.get("confidence", 0.0))
-            reasoning = parsed_result.get("reasoning", "No reasoning provided")
-            should_analyze_as_payment = parsed_result.get("should_analyze_as_payment", False)
-            suggested_response = parsed_result.get("suggested_response", "Process as general image")
-            
-            # Ensure confidence is within valid range
-            confidence = max(0.0, min(1.0, confidence))
-            
-            # Conservative payment proof detection - require high confidence
-            if classification == "payment_proof" and confidence < 0.8:
-                logger.info(f"[IMAGE_CLASSIFIER] Downgrading payment_proof classification due to low confidence: {confidence}")
-                classification = "general_inquiry"
-                should_analyze_as_payment = False
-                reasoning += " (Downgraded due to insufficient confidence for payment proof)"
-            
-            logger.info(f"[IMAGE_CLASSIFIER] Classification result: {classification} (confidence: {confidence:.2f})")
-            
-            # If it's a general inquiry, handle it directly with Responses API
-            if classification == "general_inquiry":
-                direct_response = await handle_general_inquiry_image(
-                    image_path, wa_id, reasoning, parsed_result.get("visual_indicators", []), caption, reply_context_id
+            if _reusable_classification(parsed_result):
+                await asyncio.to_thread(
+                    vision_result_cache.store, cache_scope, "classification", fingerprint, parsed_result, context=cache_context
                 )
-                return {
-                    "success": True,
-                    "classification": classification,
-                    "confidence": confidence,
-                    "reasoning": reasoning,
-                    "should_analyze_as_payment": False,
-                    "direct_response": direct_response,
-                    "visual_indicators": parsed_result.get("visual_indicators", []),
-                    "context_indicators": parsed_result.get("context_indicators", []),
-                    "error": ""
-                }
-            
-            return {
-                "success": True,
-                "classification": classification,
-                "confidence": confidence,
-                "reasoning": reasoning,
-                "should_analyze_as_payment": should_analyze_as_payment,
-                "visual_indicators": parsed_result.get("visual_indicators", []),
-                "context_indicators": parsed_result.get("context_indicators", []),
-                "error": ""
-            }
+            return await _classification_result(parsed_result, image_path, wa_id, caption, reply_context_id)
             
         except json.JSONDecodeError as e:
             logger.exception(f"[IMAGE_CLASSIFIER] Error parsing OpenAI response: {str(e)}")
@@ -270,6 +239,72 @@ async def classify_image_with_context(
             "error": f"Classification error: {str(e)}"
         }
 
+
+def _reusable_classification(parsed_result: Dict[str, Any]) -> bool:
+    """Only confident payment proofs are cached: a reused general_inquiry could let a real receipt skip analysis."""
+    try:
+        confidence = float(parsed_result.get("confidence", 0.0))
+    except (TypeError, ValueError):
+        return False
+    return parsed_result.get("classification") == "payment_proof" and confidence >= 0.8
+
+
+async def _classification_result(
+    parsed_result: Dict[str, Any],
+    image_path: str,
+    wa_id: str,
+    caption: str = None,
+    reply_context_id: str = None
+) -> Dict[str, Any]:
+    """Applies the confidence rules to the model's (or cached) classification and handles general inquiries."""
+    # Validate and set defaults
+    classification = parsed_result.get("classification", "unknown")
+    confidence = float(parsed_result.get("confidence", 0.0))
+    reasoning = parsed_result.get("reasoning", "No reasoning provided")
+    should_analyze_as_payment = parsed_result.get("should_analyze_as_payment", False)
+    suggested_response = parsed_result.get("suggested_response", "Process as general image")
+    
+    # Ensure confidence is within valid range
+    confidence = max(0.0, min(1.0, confidence))
+    
+    # Conservative payment proof detection - require high confidence
+    if classification == "payment_proof" and confidence < 0.8:
+        logger.info(f"[IMAGE_CLASSIFIER] Downgrading payment_proof classification due to low confidence: {confidence}")
+        classification = "general_inquiry"
+        should_analyze_as_payment = False
+        reasoning += " (Downgraded due to insufficient confidence for payment proof)"
+    
+    logger.info(f"[IMAGE_CLASSIFIER] Classification result: {classification} (confidence: {confidence:.2f})")
+    
+    # If it's a general inquiry, handle it directly with Responses API
+    if classification == "general_inquiry":
+        direct_response = await handle_general_inquiry_image(
+            image_path, wa_id, reasoning, parsed_result.get("visual_indicators", []), caption, reply_context_id
+        )
+        return {
+            "success": True,
+            "classification": classification,
+            "confidence": confidence,
+            "reasoning": reasoning,
+            "should_analyze_as_payment": False,
+            "direct_response": direct_response,
+            "visual_indicators": parsed_result.get("visual_indicators", []),
+            "context_indicators": parsed_result.get("context_indicators", []),
+            "error": ""
+        }
+    
+    return {
+        "success": True,
+        "classification": classification,
+        "confidence": confidence,
+        "reasoning": reasoning,
+        "should_analyze_as_payment": should_analyze_as_payment,
+        "visual_indicators": parsed_result.get("visual_indicators", []),
+        "context_indicators": parsed_result.get("context_indicators", []),
+        "error": ""
+    }
+
+
 async def handle_general_inquiry_image(image_path: str, wa_id: str, classification_reasoning: str, visual_indicators: List[str], caption: str = None, reply_context_id: str = None) -> Dict[str, Any]:
     """
     Handles general inquiry images by sending them directly to GPT-5 via Responses API
@@ -290,9 +325,10 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
         from . import thread_store
         from . import openai_agent
         
-        # Get conversation context
-        conversation_id = thread_store.get_conversation_id(wa_id)
-        previous_response_id = thread_store.get_last_response_id(wa_id)
+        # Get conversation context (one row fetch)
+        thread_info = thread_store.get_thread_id(wa_id) or {}
+        conversation_id = thread_info.get("conversation_id") or None
+        previous_response_id = thread_info.get("last_response_id") or None
         
         # Load system instructions (same as main agent)
         system_instructions = openai_agent.build_classification_system_prompt()
@@ -302,9 +338,9 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
         if not conversation_id:
             logger.info(f"[IMAGE_CLASSIFIER] No conversation ID found for wa_id: {wa_id}, creating new conversation")
             from . import config
-            async with httpx.AsyncClient() as http_client:
+            async with http_pool.client_for(openai_agent.OPENAI_CONVERSATIONS_URL) as http_client:
                 response = await http_client.post(
-                    "https://api.openai.com/v1/conversations",
+                    openai_agent.OPENAI_CONVERSATIONS_URL,
                     headers={
                         "Authorization": f"Bearer {config.OPENAI_API_KEY}",
                         "Content-Type": "application/json",
@@ -321,11 +357,9 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
             logger.info(f"[IMAGE_CLASSIFIER] Created new conversation {conversation_id} for wa_id: {wa_id}")
             previous_response_id = None  # Fresh conversation has no previous response
         
-        # Load and encode the image
+        # Load, downscale and encode the image
         try:
-            with open(image_path, 'rb') as img_file:
-                img_content = img_file.read()
-            img_base64 = base64.b64encode(img_content).decode('utf-8')
+            img_data_url = await vision_preprocess.to_data_url(image_path, "inquiry")
         except Exception as e:
             logger.exception(f"[IMAGE_CLASSIFIER] Error loading image for general inquiry: {str(e)}")
             return {
@@ -360,7 +394,7 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
             "content": [
                 {
                     "type": "input_image",
-                    "image_url": f"data:image/jpeg;base64,{img_base64}",
+                    "image_url": img_data_url,
                     "detail": "auto"
                 },
                 {
@@ -422,11 +456,11 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
                     logger.warning(f"[IMAGE_CLASSIFIER] Recoverable error (attempt {recovery_attempts}): {e}")
                     logger.info(f"[IMAGE_CLASSIFIER] Creating fresh conversation for recovery")
                     
-                    # Create fresh conversation (httpx already imported at module level)
+                    # Create fresh conversation
                     from . import config
-                    async with httpx.AsyncClient() as http_client:
+                    async with http_pool.client_for(openai_agent.OPENAI_CONVERSATIONS_URL) as http_client:
                         response_data = await http_client.post(
-                            "https://api.openai.com/v1/conversations",
+                            openai_agent.OPENAI_CONVERSATIONS_URL,
                             headers={
                                 "Authorization": f"Bearer {config.OPENAI_API_KEY}",
                                 "Content-Type": "application/json",
@@ -444,7 +478,7 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
                     
                     # INJECT AGENT CONTEXT first for fresh conversation (same as openai_agent.py)
                     from agent_context_injector import get_agent_context_for_system_injection
-                    agent_context_system_msg = get_agent_context_for_system_injection(wa_id)
+                    agent_context_system_msg = await asyncio.to_thread(get_agent_context_for_system_injection, wa_id)
                     if agent_context_system_msg:
                         logger.info(f"[IMAGE_CLASSIFIER] Injecting agent context for fresh recovery conversation {conversation_id}")
                         agent_response = await _responses_flex(
@@ -505,7 +539,7 @@ async def handle_general_inquiry_image(image_path: str, wa_id: str, classificati
                         if inspect.iscoroutinefunction(func):
                             result = await func(**args)
                         else:
-                            result = func(**args)
+                            result = await asyncio.to_thread(func, **args)
                         output_str = openai_agent._coerce_output_str(result)
                     else:
                         output_str = f"Error: Unknown tool {fn_name}"
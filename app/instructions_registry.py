@@ -0,0 +1,128 @@
+"""
+Parsed-once registry for system_instructions_new.txt.
+
+The instructions file is ~250 KB of JSON and used to be re-read and
+json.loads()'d on every turn (classification prompt, load_additional_modules,
+occupancy/pricing rules, RAG core prompt). The registry parses it once and keeps
+an immutable snapshot in memory. Everything derived from it (serialized modules,
+prebuilt prompts) is memoized on that snapshot.
+
+Hot reload: the file's mtime/size is checked at most every
+INSTRUCTIONS_RELOAD_CHECK_SECONDS. A changed file is parsed completely before
+the new snapshot replaces the old one. If the parse fails (e.g. the file is
+caught mid-write), the old snapshot keeps serving and the next check retries.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+INSTRUCTIONS_PATH = os.path.join(os.path.dirname(__file__), "resources", "system_instructions_new.txt")
+
+
+class InstructionsSnapshot:
+    """One parsed version of the instructions file plus everything derived from it."""
+
+    def __init__(self, data: Dict[str, Any], mtime: float, size: int):
+        self.data = data
+        self.mtime = mtime
+        self.size = size
+        self._derived: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def derived(self, key: str, builder: Callable[[Dict[str, Any]], Any]) -> Any:
+        """Build ``builder(data)`` once for this snapshot and reuse it."""
+        try:
+            return self._derived[key]
+        except KeyError:
+            pass
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = builder(self.data)
+            return self._derived[key]
+
+
+_snapshot: Optional[InstructionsSnapshot] = None
+_last_check = 0.0
+_reload_lock = threading.Lock()
+
+
+def _load(path: str) -> InstructionsSnapshot:
+    stat = os.stat(path)
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.loads(f.read())
+    return InstructionsSnapshot(data, stat.st_mtime, stat.st_size)
+
+
+def get_snapshot() -> InstructionsSnapshot:
+    """Current instructions snapshot, reloading if the file changed on disk."""
+    global _snapshot, _last_check
+
+    now = time.monotonic()
+    if _snapshot is not None and now - _last_check < config.INSTRUCTIONS_RELOAD_CHECK_SECONDS:
+        return _snapshot
+
+    with _reload_lock:
+        if _snapshot is not None and now - _last_check < config.INSTRUCTIONS_RELOAD_CHECK_SECONDS:
+            return _snapshot
+        _last_check = now
+
+        if _snapshot is None:
+            _snapshot = _load(INSTRUCTIONS_PATH)
+            logger.info(f"[INSTRUCTIONS] Loaded {len(_snapshot.data)} top-level modules ({_snapshot.size:,} bytes)")
+            return _snapshot
+
+        try:
+            stat = os.stat(INSTRUCTIONS_PATH)
+            if stat.st_mtime == _snapshot.mtime and stat.st_size == _snapshot.size:
+                return _snapshot
+            _snapshot = _load(INSTRUCTIONS_PATH)
+            logger.info(f"[INSTRUCTIONS] Hot-reloaded instructions ({_snapshot.size:,} bytes)")
+        except (OSError, ValueError) as e:
+            logger.error(f"[INSTRUCTIONS] Reload failed, keeping previous version: {e}")
+        return _snapshot
+
+
+def get_instructions() -> Dict[str, Any]:
+    """Parsed instructions dict. Shared across callers: treat it as read-only."""
+    return get_snapshot().data
+
+
+def derived(key: str, builder: Callable[[Dict[str, Any]], Any]) -> Any:
+    """Memoize ``builder(instructions)`` until the file changes."""
+    return get_snapshot().derived(key, builder)
+
+
+def get_module_json(module_ref: str) -> Optional[str]:
+    """
+    Pre-serialized module content in load_additional_modules' format.
+
+    Args:
+        module_ref: "MODULE_NAME" for a full module, or
+                    "MODULE_NAME.protocol[.sub]" for a micro-load.
+
+    Returns:
+        JSON string (indent=2), or None if the module/path doesn't exist.
+    """
+    def build(data: Dict[str, Any]) -> Optional[str]:
+        parts = module_ref.split(".")
+        if parts[0] not in data:
+            return None
+        if len(parts) == 1:
+            return json.dumps(data[module_ref], ensure_ascii=False, indent=2)
+        content = data[parts[0]]
+        for key in parts[1:]:
+            if isinstance(content, dict) and key in content:
+                content = content[key]
+            else:
+                return None
+        return json.dumps({parts[-1]: content}, ensure_ascii=False, indent=2)
+
+    return derived(f"module_json:{module_ref}", build)
@@ -5,13 +5,24 @@ from fastapi.staticfiles import StaticFiles
 import asyncio
 import logging
 
-from . import config, openai_agent, wati_client
+from . import config, openai_agent, wati_client, database_client
 from . import compraclick_tool, bank_transfer_tool
 from . import thread_store
 from . import message_buffer
+from . import sqlite_store
 from . import whisper_client
 from . import image_classifier, payment_proof_analyzer as payment_proof_tool
 from . import security
+from . import instructions_registry
+from . import menu_render_cache
+from . import gallery
+from . import vision_preprocess, vision_result_cache
+from . import office_status_tool
+from . import room_availability, room_nights
+from . import pending_bookings
+from .batch_scheduler import batch_scheduler
+from .retry_scheduler import retry_scheduler
+from .clients import http_pool, browser_pool
 from app.adapters.channel_detector import detect_channel
 from app.adapters.manychat_fb_adapter import ManyChatFBAdapter
 from app.adapters.manychat_ig_adapter import ManyChatIGAdapter
@@ -45,10 +56,9 @@ pending_messages_lock = threading.Lock()
 processed_message_cache = {}
 processed_message_cache_lock = threading.Lock()
 
-# Active safety net threads tracking to prevent thread explosion
-# Structure: {message_key: thread_object}
-active_safety_threads = {}
-active_safety_threads_lock = threading.Lock()
+# Active safety net tasks tracking to prevent task explosion
+# Structure: {message_key: asyncio.Task}
+active_safety_tasks = {}
  
 # Serve static media for ManyChat via /pictures/ and /files/
 try:
@@ -202,7 +212,7 @@ def mark_message_processed(wa_id: str, message_text: str, message_type: str = No
         logger.debug(f"[SAFETY_NET] Cached processed key awaiting universal tracking: {message_key}")
 
 
-def safety_net_task(wa_id: str, message_data: dict, message_key: str):
+async def safety_net_task(wa_id: str, message_data: dict, message_key: str):
     """Background task that forwards message to processing if not received within 10 seconds.
     
     This handles WATI network hiccups where messages arrive at /webhook/universal
@@ -215,7 +225,7 @@ def safety_net_task(wa_id: str, message_data: dict, message_key: str):
     """
     try:
         # Wait 15 seconds for message to arrive at main webhook
-        time.sleep(15)
+        await asyncio.sleep(15)
         
         with pending_messages_lock:
             entry = pending_messages.get(message_key)
@@ -262,27 +272,19 @@ def safety_net_task(wa_id: str, message_data: dict, message_key: str):
                     logger.exception("[SAFETY_NET] Failed to store webhook message")
                     
                 # Get old timestamps before updating (for timer callback)
-                old_webhook_timestamp = thread_store.get_last_webhook_timestamp(wa_id)
-                old_last_updated = thread_store.get_last_updated_timestamp(wa_id)
-                
-                # Update timestamps (same as main webhook)
-                thread_store.update_last_webhook_timestamp(wa_id)
+                # and update them (same as main webhook)
+                old_webhook_timestamp, old_last_updated = thread_store.touch_webhook_timestamp(wa_id)
                 
                 # CRITICAL: Start timer to process the buffered message
                 now = datetime.utcnow()
                 waid_last_message[wa_id] = now
                 
-                with timer_lock:
-                    # Only start timer if one isn't already running
-                    if wa_id not in waid_timers:
-                        timer_start_time = now
-                        t = threading.Thread(target=timer_callback, args=(wa_id, timer_start_time, old_webhook_timestamp, old_last_updated))
-                        t.daemon = True
-                        waid_timers[wa_id] = t
-                        t.start()
-                        logger.info(f"[SAFETY_NET] Started timer thread for {wa_id}")
-                    else:
-                        logger.info(f"[SAFETY_NET] Timer already running for {wa_id}, message buffered")
+                # Only start timer if one isn't already running
+                timer_start_time = now
+                if batch_scheduler.schedule(wa_id, timer_callback, wa_id, timer_start_time, old_webhook_timestamp, old_last_updated):
+                    logger.info(f"[SAFETY_NET] Started batch for {wa_id}")
+                else:
+                    logger.info(f"[SAFETY_NET] Timer already running for {wa_id}, message buffered")
                 
                 # Mark as processed to prevent duplicate forwarding
                 entry["processed"] = True
@@ -291,13 +293,12 @@ def safety_net_task(wa_id: str, message_data: dict, message_key: str):
             except Exception as e:
                 logger.exception(f"[SAFETY_NET] Failed to forward message: {e}")
     finally:
-        # Remove thread from active tracking when done
-        with active_safety_threads_lock:
-            active_safety_threads.pop(message_key, None)
-            logger.info(f"[SAFETY_NET] Removed tracking for message_key: {message_key}")
+        # Remove task from active tracking when done
+        active_safety_tasks.pop(message_key, None)
+        logger.info(f"[SAFETY_NET] Removed tracking for message_key: {message_key}")
         
         # Clean up after 60 seconds
-        time.sleep(45)  # Already waited 15, wait 45 more = 60 total
+        await asyncio.sleep(45)  # Already waited 15, wait 45 more = 60 total
         with pending_messages_lock:
             if message_key in pending_messages:
                 del pending_messages[message_key]
@@ -336,7 +337,7 @@ async def process_image_message(wa_id: str, file_path: str, caption: str = None,
         media_url = f"{config.WATI_API_URL}/api/v1/getMedia?fileName={file_path}"
         headers = {"Authorization": f"Bearer {config.WATI_API_KEY}"}
 
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(media_url) as client:
             response = await client.get(media_url, headers=headers, timeout=60)
             response.raise_for_status()
 
@@ -369,17 +370,19 @@ async def process_image_message(wa_id: str, file_path: str, caption: str = None,
         
         logger.info(f"[PROCESS_IMAGE] File downloaded to temp file: {tmpfile_path} for {wa_id}")
         
-        # Handle PDF files - convert to image using pdf2image
+        # Handle PDF files - render the first page in memory with PyMuPDF
         if is_pdf:
             logger.info(f"[PROCESS_IMAGE] PDF detected for {wa_id}. Converting to image...")
             try:
-                from pdf2image import convert_from_path
                 # Convert first page of PDF to image (most payment proofs are single page)
-                images = convert_from_path(tmpfile_path, first_page=1, last_page=1, dpi=150)
+                images = await payment_proof_tool.render_pdf_pages(
+                    response.content, max_pages=1, dpi=150, jpeg_quality=95
+                )
                 if images:
                     # Save the first page as a temporary JPG
                     pdf_image_path = tmpfile_path.replace('.pdf', '_converted.jpg')
-                    images[0].save(pdf_image_path, 'JPEG', quality=95)
+                    with open(pdf_image_path, 'wb') as f:
+                        f.write(images[0])
                     # Clean up original PDF temp file
                     try:
                         os.remove(tmpfile_path)
@@ -402,7 +405,8 @@ async def process_image_message(wa_id: str, file_path: str, caption: str = None,
             conversation_context=None,  # Context is handled by the agent, not here
             wa_id=wa_id,
             caption=caption,
-            reply_context_id=reply_context_id
+            reply_context_id=reply_context_id,
+            cache_scope=wa_id
         )
         
         classification = classification_result.get("classification", "unknown")
@@ -426,7 +430,7 @@ async def process_image_message(wa_id: str, file_path: str, caption: str = None,
         # Analyze as payment proof if high confidence OR if classifier suggests it (fallback for empty responses)
         if (classification == 'payment_proof' and confidence >= 0.8) or should_analyze_as_payment:
             logger.info(f"[PROCESS_IMAGE] Analyzing as payment proof for {wa_id} (classification={classification}, confidence={confidence}, should_analyze={should_analyze_as_payment})")
-            analysis_result = await payment_proof_tool.analyze_payment_proof(tmpfile_path)
+            analysis_result = await payment_proof_tool.analyze_payment_proof(tmpfile_path, wa_id=wa_id)
             return f"(User sent a payment proof. Analysis result: {analysis_result})"
         else:
             # Return caption with classification if provided
@@ -450,7 +454,6 @@ async def process_audio_message(file_path: str) -> str:
     Downloads and transcribes an audio message.
     """
     logger.info(f"[PROCESS_AUDIO] Starting processing for audio: {file_path}")
-    tmpfile_path = None
     try:
         # Handle full URL vs. just the file path
         # WATI sometimes sends full URLs like: https://live-mt-server.wati.io/.../showFile?fileName=data/audios/...
@@ -468,26 +471,17 @@ async def process_audio_message(file_path: str) -> str:
         media_url = f"{config.WATI_API_URL}/api/v1/getMedia?fileName={file_path}"
         headers = {"Authorization": f"Bearer {config.WATI_API_KEY}"}
 
-        async with httpx.AsyncClient() as client:
-            response = await client.get(media_url, headers=headers, timeout=60)
-            response.raise_for_status()
-
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".opus") as tmpfile:
-                tmpfile.write(response.content)
-                tmpfile_path = tmpfile.name
+        with whisper_client.stage_timer("download"):
+            async with http_pool.client_for(media_url) as client:
+                response = await client.get(media_url, headers=headers, timeout=60)
+                response.raise_for_status()
 
-        transcription = await whisper_client.transcribe_audio_opus(tmpfile_path)
+        transcription = await whisper_client.transcribe_audio(response.content)
         return f'(User sent a voice note: "{transcription}")'
 
     except Exception as e:
         logger.exception(f"[PROCESS_AUDIO] Failed to download/process audio from WATI: {file_path}")
         return '(User sent a voice note, but an error occurred during processing)'
-    finally:
-        if tmpfile_path:
-            try:
-                os.remove(tmpfile_path)
-            except Exception as e:
-                logger.warning(f"[PROCESS_AUDIO] Could not delete temp file: {tmpfile_path}")
 
 
 async def process_manychat_audio_message(url: str) -> str:
@@ -497,50 +491,40 @@ async def process_manychat_audio_message(url: str) -> str:
     Returns a formatted string with the transcription or a fallback description on error.
     """
     logger.info(f"[PROCESS_AUDIO_MC] Starting processing for audio URL: {url}")
-    tmpfile_path = None
     try:
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, timeout=60)
-            response.raise_for_status()
-
-            # Some IG lookaside URLs can actually be images (e.g., screenshots sent as links).
-            # If the content-type indicates an image, route to the image processor instead.
-            content_type = response.headers.get("Content-Type", "").lower()
-            if content_type.startswith("image/"):
-                logger.info(f"[PROCESS_AUDIO_MC] Detected image content-type ({content_type}) for URL; routing to image handler")
-                # Reuse the image processing path to keep behavior identical to WATI
-                return await process_manychat_image_message(url)
+        with whisper_client.stage_timer("download"):
+            async with http_pool.client_for(url) as client:
+                response = await client.get(url, timeout=60)
+                response.raise_for_status()
 
-            # Save as a generic container; ffmpeg detects the codec/container automatically
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmpfile:
-                tmpfile.write(response.content)
-                tmpfile_path = tmpfile.name
+        # Some IG lookaside URLs can actually be images (e.g., screenshots sent as links).
+        # If the content-type indicates an image, route to the image processor instead.
+        content_type = response.headers.get("Content-Type", "").lower()
+        if content_type.startswith("image/"):
+            logger.info(f"[PROCESS_AUDIO_MC] Detected image content-type ({content_type}) for URL; routing to image handler")
+            # Reuse the image processing path to keep behavior identical to WATI
+            return await process_manychat_image_message(url)
 
-        # Reuse whisper client (ffmpeg -i works for mp4/m4a/aac/ogg/etc.)
-        transcription = await whisper_client.transcribe_audio_opus(tmpfile_path)
+        # Whisper takes mp4/m4a/ogg/etc. as-is; other containers are converted in memory
+        transcription = await whisper_client.transcribe_audio(response.content)
         return f'(User sent a voice note: "{transcription}")'
 
     except Exception:
         logger.exception(f"[PROCESS_AUDIO_MC] Failed to download/process audio from URL: {url}")
         return '(User sent a voice note, but an error occurred during processing)'
-    finally:
-        if tmpfile_path:
-            try:
-                os.remove(tmpfile_path)
-            except Exception:
-                logger.warning(f"[PROCESS_AUDIO_MC] Could not delete temp file: {tmpfile_path}")
 
 
-async def process_manychat_image_message(url: str) -> str:
+async def process_manychat_image_message(url: str, customer_id: str = None) -> str:
     """
     Downloads, classifies, and analyzes an image from a public ManyChat URL.
 
     Mirrors WATI image processing but pulls the file directly from the given URL.
+    ``customer_id`` (the "{channel}:{user_id}" buffer key) scopes the vision result cache.
     """
     logger.info(f"[PROCESS_IMAGE_MC] Starting processing for image URL: {url}")
     tmpfile_path = None
     try:
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(url) as client:
             response = await client.get(url, timeout=60)
             response.raise_for_status()
 
@@ -552,13 +536,14 @@ async def process_manychat_image_message(url: str) -> str:
             image_path=tmpfile_path,
             conversation_context=None,
             wa_id="manychat",  # Identifier only; not used by classifier
+            cache_scope=customer_id,
         )
         classification = classification_result.get("classification", "unknown")
         confidence = classification_result.get("confidence", 0)
         logger.info(f"[PROCESS_IMAGE_MC] Classification: {classification} (Confidence: {confidence})")
 
         if classification == 'payment_proof' and confidence >= 0.8:
-            analysis_result = await payment_proof_tool.analyze_payment_proof(tmpfile_path)
+            analysis_result = await payment_proof_tool.analyze_payment_proof(tmpfile_path, wa_id=customer_id)
             return f"(User sent a payment proof. Analysis result: {analysis_result})"
         else:
             return f"(User sent an image of type '{classification}')"
@@ -593,7 +578,7 @@ async def get_original_message_context(wa_id: str, reply_context_id: str) -> str
         wati_url = f"{config.WATI_API_URL}/api/v1/getMessages/{wa_id}"
         headers = {"Authorization": f"Bearer {config.WATI_API_KEY}"}
         
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(wati_url) as client:
             response = await client.get(wati_url, headers=headers, timeout=30)
             logger.info(f"[REPLY_CONTEXT] API response status: {response.status_code}")
             
@@ -713,13 +698,13 @@ async def get_pre_live_history(wa_id: str, before_date: datetime) -> list:
     page_number = 1
     PAGE_SIZE = 100
 
-    async with httpx.AsyncClient(timeout=30) as client:
+    async with http_pool.client_for(config.WATI_API_URL) as client:
         while True:
             try:
                 logger.info(f"[HISTORY_IMPORT] Fetching page {page_number} for {wa_id}...")
                 wati_url = f"{config.WATI_API_URL}/api/v1/getMessages/{wa_id}?pageSize={PAGE_SIZE}&pageNumber={page_number}"
                 headers = {"Authorization": f"Bearer {config.WATI_API_KEY}"}
-                response = await client.get(wati_url, headers=headers)
+                response = await client.get(wati_url, headers=headers, timeout=30)
 
                 if response.status_code == 429:
                     logger.warning(f"[HISTORY_IMPORT] Rate limit hit. Waiting 30 seconds...")
@@ -790,21 +775,16 @@ async def get_pre_live_history(wa_id: str, before_date: datetime) -> list:
             continue
     return final_list
 
-# In-memory tracking for message buffering and timers
-waid_timers = {}
+# In-memory tracking for message buffering
+# Pending batches (one debounce task per conversation) live in batch_scheduler
 waid_last_message = {}
 
-# Thread-safe lock for timer management (prevents race conditions)
-timer_lock = threading.Lock()
-
 # Thread-safe lock for conversation access (prevents OpenAI conversation race conditions)
 conversation_locks = {}
 conversation_lock = threading.Lock()
 
 # ManyChat tracking (separate from WATI)
-mc_timers = {}
 mc_last_message = {}
-mc_timer_lock = threading.Lock()
 
 # Initialize thread store DB and message buffer DB on startup
 @app.on_event("startup")
@@ -849,12 +829,62 @@ def startup_event():
     if cleaned_count > 0:
         logger.info(f"[STARTUP] Cleaned up {cleaned_count} old buffered messages")
     
+    # Parse system instructions once up front instead of on the first customer turn
+    instructions_registry.get_snapshot()
+
+    # Render menu PDFs now (only if they changed) so the first menu request is a cache hit
+    menu_render_cache.prerender()
+
+    # Index photo galleries and build their messaging variants before the first photo request
+    try:
+        gallery.prepare_all()
+    except Exception as e:
+        logger.warning(f"[STARTUP] Could not prepare photo galleries, variants will be built on demand: {e}")
+
+    # Office closure rules load in the background; check_office_status answers from memory
+    office_status_tool.prime()
+
+    # Room-night occupancy table catches up with bookings in the background
+    room_nights.prime()
+
+    # CompraClick schema migrations run once here instead of on every report sync
+    try:
+        compraclick_tool.ensure_compraclick_schema()
+    except Exception as e:
+        logger.warning(f"[STARTUP] CompraClick schema check failed, will retry on first sync: {e}")
+    
+    if config.RAG_ENABLED:
+        # Load chunk embeddings into memory once so retrieval never opens ChromaDB per turn
+        try:
+            from .rag import vector_index
+            vector_index.load()
+        except Exception as e:
+            logger.warning(f"[STARTUP] Could not preload RAG vector index, will load on first query: {e}")
+    
     logger.info("[STARTUP] Initialization complete")
 
-def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None, previous_last_updated=None):
-    time.sleep(5)  # Add a 5-second delay to mitigate race condition with WATI DB
+@app.on_event("startup")
+async def start_http_clients():
+    # Shared keep-alive clients and warm portal browsers are bound to the server's event loop
+    http_pool.start()
+    browser_pool.start()
+
+@app.on_event("startup")
+async def start_retry_scheduler():
+    # Bank transfer / CompraClick retry jobs run on the server's event loop and resume after restarts
+    await retry_scheduler.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await retry_scheduler.stop()
+    await browser_pool.aclose()
+    await http_pool.aclose()
+
+async def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None, previous_last_updated=None):
+    """Debounced batch for one WATI conversation; runs as a batch_scheduler task."""
+    await asyncio.sleep(5)  # Add a 5-second delay to mitigate race condition with WATI DB
     # Wait 60 seconds to gather all messages
-    threading.Event().wait(60)
+    await asyncio.sleep(60)
     
     # Calculate exact buffer window based on when the timer started
     if timer_start_time:
@@ -871,7 +901,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
     count = message_buffer.count_media_buffered_messages(wa_id, since_seconds=buffer_window)
     if count >= 1:
         logger.info(f"[BUFFER] {count} media message(s) for {wa_id}, extending buffer by 60s")
-        threading.Event().wait(60)
+        await asyncio.sleep(60)
         # Recalculate to cover the extra 60s
         if timer_start_time:
             time_elapsed = (datetime.utcnow() - timer_start_time).total_seconds()
@@ -882,14 +912,9 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
     buffered_messages = message_buffer.get_and_clear_buffered_messages(wa_id, since_seconds=buffer_window)
     if not buffered_messages:
         logger.info(f"[BUFFER] No messages to process for {wa_id}")
-        with timer_lock:
-            waid_timers.pop(wa_id, None)
         return
 
     processed_messages = []
-    # Use a new event loop for async operations within this thread
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
 
     for message in buffered_messages:
         msg_type = message.get('type')
@@ -904,7 +929,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
             if reply_context_id:
                 logger.info(f"[REPLY_CONTEXT] Text message has reply context: {reply_context_id}")
                 try:
-                    original_context = loop.run_until_complete(get_original_message_context(wa_id, reply_context_id))
+                    original_context = await get_original_message_context(wa_id, reply_context_id)
                     if original_context:
                         user_message = f"(Customer is replying to: \"{original_context}\") {content}"
                         logger.info(f"[REPLY_CONTEXT] Enhanced text with context: {user_message[:200]}...")
@@ -924,7 +949,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
             reply_context_id = cache_data.get("reply_context_id")
             logger.info(f"[TIMER_CALLBACK] Processing buffered image: {file_path} (caption: {caption!r}, reply_context: {reply_context_id!r})")
             try:
-                user_message = loop.run_until_complete(process_image_message(wa_id, file_path, caption, reply_context_id))
+                user_message = await process_image_message(wa_id, file_path, caption, reply_context_id)
             except Exception as e:
                 logger.exception(f"[TIMER_CALLBACK] Error processing image {file_path} for {wa_id}")
                 user_message = "(User sent an image, but an error occurred during processing)"
@@ -933,15 +958,13 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
             file_path = content
             logger.info(f"[TIMER_CALLBACK] Processing buffered audio: {file_path}")
             try:
-                user_message = loop.run_until_complete(process_audio_message(file_path))
+                user_message = await process_audio_message(file_path)
             except Exception as e:
                 logger.exception(f"[TIMER_CALLBACK] Error processing audio {file_path} for {wa_id}")
                 user_message = "(User sent a voice note, but an error occurred during processing)"
 
         if user_message:
             processed_messages.append(user_message)
-    
-    loop.close()
 
     if not processed_messages:
         logger.warning(f"[BUFFER] No processable message content found for {wa_id}, but customer sent messages - providing fallback response")
@@ -960,22 +983,18 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
     if processed_messages and processed_messages[0] == "__ALREADY_RESPONDED__":
         logger.info(f"[BUFFER] Image was already responded to directly, skipping get_openai_response for {wa_id}")
         # CRITICAL: Must clean up timer before returning to prevent zombie timer
-        with timer_lock:
-            waid_timers.pop(wa_id, None)
-            
-            # Check if new messages arrived while we were processing
-            if message_buffer.has_buffered_messages(wa_id):
-                logger.warning(f"[BUFFER] Orphaned messages detected for {wa_id} after direct image response - starting immediate processing")
-                # Don't pass previous timestamps for orphaned messages (same conversation)
-                t = threading.Thread(target=timer_callback, args=(wa_id, timer_start_time, None, None))
-                t.daemon = True
-                waid_timers[wa_id] = t
-                t.start()
-                logger.info(f"[TIMER_THREAD] Started new timer for orphaned messages (reusing original start time: {timer_start_time})")
-            else:
-                logger.info(f"[BUFFER] Timer cleanup complete for {wa_id} after direct image response, no orphaned messages")
-                # CRITICAL: Release processing lock so other workers can handle next message from this customer
-                message_buffer.release_processing_lock(wa_id)
+        batch_scheduler.release(wa_id)
+
+        # Check if new messages arrived while we were processing
+        if message_buffer.has_buffered_messages(wa_id):
+            logger.warning(f"[BUFFER] Orphaned messages detected for {wa_id} after direct image response - starting immediate processing")
+            # Don't pass previous timestamps for orphaned messages (same conversation)
+            batch_scheduler.schedule(wa_id, timer_callback, wa_id, timer_start_time, None, None)
+            logger.info(f"[BATCH_SCHEDULER] Started new batch for orphaned messages (reusing original start time: {timer_start_time})")
+        else:
+            logger.info(f"[BUFFER] Timer cleanup complete for {wa_id} after direct image response, no orphaned messages")
+            # CRITICAL: Release processing lock so other workers can handle next message from this customer
+            message_buffer.release_processing_lock(wa_id)
         return
     
     prompt = "\n".join(processed_messages)
@@ -995,13 +1014,8 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
 
             history_import_success = False
             try:
-                history_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(history_loop)
                 # Fetch all messages before the go-live date
-                all_pre_live_history = history_loop.run_until_complete(
-                    get_pre_live_history(wa_id, before_date=GO_LIVE_DATE)
-                )
-                history_loop.close()
+                all_pre_live_history = await get_pre_live_history(wa_id, before_date=GO_LIVE_DATE)
 
                 if all_pre_live_history:
                     # Take the last MESSAGE_LIMIT messages (the most recent ones)
@@ -1033,10 +1047,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
                     # Add the formatted history to the thread - WAIT FOR COMPLETION
                     if thread_id:
                         logger.info(f"[HISTORY_IMPORT] Injecting {len(limited_history)} pre-go-live messages into thread {thread_id} for {wa_id}")
-                        injection_loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(injection_loop)
-                        success = injection_loop.run_until_complete(openai_agent.add_message_to_thread(thread_id, formatted_history))
-                        injection_loop.close()
+                        success = await openai_agent.add_message_to_thread(thread_id, formatted_history)
                         if success:
                             thread_store.set_history_imported(wa_id)
                             history_import_success = True
@@ -1087,7 +1098,9 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
                     from agent_context_injector import get_missed_customer_agent_messages_for_developer_input
                     # Pass the PREVIOUS last_updated timestamp (before current response) as cutoff
                     # Also pass current processed_messages to exclude them from the missed-messages section (prevent duplication)
-                    missed_messages_prompt = get_missed_customer_agent_messages_for_developer_input(wa_id, previous_last_updated, exclude_texts=processed_messages)
+                    missed_messages_prompt = await asyncio.to_thread(
+                        get_missed_customer_agent_messages_for_developer_input, wa_id, previous_last_updated, exclude_texts=processed_messages
+                    )
                     if missed_messages_prompt:
                         logger.info(f"[MISSED_MESSAGES_CHECK] Found {len(missed_messages_prompt)} chars of missed messages for {wa_id}")
                         # Prepend missed messages to prompt
@@ -1128,10 +1141,8 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
             
             try:
                 logger.info(f"[BUFFER] Attempt {attempt} to get OpenAI response for {wa_id} (elapsed: {elapsed:.1f}s)")
-                aio_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(aio_loop)
-                ai_response, new_thread_id = aio_loop.run_until_complete(openai_agent.get_openai_response(prompt, thread_id, wa_id, time_since_last_message=time_diff))
-                aio_loop.close()
+                async with batch_scheduler.turn_slot(wa_id):
+                    ai_response, new_thread_id = await openai_agent.get_openai_response(prompt, thread_id, wa_id, time_since_last_message=time_diff)
                 logger.info(f"[BUFFER] OpenAI response for {wa_id}: {ai_response!r}")
                 
                 if not thread_id or (new_thread_id and new_thread_id != thread_id):
@@ -1142,13 +1153,13 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
                 for send_attempt in range(1, 4):  # 3 attempts for sending
                     try:
                         logger.info(f"[BUFFER] Attempt {send_attempt}/3 to send WATI message to {wa_id}")
-                        asyncio.run(wati_client.send_wati_message(wa_id, ai_response))
+                        await wati_client.send_wati_message(wa_id, ai_response)
                         send_success = True
                         break
                     except Exception as send_error:
                         logger.warning(f"[BUFFER] WATI send attempt {send_attempt} failed for {wa_id}: {send_error}")
                         if send_attempt < 3:
-                            time.sleep(5)
+                            await asyncio.sleep(5)
                         else:
                             logger.error(f"[BUFFER] Failed to send WATI message after 3 attempts for {wa_id}")
                             raise
@@ -1170,7 +1181,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
                 
                 if remaining_time > delay:
                     logger.info(f"[BUFFER] Retrying in {delay} seconds for {wa_id} (time remaining: {remaining_time:.1f}s)...")
-                    time.sleep(delay)
+                    await asyncio.sleep(delay)
                 else:
                     logger.warning(f"[BUFFER] Not enough time for another retry. Breaking retry loop for {wa_id}")
                     break
@@ -1182,7 +1193,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
             
             try:
                 # Use the existing WATI API to mark conversation as PENDING for human review
-                asyncio.run(wati_client.update_chat_status(wa_id, "PENDING"))
+                await wati_client.update_chat_status(wa_id, "PENDING")
                 logger.info(f"[BUFFER] Successfully marked conversation as PENDING for {wa_id}")
                 
                 # Send polite escalation message to customer
@@ -1190,7 +1201,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
                     "Su mensaje ha sido recibido y está siendo procesado por nuestro equipo. "
                     "Le responderemos a la brevedad posible. Gracias por su paciencia."
                 )
-                asyncio.run(wati_client.send_wati_message(wa_id, escalation_message))
+                await wati_client.send_wati_message(wa_id, escalation_message)
                 logger.info(f"[BUFFER] Sent escalation notification to {wa_id}")
                     
             except Exception as escalation_error:
@@ -1201,7 +1212,7 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
                         "Estamos experimentando dificultades técnicas. Por favor, "
                         "contacte directamente con nuestras oficinas para asistencia inmediata."
                     )
-                    asyncio.run(wati_client.send_wati_message(wa_id, emergency_message))
+                    await wati_client.send_wati_message(wa_id, emergency_message)
                 except:
                     logger.critical(f"[BUFFER] Complete failure - unable to notify {wa_id}")
                         
@@ -1211,29 +1222,25 @@ def timer_callback(wa_id, timer_start_time=None, previous_webhook_timestamp=None
     # CRITICAL FIX: Check for orphaned messages before cleaning up timer
     # Messages that arrived after we called get_and_clear_buffered_messages() 
     # but before processing completed need to be handled
-    with timer_lock:
-        waid_timers.pop(wa_id, None)
-        
-        # Check if new messages arrived while we were processing
-        if message_buffer.has_buffered_messages(wa_id):
-            logger.warning(f"[BUFFER] Orphaned messages detected for {wa_id} - starting immediate processing")
-            # CRITICAL: Use the ORIGINAL timer_start_time so the buffer window 
-            # includes messages that were buffered during the previous processing
-            # This prevents orphaned messages from being outside the time window
-            # Don't pass previous timestamps for orphaned messages (same conversation)
-            t = threading.Thread(target=timer_callback, args=(wa_id, timer_start_time, None, None))
-            t.daemon = True
-            waid_timers[wa_id] = t
-            t.start()
-            logger.info(f"[TIMER_THREAD] Started new timer for orphaned messages (reusing original start time: {timer_start_time})")
-        else:
-            logger.info(f"[BUFFER] Timer cleanup complete for {wa_id}, no orphaned messages")
-            # CRITICAL: Release processing lock so other workers can handle next message from this customer
-            message_buffer.release_processing_lock(wa_id)
+    batch_scheduler.release(wa_id)
+
+    # Check if new messages arrived while we were processing
+    if message_buffer.has_buffered_messages(wa_id):
+        logger.warning(f"[BUFFER] Orphaned messages detected for {wa_id} - starting immediate processing")
+        # CRITICAL: Use the ORIGINAL timer_start_time so the buffer window 
+        # includes messages that were buffered during the previous processing
+        # This prevents orphaned messages from being outside the time window
+        # Don't pass previous timestamps for orphaned messages (same conversation)
+        batch_scheduler.schedule(wa_id, timer_callback, wa_id, timer_start_time, None, None)
+        logger.info(f"[BATCH_SCHEDULER] Started new batch for orphaned messages (reusing original start time: {timer_start_time})")
+    else:
+        logger.info(f"[BUFFER] Timer cleanup complete for {wa_id}, no orphaned messages")
+        # CRITICAL: Release processing lock so other workers can handle next message from this customer
+        message_buffer.release_processing_lock(wa_id)
 
 
-def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, timer_start_time=None,
-                            previous_webhook_timestamp=None, previous_last_updated=None):
+async def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, timer_start_time=None,
+                                  previous_webhook_timestamp=None, previous_last_updated=None):
     """Aggregates buffered ManyChat messages and sends AI response via appropriate adapter.
 
     conversation_id is formatted as "{channel}:{user_id}" to avoid collisions with WATI keys.
@@ -1243,7 +1250,7 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
                                 cutoff for missed-message queries.
     """
     # Wait 60 seconds to gather messages similar to WATI behavior
-    threading.Event().wait(60)
+    await asyncio.sleep(60)
 
     # Calculate buffer window similar to WATI logic
     if timer_start_time:
@@ -1258,7 +1265,7 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
     count = message_buffer.count_media_buffered_messages(conversation_id, since_seconds=buffer_window)
     if count >= 1:
         logging.info(f"[MC_BUFFER] {count} media message(s) for {conversation_id}, extending buffer by 60s")
-        threading.Event().wait(60)
+        await asyncio.sleep(60)
         # Recalculate to cover the extra 60s
         if timer_start_time:
             time_elapsed = (datetime.utcnow() - timer_start_time).total_seconds()
@@ -1268,46 +1275,36 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
     buffered_messages = message_buffer.get_and_clear_buffered_messages(conversation_id, since_seconds=buffer_window)
     if not buffered_messages:
         logging.info(f"[MC_BUFFER] No messages to process for {conversation_id}")
-        with mc_timer_lock:
-            mc_timers.pop(conversation_id, None)
         return
 
     # Convert all buffered messages into plain text lines for the AI prompt
     # For ManyChat, mirror WATI behavior: process audio (transcribe) during timer.
     lines = []
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    try:
-        for m in buffered_messages:
-            mtype = (m.get('type') or 'text').lower()
-            content = m.get('content') or ''
-            if mtype == 'text':
-                lines.append(content)
-            elif mtype == 'image' and content:
-                try:
-                    analyzed = loop.run_until_complete(process_manychat_image_message(content))
-                    lines.append(analyzed)
-                except Exception:
-                    logger.exception(f"[MC_BUFFER] Error processing image for {conversation_id}")
-                    lines.append("(User sent an image, but an error occurred during processing)")
-            elif mtype == 'audio' and content:
-                try:
-                    transcribed = loop.run_until_complete(process_manychat_audio_message(content))
-                    lines.append(transcribed)
-                except Exception:
-                    logger.exception(f"[MC_BUFFER] Error transcribing audio for {conversation_id}")
-                    lines.append("(User sent a voice note, but an error occurred during processing)")
+    for m in buffered_messages:
+        mtype = (m.get('type') or 'text').lower()
+        content = m.get('content') or ''
+        if mtype == 'text':
+            lines.append(content)
+        elif mtype == 'image' and content:
+            try:
+                analyzed = await process_manychat_image_message(content, customer_id=conversation_id)
+                lines.append(analyzed)
+            except Exception:
+                logger.exception(f"[MC_BUFFER] Error processing image for {conversation_id}")
+                lines.append("(User sent an image, but an error occurred during processing)")
+        elif mtype == 'audio' and content:
+            try:
+                transcribed = await process_manychat_audio_message(content)
+                lines.append(transcribed)
+            except Exception:
+                logger.exception(f"[MC_BUFFER] Error transcribing audio for {conversation_id}")
+                lines.append("(User sent a voice note, but an error occurred during processing)")
+        else:
+            # Include URL/path if present to give the AI some context for other media types
+            if content:
+                lines.append(f"(User sent a {mtype}: {content})")
             else:
-                # Include URL/path if present to give the AI some context for other media types
-                if content:
-                    lines.append(f"(User sent a {mtype}: {content})")
-                else:
-                    lines.append(f"(User sent a {mtype})")
-    finally:
-        try:
-            loop.close()
-        except Exception:
-            pass
+                lines.append(f"(User sent a {mtype})")
 
     prompt = "\n".join(lines)
     logging.info(f"[MC_BUFFER] Sending combined prompt for {conversation_id}: {prompt!r}")
@@ -1322,7 +1319,8 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
 
             if mc_time_diff > 300:
                 from agent_context_injector import get_missed_customer_agent_messages_for_developer_input
-                missed_messages_prompt = get_missed_customer_agent_messages_for_developer_input(
+                missed_messages_prompt = await asyncio.to_thread(
+                    get_missed_customer_agent_messages_for_developer_input,
                     conversation_id, previous_last_updated, exclude_texts=lines
                 )
                 if missed_messages_prompt:
@@ -1350,18 +1348,14 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
         thread_id = thread_info['thread_id'] if thread_info else None
 
         # Call OpenAI agent to get response (no phone_number for ManyChat)
-        aio_loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(aio_loop)
-        ai_response, new_thread_id = aio_loop.run_until_complete(
-            openai_agent.get_openai_response(
+        async with batch_scheduler.turn_slot(conversation_id):
+            ai_response, new_thread_id = await openai_agent.get_openai_response(
                 prompt,
                 thread_id,
                 None,  # phone_number not used for ManyChat
                 subscriber_id=user_id,
                 channel=channel,
             )
-        )
-        aio_loop.close()
 
         if not thread_id or (new_thread_id and new_thread_id != thread_id):
             thread_store.set_thread_id(conversation_id, new_thread_id)
@@ -1373,10 +1367,7 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
         send_success = False
         for attempt in range(1, 4):
             try:
-                send_loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(send_loop)
-                ok = send_loop.run_until_complete(adapter.send_outgoing(user_id, ai_response))
-                send_loop.close()
+                ok = await adapter.send_outgoing(user_id, ai_response)
                 if ok:
                     send_success = True
                     break
@@ -1385,7 +1376,7 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
             except Exception as send_err:
                 logging.warning(f"[MC_BUFFER] Send attempt {attempt} failed for {conversation_id}: {send_err}")
                 if attempt < 3:
-                    time.sleep(5)
+                    await asyncio.sleep(5)
 
         if send_success:
             logging.info(f"[MC_BUFFER] Successfully processed and sent response to {conversation_id}")
@@ -1395,21 +1386,17 @@ def manychat_timer_callback(conversation_id: str, channel: str, user_id: str, ti
         logging.exception(f"[MC_BUFFER] Unexpected error in buffer processing for {conversation_id}: {e}")
     finally:
         # CRITICAL FIX: Check for orphaned messages before cleaning up timer
-        with mc_timer_lock:
-            mc_timers.pop(conversation_id, None)
-            
-            # Check if new messages arrived while we were processing
-            if message_buffer.has_buffered_messages(conversation_id):
-                logging.warning(f"[MC_BUFFER] Orphaned messages detected for {conversation_id} - starting immediate processing")
-                # CRITICAL: Use the ORIGINAL timer_start_time so the buffer window 
-                # includes messages that were buffered during the previous processing
-                t = threading.Thread(target=manychat_timer_callback, args=(conversation_id, channel, user_id, timer_start_time))
-                t.daemon = True
-                mc_timers[conversation_id] = t
-                t.start()
-                logging.info(f"[MC_TIMER] Started new timer for orphaned messages (reusing original start time: {timer_start_time})")
-            else:
-                logging.info(f"[MC_BUFFER] Timer cleanup complete for {conversation_id}, no orphaned messages")
+        batch_scheduler.release(conversation_id)
+
+        # Check if new messages arrived while we were processing
+        if message_buffer.has_buffered_messages(conversation_id):
+            logging.warning(f"[MC_BUFFER] Orphaned messages detected for {conversation_id} - starting immediate processing")
+            # CRITICAL: Use the ORIGINAL timer_start_time so the buffer window 
+            # includes messages that were buffered during the previous processing
+            batch_scheduler.schedule(conversation_id, manychat_timer_callback, conversation_id, channel, user_id, timer_start_time)
+            logging.info(f"[MC_TIMER] Started new batch for orphaned messages (reusing original start time: {timer_start_time})")
+        else:
+            logging.info(f"[MC_BUFFER] Timer cleanup complete for {conversation_id}, no orphaned messages")
 
 default_message = {
     "message": "WATI-OpenAI integration service running. Configure webhook endpoint next."
@@ -1491,28 +1478,20 @@ async def manychat_webhook(request: Request):
     message_buffer.buffer_message(conversation_id, msg_type, content, caption)
 
     # CRITICAL: Capture old timestamps BEFORE updating so the timer can compute the gap
-    old_mc_webhook_timestamp = thread_store.get_last_webhook_timestamp(conversation_id)
-    old_mc_last_updated = thread_store.get_last_updated_timestamp(conversation_id)
-
-    # Track webhook message timestamp for missed message detection
-    thread_store.update_last_webhook_timestamp(conversation_id)
+    # and track the new webhook message timestamp for missed message detection
+    old_mc_webhook_timestamp, old_mc_last_updated = thread_store.touch_webhook_timestamp(conversation_id)
 
     # Start a timer for this conversation if not running
     now = datetime.utcnow()
-    with mc_timer_lock:
-        if conversation_id not in mc_timers:
-            timer_start_time = now
-            t = threading.Thread(
-                target=manychat_timer_callback,
-                args=(conversation_id, unified_msg.channel, unified_msg.user_id, timer_start_time,
-                      old_mc_webhook_timestamp, old_mc_last_updated)
-            )
-            t.daemon = True
-            mc_timers[conversation_id] = t
-            t.start()
-            logger.info(f"[MC_TIMER] Started timer for {conversation_id} at {timer_start_time}")
-        else:
-            logger.info(f"[MC_TIMER] Timer already running for {conversation_id}, message buffered")
+    timer_start_time = now
+    if batch_scheduler.schedule(
+        conversation_id, manychat_timer_callback,
+        conversation_id, unified_msg.channel, unified_msg.user_id, timer_start_time,
+        old_mc_webhook_timestamp, old_mc_last_updated
+    ):
+        logger.info(f"[MC_TIMER] Started timer for {conversation_id} at {timer_start_time}")
+    else:
+        logger.info(f"[MC_TIMER] Timer already running for {conversation_id}, message buffered")
 
     return {"status": "ok", "detail": "Message buffered"}
 
@@ -1561,11 +1540,10 @@ async def universal_webhook(request: Request):
                     logger.info(f"[SAFETY_NET] Skipping tracking for message already processed: {message_key}")
                     return {"status": "ignored", "reason": "already_processed"}
             
-            # Check if safety net thread already running for this message
-            with active_safety_threads_lock:
-                if message_key in active_safety_threads:
-                    logger.info(f"[SAFETY_NET] Thread already running for message_key: {message_key}, skipping")
-                    return {"status": "ignored", "reason": "safety_thread_already_active"}
+            # Check if safety net task already running for this message
+            if message_key in active_safety_tasks:
+                logger.info(f"[SAFETY_NET] Task already running for message_key: {message_key}, skipping")
+                return {"status": "ignored", "reason": "safety_thread_already_active"}
             
             with pending_messages_lock:
                 # Store message for tracking
@@ -1584,18 +1562,8 @@ async def universal_webhook(request: Request):
                         logger.info(f"[SAFETY_NET] Immediate mark for pending message (already processed): {message_key}")
             
             # Start background safety net task (only if not already running)
-            safety_thread = threading.Thread(
-                target=safety_net_task,
-                args=(wa_id, data.copy(), message_key),
-                daemon=True
-            )
-            
-            # Track the thread before starting it
-            with active_safety_threads_lock:
-                active_safety_threads[message_key] = safety_thread
-            
-            safety_thread.start()
-            logger.info(f"[SAFETY_NET] Tracking message for bot: wa_id={wa_id}, message_key={message_key} (total active: {len(active_safety_threads)})")
+            active_safety_tasks[message_key] = asyncio.create_task(safety_net_task(wa_id, data.copy(), message_key))
+            logger.info(f"[SAFETY_NET] Tracking message for bot: wa_id={wa_id}, message_key={message_key} (total active: {len(active_safety_tasks)})")
         
         # FILTER: Cache media messages OR messages with reply context
         should_cache = False
@@ -1817,11 +1785,8 @@ async def wati_webhook(request: Request):
             # CRITICAL: Get the OLD timestamps BEFORE updating them
             # This allows the timer to check if 5+ minutes passed since the PREVIOUS message
             # AND to filter missed messages from after the PREVIOUS assistant response
-            old_webhook_timestamp = thread_store.get_last_webhook_timestamp(phone_number)
-            old_last_updated = thread_store.get_last_updated_timestamp(phone_number)
-            
-            # Now update to current timestamp for next message
-            thread_store.update_last_webhook_timestamp(phone_number)
+            # Then update to current timestamp for next message (one transaction)
+            old_webhook_timestamp, old_last_updated = thread_store.touch_webhook_timestamp(phone_number)
             
             now = datetime.utcnow()
             waid_last_message[phone_number] = now
@@ -1833,17 +1798,14 @@ async def wati_webhook(request: Request):
             
             if lock_acquired:
                 # We got the lock - start timer for this customer
-                with timer_lock:
-                    timer_start_time = now
-                    t = threading.Thread(target=timer_callback, args=(phone_number, timer_start_time, old_webhook_timestamp, old_last_updated))
-                    t.daemon = True
-                    # Add to local worker's dict
-                    waid_timers[phone_number] = t
-                    t.start()
-                    logger.info(f"[TIMER_THREAD] Acquired lock and started timer for {phone_number} at {timer_start_time}")
+                timer_start_time = now
+                if batch_scheduler.schedule(phone_number, timer_callback, phone_number, timer_start_time, old_webhook_timestamp, old_last_updated):
+                    logger.info(f"[BATCH_SCHEDULER] Acquired lock and started batch for {phone_number} at {timer_start_time}")
+                else:
+                    logger.info(f"[BATCH_SCHEDULER] Batch already pending for {phone_number} in this worker, message buffered")
             else:
                 # Another worker is already processing this customer - just buffer the message
-                logger.info(f"[TIMER_THREAD] Another worker is processing {phone_number}, message buffered (will be included in that batch)")
+                logger.info(f"[BATCH_SCHEDULER] Another worker is processing {phone_number}, message buffered (will be included in that batch)")
                     
         except Exception as timer_error:
             # CRITICAL: If timer creation fails, message is orphaned in buffer
@@ -1886,17 +1848,11 @@ async def check_orphaned_messages():
         processed = []
         for wa_id in orphaned_wa_ids:
             # Check if timer is already running for this wa_id
-            with timer_lock:
-                if wa_id not in waid_timers:
-                    logger.info(f"[DEBUG] Starting immediate processing for orphaned messages: {wa_id}")
-                    now = datetime.utcnow()
-                    t = threading.Thread(target=timer_callback, args=(wa_id, now, None, None))
-                    t.daemon = True
-                    waid_timers[wa_id] = t
-                    t.start()
-                    processed.append(wa_id)
-                else:
-                    logger.info(f"[DEBUG] Timer already running for {wa_id}, skipping")
+            if batch_scheduler.schedule(wa_id, timer_callback, wa_id, datetime.utcnow(), None, None):
+                logger.info(f"[DEBUG] Starting immediate processing for orphaned messages: {wa_id}")
+                processed.append(wa_id)
+            else:
+                logger.info(f"[DEBUG] Timer already running for {wa_id}, skipping")
         
         return {
             "status": "ok",
@@ -1950,3 +1906,26 @@ async def api_sync_bank_transfers(request: Request, x_api_key: str = Header(...)
     logger.info(f"[INTERNAL_API] sync-bank-transfers triggered from {request.client.host}")
     result = await bank_transfer_tool.sync_bank_transfers()
     return result
+
+
+@app.get("/api/metrics")
+async def api_metrics(request: Request, x_api_key: str = Header(...)):
+    """Runtime pool/queue metrics. Restricted to internal LAN."""
+    _validate_internal_request(request, x_api_key)
+    return {
+        "mysql_pool": database_client.get_pool_metrics(),
+        "message_batching": batch_scheduler.metrics(),
+        "http_hosts": http_pool.get_metrics(),
+        "sqlite": sqlite_store.get_metrics(),
+        "payment_retries": retry_scheduler.metrics(),
+        "bank_sync": bank_transfer_tool.get_sync_metrics(),
+        "browsers": browser_pool.get_metrics(),
+        "galleries": gallery.get_metrics(),
+        "vision_images": vision_preprocess.get_metrics(),
+        "vision_cache": vision_result_cache.get_metrics(),
+        "transcription": whisper_client.get_metrics(),
+        "office_status": office_status_tool.get_metrics(),
+        "room_availability": room_availability.get_metrics(),
+        "room_nights": room_nights.get_metrics(),
+        "pending_bookings": pending_bookings.get_metrics(),
+    }
@@ -0,0 +1,141 @@
+"""
+Content-addressed cache of rasterized menu PDF pages.
+
+read_menu_content, read_menu_prices_content and the Instagram menu senders
+used to rasterize the menu PDFs with PyMuPDF on every request, writing a new
+set of timestamped PNGs each time. Renders are now keyed by the PDF's
+content hash and the DPI:
+
+    resources/pictures/menu_converted/menu_<sha256[:16]>_<dpi>dpi_p<N>.png
+
+- A render is complete once its manifest (``<prefix>_<key>.json``, written
+  last) exists; every customer gets the same page files.
+- The PDF is only re-hashed when its mtime/size change, so a request costs a
+  stat() once the render exists.
+- Pages are written to temp names and renamed into place, so concurrent
+  workers rendering the same key never expose a half-written PNG.
+- Whenever the PDF is (re)checked, PNGs and manifests of every other key
+  (and the old timestamped files) for that prefix are deleted. The output
+  directories are runtime caches and are not tracked in git.
+
+Menus are pre-rendered at startup (``prerender()``); a replaced PDF is picked
+up by the next request.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+PICTURES_DIR = Path(__file__).resolve().parent / "resources" / "pictures"
+
+
+class MenuRender:
+    """Rendered pages of one menu PDF."""
+
+    def __init__(self, pdf_path: str, out_dir: Path, prefix: str):
+        self.pdf_path = pdf_path
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        # (mtime, size, dpi) -> page paths of the matching complete render
+        self._memo: Optional[Tuple[Tuple[float, int, int], List[str]]] = None
+
+    def _key(self, dpi: int) -> str:
+        digest = hashlib.sha256()
+        with open(self.pdf_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return f"{digest.hexdigest()[:16]}_{dpi}dpi"
+
+    def _manifest_path(self, key: str) -> Path:
+        return self.out_dir / f"{self.prefix}_{key}.json"
+
+    def _load_manifest(self, key: str) -> Optional[List[str]]:
+        try:
+            with open(self._manifest_path(key)) as f:
+                pages = [str(self.out_dir / name) for name in json.load(f)["pages"]]
+        except (OSError, ValueError, KeyError):
+            return None
+        return pages if pages and all(os.path.exists(p) for p in pages) else None
+
+    def _render(self, key: str, dpi: int) -> List[str]:
+        import fitz  # PyMuPDF
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        names = []
+        doc = fitz.open(self.pdf_path)
+        try:
+            for i, page in enumerate(doc):
+                name = f"{self.prefix}_{key}_p{i + 1}.png"
+                tmp_path = self.out_dir / f".{name}.{os.getpid()}.tmp"
+                page.get_pixmap(dpi=dpi).save(str(tmp_path), output="png")
+                os.replace(tmp_path, self.out_dir / name)
+                names.append(name)
+        finally:
+            doc.close()
+        if not names:
+            raise ValueError(f"{self.pdf_path} has no pages")
+
+        tmp_manifest = self.out_dir / f".{self.prefix}_{key}.json.{os.getpid()}.tmp"
+        with open(tmp_manifest, "w") as f:
+            json.dump({"pdf": self.pdf_path, "dpi": dpi, "pages": names}, f)
+        os.replace(tmp_manifest, self._manifest_path(key))
+        logger.info(f"[MENU_CACHE] Rendered {len(names)} pages of {os.path.basename(self.pdf_path)} at {dpi} dpi ({key})")
+        return [str(self.out_dir / name) for name in names]
+
+    def _collect_garbage(self, key: str) -> None:
+        current = f"{self.prefix}_{key}"
+        removed = 0
+        for path in self.out_dir.glob(f"{self.prefix}_*"):
+            if path.suffix not in (".png", ".json") or path.name.startswith(f"{current}_") or path.stem == current:
+                continue
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        if removed:
+            logger.info(f"[MENU_CACHE] Removed {removed} stale {self.prefix} render files")
+
+    def get_pages(self, dpi: Optional[int] = None) -> List[str]:
+        """Paths of the rendered pages for the PDF's current content (renders on a miss)."""
+        dpi = dpi or config.MENU_RENDER_DPI
+        stat = os.stat(self.pdf_path)
+        signature = (stat.st_mtime, stat.st_size, dpi)
+        memo = self._memo
+        if memo is not None and memo[0] == signature and all(os.path.exists(p) for p in memo[1]):
+            return list(memo[1])
+
+        with self._lock:
+            key = self._key(dpi)
+            pages = self._load_manifest(key)
+            if pages is None:
+                pages = self._render(key, dpi)
+            self._collect_garbage(key)
+            self._memo = (signature, pages)
+            return list(pages)
+
+
+_menus: Dict[str, MenuRender] = {}
+
+
+def register(name: str, pdf_path: str, out_dir: Path, prefix: str) -> MenuRender:
+    _menus[name] = MenuRender(pdf_path, out_dir, prefix)
+    return _menus[name]
+
+
+def prerender() -> None:
+    """Render every registered menu that has no render for its current content (startup hook)."""
+    for name, menu in _menus.items():
+        try:
+            menu.get_pages()
+        except Exception as e:
+            logger.warning(f"[MENU_CACHE] Could not pre-render {name}: {e}")
@@ -3,9 +3,10 @@ import os
 import threading
 import logging
 import time
-from contextlib import contextmanager
 from datetime import datetime, timedelta
 
+from app import sqlite_store
+
 logger = logging.getLogger(__name__)
 
 # Track last cleanup time to throttle database cleanup operations
@@ -13,13 +14,9 @@ _last_cleanup_time = 0
 
 DB_PATH = os.environ.get("THREAD_DB_PATH", "thread_store.db")
 
-@contextmanager
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """This thread's shared WAL connection (see sqlite_store); use as a context manager."""
+    return sqlite_store.connection(DB_PATH)
 
 def init_message_buffer_db():
     with get_conn() as conn:
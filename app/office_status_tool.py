@@ -7,17 +7,22 @@ by querying the Asterisk timegroups database and evaluating automation eligibili
 Used by the assistant before making any booking to determine:
 - If offices are closed → Assistant proceeds with automated booking
 - If offices are open → Check automation windows to decide booking method
+
+The closure rules are compiled once into value sets and reloaded from the
+database in a background thread every OFFICE_RULES_TTL_SECONDS, so an answer
+never waits on the remote Asterisk database. Each answer also carries the
+time it next changes (``next_change_at``) and is reused from memory until then.
 """
 
 import os
 import logging
 import mysql.connector
+import threading
 import time
-from datetime import datetime
+from datetime import datetime, timedelta, time as dt_time
 from pytz import timezone
 import holidays
-import re
-from typing import Dict, List, Tuple, Optional, Callable, Any
+from typing import Dict, FrozenSet, List, Set, Tuple, Optional, Callable, Any
 from . import config
 
 logger = logging.getLogger(__name__)
@@ -32,214 +37,94 @@ EL_SALVADOR_TZ = timezone('America/El_Salvador')
 # El Salvador holidays
 EL_SALVADOR_HOLIDAYS = holidays.country_holidays('SV')
 
-def _parse_time_segment(time_segment: str, current_time: datetime) -> bool:
-    """
-    Parse and match time segment in HH:MM-HH:MM format.
-    Handles spanning midnight ranges (e.g., 23:00-02:00).
-    
-    Args:
-        time_segment: Time range string (e.g., "08:00-17:00" or "23:00-02:00")
-        current_time: Current datetime object
-        
-    Returns:
-        bool: True if current time matches the segment
-    """
-    if not time_segment or time_segment == '*':
-        return True
-    
-    try:
-        if '-' not in time_segment:
-            logger.warning(f"Invalid time segment format: {time_segment}")
-            return False
-            
-        start_str, end_str = time_segment.split('-', 1)
-        
-        # Parse times
-        start_hour, start_min = map(int, start_str.split(':'))
-        end_hour, end_min = map(int, end_str.split(':'))
-        
-        current_hour = current_time.hour
-        current_min = current_time.minute
-        current_total_min = current_hour * 60 + current_min
-        start_total_min = start_hour * 60 + start_min
-        end_total_min = end_hour * 60 + end_min
-        
-        # Handle spanning midnight (e.g., 23:00-02:00)
-        if start_total_min > end_total_min:
-            # Time spans midnight: current time >= start OR current time <= end
-            return current_total_min >= start_total_min or current_total_min <= end_total_min
-        else:
-            # Normal range: start <= current <= end
-            return start_total_min <= current_total_min <= end_total_min
-            
-    except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing time segment '{time_segment}': {e}")
-        return False
+DAY_NAMES = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
+MONTH_NAMES = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
+               'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
+MINUTES_PER_DAY = 24 * 60
 
-def _parse_day_of_week_segment(day_segment: str, current_time: datetime) -> bool:
-    """
-    Parse and match day of week segment.
-    Handles ranges like "mon-fri" or "thu-sun" including weekend spanning.
-    
-    Args:
-        day_segment: Day range string (e.g., "mon-fri", "thu-sun", "sat")
-        current_time: Current datetime object
-        
-    Returns:
-        bool: True if current day matches the segment
-    """
-    if not day_segment or day_segment == '*':
-        return True
-    
-    day_names = ['mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun']
-    current_day = current_time.weekday()  # 0=Monday, 6=Sunday
-    
-    day_segment = day_segment.lower().strip()
-    
-    try:
-        if '-' in day_segment:
-            start_day_str, end_day_str = day_segment.split('-', 1)
-            start_day_idx = day_names.index(start_day_str.strip())
-            end_day_idx = day_names.index(end_day_str.strip())
-            
-            # Handle spanning ranges (e.g., fri-mon = fri,sat,sun,mon)
-            if start_day_idx > end_day_idx:
-                # Spans weekend: current >= start OR current <= end
-                return current_day >= start_day_idx or current_day <= end_day_idx
-            else:
-                # Normal range: start <= current <= end
-                return start_day_idx <= current_day <= end_day_idx
-        else:
-            # Single day
-            target_day_idx = day_names.index(day_segment)
-            return current_day == target_day_idx
-            
-    except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing day segment '{day_segment}': {e}")
-        return False
+# Minutes of day where the automation window opens/closes (8:10, 9:10, 13:00, 17:00)
+AUTOMATION_BOUNDARIES = (8 * 60 + 10, 9 * 60 + 10, 13 * 60, 17 * 60)
 
-def _parse_day_of_month_segment(date_segment: str, current_time: datetime) -> bool:
-    """
-    Parse and match day of month segment.
-    Handles ranges like "1-5" or "28-3" (spanning month boundary).
-    
-    Args:
-        date_segment: Date range string (e.g., "1-5", "28-3", "15")
-        current_time: Current datetime object
-        
-    Returns:
-        bool: True if current day of month matches the segment
-    """
-    if not date_segment or date_segment == '*':
-        return True
-    
-    current_day = current_time.day
-    
-    try:
-        if '-' in date_segment:
-            start_str, end_str = date_segment.split('-', 1)
-            start_day = int(start_str.strip())
-            end_day = int(end_str.strip())
-            
-            # Validate day ranges
-            if not (1 <= start_day <= 31) or not (1 <= end_day <= 31):
-                logger.warning(f"Invalid day range: {date_segment}")
-                return False
-            
-            # Handle spanning month boundary (e.g., 28-3)
-            if start_day > end_day:
-                # Spans month boundary: current >= start OR current <= end
-                return current_day >= start_day or current_day <= end_day
-            else:
-                # Normal range: start <= current <= end
-                return start_day <= current_day <= end_day
-        else:
-            # Single day
-            target_day = int(date_segment.strip())
-            if not (1 <= target_day <= 31):
-                logger.warning(f"Invalid day: {date_segment}")
-                return False
-            return current_day == target_day
-            
-    except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing date segment '{date_segment}': {e}")
-        return False
 
-def _parse_month_segment(month_segment: str, current_time: datetime) -> bool:
+def _span(start: int, end: int, lowest: int, highest: int) -> FrozenSet[int]:
+    """Inclusive range of values; start > end wraps around (e.g. 23:00-02:00, fri-mon, nov-feb)."""
+    if start <= end:
+        return frozenset(range(start, end + 1))
+    return frozenset(range(start, highest + 1)) | frozenset(range(lowest, end + 1))
+
+
+def _compile_segment(segment: str, kind: str, to_value: Callable[[str], int],
+                     lowest: int, highest: int) -> Optional[FrozenSet[int]]:
     """
-    Parse and match month segment.
-    Handles ranges like "jan-mar" or "nov-feb" (spanning year boundary).
-    
-    Args:
-        month_segment: Month range string (e.g., "jan-mar", "nov-feb", "dec")
-        current_time: Current datetime object
-        
-    Returns:
-        bool: True if current month matches the segment
+    Values matched by one rule segment, or None for a wildcard.
+    A segment that doesn't parse matches nothing (the rule never triggers), as before.
     """
-    if not month_segment or month_segment == '*':
-        return True
-    
-    month_names = ['jan', 'feb', 'mar', 'apr', 'may', 'jun',
-                   'jul', 'aug', 'sep', 'oct', 'nov', 'dec']
-    current_month = current_time.month - 1  # 0-based for list indexing
-    
-    month_segment = month_segment.lower().strip()
-    
+    segment = segment.strip().lower()
+    if not segment or segment == '*':
+        return None
     try:
-        if '-' in month_segment:
-            start_month_str, end_month_str = month_segment.split('-', 1)
-            start_month_idx = month_names.index(start_month_str.strip())
-            end_month_idx = month_names.index(end_month_str.strip())
-            
-            # Handle spanning year boundary (e.g., nov-feb)
-            if start_month_idx > end_month_idx:
-                # Spans year boundary: current >= start OR current <= end
-                return current_month >= start_month_idx or current_month <= end_month_idx
-            else:
-                # Normal range: start <= current <= end
-                return start_month_idx <= current_month <= end_month_idx
+        if '-' in segment:
+            start_str, end_str = segment.split('-', 1)
+            start, end = to_value(start_str.strip()), to_value(end_str.strip())
         else:
-            # Single month
-            target_month_idx = month_names.index(month_segment)
-            return current_month == target_month_idx
-            
+            start = end = to_value(segment)
+        if not (lowest <= start <= highest and lowest <= end <= highest):
+            raise ValueError(f"out of range {lowest}-{highest}")
+        if kind == 'time' and '-' not in segment:
+            raise ValueError("expected HH:MM-HH:MM")
+        return _span(start, end, lowest, highest)
     except (ValueError, IndexError) as e:
-        logger.error(f"Error parsing month segment '{month_segment}': {e}")
-        return False
+        logger.error(f"Error parsing {kind} segment '{segment}': {e}")
+        return frozenset()
 
-def _matches_closure_rule(rule: str, current_time: datetime) -> Tuple[bool, str]:
+
+def _minute_of_day(value: str) -> int:
+    hour, minute = map(int, value.split(':'))
+    return hour * 60 + minute
+
+
+class ClosureRule:
     """
-    Check if current time matches a closure rule in Asterisk 11 format.
-    
-    Args:
-        rule: Pipe-delimited rule string (TIME|DAY|DATE|MONTH)
-        current_time: Current datetime object
-        
-    Returns:
-        Tuple[bool, str]: (matches, description)
+    One Asterisk 11 time group rule (TIME|DAY|DATE|MONTH), compiled into value sets.
+
+    Matching a moment is four set lookups; the sets keep the old parsers' semantics
+    (inclusive ends, ranges wrapping around midnight / the weekend / the month / the year).
     """
-    if not rule or not rule.strip():
-        return False, "Empty rule"
-    
-    # Split by pipe and pad with wildcards if needed
-    segments = rule.split('|')
-    while len(segments) < 4:
-        segments.append('*')
-    
-    time_seg, day_seg, date_seg, month_seg = segments[:4]
-    
-    # All segments must match for rule to trigger
-    time_matches = _parse_time_segment(time_seg.strip(), current_time)
-    day_matches = _parse_day_of_week_segment(day_seg.strip(), current_time)
-    date_matches = _parse_day_of_month_segment(date_seg.strip(), current_time)
-    month_matches = _parse_month_segment(month_seg.strip(), current_time)
-    
-    if time_matches and day_matches and date_matches and month_matches:
-        description = f"Closure rule: {time_seg}|{day_seg}|{date_seg}|{month_seg}"
-        return True, description
-    
-    return False, f"Rule did not match: {rule}"
+
+    __slots__ = ("rule", "minutes", "weekdays", "days", "months")
+
+    def __init__(self, rule: str):
+        segments = rule.split('|')
+        while len(segments) < 4:
+            segments.append('*')
+        time_seg, day_seg, date_seg, month_seg = segments[:4]
+        self.rule = f"{time_seg}|{day_seg}|{date_seg}|{month_seg}"
+        self.minutes = _compile_segment(time_seg, 'time', _minute_of_day, 0, MINUTES_PER_DAY - 1)
+        self.weekdays = _compile_segment(day_seg, 'day', DAY_NAMES.index, 0, 6)
+        self.days = _compile_segment(date_seg, 'date', int, 1, 31)
+        self.months = _compile_segment(month_seg, 'month', lambda m: MONTH_NAMES.index(m) + 1, 1, 12)
+
+    def matches(self, moment: datetime) -> bool:
+        return (
+            (self.minutes is None or moment.hour * 60 + moment.minute in self.minutes)
+            and (self.weekdays is None or moment.weekday() in self.weekdays)
+            and (self.days is None or moment.day in self.days)
+            and (self.months is None or moment.month in self.months)
+        )
+
+    def boundaries(self) -> Set[int]:
+        """Minutes of day where this rule can start or stop matching (besides midnight)."""
+        if not self.minutes:
+            return set()
+        return {m for m in self.minutes if (m - 1) % MINUTES_PER_DAY not in self.minutes} | {
+            (m + 1) % MINUTES_PER_DAY for m in self.minutes if (m + 1) % MINUTES_PER_DAY not in self.minutes
+        }
+
+
+def compile_rules(rules: List[str]) -> List[ClosureRule]:
+    """Compile closure rule strings, skipping empty ones."""
+    return [ClosureRule(rule) for rule in rules if rule and rule.strip()]
+
 
 def _is_in_automation_window(current_time: datetime) -> Tuple[bool, str]:
     """
@@ -285,6 +170,7 @@ def _get_office_database_connection() -> mysql.connector.MySQLConnection:
     """
     Create database connection for office status queries with limited retries.
     Loads credentials directly from .env file for reliability.
+    Only called from the rules refresh (background thread or the first load), never per request.
     
     Returns:
         MySQL connection object
@@ -311,7 +197,7 @@ def _get_office_database_connection() -> mysql.connector.MySQLConnection:
                 password=os.getenv('OFFICE_DB_PASSWORD', ''),
                 charset='utf8',
                 autocommit=True,
-                connection_timeout=60
+                connection_timeout=config.OFFICE_DB_CONNECT_TIMEOUT_SECONDS
             )
             if attempt > 1:
                 logger.info(f"[OFFICE_DB] Successfully connected on attempt #{attempt}")
@@ -325,83 +211,194 @@ def _get_office_database_connection() -> mysql.connector.MySQLConnection:
     logger.error(f"[OFFICE_DB] All {OFFICE_MAX_RETRIES} connection attempts failed. Giving up.")
     raise last_error
 
-def check_office_status() -> Dict[str, any]:
+
+class _RuleSnapshot:
+    """Compiled closure rules as last loaded from the database."""
+
+    def __init__(self, rules: List[ClosureRule]):
+        self.rules = rules
+        self.loaded_at = time.time()
+        boundaries = set(AUTOMATION_BOUNDARIES)
+        for rule in rules:
+            boundaries |= rule.boundaries()
+        boundaries.discard(0)
+        # Minutes of day where the office state can change (it can also change at midnight)
+        self.boundaries = sorted(boundaries)
+
+
+_snapshot: Optional[_RuleSnapshot] = None
+_next_refresh = 0.0  # time.monotonic() after which the rules are reloaded
+_refresh_lock = threading.Lock()
+_refreshing = False
+# (snapshot, valid until epoch seconds, result) of the last answer
+_answer: Optional[Tuple[_RuleSnapshot, float, Dict[str, Any]]] = None
+_stats = {"answers": 0, "answers_from_memory": 0, "refreshes": 0, "refresh_failures": 0}
+
+
+def _load_rules() -> List[ClosureRule]:
+    connection = _get_office_database_connection()
+    cursor = None
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT time FROM timegroups_details WHERE timegroupid = 3")
+        rows = cursor.fetchall()
+    finally:
+        if cursor is not None:
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        if connection.is_connected():
+            connection.close()
+    return compile_rules([row[0] for row in rows if row and row[0]])
+
+
+def refresh_rules() -> bool:
     """
-    Check customer service office status and automation eligibility.
-    Uses limited retry (3 attempts) for database operations.
-    If database check fails, defaults to allowing automation so bookings can proceed.
-    
-    This is the main tool function called by the assistant before making bookings.
-    
-    Returns:
-        Dict containing:
-        - office_status: "open" | "closed"
-        - reason: Human-readable explanation
-        - can_automate: bool
-        - automation_reason: Human-readable automation explanation
+    Reload and compile the closure rules now (startup hook / background refresh).
+    On failure the previous rules stay in use and the reload is retried sooner.
     """
-    # Get current time in El Salvador timezone
-    current_time = datetime.now(EL_SALVADOR_TZ)
-    logger.info(f"[OFFICE_STATUS] Checking office status at {current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}")
-    
-    # Query database for closure rules with limited retry
-    closure_rules = []
+    global _snapshot, _next_refresh, _refreshing
     try:
-        connection = _get_office_database_connection()
-        try:
-            cursor = connection.cursor()
-            query = "SELECT time FROM timegroups_details WHERE timegroupid = 3"
-            cursor.execute(query)
-            closure_rules = cursor.fetchall()
-            logger.info(f"[OFFICE_STATUS] Retrieved {len(closure_rules)} closure rules from database")
-        finally:
-            if connection and connection.is_connected():
-                try:
-                    cursor.close()
-                except:
-                    pass
-                connection.close()
+        rules = _load_rules()
     except Exception as e:
-        # Database failed after 3 retries - default to allowing automation
-        logger.error(f"[OFFICE_STATUS] Database check failed after {OFFICE_MAX_RETRIES} retries: {e}")
-        logger.info("[OFFICE_STATUS] Defaulting to can_automate=True so bookings can proceed")
-        return {
-            "office_status": "unknown",
-            "reason": f"Database unavailable after {OFFICE_MAX_RETRIES} retries - defaulting to automation",
-            "can_automate": True,
-            "automation_reason": "Database check failed - allowing automation so bookings can proceed"
-        }
-    
-    # Check if any closure rule matches current time
+        _stats["refresh_failures"] += 1
+        _next_refresh = time.monotonic() + config.OFFICE_RULES_RETRY_SECONDS
+        logger.error(f"[OFFICE_STATUS] Could not refresh closure rules: {e}")
+        return False
+    finally:
+        _refreshing = False
+    _snapshot = _RuleSnapshot(rules)
+    _next_refresh = time.monotonic() + config.OFFICE_RULES_TTL_SECONDS
+    _stats["refreshes"] += 1
+    logger.info(f"[OFFICE_STATUS] Compiled {len(rules)} closure rules from database")
+    return True
+
+
+def _current_rules() -> Optional[_RuleSnapshot]:
+    """The compiled rules; stale rules are served while a background thread reloads them."""
+    global _refreshing
+    if _snapshot is None:
+        with _refresh_lock:
+            if _snapshot is None and time.monotonic() >= _next_refresh:
+                _refreshing = True
+                refresh_rules()
+        return _snapshot
+    if time.monotonic() >= _next_refresh and not _refreshing:
+        with _refresh_lock:
+            if _refreshing:
+                return _snapshot
+            _refreshing = True
+        threading.Thread(target=refresh_rules, name="office_rules_refresh", daemon=True).start()
+    return _snapshot
+
+
+def prime() -> None:
+    """Load the closure rules in the background so the first booking doesn't wait on the database (startup hook)."""
+    threading.Thread(target=_current_rules, name="office_rules_refresh", daemon=True).start()
+
+
+def _evaluate(snapshot: _RuleSnapshot, moment: datetime) -> Dict[str, Any]:
     office_closed = False
     closure_reason = "Open - no matching closure rules in database"
     
-    for rule_tuple in closure_rules:
-        rule = rule_tuple[0] if rule_tuple and rule_tuple[0] else ""
-        matches, description = _matches_closure_rule(rule, current_time)
-        
-        if matches:
+    for rule in snapshot.rules:
+        if rule.matches(moment):
             office_closed = True
-            closure_reason = f"Closed per database rule: {description}"
-            logger.info(f"[OFFICE_STATUS] Office closed - matched rule: {rule}")
+            closure_reason = f"Closed per database rule: Closure rule: {rule.rule}"
             break
     
-    # Determine office status
-    office_status = "closed" if office_closed else "open"
-    
     # Determine automation eligibility
     if office_closed:
         can_automate = True
         automation_reason = "Office closed per database - assistant handles all bookings during closures"
     else:
-        can_automate, automation_reason = _is_in_automation_window(current_time)
+        can_automate, automation_reason = _is_in_automation_window(moment)
     
-    result = {
-        "office_status": office_status,
+    return {
+        "office_status": "closed" if office_closed else "open",
         "reason": closure_reason,
         "can_automate": can_automate,
         "automation_reason": automation_reason
     }
+
+
+def next_state_change(snapshot: _RuleSnapshot, now: datetime,
+                      state: Tuple[str, bool]) -> Optional[datetime]:
+    """
+    First moment after ``now`` where (office_status, can_automate) differs from ``state``.
+
+    The state can only change at midnight or at a rule/automation boundary minute,
+    so only those moments are evaluated. None if nothing changes within a week.
+    """
+    today = now.date()
+    for day_offset in range(8):
+        day = today + timedelta(days=day_offset)
+        for minute in [0] + snapshot.boundaries:
+            moment = EL_SALVADOR_TZ.localize(datetime.combine(day, dt_time(minute // 60, minute % 60)))
+            if moment <= now:
+                continue
+            result = _evaluate(snapshot, moment)
+            if (result["office_status"], result["can_automate"]) != state:
+                return moment
+    return None
+
+
+def check_office_status() -> Dict[str, any]:
+    """
+    Check customer service office status and automation eligibility.
+    Answers from the compiled closure rules in memory; the rules are reloaded
+    from the database in the background every OFFICE_RULES_TTL_SECONDS.
+    If the rules were never loaded, defaults to allowing automation so bookings can proceed.
     
-    logger.info(f"[OFFICE_STATUS] Result: {result}")
-    return result
+    This is the main tool function called by the assistant before making bookings.
+    
+    Returns:
+        Dict containing:
+        - office_status: "open" | "closed"
+        - reason: Human-readable explanation
+        - can_automate: bool
+        - automation_reason: Human-readable automation explanation
+        - next_change_at: ISO time (El Salvador) when the answer changes, or None
+        - valid_for_seconds: Seconds the answer can be cached (never past local midnight), or None
+    """
+    global _answer
+    _stats["answers"] += 1
+    snapshot = _current_rules()
+    if snapshot is None:
+        logger.info("[OFFICE_STATUS] Closure rules unavailable, defaulting to can_automate=True so bookings can proceed")
+        return {
+            "office_status": "unknown",
+            "reason": f"Database unavailable after {OFFICE_MAX_RETRIES} retries - defaulting to automation",
+            "can_automate": True,
+            "automation_reason": "Database check failed - allowing automation so bookings can proceed"
+        }
+
+    answer = _answer
+    now_epoch = time.time()
+    if answer is not None and answer[0] is snapshot and now_epoch < answer[1]:
+        _stats["answers_from_memory"] += 1
+        return {**answer[2], "valid_for_seconds": int(answer[1] - now_epoch)}
+
+    # Get current time in El Salvador timezone
+    current_time = datetime.now(EL_SALVADOR_TZ)
+    result = _evaluate(snapshot, current_time)
+    change_at = next_state_change(snapshot, current_time, (result["office_status"], result["can_automate"]))
+    result["next_change_at"] = change_at.isoformat() if change_at else None
+    # reason/automation_reason can change at midnight (weekday vs weekend hours, holidays) while the state doesn't
+    next_midnight = EL_SALVADOR_TZ.localize(datetime.combine(current_time.date() + timedelta(days=1), dt_time(0, 0)))
+    valid_until = min(change_at.timestamp() if change_at else now_epoch + 24 * 3600, next_midnight.timestamp())
+    result["valid_for_seconds"] = int(valid_until - now_epoch)
+    _answer = (snapshot, valid_until, result)
+    
+    logger.info(f"[OFFICE_STATUS] Result at {current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}: {result}")
+    return dict(result)
+
+
+def get_metrics() -> Dict[str, Any]:
+    snapshot = _snapshot
+    return {
+        **_stats,
+        "rules": len(snapshot.rules) if snapshot else None,
+        "rules_age_seconds": round(time.time() - snapshot.loaded_at) if snapshot else None,
+    }
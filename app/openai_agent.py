@@ -2,13 +2,9 @@ import asyncio
 import inspect
 import json
 import logging
-import os
-import sqlite3
 import time
 from typing import Dict, List, Any, Optional, Tuple, Union
 from datetime import datetime, timedelta
-import re
-import httpx
 
 from openai import AsyncOpenAI
 from . import config, database_client
@@ -26,9 +22,15 @@ from app import wati_client
 from app.clients import manychat_client
 from app import menu_reader
 from app import menu_prices_reader
+from app import gallery
 from app import operations_tool
+from app.clients import http_pool
+from app import instructions_registry
+from app import tool_executor
 logger = logging.getLogger(__name__)
 
+OPENAI_CONVERSATIONS_URL = "https://api.openai.com/v1/conversations"
+
 # Initialize OpenAI client for Responses API
 openai_client = AsyncOpenAI(api_key=config.OPENAI_API_KEY)
 
@@ -179,8 +181,6 @@ def _build_input_messages(system_msg: str, user_msg: str, developer_msg: str = N
     return msgs
 
 
-_OCCUPANCY_RULES_CACHE: str = ""
-
 def _get_occupancy_rules() -> str:
     """Return ALL occupancy-related rules consolidated from system instructions.
 
@@ -198,13 +198,11 @@ def _get_occupancy_rules() -> str:
     capacity constraints when deciding which room type to offer, and never
     blindly reports all available types from the tool result.
     """
-    global _OCCUPANCY_RULES_CACHE
-    if _OCCUPANCY_RULES_CACHE:
-        return _OCCUPANCY_RULES_CACHE
+    return instructions_registry.derived("occupancy_rules", _build_occupancy_rules)
+
+
+def _build_occupancy_rules(data: Dict[str, Any]) -> str:
     try:
-        path = os.path.join(os.path.dirname(__file__), "resources", "system_instructions_new.txt")
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.loads(f.read())
         # Source 1: MODULE_2C occupancy_rules (now includes moved prohibitions)
         rules = data["MODULE_2C_AVAILABILITY"]["occupancy_rules"]
         # Source 2: DECISION_TREE.PRIORITY_3_SALES_INTENTS.multi_room_booking
@@ -227,14 +225,11 @@ def _get_occupancy_rules() -> str:
         auto_filter = rules.get("auto_filter", "")
         if auto_filter:
             parts.append(f"\n🚨 AUTO_FILTER (apply IMMEDIATELY after availability tool — BEFORE responding to customer): {auto_filter}")
-        _OCCUPANCY_RULES_CACHE = "\n".join(parts)
+        return "\n".join(parts)
     except Exception as e:
         logger.error(f"[OCCUPANCY_RULES] Failed to load: {e}")
-        _OCCUPANCY_RULES_CACHE = '{"error": "occupancy_rules unavailable"}'
-    return _OCCUPANCY_RULES_CACHE
-
+        return '{"error": "occupancy_rules unavailable"}'
 
-_PRICING_RULES_CACHE: str = ""
 
 def _get_pricing_rules() -> str:
     """Return critical pricing calculation rules from MODULE_2B_PRICE_INQUIRY.
@@ -251,13 +246,11 @@ def _get_pricing_rules() -> str:
     computing totals, and proactively includes room amenity highlights in
     accommodation quotes, regardless of which modules were dynamically loaded.
     """
-    global _PRICING_RULES_CACHE
-    if _PRICING_RULES_CACHE:
-        return _PRICING_RULES_CACHE
+    return instructions_registry.derived("pricing_rules", _build_pricing_rules)
+
+
+def _build_pricing_rules(data: Dict[str, Any]) -> str:
     try:
-        path = os.path.join(os.path.dirname(__file__), "resources", "system_instructions_new.txt")
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.loads(f.read())
         pricing = data["MODULE_2B_PRICE_INQUIRY"]["pricing_logic"]
         promo  = data["MODULE_2B_PRICE_INQUIRY"]["promotion_validation_cross_check"]
 
@@ -293,11 +286,10 @@ def _get_pricing_rules() -> str:
                 "  Matrimonial → cama king, terraza privada y hamacas, ideal para parejas"
             )
             parts.append(room_feat_block)
-        _PRICING_RULES_CACHE = "\n".join(parts)
+        return "\n".join(parts)
     except Exception as e:
         logger.error(f"[PRICING_RULES] Failed to load: {e}")
-        _PRICING_RULES_CACHE = '{"error": "pricing_rules unavailable"}'
-    return _PRICING_RULES_CACHE
+        return '{"error": "pricing_rules unavailable"}'
 
 
 # Add system instruction loading function
@@ -308,10 +300,10 @@ def load_system_instructions():
 
 def build_classification_system_prompt() -> str:
     """Build minimal system prompt with base modules for classification"""
-    
-    with open('app/resources/system_instructions_new.txt', 'r', encoding='utf-8') as f:
-        modular_data = json.loads(f.read())
-    
+    return instructions_registry.derived("classification_prompt", _build_classification_prompt)
+
+
+def _build_classification_prompt(modular_data: Dict[str, Any]) -> str:
     base_modules = {
         "MODULE_SYSTEM": modular_data.get("MODULE_SYSTEM", {}),
         "DECISION_TREE": modular_data.get("DECISION_TREE", {}),
@@ -431,9 +423,6 @@ async def load_additional_modules(modules: List[str], reasoning: str, user_ident
     
     logger.info(f"[DYNAMIC_LOADING] Loading {len(modules)} modules for stateless API call: {modules}")
     
-    with open('app/resources/system_instructions_new.txt', 'r', encoding='utf-8') as f:
-        all_modules = json.loads(f.read())
-    
     # Always include base modules header
     loaded_content = "=== BASE MODULES ALREADY LOADED ===\n"
     loaded_content += "MODULE_SYSTEM, DECISION_TREE, MODULE_DEPENDENCIES, CORE_CONFIG (includes universal safety protocols)\n\n"
@@ -444,34 +433,20 @@ async def load_additional_modules(modules: List[str], reasoning: str, user_ident
         # Check if micro-loading (has dot notation)
         if '.' in module_ref:
             # Micro-load: MODULE_2D_SPECIAL_SCENARIOS.membership_sales_protocol
-            parts = module_ref.split('.')
-            module_name = parts[0]
-            protocol_path = parts[1:]
-            
-            if module_name not in all_modules:
-                logger.warning(f"[DYNAMIC_LOADING] Module not found: {module_name}")
-                continue
-            
-            # Navigate to the specific protocol
-            content = all_modules[module_name]
-            for key in protocol_path:
-                if isinstance(content, dict) and key in content:
-                    content = content[key]
-                else:
-                    logger.warning(f"[DYNAMIC_LOADING] Protocol path not found: {module_ref}")
-                    content = None
-                    break
-            
-            if content is not None:
+            module_json = instructions_registry.get_module_json(module_ref)
+            if module_json is not None:
                 loaded_content += f"=== {module_ref} (MICRO-LOAD) ===\n"
-                loaded_content += json.dumps({protocol_path[-1]: content}, ensure_ascii=False, indent=2) + "\n\n"
+                loaded_content += module_json + "\n\n"
                 logger.info(f"[DYNAMIC_LOADING] Micro-loaded: {module_ref}")
+            else:
+                logger.warning(f"[DYNAMIC_LOADING] Protocol path not found: {module_ref}")
             
         else:
             # Full module or sub-module load
-            if module_ref in all_modules:
+            module_json = instructions_registry.get_module_json(module_ref)
+            if module_json is not None:
                 loaded_content += f"=== {module_ref} ===\n"
-                loaded_content += json.dumps(all_modules[module_ref], ensure_ascii=False, indent=2) + "\n\n"
+                loaded_content += module_json + "\n\n"
                 logger.info(f"[DYNAMIC_LOADING] Loaded full module: {module_ref}")
             else:
                 logger.warning(f"[DYNAMIC_LOADING] Module not found: {module_ref}")
@@ -1305,13 +1280,11 @@ async def add_message_to_thread(thread_id: str, content: str):
         from .thread_store import get_last_response_id
         
         # Extract wa_id from thread_id lookup in database
-        import sqlite3
+        from . import sqlite_store
         try:
-            conn = sqlite3.connect("thread_store.db")
-            cursor = conn.cursor()
-            cursor.execute("SELECT wa_id FROM threads WHERE thread_id = ? OR conversation_id = ?", (thread_id, thread_id))
-            result = cursor.fetchone()
-            conn.close()
+            with sqlite_store.connection("thread_store.db") as conn:
+                cursor = conn.execute("SELECT wa_id FROM threads WHERE thread_id = ? OR conversation_id = ?", (thread_id, thread_id))
+                result = cursor.fetchone()
             
             if result:
                 user_identifier = result[0]
@@ -1379,43 +1352,30 @@ def format_location_as_text(latitude: float, longitude: float, name: str, addres
     maps_url = f"https://www.google.com/maps/search/?api=1&query={latitude},{longitude}"
     return f"Aquí está la ubicación de {name}:\n\n{address}\n\nPuede encontrarlo en Google Maps aquí: {maps_url}"
 
-def generate_caption_from_filename(filename: str, bungalow_type: str) -> str:
-    """Generates a user-friendly Spanish caption from a filename."""
-    name_part = os.path.splitext(filename)[0]
+async def _deliver_gallery(
+    photos: List[gallery.GalleryPhoto],
+    phone_number: Optional[str],
+    subscriber_id: Optional[str],
+    channel: Optional[str],
+) -> int:
+    """Send gallery photos in order over the customer's channel (raises on a failed WATI upload)."""
+    if subscriber_id and channel in ("facebook", "instagram"):
+        async def send(batch):
+            # Captions + images in one ordered ManyChat request
+            await manychat_client.send_image_batch(subscriber_id=subscriber_id, items=batch, channel=channel)
+
+        return await gallery.deliver(
+            photos, send,
+            batch_size=manychat_client.MAX_MESSAGES_PER_CONTENT // 2,
+            interval=config.GALLERY_SEND_INTERVAL_SECONDS,
+        )
 
-    bungalow_map = {
-        "Bungalow Familiar": "bungalow_familiar",
-        "Bungalow Junior": "bungalow_junior",
-        "Habitacion": "habitacion"
-    }
-    prefix_to_remove = bungalow_map.get(bungalow_type, "").lower().replace(" ", "_") + "_"
-    if name_part.startswith(prefix_to_remove):
-        name_part = name_part[len(prefix_to_remove):]
-
-    name_part = name_part.replace('_', ' ').replace('-', ' ')
-
-    translations = {
-        "livingroom": "Sala de Estar",
-        "masterbedroom": "Habitación Principal",
-        "outside": "Vista Exterior",
-        "terrace": "Terraza",
-        "cuarto": "Habitación",
-        "room": "Habitación",
-        "bathroom": "Baño"
-    }
+    async def send(batch):
+        for file_path, caption in batch:
+            await wati_client.send_wati_file(phone_number=phone_number, caption=caption, file_path=file_path)
 
-    parts = re.findall(r'[a-zA-Z]+|\d+', name_part)
-    
-    description_parts = []
-    for part in parts:
-        if part.lower() in translations:
-            description_parts.append(translations[part.lower()])
-        else:
-            description_parts.append(part.capitalize())
-    
-    description = " ".join(description_parts)
-
-    return f"{description} - {bungalow_type}"
+    # Small delay between files to prevent flooding
+    return await gallery.deliver(photos, send, interval=config.GALLERY_SEND_INTERVAL_SECONDS)
 
 async def send_bungalow_pictures(
     bungalow_type: str,
@@ -1430,62 +1390,36 @@ async def send_bungalow_pictures(
     - Else if `phone_number` is provided, send via WATI (WhatsApp).
     - Else return an error indicating missing identifiers.
     """
-    base_path = "/home/robin/watibot4/app/resources/pictures"
-    type_map = {
-        "Bungalow Familiar": "bungalow_familiar",
-        "Bungalow Junior": "bungalow_junior",
-        "Habitacion": "habitacion"
-    }
-    
-    dir_name = type_map.get(bungalow_type)
-    if not dir_name:
+    if bungalow_type not in gallery.GALLERIES or bungalow_type == "Áreas Públicas":
         logger.error(f"Invalid bungalow type received: {bungalow_type}")
         return f"Error: El tipo de bungalow '{bungalow_type}' no es válido."
 
-    picture_dir = os.path.join(base_path, dir_name)
+    pictures = gallery.get_gallery(bungalow_type)
 
-    if not os.path.isdir(picture_dir):
-        logger.error(f"Picture directory not found: {picture_dir}")
+    if pictures is None:
+        logger.error(f"Picture directory not found for {bungalow_type}")
         return f"Lo siento, no pude encontrar el directorio de fotos para {bungalow_type}."
 
-    pictures = sorted([f for f in os.listdir(picture_dir) if os.path.isfile(os.path.join(picture_dir, f))])
-
     if not pictures:
-        logger.warning(f"No pictures found in {picture_dir}")
+        logger.warning(f"No pictures found for {bungalow_type}")
         return f"Lo siento, no hay fotos disponibles para {bungalow_type} en este momento."
 
+    if not phone_number and not (subscriber_id and channel in ("facebook", "instagram")):
+        logger.error("No subscriber_id/channel or phone_number provided to send media.")
+        return (
+            "Lo siento, no pude identificar tu canal para enviar las fotos. "
+            "Por favor intenta de nuevo."
+        )
+
     logger.info(
         f"Found {len(pictures)} pictures for {bungalow_type}. "
         f"Target -> channel={channel}, subscriber_id={subscriber_id}, phone_number={phone_number}"
     )
-    for pic in pictures:
-        file_path = os.path.join(picture_dir, pic)
-        caption = generate_caption_from_filename(pic, bungalow_type)
-        try:
-            if subscriber_id and channel in ("facebook", "instagram"):
-                await manychat_client.send_media_message(
-                    subscriber_id=subscriber_id,
-                    file_path=file_path,
-                    media_type="image",
-                    channel=channel,
-                    caption=caption,
-                )
-            elif phone_number:
-                await wati_client.send_wati_file(
-                    phone_number=phone_number,
-                    caption=caption,
-                    file_path=file_path,
-                )
-            else:
-                logger.error("No subscriber_id/channel or phone_number provided to send media.")
-                return (
-                    "Lo siento, no pude identificar tu canal para enviar las fotos. "
-                    "Por favor intenta de nuevo."
-                )
-            await asyncio.sleep(1)  # Small delay to prevent flooding
-        except Exception as e:
-            logger.exception(f"Failed to send picture {file_path} to {phone_number}")
-            return f"Tuve un problema al enviar una de las fotos. Por favor, inténtalo de nuevo."
+    try:
+        await _deliver_gallery(pictures, phone_number, subscriber_id, channel)
+    except Exception as e:
+        logger.exception(f"Failed to send {bungalow_type} pictures to {phone_number}")
+        return f"Tuve un problema al enviar una de las fotos. Por favor, inténtalo de nuevo."
 
     return f"He enviado {len(pictures)} foto(s) de {bungalow_type}. ¡Espero que te gusten!"
 
@@ -1498,51 +1432,32 @@ async def send_public_areas_pictures(
 
     See `send_bungalow_pictures` for routing logic.
     """
-    base_path = "/home/robin/watibot4/app/resources/pictures"
-    picture_dir = os.path.join(base_path, "public_areas")
+    pictures = gallery.get_gallery("Áreas Públicas")
 
-    if not os.path.isdir(picture_dir):
-        logger.error(f"Public areas picture directory not found: {picture_dir}")
+    if pictures is None:
+        logger.error("Public areas picture directory not found")
         return f"Lo siento, no pude encontrar el directorio de fotos de las áreas públicas."
 
-    pictures = sorted([f for f in os.listdir(picture_dir) if os.path.isfile(os.path.join(picture_dir, f))])
-
     if not pictures:
-        logger.warning(f"No pictures found in {picture_dir}")
+        logger.warning("No public area pictures found")
         return f"Lo siento, no hay fotos disponibles de las áreas públicas en este momento."
 
+    if not phone_number and not (subscriber_id and channel in ("facebook", "instagram")):
+        logger.error("No subscriber_id/channel or phone_number provided to send media.")
+        return (
+            "Lo siento, no pude identificar tu canal para enviar las fotos. "
+            "Por favor intenta de nuevo."
+        )
+
     logger.info(
         f"Found {len(pictures)} public area pictures. "
         f"Target -> channel={channel}, subscriber_id={subscriber_id}, phone_number={phone_number}"
     )
-    for pic in pictures:
-        file_path = os.path.join(picture_dir, pic)
-        caption = generate_caption_from_filename(pic, "Áreas Públicas")
-        try:
-            if subscriber_id and channel in ("facebook", "instagram"):
-                await manychat_client.send_media_message(
-                    subscriber_id=subscriber_id,
-                    file_path=file_path,
-                    media_type="image",
-                    channel=channel,
-                    caption=caption,
-                )
-            elif phone_number:
-                await wati_client.send_wati_file(
-                    phone_number=phone_number,
-                    caption=caption,
-                    file_path=file_path,
-                )
-            else:
-                logger.error("No subscriber_id/channel or phone_number provided to send media.")
-                return (
-                    "Lo siento, no pude identificar tu canal para enviar las fotos. "
-                    "Por favor intenta de nuevo."
-                )
-            await asyncio.sleep(1)  # Small delay to prevent flooding
-        except Exception as e:
-            logger.exception(f"Failed to send public area picture {file_path} to {phone_number}")
-            return f"Tuve un problema al enviar una de las fotos de las áreas públicas. Por favor, inténtalo de nuevo."
+    try:
+        await _deliver_gallery(pictures, phone_number, subscriber_id, channel)
+    except Exception as e:
+        logger.exception(f"Failed to send public area pictures to {phone_number}")
+        return f"Tuve un problema al enviar una de las fotos de las áreas públicas. Por favor, inténtalo de nuevo."
 
     return f"He enviado {len(pictures)} foto(s) de las áreas públicas del hotel. ¡Espero que te gusten!"
 
@@ -1560,27 +1475,15 @@ async def send_menu_pdf_wrapper(
     
     Returns a confirmation message that serves as the final response to the user.
     """
-    menu_pdf_path = "/home/robin/watibot4/app/resources/menu.pdf"
+    menu_pdf_path = menu_reader.MENU_PDF_PATH
     if subscriber_id and channel in ("facebook", "instagram"):
         # Instagram: convert PDF to images and send as images (IG doesn't support PDF attachments)
         if channel == "instagram":
-            # Step 1: Convert PDF to images (separate try block)
+            # Step 1: Get the pre-rendered page images (separate try block)
             image_paths = []
             try:
-                import fitz  # PyMuPDF
-                from pathlib import Path
-                import time as _time
-                out_dir = Path(__file__).resolve().parent / "resources" / "pictures" / "menu_converted"
-                out_dir.mkdir(parents=True, exist_ok=True)
-                ts = int(_time.time())
-                doc = fitz.open(menu_pdf_path)
-                for i, page in enumerate(doc):
-                    pix = page.get_pixmap(dpi=144)
-                    img_path = out_dir / f"menu_{ts}_p{i+1}.png"
-                    pix.save(str(img_path))
-                    image_paths.append(str(img_path))
-                doc.close()
-                logger.info(f"[IG_MENU] Converted menu.pdf to {len(image_paths)} images")
+                image_paths = await menu_reader.get_menu_pages()
+                logger.info(f"[IG_MENU] Using {len(image_paths)} cached menu page images")
             except Exception as e:
                 logger.exception(f"[IG_MENU] PDF->image conversion failed: {type(e).__name__}: {e}")
                 # Send text message explaining the issue (don't send PDF URL - IG can't handle it)
@@ -1657,27 +1560,15 @@ async def send_menu_prices_wrapper(
     
     Returns a confirmation message that serves as the final response to the user.
     """
-    menu_prices_pdf_path = "/home/robin/watibot4/app/resources/menu_prices.pdf"
+    menu_prices_pdf_path = menu_prices_reader.MENU_PRICES_PDF_PATH
     if subscriber_id and channel in ("facebook", "instagram"):
         # Instagram: convert PDF to images and send as images (IG doesn't support PDF attachments)
         if channel == "instagram":
-            # Step 1: Convert PDF to images (separate try block)
+            # Step 1: Get the pre-rendered page images (separate try block)
             image_paths = []
             try:
-                import fitz  # PyMuPDF
-                from pathlib import Path
-                import time as _time
-                out_dir = Path(__file__).resolve().parent / "resources" / "pictures" / "menu_prices_converted"
-                out_dir.mkdir(parents=True, exist_ok=True)
-                ts = int(_time.time())
-                doc = fitz.open(menu_prices_pdf_path)
-                for i, page in enumerate(doc):
-                    pix = page.get_pixmap(dpi=144)
-                    img_path = out_dir / f"menu_prices_{ts}_p{i+1}.png"
-                    pix.save(str(img_path))
-                    image_paths.append(str(img_path))
-                doc.close()
-                logger.info(f"[IG_MENU_PRICES] Converted menu_prices.pdf to {len(image_paths)} images")
+                image_paths = await menu_prices_reader.get_menu_prices_pages()
+                logger.info(f"[IG_MENU_PRICES] Using {len(image_paths)} cached menu prices page images")
             except Exception as e:
                 logger.exception(f"[IG_MENU_PRICES] PDF->image conversion failed: {type(e).__name__}: {e}")
                 # Send text message explaining the issue (don't send PDF URL - IG can't handle it)
@@ -1759,7 +1650,7 @@ available_functions = {
     "read_menu_content": menu_reader.read_menu_content_wrapper,
     "send_menu_prices": send_menu_prices_wrapper,
     "read_menu_prices_content": menu_prices_reader.read_menu_prices_content_wrapper,
-    "analyze_payment_proof": payment_proof_analyzer.analyze_payment_proof,
+    "analyze_payment_proof": payment_proof_analyzer.reanalyze_payment_proof,
     "check_office_status": office_status_tool.check_office_status,
     "transfer_to_human_agent": transfer_to_human_agent_wrapper,
     "check_room_availability": database_client.check_room_availability,
@@ -1790,16 +1681,16 @@ async def rotate_conversation_thread(old_conversation_id: str, wa_id: str, curre
     Creates a new conversation thread when the current one exceeds context window.
     Seeds the new thread with essential context from the old one.
     """
+    from . import thread_store
     from .thread_store import reset_message_count, clear_loaded_modules
     
     try:
         logger.info(f"[THREAD_ROTATION] Starting rotation for wa_id: {wa_id}")
         
         # Create new conversation using Conversations API
-        import httpx
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(OPENAI_CONVERSATIONS_URL) as client:
             response = await client.post(
-                "https://api.openai.com/v1/conversations",
+                OPENAI_CONVERSATIONS_URL,
                 headers={
                     "Authorization": f"Bearer {config.OPENAI_API_KEY}",
                     "Content-Type": "application/json",
@@ -1813,64 +1704,64 @@ async def rotate_conversation_thread(old_conversation_id: str, wa_id: str, curre
                 raise RuntimeError("Conversations API returned no id")
         logger.info(f"[THREAD_ROTATION] Created new conversation: {new_conversation_id}")
         
-        # Reset message count and clear loaded modules for fresh start
-        reset_message_count(wa_id)
-        clear_loaded_modules(wa_id)
-        logger.info(f"[MODULE_OPTIMIZATION] Reset message count and cleared loaded modules for {wa_id}")
-        
-        # NOTE: Context seeding now handled in get_openai_response via enhanced_developer_message
-        # No separate seeding call needed - prevents context overflow issues
+        # Reset counters and archive the old conversation in one transaction
+        with thread_store.batch():
+            # Reset message count and clear loaded modules for fresh start
+            reset_message_count(wa_id)
+            clear_loaded_modules(wa_id)
+            logger.info(f"[MODULE_OPTIMIZATION] Reset message count and cleared loaded modules for {wa_id}")
         
-        # Update database with new conversation ID
-        db_path = "app/thread_store.db"
+            # NOTE: Context seeding now handled in get_openai_response via enhanced_developer_message
+            # No separate seeding call needed - prevents context overflow issues
         
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.cursor()
-            
-            # Create archived_threads table if it doesn't exist
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS archived_threads (
-                    wa_id TEXT,
-                    thread_id TEXT,
-                    original_thread_id TEXT,
-                    created_at TEXT,
-                    archived_at TEXT,
-                    agent_context_injected INTEGER
-                )
-            """)
+            # Update database with new conversation ID
+            with thread_store.get_conn() as conn:
+                cursor = conn.cursor()
             
-            # Get the old thread data before deleting (wa_id is PRIMARY KEY)
-            cursor.execute(
-                "SELECT wa_id, thread_id, created_at, agent_context_injected, last_webhook_timestamp FROM threads WHERE wa_id = ?", 
-                (wa_id,)
-            )
-            old_thread_data = cursor.fetchone()
+                # Create archived_threads table if it doesn't exist
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS archived_threads (
+                        wa_id TEXT,
+                        thread_id TEXT,
+                        original_thread_id TEXT,
+                        created_at TEXT,
+                        archived_at TEXT,
+                        agent_context_injected INTEGER
+                    )
+                """)
             
-            if old_thread_data:
-                # Archive the old conversation
-                archived_name = f"{old_thread_data[1]}_archived_{int(time.time())}"  # Use actual thread_id from DB
+                # Get the old thread data before deleting (wa_id is PRIMARY KEY)
                 cursor.execute(
-                    "INSERT INTO archived_threads (wa_id, thread_id, original_thread_id, created_at, archived_at, agent_context_injected) VALUES (?, ?, ?, ?, ?, ?)",
-                    (old_thread_data[0], archived_name, old_thread_data[1], old_thread_data[2], datetime.now().isoformat(), old_thread_data[3] if len(old_thread_data) > 3 else 0)
+                    "SELECT wa_id, thread_id, created_at, agent_context_injected, last_webhook_timestamp FROM threads WHERE wa_id = ?", 
+                    (wa_id,)
                 )
+                old_thread_data = cursor.fetchone()
+            
+                if old_thread_data:
+                    # Archive the old conversation
+                    archived_name = f"{old_thread_data[1]}_archived_{int(time.time())}"  # Use actual thread_id from DB
+                    cursor.execute(
+                        "INSERT INTO archived_threads (wa_id, thread_id, original_thread_id, created_at, archived_at, agent_context_injected) VALUES (?, ?, ?, ?, ?, ?)",
+                        (old_thread_data[0], archived_name, old_thread_data[1], old_thread_data[2], datetime.now().isoformat(), old_thread_data[3] if len(old_thread_data) > 3 else 0)
+                    )
                 
-                # Delete the old thread record by wa_id only (wa_id is PRIMARY KEY)
+                    # Delete the old thread record by wa_id only (wa_id is PRIMARY KEY)
+                    cursor.execute(
+                        "DELETE FROM threads WHERE wa_id = ?", 
+                        (wa_id,)
+                    )
+                    logger.info(f"[THREAD_ROTATION] Archived old conversation {old_thread_data[1]} for {wa_id}")
+            
+                # Insert new conversation record, preserving last_webhook_timestamp so the
+                # missed-messages gap check (time_diff > 300s) works correctly after rotation.
+                old_webhook_ts = old_thread_data[4] if (old_thread_data and len(old_thread_data) > 4) else None
                 cursor.execute(
-                    "DELETE FROM threads WHERE wa_id = ?", 
-                    (wa_id,)
+                    "INSERT INTO threads (wa_id, thread_id, created_at, last_webhook_timestamp) VALUES (?, ?, ?, ?)",
+                    (wa_id, new_conversation_id, datetime.now().isoformat(), old_webhook_ts)
                 )
-                logger.info(f"[THREAD_ROTATION] Archived old conversation {old_thread_data[1]} for {wa_id}")
-            
-            # Insert new conversation record, preserving last_webhook_timestamp so the
-            # missed-messages gap check (time_diff > 300s) works correctly after rotation.
-            old_webhook_ts = old_thread_data[4] if (old_thread_data and len(old_thread_data) > 4) else None
-            cursor.execute(
-                "INSERT INTO threads (wa_id, thread_id, created_at, last_webhook_timestamp) VALUES (?, ?, ?, ?)",
-                (wa_id, new_conversation_id, datetime.now().isoformat(), old_webhook_ts)
-            )
             
-            conn.commit()
-            logger.info(f"[THREAD_ROTATION] Database updated successfully for {wa_id}")
+                conn.commit()
+                logger.info(f"[THREAD_ROTATION] Database updated successfully for {wa_id}")
         
         logger.info(f"[THREAD_ROTATION] Successfully rotated thread for {wa_id}: {old_conversation_id} -> {new_conversation_id}")
         return new_conversation_id
@@ -1911,17 +1802,18 @@ async def get_openai_response(
     Uses conversation IDs instead of thread IDs for conversation context management.
     """
     from .thread_store import (
-        get_conversation_id, save_conversation_id, get_last_response_id, save_response_id,
-        increment_message_count, get_message_count
+        save_conversation_id, save_response_id, increment_message_count, begin_turn
     )
+    from . import thread_store
     
     el_salvador_tz = timezone("America/El_Salvador")
     now_in_sv = datetime.now(el_salvador_tz)
     datetime_str = now_in_sv.strftime("%A, %Y-%m-%d, %H:%M")
     
-    # Get or increment message count for this conversation
+    # Increment message count and load the stored conversation state (one DB round trip)
     user_identifier = phone_number or subscriber_id or "unknown"
-    current_message_count = increment_message_count(user_identifier)
+    turn_state = begin_turn(user_identifier)
+    current_message_count = turn_state["message_count"]
     
     # Copy module-level tools/available_functions into local variables so they
     # can be conditionally filtered when RAG is enabled (avoids UnboundLocalError
@@ -1944,8 +1836,7 @@ async def get_openai_response(
     # Staleness check: re-send developer if >3 hours since last assistant response
     # This covers pre-existing conversations and long gaps where context may drift
     if not should_send_developer:
-        from .thread_store import get_last_updated_timestamp
-        last_updated_str = get_last_updated_timestamp(user_identifier)
+        last_updated_str = turn_state["last_updated"]
         if last_updated_str:
             try:
                 last_updated = datetime.fromisoformat(last_updated_str)
@@ -2122,8 +2013,8 @@ async def get_openai_response(
         conversation_id = thread_id
         save_conversation_id(user_identifier, thread_id)
     else:
-        # Either no thread_id, or it's invalid (phone number) - get from database
-        conversation_id = get_conversation_id(user_identifier)
+        # Either no thread_id, or it's invalid (phone number) - use the stored one
+        conversation_id = turn_state["conversation_id"]
         if thread_id and not thread_id.startswith('conv_'):
             logger.warning(f"[OpenAI] Invalid thread_id format: {thread_id}. Will create new conversation.")
     
@@ -2165,9 +2056,9 @@ async def get_openai_response(
         
         # Create fresh conversation using Responses API
         # Create fresh conversation using Conversations API
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(OPENAI_CONVERSATIONS_URL) as client:
             response = await client.post(
-                "https://api.openai.com/v1/conversations",
+                OPENAI_CONVERSATIONS_URL,
                 headers={
                     "Authorization": f"Bearer {config.OPENAI_API_KEY}",
                     "Content-Type": "application/json",
@@ -2189,9 +2080,9 @@ async def get_openai_response(
         if not conversation_id:
             logger.info(f"[OpenAI] Creating new conversation for {user_identifier}")
             # Create initial conversation using Conversations API
-            async with httpx.AsyncClient() as client:
+            async with http_pool.client_for(OPENAI_CONVERSATIONS_URL) as client:
                 response = await client.post(
-                    "https://api.openai.com/v1/conversations",
+                    OPENAI_CONVERSATIONS_URL,
                     headers={
                         "Authorization": f"Bearer {config.OPENAI_API_KEY}",
                         "Content-Type": "application/json",
@@ -2214,7 +2105,7 @@ async def get_openai_response(
         
         # For existing conversations, get the last response ID from local storage to continue properly  
         if conversation_id:
-            previous_response_id = get_last_response_id(user_identifier)
+            previous_response_id = turn_state["last_response_id"]
             if previous_response_id:
                 logger.info(f"[OpenAI] Found previous response {previous_response_id} to continue from")
             else:
@@ -2239,12 +2130,13 @@ async def get_openai_response(
             )
             if new_conv_id:
                 conversation_id = new_conv_id
-                save_conversation_id(user_identifier, new_conv_id)
-                save_response_id(user_identifier, None)
-                previous_response_id = None
                 from .thread_store import reset_message_count
-                reset_message_count(user_identifier)
-                current_message_count = increment_message_count(user_identifier)
+                with thread_store.batch():
+                    save_conversation_id(user_identifier, new_conv_id)
+                    save_response_id(user_identifier, None)
+                    reset_message_count(user_identifier)
+                    current_message_count = increment_message_count(user_identifier)
+                previous_response_id = None
                 should_send_developer = True
                 developer_message = developer_base_modules  # re-assign: was set to None before rotation check
                 logger.info(f"[THREAD_ROTATION] Proactive rotation complete → new conv: {new_conv_id}, developer=FORCE_SENT")
@@ -2270,7 +2162,7 @@ async def get_openai_response(
                 # Get context based on user type (same logic as thread rotation)
                 if phone_number and phone_number.isdigit():
                     # WATI user: use WATI API to fetch message history
-                    agent_context_system_msg = get_agent_context_for_system_injection(phone_number)
+                    agent_context_system_msg = await asyncio.to_thread(get_agent_context_for_system_injection, phone_number)
                 else:
                     # ManyChat user (Facebook/Instagram): use local thread_store to fetch message history
                     agent_context_system_msg = get_manychat_context_for_system_injection(user_identifier)
@@ -2348,26 +2240,26 @@ async def get_openai_response(
                 logger.warning(f"[OpenAI] Tool call/conversation error detected: {e}")
                 logger.info(f"[OpenAI] Clearing corrupted conversation state and restarting fresh")
                 
-                # Clear corrupted state - OpenAI will create fresh conversation ID
-                save_conversation_id(user_identifier, None)
-                save_response_id(user_identifier, None)
-                
-                # Reset message count and clear loaded modules for fresh start
                 from .thread_store import reset_message_count, clear_loaded_modules
                 from agent_context_injector import (
                     get_agent_context_for_system_injection,
                     get_manychat_context_for_system_injection
                 )
-                reset_message_count(user_identifier)
-                clear_loaded_modules(user_identifier)
-                # Increment to get message 1 for fresh conversation
-                current_message_count = increment_message_count(user_identifier)
+                with thread_store.batch():
+                    # Clear corrupted state - OpenAI will create fresh conversation ID
+                    save_conversation_id(user_identifier, None)
+                    save_response_id(user_identifier, None)
+                    # Reset message count and clear loaded modules for fresh start
+                    reset_message_count(user_identifier)
+                    clear_loaded_modules(user_identifier)
+                    # Increment to get message 1 for fresh conversation
+                    current_message_count = increment_message_count(user_identifier)
                 logger.info(f"[OpenAI] Reset counters (now at message {current_message_count}), will create fresh conversation")
                 
                 # INJECT AGENT CONTEXT first for fresh conversation (channel-aware)
                 if phone_number and phone_number.isdigit():
                     # WATI user: use WATI API to fetch message history
-                    agent_context_system_msg = get_agent_context_for_system_injection(phone_number)
+                    agent_context_system_msg = await asyncio.to_thread(get_agent_context_for_system_injection, phone_number)
                 else:
                     # ManyChat user (Facebook/Instagram): use local thread_store to fetch message history
                     agent_context_system_msg = get_manychat_context_for_system_injection(user_identifier)
@@ -2456,7 +2348,7 @@ async def get_openai_response(
 
             tool_output_input = []
             
-            for tc in tool_calls:
+            async def _execute_tool_call(tc):
                 fn_name = getattr(tc, "name", None)
                 raw_args = getattr(tc, "arguments", None)
                 call_id = getattr(tc, "call_id", None) or getattr(tc, "id", None)
@@ -2469,6 +2361,7 @@ async def get_openai_response(
                 # Execute function and get result
                 fn_args = _tool_args(raw_args)
                 fn = available_functions.get(fn_name)
+                high_reasoning = False
 
                 try:
                     if fn is None:
@@ -2525,14 +2418,18 @@ async def get_openai_response(
                                 fn_args.setdefault('channel', channel)
                             if 'user_identifier' in sig.parameters and user_identifier:
                                 fn_args.setdefault('user_identifier', user_identifier)
-                            result = await fn(**fn_args)
+                            result = await tool_executor.call_with_timeout(fn_name, fn(**fn_args))
                         else:
-                            result = fn(**fn_args)
+                            # Sync tools (e.g. check_office_status) may block on I/O; keep them off the event loop
+                            result = await tool_executor.call_with_timeout(fn_name, asyncio.to_thread(fn, **fn_args))
                         # Check for _require_high_reasoning flag BEFORE serialization
                         if isinstance(result, dict) and result.pop("_require_high_reasoning", False):
-                            require_high_reasoning = True
+                            high_reasoning = True
                             logger.info(f"[REASONING] Tool {fn_name} requested high reasoning effort")
                         output = _coerce_output_str(result)
+                except tool_executor.ToolTimeout as e:
+                    logger.error(f"[Tool] {e}")
+                    output = _coerce_output_str({"error": f"{e}, try again"})
                 except Exception as e:
                     logger.exception(f"Error executing tool {fn_name}")
                     output = _coerce_output_str({"error": f"Error executing {fn_name}: {str(e)}"})
@@ -2548,13 +2445,21 @@ async def get_openai_response(
                     output += "\n\n🚨 PRICING RULES (MUST apply when calculating totals):\n" + _get_pricing_rules()
                     logger.info(f"[PRICING_INJECTION] Injected pricing rules into get_price_for_date response")
 
+                return call_id, fn_name, output, high_reasoning
+
+            # Independent lookups run concurrently; side-effecting tools stay serialized in request order
+            round_results = await tool_executor.run_round(
+                tool_calls, _execute_tool_call, lambda tc: getattr(tc, "name", None), f"Round {round_count}"
+            )
+            for call_id, fn_name, output, high_reasoning in round_results:
+                if high_reasoning:
+                    require_high_reasoning = True
                 tool_output_input.append({
                     "type": "function_call_output",
                     "call_id": call_id,
                     "output": output
                 })
                 all_tool_outputs.append((fn_name, output))  # Track for logging
-
                 
             # Submit tool outputs - model may request MORE tools or provide final answer
             try:
@@ -2624,9 +2529,9 @@ async def get_openai_response(
                     logger.info(f"[Tool] Creating fresh conversation and restarting entire flow")
                     
                     # Create completely fresh conversation
-                    async with httpx.AsyncClient() as client:
+                    async with http_pool.client_for(OPENAI_CONVERSATIONS_URL) as client:
                         response_data = await client.post(
-                            "https://api.openai.com/v1/conversations",
+                            OPENAI_CONVERSATIONS_URL,
                             headers={
                                 "Authorization": f"Bearer {config.OPENAI_API_KEY}",
                                 "Content-Type": "application/json",
@@ -2639,25 +2544,25 @@ async def get_openai_response(
                         if not conversation_id:
                             raise RuntimeError("Conversations API returned no id")
                     
-                    save_conversation_id(user_identifier, conversation_id)
-                    
-                    # Reset message count and clear loaded modules for fresh start
                     from .thread_store import reset_message_count, clear_loaded_modules
                     from agent_context_injector import (
                         get_agent_context_for_system_injection,
                         get_manychat_context_for_system_injection,
                         mark_agent_context_injected
                     )
-                    reset_message_count(user_identifier)
-                    clear_loaded_modules(user_identifier)
-                    # Increment to get message 1 for fresh conversation
-                    current_message_count = increment_message_count(user_identifier)
+                    with thread_store.batch():
+                        save_conversation_id(user_identifier, conversation_id)
+                        # Reset message count and clear loaded modules for fresh start
+                        reset_message_count(user_identifier)
+                        clear_loaded_modules(user_identifier)
+                        # Increment to get message 1 for fresh conversation
+                        current_message_count = increment_message_count(user_identifier)
                     logger.info(f"[Tool] Created fresh conversation {conversation_id} for recovery with reset counters (now at message {current_message_count})")
                     
                     # INJECT AGENT CONTEXT first for fresh conversation (channel-aware)
                     if phone_number and phone_number.isdigit():
                         # WATI user: use WATI API to fetch message history
-                        agent_context_system_msg = get_agent_context_for_system_injection(phone_number)
+                        agent_context_system_msg = await asyncio.to_thread(get_agent_context_for_system_injection, phone_number)
                     else:
                         # ManyChat user (Facebook/Instagram): use local thread_store to fetch message history
                         agent_context_system_msg = get_manychat_context_for_system_injection(user_identifier)
@@ -2887,7 +2792,7 @@ async def get_openai_response(
                     # Get context based on user type
                     if phone_number:
                         # WATI user: use WATI API to fetch message history
-                        agent_context_system_msg = get_agent_context_for_system_injection(phone_number)
+                        agent_context_system_msg = await asyncio.to_thread(get_agent_context_for_system_injection, phone_number)
                     else:
                         # ManyChat user: use local thread_store to fetch message history
                         agent_context_system_msg = get_manychat_context_for_system_injection(user_identifier)
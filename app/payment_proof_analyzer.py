@@ -9,21 +9,21 @@ Usage:
     result = await analyze_payment_proof(file_url)
 """
 import os
+import re
 import json
 import logging
 import base64
 import aiohttp
-import tempfile
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, date
 from typing import Optional, Dict, List, Any, Tuple
 from openai import AsyncOpenAI
-from PyPDF2 import PdfReader
-from pdf2image import convert_from_path
-import io
-from PIL import Image
+import fitz  # PyMuPDF
 
 from .flex_tier_handler import call_with_flex_fallback
-from . import config
+from . import config, vision_preprocess, vision_result_cache
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -36,13 +36,19 @@ MAX_PDF_PAGES = 5  # Reasonable limit for payment receipts
 # Initialize OpenAI client
 client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
 
+# Dedicated executor: PDF rasterization is CPU-bound and must stay off the event loop
+_pdf_executor: Optional[ThreadPoolExecutor] = None
+_pdf_executor_lock = threading.Lock()
 
-async def analyze_payment_proof(file_url: str) -> Dict[str, Any]:
+
+async def analyze_payment_proof(file_url: str, wa_id: str = None, use_cache: bool = True) -> Dict[str, Any]:
     """
     Analyzes a payment proof image or PDF to determine if it's a valid payment receipt.
     
     Args:
         file_url: URL to the payment proof file (from WhatsApp/Wati)
+        wa_id: Customer the proof belongs to; a receipt they already sent is answered from the cache
+        use_cache: False forces a fresh analysis (the agent re-analyzing after a misread date)
     
     Returns:
         dict: {
@@ -72,6 +78,14 @@ async def analyze_payment_proof(file_url: str) -> Dict[str, Any]:
                 "error": "Failed to download file"
             }
             
+        # Byte-identical receipt already analyzed for this customer: reuse the extracted fields
+        fingerprint = await vision_result_cache.fingerprint(file_content)
+        cached = await asyncio.to_thread(vision_result_cache.lookup, wa_id, "payment_proof", fingerprint) if use_cache else None
+        if cached is not None:
+            if cached.get("receipt_type") == "bank_transfer" and cached.get("transfer_method") == "UNI":
+                cached["uni_timing"] = _compute_uni_timing_info()
+            return cached
+
         # Step 2: Convert to appropriate format for o4-mini
         image_data = []
         
@@ -79,13 +93,12 @@ async def analyze_payment_proof(file_url: str) -> Dict[str, Any]:
             # Handle PDF conversion
             image_data = await convert_pdf_to_images(file_content)
         else:
-            # Handle direct image
+            # Handle direct image (rotated, downscaled and recompressed; shared with the classifier)
             try:
-                img_base64 = base64.b64encode(file_content).decode('utf-8')
                 image_data = [{
                     "type": "image",
                     "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_base64}"
+                        "url": await vision_preprocess.to_data_url(file_content, "receipt")
                     }
                 }]
             except Exception as e:
@@ -100,6 +113,13 @@ async def analyze_payment_proof(file_url: str) -> Dict[str, Any]:
         
         # Step 3: Send to OpenAI o4-mini for analysis
         result = await analyze_with_o4_mini(image_data)
+        # A missing, unreadable or future date is what re-analysis is for: never pin it in the cache
+        if result.get("success") and _has_plausible_date(result):
+            # uni_timing depends on when the receipt is sent, so it is recomputed on a cache hit
+            await asyncio.to_thread(
+                vision_result_cache.store,
+                wa_id, "payment_proof", fingerprint, {k: v for k, v in result.items() if k != "uni_timing"}
+            )
         
         return result
         
@@ -114,6 +134,37 @@ async def analyze_payment_proof(file_url: str) -> Dict[str, Any]:
         }
 
 
+async def reanalyze_payment_proof(file_url: str, wa_id: str = None) -> Dict[str, Any]:
+    """
+    Tool entry point for analyze_payment_proof.
+
+    The agent calls the tool when it needs the receipt read (again), e.g. after
+    validate_bank_transfer reported a missing or future slip date, so the
+    cached result is never reused here; the fresh result still refreshes it.
+    """
+    return await analyze_payment_proof(file_url, wa_id=wa_id, use_cache=False)
+
+
+_DATE_TOKEN = re.compile(r"\d{1,4}[/-]\d{1,2}[/-]\d{2,4}")
+_DATE_FORMATS = ("%m/%d/%Y", "%d/%m/%Y", "%Y/%m/%d", "%m/%d/%y", "%d/%m/%y")
+
+
+def _has_plausible_date(result: Dict[str, Any]) -> bool:
+    """Whether the extracted transaction date parses and is not in the future (under every reading of it)."""
+    timestamp = str((result.get("extracted_info") or {}).get("timestamp") or "")
+    match = _DATE_TOKEN.search(timestamp)
+    if not match:
+        return False
+    token = match.group(0).replace("-", "/")
+    readings = []
+    for fmt in _DATE_FORMATS:
+        try:
+            readings.append(datetime.strptime(token, fmt).date())
+        except ValueError:
+            pass
+    return bool(readings) and all(reading <= date.today() for reading in readings)
+
+
 async def download_file(file_url: str) -> Tuple[Optional[bytes], Optional[str]]:
     """
     Downloads a file from a URL or reads a local file and determines its MIME type.
@@ -190,6 +241,50 @@ async def download_file(file_url: str) -> Tuple[Optional[bytes], Optional[str]]:
         return None, None
 
 
+def _get_pdf_executor() -> ThreadPoolExecutor:
+    global _pdf_executor
+    if _pdf_executor is None:
+        with _pdf_executor_lock:
+            if _pdf_executor is None:
+                _pdf_executor = ThreadPoolExecutor(max_workers=config.PDF_RENDER_WORKERS, thread_name_prefix="pdf")
+    return _pdf_executor
+
+
+def _render_pdf_pages_sync(pdf_content: bytes, max_pages: int, dpi: int, jpeg_quality: int) -> List[bytes]:
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        if doc.page_count > max_pages:
+            logger.warning(f"PDF has {doc.page_count} pages, limiting to first {max_pages}")
+        return [
+            doc.load_page(i).get_pixmap(dpi=dpi, alpha=False).tobytes("jpeg", jpg_quality=jpeg_quality)
+            for i in range(min(doc.page_count, max_pages))
+        ]
+
+
+async def render_pdf_pages(
+    pdf_content: bytes,
+    max_pages: int = MAX_PDF_PAGES,
+    dpi: int = None,
+    jpeg_quality: int = 70
+) -> List[bytes]:
+    """
+    Renders the first pages of a PDF to JPEG in memory with PyMuPDF (no temp files, no poppler subprocess).
+    
+    Args:
+        pdf_content: PDF file content as bytes
+        max_pages: Pages to render from the start of the document
+        dpi: Render resolution (defaults to PDF_RENDER_DPI)
+        jpeg_quality: JPEG quality of the rendered pages
+        
+    Returns:
+        list: JPEG bytes per rendered page
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _get_pdf_executor(), _render_pdf_pages_sync,
+        pdf_content, max_pages, dpi or config.PDF_RENDER_DPI, jpeg_quality
+    )
+
+
 async def convert_pdf_to_images(pdf_content: bytes) -> List[Dict[str, str]]:
     """
     Converts a PDF to a list of images encoded as base64.
@@ -203,46 +298,22 @@ async def convert_pdf_to_images(pdf_content: bytes) -> List[Dict[str, str]]:
     image_data = []
     
     try:
-        # Create a temporary file to save the PDF content
-        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
-            pdf_file.write(pdf_content)
-            pdf_path = pdf_file.name
-            
-        try:
-            # Check how many pages the PDF has
-            pdf_reader = PdfReader(io.BytesIO(pdf_content))
-            num_pages = len(pdf_reader.pages)
-            
-            # Apply page limit
-            if num_pages > MAX_PDF_PAGES:
-                logger.warning(f"PDF has {num_pages} pages, limiting to first {MAX_PDF_PAGES}")
-                num_pages = MAX_PDF_PAGES
-            
-            # Convert PDF to images
-            images = convert_from_path(pdf_path, first_page=1, last_page=num_pages)
-            
-            # Convert each image to base64
-            for i, image in enumerate(images):
-                img_byte_arr = io.BytesIO()
-                image.save(img_byte_arr, format='JPEG', quality=70)  # Reduce quality to control size
-                img_byte_arr = img_byte_arr.getvalue()
-                
-                # Skip if image is too large
-                if len(img_byte_arr) > MAX_IMAGE_SIZE:
-                    logger.warning(f"PDF page {i+1} image too large, skipping")
-                    continue
-                    
-                img_base64 = base64.b64encode(img_byte_arr).decode('utf-8')
-                image_data.append({
-                    "type": "image",
-                    "image_url": {
-                        "url": f"data:image/jpeg;base64,{img_base64}"
-                    }
-                })
+        pages = await render_pdf_pages(pdf_content)
+        
+        # Convert each image to base64
+        for i, img_bytes in enumerate(pages):
+            # Skip if image is too large
+            if len(img_bytes) > MAX_IMAGE_SIZE:
+                logger.warning(f"PDF page {i+1} image too large, skipping")
+                continue
                 
-        finally:
-            # Clean up temporary file
-            os.unlink(pdf_path)
+            img_base64 = base64.b64encode(img_bytes).decode('utf-8')
+            image_data.append({
+                "type": "image",
+                "image_url": {
+                    "url": f"data:image/jpeg;base64,{img_base64}"
+                }
+            })
     
     except Exception as e:
         logger.exception(f"Error converting PDF: {str(e)}")
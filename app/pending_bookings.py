@@ -0,0 +1,148 @@
+"""
+Durable store for PENDING bookings awaiting explicit customer confirmation.
+
+Pending bookings used to live in one JSON file (/tmp/pending_bookings.json)
+that every lookup loaded and every write rewrote whole. The lookup runs at
+the start of every customer turn, so each turn paid a file read and JSON
+parse that grew with the number of pending customers, and concurrent
+workers could overwrite each other's writes.
+
+Now each booking is one row in SQLite (sqlite_store), keyed by phone:
+
+- Reads and writes are single-row transactions; nothing else is rewritten.
+- Entries expire after PENDING_BOOKING_TTL_SECONDS.
+- "No pending booking for this phone" is remembered in memory. The memory
+  is trusted only while ``PRAGMA data_version`` is unchanged, i.e. until
+  any other connection (thread or worker) commits to the store, so the
+  common case costs no query and no parse.
+
+Entries still in the old JSON file are imported once on first use.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Set
+
+from . import config, sqlite_store
+
+logger = logging.getLogger(__name__)
+
+LEGACY_JSON_PATH = "/tmp/pending_bookings.json"
+PURGE_INTERVAL_SECONDS = 3600
+
+_db_ready = False
+_last_purge = 0.0
+_local = threading.local()
+_stats = {"lookups": 0, "negative_hits": 0, "hits": 0, "stores": 0, "removals": 0}
+
+
+def _init_db() -> None:
+    global _db_ready
+    if _db_ready:
+        return
+    with sqlite_store.connection(config.PENDING_BOOKINGS_DB_PATH) as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS pending_bookings (
+            phone TEXT PRIMARY KEY,
+            booking_data TEXT NOT NULL,
+            created_at REAL NOT NULL,
+            expires_at REAL NOT NULL
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_pending_bookings_expires ON pending_bookings (expires_at)")
+        conn.commit()
+        _import_legacy_file(conn)
+    _db_ready = True
+
+
+def _import_legacy_file(conn) -> None:
+    if not os.path.exists(LEGACY_JSON_PATH):
+        return
+    try:
+        with open(LEGACY_JSON_PATH, "r") as f:
+            legacy = json.load(f)
+        now = time.time()
+        conn.executemany(
+            "INSERT OR IGNORE INTO pending_bookings (phone, booking_data, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            [(phone, json.dumps(data), now, now + config.PENDING_BOOKING_TTL_SECONDS) for phone, data in legacy.items()]
+        )
+        conn.commit()
+        os.replace(LEGACY_JSON_PATH, LEGACY_JSON_PATH + ".migrated")
+        logger.info(f"[PENDING_BOOKINGS] Imported {len(legacy)} pending bookings from {LEGACY_JSON_PATH}")
+    except FileNotFoundError:
+        pass  # another worker imported it first
+    except Exception as e:
+        logger.error(f"[PENDING_BOOKINGS] Could not import {LEGACY_JSON_PATH}: {e}")
+
+
+def _known_absent(conn) -> Set[str]:
+    """
+    Phones this thread saw without a pending booking, valid for the current data_version.
+
+    data_version changes whenever another connection commits to the database
+    (never for this connection's own commits, which update the set directly).
+    """
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    state = _local.__dict__
+    if state.get("pid") != os.getpid() or state.get("version") != version:
+        state.update(pid=os.getpid(), version=version, absent=set())
+    if len(state["absent"]) > config.PENDING_BOOKINGS_NEGATIVE_CACHE_SIZE:
+        state["absent"].clear()
+    return state["absent"]
+
+
+def get(phone: str) -> Optional[Dict[str, Any]]:
+    """The phone's unexpired pending booking data, or None."""
+    _init_db()
+    _stats["lookups"] += 1
+    with sqlite_store.connection(config.PENDING_BOOKINGS_DB_PATH) as conn:
+        absent = _known_absent(conn)
+        if phone in absent:
+            _stats["negative_hits"] += 1
+            return None
+        row = conn.execute(
+            "SELECT booking_data FROM pending_bookings WHERE phone = ? AND expires_at > ?",
+            (phone, time.time())
+        ).fetchone()
+    if row is None:
+        absent.add(phone)
+        return None
+    _stats["hits"] += 1
+    return json.loads(row[0])
+
+
+def put(phone: str, booking_data: Dict[str, Any]) -> None:
+    """Store (or replace) the phone's pending booking."""
+    global _last_purge
+    _init_db()
+    now = time.time()
+    with sqlite_store.connection(config.PENDING_BOOKINGS_DB_PATH) as conn:
+        conn.execute(
+            "REPLACE INTO pending_bookings (phone, booking_data, created_at, expires_at) VALUES (?, ?, ?, ?)",
+            (phone, json.dumps(booking_data), now, now + config.PENDING_BOOKING_TTL_SECONDS)
+        )
+        if now - _last_purge >= PURGE_INTERVAL_SECONDS:
+            _last_purge = now
+            conn.execute("DELETE FROM pending_bookings WHERE expires_at <= ?", (now,))
+        conn.commit()
+        _known_absent(conn).discard(phone)
+    _stats["stores"] += 1
+
+
+def remove(phone: str) -> bool:
+    """Delete the phone's pending booking; returns whether one existed."""
+    _init_db()
+    with sqlite_store.connection(config.PENDING_BOOKINGS_DB_PATH) as conn:
+        removed = conn.execute("DELETE FROM pending_bookings WHERE phone = ?", (phone,)).rowcount > 0
+        conn.commit()
+        _known_absent(conn).add(phone)
+    if removed:
+        _stats["removals"] += 1
+    return removed
+
+
+def get_metrics() -> Dict[str, int]:
+    return dict(_stats)
@@ -9,6 +9,8 @@ Components:
     - chunker: Parses system_instructions_new.txt into semantic chunks
     - chunk_store: ChromaDB persistent collection management
     - embedder: Generates and stores embeddings via OpenAI text-embedding-3-large
+    - embedding_cache: LRU + SQLite cache of query embeddings
+    - vector_index: In-memory NumPy index of the chunk embeddings
     - retriever: Semantic retrieval at query time
     - always_on_core: Builds the always-on system prompt
 """
@@ -16,9 +16,6 @@ from .chunker import get_always_on_data
 
 logger = logging.getLogger(__name__)
 
-# Cache the core prompt to avoid re-reading the file on every call
-_cached_core_prompt: str = ""
-_cached_data: Dict[str, Any] = {}
 
 
 def get_core_prompt(force_reload: bool = False) -> str:
@@ -29,24 +26,26 @@ def get_core_prompt(force_reload: bool = False) -> str:
     The wrapper text is simplified because module loading is now handled
     by Python-side RAG retrieval instead of the LLM calling load_additional_modules.
 
+    The prompt is memoized on the instructions registry snapshot, so it is
+    rebuilt only when system_instructions_new.txt changes on disk.
+
     Args:
-        force_reload: If True, re-read the instructions file even if cached.
+        force_reload: If True, rebuild the prompt even if cached.
 
     Returns:
         The complete always-on core system prompt string.
     """
-    global _cached_core_prompt, _cached_data
+    from .. import instructions_registry
 
-    if _cached_core_prompt and not force_reload:
-        return _cached_core_prompt
+    if force_reload:
+        return _build_core_prompt(instructions_registry.get_instructions())
+    return instructions_registry.derived("rag_core_prompt", _build_core_prompt)
 
-    _cached_data = get_always_on_data()
-    _cached_core_prompt = _build_prompt(_cached_data)
 
-    logger.info(
-        f"[ALWAYS_ON_CORE] Built core prompt: {len(_cached_core_prompt):,} chars"
-    )
-    return _cached_core_prompt
+def _build_core_prompt(data: Dict[str, Any]) -> str:
+    prompt = _build_prompt(get_always_on_data(data))
+    logger.info(f"[ALWAYS_ON_CORE] Built core prompt: {len(prompt):,} chars")
+    return prompt
 
 
 def _build_prompt(base_modules: Dict[str, Any]) -> str:
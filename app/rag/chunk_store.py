@@ -32,6 +32,10 @@ EMBEDDING_MODEL = "text-embedding-3-large"
 EMBEDDING_DIMENSIONS = 3072
 
 
+# One PersistentClient per storage directory, opened on first use
+_clients: Dict[str, Any] = {}
+
+
 def get_chroma_client(persist_dir: str = None):
     """Get a persistent ChromaDB client.
 
@@ -40,13 +44,17 @@ def get_chroma_client(persist_dir: str = None):
                      Defaults to app/rag/chroma_db/.
 
     Returns:
-        ChromaDB PersistentClient instance.
+        ChromaDB PersistentClient instance (shared per directory).
     """
     import chromadb
 
     persist_dir = persist_dir or DEFAULT_PERSIST_DIR
-    os.makedirs(persist_dir, exist_ok=True)
-    return chromadb.PersistentClient(path=persist_dir)
+    client = _clients.get(persist_dir)
+    if client is None:
+        os.makedirs(persist_dir, exist_ok=True)
+        client = chromadb.PersistentClient(path=persist_dir)
+        _clients[persist_dir] = client
+    return client
 
 
 def get_or_create_collection(client=None, persist_dir: str = None):
@@ -51,9 +51,12 @@ def load_system_instructions(path: str = None) -> Dict[str, Any]:
               Defaults to app/resources/system_instructions_new.txt.
 
     Returns:
-        Parsed JSON as a dictionary.
+        Parsed JSON as a dictionary. The default file comes from the shared
+        instructions registry (parsed once, hot-reloaded) and must not be mutated.
     """
-    path = path or DEFAULT_INSTRUCTIONS_PATH
+    if path is None or os.path.abspath(path) == os.path.abspath(DEFAULT_INSTRUCTIONS_PATH):
+        from .. import instructions_registry
+        return instructions_registry.get_instructions()
     with open(path, "r", encoding="utf-8") as f:
         return json.loads(f.read())
 
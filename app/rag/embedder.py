@@ -135,6 +135,10 @@ async def index_all_chunks(rebuild: bool = True) -> int:
     collection = get_or_create_collection()
     count = add_chunks(chunks, embeddings, collection=collection)
 
+    # Retrieval reads from the in-memory index; make it pick up the new vectors
+    from . import vector_index
+    vector_index.invalidate()
+
     logger.info(f"[EMBEDDER] Indexing complete: {count} chunks stored")
     return count
 
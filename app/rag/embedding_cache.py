@@ -0,0 +1,160 @@
+"""
+Query embedding cache for the RAG retriever.
+
+Customers repeat the same short phrases ("precio para mañana", "hay
+disponibilidad?") all day, and every one of them used to cost a
+text-embedding-3-large round trip. Query embeddings are cached by normalized
+query text in a bounded in-memory LRU, backed by a small SQLite table so the
+cache survives restarts. SQLite reads and writes go through sqlite_store's
+per-thread WAL connections and run on a worker thread so a slow disk never
+stalls the event loop.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import sqlite3
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import List, Optional
+
+from openai import AsyncOpenAI
+
+from .. import sqlite_store
+
+logger = logging.getLogger(__name__)
+
+DB_PATH = os.environ.get(
+    "RAG_EMBEDDING_CACHE_DB_PATH",
+    os.path.join(os.path.dirname(__file__), "embedding_cache.db"),
+)
+LRU_SIZE = int(os.environ.get("RAG_EMBEDDING_CACHE_LRU_SIZE", "1024"))
+
+_lru: "OrderedDict[str, List[float]]" = OrderedDict()
+_stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+_db_ready = False
+
+
+def _get_conn():
+    """This thread's shared WAL connection (see sqlite_store); use as a context manager."""
+    return sqlite_store.connection(DB_PATH)
+
+
+def _init_db() -> None:
+    global _db_ready
+    with _get_conn() as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS query_embeddings (
+            cache_key TEXT PRIMARY KEY,
+            model TEXT NOT NULL,
+            dimensions INTEGER NOT NULL,
+            embedding BLOB NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """)
+        conn.commit()
+    _db_ready = True
+
+
+def normalize_query(text: str) -> str:
+    """Normalize query text so trivially different phrasings share a cache entry.
+
+    Args:
+        text: Raw query text.
+
+    Returns:
+        NFC-normalized, lower-cased text with collapsed whitespace.
+    """
+    return " ".join(unicodedata.normalize("NFC", text).lower().split())
+
+
+def _cache_key(text: str, model: str, dimensions: int) -> str:
+    raw = f"{model}:{dimensions}:{normalize_query(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _remember(key: str, embedding: List[float]) -> None:
+    _lru[key] = embedding
+    _lru.move_to_end(key)
+    while len(_lru) > LRU_SIZE:
+        _lru.popitem(last=False)
+
+
+def _load_from_disk(key: str) -> Optional[List[float]]:
+    try:
+        if not _db_ready:
+            _init_db()
+        with _get_conn() as conn:
+            row = conn.execute(
+                "SELECT embedding FROM query_embeddings WHERE cache_key = ?", (key,)
+            ).fetchone()
+    except sqlite3.Error as e:
+        logger.warning(f"[EMBEDDING_CACHE] Disk lookup failed: {e}")
+        return None
+    if not row:
+        return None
+    vector = array("f")
+    vector.frombytes(row[0])
+    return vector.tolist()
+
+
+def _save_to_disk(key: str, model: str, dimensions: int, embedding: List[float]) -> None:
+    try:
+        if not _db_ready:
+            _init_db()
+        with _get_conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO query_embeddings (cache_key, model, dimensions, embedding) "
+                "VALUES (?, ?, ?, ?)",
+                (key, model, dimensions, array("f", embedding).tobytes()),
+            )
+            conn.commit()
+    except sqlite3.Error as e:
+        logger.warning(f"[EMBEDDING_CACHE] Disk write failed: {e}")
+
+
+async def get_query_embedding(
+    query: str,
+    client: Optional[AsyncOpenAI] = None,
+) -> List[float]:
+    """Embedding for a query, from cache when possible.
+
+    Args:
+        query: The query text to embed.
+        client: Optional pre-existing AsyncOpenAI client.
+
+    Returns:
+        Embedding vector (list of floats).
+    """
+    from .embedder import EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, embed_query
+
+    key = _cache_key(query, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS)
+
+    embedding = _lru.get(key)
+    if embedding is not None:
+        _lru.move_to_end(key)
+        _stats["memory_hits"] += 1
+        return embedding
+
+    embedding = await asyncio.to_thread(_load_from_disk, key)
+    if embedding is not None:
+        _stats["disk_hits"] += 1
+        _remember(key, embedding)
+        return embedding
+
+    _stats["misses"] += 1
+    embedding = await embed_query(query, client=client)
+    _remember(key, embedding)
+    await asyncio.to_thread(_save_to_disk, key, EMBEDDING_MODEL, EMBEDDING_DIMENSIONS, embedding)
+    return embedding
+
+
+def get_cache_stats() -> dict:
+    """Hit/miss counters for the query embedding cache.
+
+    Returns:
+        Dict with memory_hits, disk_hits, misses and the current LRU size.
+    """
+    return {**_stats, "lru_entries": len(_lru), "lru_capacity": LRU_SIZE}
@@ -1,11 +1,13 @@
 """
 Retriever module for semantic chunk retrieval at query time.
 
-Embeds the user message (+ optional conversation context), queries ChromaDB
-for the top-K most relevant chunks, and returns formatted content ready
-for injection into the system prompt.
+Embeds the user message (+ optional conversation context), finds the top-K
+most relevant chunks, and returns formatted content ready for injection
+into the system prompt. Query embeddings come from embedding_cache and the
+search runs against the in-memory vector_index (ChromaDB as fallback).
 """
 
+import asyncio
 import logging
 from typing import List, Dict, Any, Optional
 
@@ -50,19 +52,12 @@ async def retrieve(
         Formatted string with retrieved chunk contents, ready for
         injection into the system prompt.
     """
-    from .embedder import embed_query
-    from .chunk_store import query_chunks
-
     # Build the query: user message + conversation context for better retrieval
     query_text = user_message
     if conversation_context:
         query_text = f"{conversation_context}\n\nCurrent message: {user_message}"
 
-    # Embed the query
-    query_embedding = await embed_query(query_text, client=openai_client)
-
-    # Query ChromaDB for top-K chunks
-    results = query_chunks(query_embedding, n_results=top_k)
+    results = await _search(query_text, top_k, openai_client)
 
     if not results:
         logger.warning("[RETRIEVER] No chunks retrieved for query")
@@ -100,15 +95,11 @@ async def retrieve_with_details(
         Dict with keys: formatted_content, chunks (list of result dicts),
         query_text, total_chars.
     """
-    from .embedder import embed_query
-    from .chunk_store import query_chunks
-
     query_text = user_message
     if conversation_context:
         query_text = f"{conversation_context}\n\nCurrent message: {user_message}"
 
-    query_embedding = await embed_query(query_text, client=openai_client)
-    results = query_chunks(query_embedding, n_results=top_k)
+    results = await _search(query_text, top_k, openai_client)
 
     formatted = _format_retrieved_chunks(results) if results else ""
     total_chars = sum(r["char_count"] for r in results)
@@ -121,6 +112,36 @@ async def retrieve_with_details(
     }
 
 
+async def _search(
+    query_text: str,
+    top_k: int,
+    openai_client: Optional[AsyncOpenAI],
+) -> List[Dict[str, Any]]:
+    """Embed the query (cached) and find the top-K chunks.
+
+    Uses the in-memory NumPy index; falls back to querying ChromaDB
+    directly if the index cannot be loaded.
+
+    Args:
+        query_text: Full query text to embed.
+        top_k: Number of top chunks to retrieve.
+        openai_client: Optional pre-existing AsyncOpenAI client.
+
+    Returns:
+        List of chunk result dicts, most relevant first.
+    """
+    from .embedding_cache import get_query_embedding
+    from . import vector_index
+
+    query_embedding = await get_query_embedding(query_text, client=openai_client)
+
+    results = await vector_index.query_async(query_embedding, n_results=top_k)
+    if results is None:
+        from .chunk_store import query_chunks
+        results = await asyncio.to_thread(query_chunks, query_embedding, top_k)
+    return results
+
+
 def _format_retrieved_chunks(results: List[Dict[str, Any]]) -> str:
     """Format retrieved chunks into a string for the system prompt.
 
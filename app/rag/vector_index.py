@@ -0,0 +1,137 @@
+"""
+In-memory vector index over the RAG chunk embeddings.
+
+The corpus is small (~77 chunks x 3072 dims), so instead of opening ChromaDB
+and walking its HNSW graph on every customer turn we load every chunk
+embedding once into a row-normalized NumPy matrix. Top-K is then a single
+matrix-vector product.
+
+ChromaDB stays the persistent store (written by embedder.index_all_chunks);
+this module is only a read-side cache of it. Async callers use
+``query_async``, which loads a cold index on a worker thread because reading
+the collection is blocking SQLite I/O.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_matrix = None  # np.ndarray of shape (n_chunks, dims), rows L2-normalized
+_chunks: List[Dict[str, Any]] = []
+
+
+def load(persist_dir: str = None) -> int:
+    """Load (or reload) all chunk embeddings from ChromaDB into memory.
+
+    Args:
+        persist_dir: Directory for persistent storage.
+
+    Returns:
+        Number of chunks in the index.
+    """
+    global _matrix, _chunks
+    import numpy as np
+    from .chunk_store import get_or_create_collection
+
+    collection = get_or_create_collection(persist_dir=persist_dir)
+    data = collection.get(include=["embeddings", "documents", "metadatas"])
+
+    ids = data.get("ids") or []
+    if not ids:
+        logger.warning("[VECTOR_INDEX] ChromaDB collection is empty, index not loaded")
+        with _lock:
+            _matrix, _chunks = None, []
+        return 0
+
+    matrix = np.asarray(data["embeddings"], dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    matrix /= norms
+
+    chunks = [
+        {
+            "chunk_id": chunk_id,
+            "content": data["documents"][i],
+            "module_name": data["metadatas"][i]["module_name"],
+            "section": data["metadatas"][i]["section"],
+            "char_count": data["metadatas"][i]["char_count"],
+        }
+        for i, chunk_id in enumerate(ids)
+    ]
+
+    with _lock:
+        _matrix, _chunks = matrix, chunks
+
+    logger.info(f"[VECTOR_INDEX] Loaded {len(chunks)} chunk embeddings ({matrix.shape[1]}d)")
+    return len(chunks)
+
+
+def invalidate() -> None:
+    """Drop the in-memory index so the next query reloads it (after re-indexing)."""
+    global _matrix, _chunks
+    with _lock:
+        _matrix, _chunks = None, []
+
+
+def is_loaded() -> bool:
+    return _matrix is not None
+
+
+def query(query_embedding: List[float], n_results: int = 8) -> Optional[List[Dict[str, Any]]]:
+    """Top-K chunks by cosine similarity.
+
+    Args:
+        query_embedding: Embedding vector of the user query.
+        n_results: Number of top results to return.
+
+    Returns:
+        Result dicts in the same shape as chunk_store.query_chunks()
+        (distance is cosine distance, like the Chroma "cosine" space),
+        or None if the index could not be loaded.
+    """
+    if _matrix is None:
+        try:
+            load()
+        except Exception as e:
+            logger.warning(f"[VECTOR_INDEX] Could not load index: {e}")
+            return None
+    return _top_k(query_embedding, n_results)
+
+
+async def query_async(query_embedding: List[float], n_results: int = 8) -> Optional[List[Dict[str, Any]]]:
+    """``query`` for code running on the event loop: a cold index is loaded on a worker thread."""
+    if _matrix is None:
+        try:
+            await asyncio.to_thread(load)
+        except Exception as e:
+            logger.warning(f"[VECTOR_INDEX] Could not load index: {e}")
+            return None
+    return _top_k(query_embedding, n_results)
+
+
+def _top_k(query_embedding: List[float], n_results: int) -> Optional[List[Dict[str, Any]]]:
+    import numpy as np
+
+    with _lock:
+        matrix, chunks = _matrix, _chunks
+    if matrix is None:
+        return None
+
+    q = np.asarray(query_embedding, dtype=np.float32)
+    q_norm = np.linalg.norm(q)
+    if q_norm:
+        q /= q_norm
+
+    scores = matrix @ q
+    k = min(n_results, len(chunks))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+
+    return [
+        {**chunks[i], "distance": float(1.0 - scores[i])}
+        for i in top
+    ]
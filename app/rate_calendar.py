@@ -0,0 +1,113 @@
+"""
+In-process rate calendar for the tarifarios table.
+
+tarifarios stores its date as a '%m/%d/%Y' string, so looking up one night
+with STR_TO_DATE(...) = %s is a full table scan. The table is small (one row
+per calendar day), so we load it in bulk, key it by real ``date`` and answer
+every nightly lookup from memory.
+
+Freshness:
+- The whole calendar is reloaded after RATE_CACHE_TTL_SECONDS.
+- A miss for a requested night forces an early reload (rates for new dates
+  are usually loaded right before they are sold), rate-limited by
+  RATE_CACHE_MISS_RELOAD_SECONDS so unknown dates can't hammer MySQL.
+- If a reload fails once a calendar is loaded, the last good calendar keeps
+  being served and the reload is retried after RATE_CACHE_MISS_RELOAD_SECONDS.
+"""
+
+import asyncio
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from . import config
+from .database_client import get_db_connection, release_db_connection, run_db
+
+logger = logging.getLogger(__name__)
+
+RATE_COLUMNS = ("lh_adulto", "lh_nino", "pa_adulto", "pa_nino", "es_adulto", "es_nino")
+
+_rates: Dict[date, Dict[str, Any]] = {}
+_loaded_at: float = 0.0
+_retry_at: float = 0.0  # no reload before this after a failed one
+_reload_lock: Optional[asyncio.Lock] = None
+
+
+def _load_all_rates() -> Dict[date, Dict[str, Any]]:
+    conn = get_db_connection()
+    cursor = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f"SELECT date, {', '.join(RATE_COLUMNS)} FROM tarifarios")
+        rates = {}
+        skipped = 0
+        for row in cursor.fetchall():
+            raw_date = row.pop("date")
+            try:
+                night = raw_date if isinstance(raw_date, date) else datetime.strptime(str(raw_date).strip(), "%m/%d/%Y").date()
+            except ValueError:
+                skipped += 1
+                continue
+            # Keep the first row for a date, like the old fetchone() lookup
+            rates.setdefault(night, row)
+        if skipped:
+            logger.warning(f"[RATE_CALENDAR] Skipped {skipped} tarifarios rows with unparseable dates")
+        return rates
+    finally:
+        release_db_connection(conn, cursor)
+
+
+async def _reload(reason: str) -> None:
+    global _rates, _loaded_at, _retry_at, _reload_lock
+    if _reload_lock is None:
+        _reload_lock = asyncio.Lock()
+    requested_at = time.monotonic()
+    async with _reload_lock:
+        # Another caller reloaded while we waited for the lock
+        if _loaded_at >= requested_at or _retry_at > requested_at:
+            return
+        try:
+            rates = await run_db(_load_all_rates, "rate_calendar._load_all_rates")
+        except Exception as e:
+            if not _rates:
+                raise
+            _retry_at = time.monotonic() + config.RATE_CACHE_MISS_RELOAD_SECONDS
+            logger.error(f"[RATE_CALENDAR] Reload failed ({reason}), serving the last {len(_rates)} loaded rates: {e}")
+            return
+        _rates = rates
+        _loaded_at = time.monotonic()
+        logger.info(f"[RATE_CALENDAR] Loaded {len(_rates)} nightly rates ({reason})")
+
+
+async def get_prices_for_range(check_in_date: str, check_out_date: str) -> dict:
+    """
+    Nightly rates for every night from check_in_date up to (not including) check_out_date.
+
+    Args:
+        check_in_date: First night in YYYY-MM-DD format
+        check_out_date: Day after the last night in YYYY-MM-DD format
+
+    Returns:
+        {"success": True, "prices": [(night_str, rate_row), ...]} in night order, or
+        {"success": False, "error": str, "missing_dates": [night_str, ...]}
+    """
+    start = datetime.strptime(check_in_date, "%Y-%m-%d").date()
+    end = datetime.strptime(check_out_date, "%Y-%m-%d").date()
+    nights = [start + timedelta(days=offset) for offset in range((end - start).days)]
+
+    now = time.monotonic()
+    age = now - _loaded_at
+    if _rates and now < _retry_at:
+        pass  # last reload failed; serve the loaded calendar until the retry time
+    elif not _loaded_at or age > config.RATE_CACHE_TTL_SECONDS:
+        await _reload("ttl expired" if _loaded_at else "cold start")
+    elif any(night not in _rates for night in nights) and age > config.RATE_CACHE_MISS_RELOAD_SECONDS:
+        await _reload(f"miss in {check_in_date}..{check_out_date}")
+
+    missing = [night.strftime("%Y-%m-%d") for night in nights if night not in _rates]
+    if missing:
+        logger.warning(f"[RATE_CALENDAR] No prices found for: {missing}")
+        return {"success": False, "error": f"No prices found for {missing[0]}.", "missing_dates": missing}
+
+    return {"success": True, "prices": [(night.strftime("%Y-%m-%d"), dict(_rates[night])) for night in nights]}
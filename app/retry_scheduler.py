@@ -0,0 +1,344 @@
+"""
+Durable scheduler for payment retry jobs.
+
+Bank transfer and CompraClick retries used to start one OS thread (with its
+own event loop) per customer, sleep for minutes to hours, and rewrite a whole
+/tmp/*_retry_state.json file on every change. Nothing resumed after a restart.
+
+Here every pending retry is a row in a SQLite ``retry_jobs`` table (key,
+JSON state, due_at). One asyncio task on the FastAPI loop sleeps until the
+earliest due time (in-memory heap) and then runs everything that is due:
+
+- Jobs of the same kind that are due together share one ``prepare()`` call,
+  so a single bank sync serves every customer waiting on a transfer.
+- Each job's handler does one attempt and returns the delay until the next
+  one (``None`` = finished, the row is deleted).
+- Jobs are claimed with a lease before running, so several workers can run
+  the scheduler against the same database without double-processing. Other
+  workers' jobs (and jobs of a crashed worker) are picked up by a periodic
+  rescan.
+
+Memory and thread count stay flat: one task per process, one heap entry per
+locally scheduled wakeup, and the state itself lives on disk.
+"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from . import config, sqlite_store
+
+logger = logging.getLogger(__name__)
+
+# handler(job_id, state, prepared) -> seconds until the next attempt, or None when done
+JobHandler = Callable[[str, Dict[str, Any], Any], Awaitable[Optional[float]]]
+# prepare() -> shared result passed to every handler due in the same batch
+JobPrepare = Callable[[], Awaitable[Any]]
+
+
+@dataclass
+class _JobKind:
+    handler: JobHandler
+    prepare: Optional[JobPrepare] = None
+
+
+class RetryScheduler:
+    """SQLite-backed retry jobs driven by one asyncio task."""
+
+    def __init__(self, db_path: str, rescan_seconds: float, lease_seconds: float, error_backoff_seconds: float):
+        self.db_path = db_path
+        self.rescan_seconds = rescan_seconds
+        self.lease_seconds = lease_seconds
+        self.error_backoff_seconds = error_backoff_seconds
+        self._kinds: Dict[str, _JobKind] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._db_ready = False
+        self._stats = {
+            "jobs_scheduled": 0,
+            "attempts": 0,
+            "attempts_failed": 0,
+            "jobs_finished": 0,
+            "batches": 0,
+            "prepares": 0,
+        }
+
+    # ------------------------------------------------------------------ storage
+
+    def _init_db(self) -> None:
+        if self._db_ready:
+            return
+        with sqlite_store.connection(self.db_path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS retry_jobs (
+                job_key TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                job_id TEXT NOT NULL,
+                state TEXT NOT NULL,
+                due_at REAL NOT NULL,
+                attempts INTEGER DEFAULT 0 NOT NULL,
+                lease_until REAL,
+                lease_token TEXT,
+                lease_pid INTEGER,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_retry_jobs_due ON retry_jobs(due_at)")
+            conn.commit()
+        self._db_ready = True
+
+    @staticmethod
+    def _job_key(kind: str, job_id: str) -> str:
+        return f"{kind}:{job_id}"
+
+    def register(self, kind: str, handler: JobHandler, prepare: Optional[JobPrepare] = None) -> None:
+        """Register the attempt handler (and optional shared prepare step) for a job kind."""
+        self._kinds[kind] = _JobKind(handler=handler, prepare=prepare)
+
+    def schedule(self, kind: str, job_id: str, state: Dict[str, Any], delay: float = 0.0) -> None:
+        """
+        Create (or replace) the job for ``job_id`` and run its first attempt after ``delay`` seconds.
+
+        Replacing clears any lease, so an attempt still running for the old job
+        cannot overwrite the new one.
+        """
+        self._init_db()
+        due_at = time.time() + max(0.0, delay)
+        with sqlite_store.connection(self.db_path) as conn:
+            conn.execute(
+                """INSERT OR REPLACE INTO retry_jobs (job_key, kind, job_id, state, due_at, attempts, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)""",
+                (self._job_key(kind, job_id), kind, job_id, json.dumps(state), due_at)
+            )
+            conn.commit()
+        self._stats["jobs_scheduled"] += 1
+        self._push(due_at, self._job_key(kind, job_id))
+        logger.info(f"[RETRY_SCHEDULER] Scheduled {kind} job for {job_id} in {max(0.0, delay):.0f}s")
+
+    def get_state(self, kind: str, job_id: str) -> Optional[Dict[str, Any]]:
+        """Current state of a pending job, or None."""
+        self._init_db()
+        with sqlite_store.connection(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT state FROM retry_jobs WHERE job_key = ?", (self._job_key(kind, job_id),)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def update_state(self, kind: str, job_id: str, **changes: Any) -> bool:
+        """Merge ``changes`` into a pending job's state. Returns False if there is no such job."""
+        self._init_db()
+        key = self._job_key(kind, job_id)
+        with sqlite_store.batch(self.db_path), sqlite_store.connection(self.db_path) as conn:
+            row = conn.execute("SELECT state FROM retry_jobs WHERE job_key = ?", (key,)).fetchone()
+            if not row:
+                return False
+            state = json.loads(row[0])
+            state.update(changes)
+            conn.execute(
+                "UPDATE retry_jobs SET state = ?, updated_at = CURRENT_TIMESTAMP WHERE job_key = ?",
+                (json.dumps(state), key)
+            )
+        return True
+
+    def cancel(self, kind: str, job_id: str) -> bool:
+        """Delete a pending job. Returns False if there was none."""
+        self._init_db()
+        with sqlite_store.connection(self.db_path) as conn:
+            cursor = conn.execute("DELETE FROM retry_jobs WHERE job_key = ?", (self._job_key(kind, job_id),))
+            conn.commit()
+            return cursor.rowcount > 0
+
+    def _claim_due(self, now: float) -> List[Tuple[str, str, str, Dict[str, Any], str]]:
+        """Lease every due, unleased job of a registered kind. Returns (job_key, kind, job_id, state, token)."""
+        kinds = list(self._kinds)
+        if not kinds:
+            return []
+        placeholders = ",".join("?" * len(kinds))
+        token = uuid.uuid4().hex
+        with sqlite_store.batch(self.db_path), sqlite_store.connection(self.db_path) as conn:
+            rows = conn.execute(
+                f"""SELECT job_key, kind, job_id, state FROM retry_jobs
+                    WHERE due_at <= ? AND (lease_until IS NULL OR lease_until < ?) AND kind IN ({placeholders})
+                    ORDER BY due_at""",
+                (now, now, *kinds)
+            ).fetchall()
+            if rows:
+                conn.executemany(
+                    "UPDATE retry_jobs SET lease_until = ?, lease_token = ?, lease_pid = ? WHERE job_key = ?",
+                    [(now + self.lease_seconds, token, os.getpid(), row[0]) for row in rows]
+                )
+        return [(job_key, kind, job_id, json.loads(state), token) for job_key, kind, job_id, state in rows]
+
+    def _finish(self, job_key: str, token: str, delay: Optional[float]) -> None:
+        """Delete the job (delay None) or release its lease with the next due time."""
+        with sqlite_store.connection(self.db_path) as conn:
+            if delay is None:
+                conn.execute("DELETE FROM retry_jobs WHERE job_key = ? AND lease_token = ?", (job_key, token))
+                due_at = None
+            else:
+                due_at = time.time() + max(0.0, delay)
+                conn.execute(
+                    """UPDATE retry_jobs
+                       SET due_at = ?, attempts = attempts + 1, lease_until = NULL, lease_token = NULL,
+                           lease_pid = NULL, updated_at = CURRENT_TIMESTAMP
+                       WHERE job_key = ? AND lease_token = ?""",
+                    (due_at, job_key, token)
+                )
+            conn.commit()
+        if due_at is not None:
+            self._push(due_at, job_key)
+
+    def _release_dead_leases(self) -> int:
+        """Clear leases held by processes that no longer exist (restart mid-attempt)."""
+        with sqlite_store.connection(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT DISTINCT lease_pid FROM retry_jobs WHERE lease_pid IS NOT NULL"
+            ).fetchall()
+            dead = []
+            for (pid,) in rows:
+                try:
+                    os.kill(pid, 0)  # Signal 0 just checks if process exists
+                except ProcessLookupError:
+                    dead.append(pid)
+                except PermissionError:
+                    pass  # Alive, just owned by another user: its lease stands
+            if not dead:
+                return 0
+            placeholders = ",".join("?" * len(dead))
+            cursor = conn.execute(
+                f"UPDATE retry_jobs SET lease_until = NULL, lease_token = NULL, lease_pid = NULL WHERE lease_pid IN ({placeholders})",
+                dead
+            )
+            conn.commit()
+            return cursor.rowcount
+
+    def _load_wakeups(self) -> int:
+        with sqlite_store.connection(self.db_path) as conn:
+            rows = conn.execute("SELECT due_at, job_key FROM retry_jobs").fetchall()
+        for due_at, job_key in rows:
+            self._push(due_at, job_key)
+        return len(rows)
+
+    # ------------------------------------------------------------------ loop
+
+    def _push(self, due_at: float, job_key: str) -> None:
+        heapq.heappush(self._heap, (due_at, job_key))
+        if self._loop is not None and self._wakeup is not None:
+            # Wake the loop in case this job is due before its current sleep ends
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _seconds_until_next_wakeup(self) -> float:
+        now = time.time()
+        if not self._heap:
+            return self.rescan_seconds
+        return max(0.0, min(self._heap[0][0] - now, self.rescan_seconds))
+
+    async def start(self) -> None:
+        """Resume pending jobs and start the scheduler task (call from an async startup hook)."""
+        if self._task is not None:
+            return
+        self._init_db()
+        released = self._release_dead_leases()
+        pending = self._load_wakeups()
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run(), name="retry_scheduler")
+        logger.info(f"[RETRY_SCHEDULER] Started with {pending} pending jobs ({released} stale leases released), kinds={list(self._kinds)}")
+
+    async def stop(self) -> None:
+        """Stop the scheduler task. Pending jobs stay in the database."""
+        task, self._task = self._task, None
+        self._loop = None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self._seconds_until_next_wakeup())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.run_due_jobs()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("[RETRY_SCHEDULER] Error while running due jobs")
+
+    async def run_due_jobs(self) -> int:
+        """Claim and run every due job once. Returns the number of attempts made."""
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            heapq.heappop(self._heap)
+
+        claimed = self._claim_due(now)
+        if not claimed:
+            return 0
+
+        by_kind: Dict[str, List[Tuple[str, str, str, Dict[str, Any], str]]] = {}
+        for job in claimed:
+            by_kind.setdefault(job[1], []).append(job)
+
+        for kind, jobs in by_kind.items():
+            job_kind = self._kinds[kind]
+            self._stats["batches"] += 1
+            prepared = None
+            if job_kind.prepare is not None:
+                try:
+                    prepared = await job_kind.prepare()
+                    self._stats["prepares"] += 1
+                except Exception:
+                    logger.exception(f"[RETRY_SCHEDULER] prepare() failed for {kind}, retrying {len(jobs)} jobs later")
+                    for job_key, _, _, _, token in jobs:
+                        self._finish(job_key, token, self.error_backoff_seconds)
+                    continue
+            logger.info(f"[RETRY_SCHEDULER] Running {len(jobs)} due {kind} jobs with one shared prepare")
+            await asyncio.gather(*(self._attempt(job_kind, job, prepared) for job in jobs))
+        return len(claimed)
+
+    async def _attempt(self, job_kind: _JobKind, job: Tuple[str, str, str, Dict[str, Any], str], prepared: Any) -> None:
+        job_key, kind, job_id, state, token = job
+        self._stats["attempts"] += 1
+        try:
+            delay = await job_kind.handler(job_id, state, prepared)
+        except Exception:
+            self._stats["attempts_failed"] += 1
+            logger.exception(f"[RETRY_SCHEDULER] {kind} attempt for {job_id} failed, retrying in {self.error_backoff_seconds:.0f}s")
+            delay = self.error_backoff_seconds
+        if delay is None:
+            self._stats["jobs_finished"] += 1
+        self._finish(job_key, token, delay)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Pending jobs per kind plus attempt counters for the internal metrics endpoint."""
+        pending: Dict[str, int] = {}
+        if self._db_ready:
+            with sqlite_store.connection(self.db_path) as conn:
+                pending = dict(conn.execute("SELECT kind, COUNT(*) FROM retry_jobs GROUP BY kind").fetchall())
+        return {
+            **self._stats,
+            "pending_jobs": pending,
+            "running": self._task is not None,
+        }
+
+
+retry_scheduler = RetryScheduler(
+    config.RETRY_JOBS_DB_PATH,
+    rescan_seconds=config.RETRY_SCHEDULER_RESCAN_SECONDS,
+    lease_seconds=config.RETRY_JOB_LEASE_SECONDS,
+    error_backoff_seconds=config.RETRY_JOB_ERROR_BACKOFF_SECONDS,
+)
@@ -0,0 +1,252 @@
+"""
+Room allocation engine for Las Hojas Resort.
+
+Splitting a group across rooms used to be done with ad-hoc trial loops
+(one ``_select_room`` scan per requested room, "N rooms of one type with
+the group split evenly" guesses for alternatives). This module answers
+both questions directly:
+
+- Which room mixes fit a group? ``MIX_TABLE`` is precomputed at import
+  from ROOM_CAPACITY for every group size up to MAX_ROOMS rooms, best mix
+  first (fewest rooms, then least unused capacity). Only the occupancy
+  (adults + children_6_10 * 0.5) decides which mixes fit, so the table is
+  keyed by occupancy in half-guests.
+- Which concrete rooms? The availability returned by the booking engine
+  is turned into a bitset over a fixed room catalogue once, and every
+  requested room is picked from it by masking (most constrained types
+  first, so a Junior request never takes the last Matrimonial room a
+  Matrimonial request needed).
+"""
+
+import random
+from itertools import combinations_with_replacement
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Room capacity constraints - ALIGNED WITH system_instructions_new.txt (line 1300-1302)
+# Format: {"min_occupancy": X, "max_occupancy": Y}
+# Occupancy formula: adults + (children_6_10 * 0.5). Children 0-5 = 0
+# NOTE: "Doble" is normalized to "Habitación" by _normalize_bungalow_type(), so no separate entry needed
+ROOM_CAPACITY = {
+    "Familiar": {"min_occupancy": 5, "max_occupancy": 8},    # Rooms 1-17
+    "Junior": {"min_occupancy": 1, "max_occupancy": 8},      # Rooms 18-59 (+$20/room/night if adults==1 AND children_6_10<2)
+    "Habitación": {"min_occupancy": 1, "max_occupancy": 4},  # Rooms 1A-14A (also called "Doble") (+$20/room/night if adults==1 AND children_6_10<2)
+    "Matrimonial": {"min_occupancy": 2, "max_occupancy": 2}, # Junior subset: 22,42,47,48,53
+    "Pasadía": {"min_occupancy": 0, "max_occupancy": 999}    # No room capacity for day pass
+}
+
+# Room types offered when suggesting a mix, in tie-break order (Matrimonial only on request)
+MIX_TYPES = ("Junior", "Familiar", "Habitación")
+MAX_ROOMS = 4
+
+# Room type -> key used by check_room_availability / check_room_availability_counts
+AVAILABILITY_KEYS = {
+    "Familiar": "bungalow_familiar",
+    "Junior": "bungalow_junior",
+    "Habitación": "habitacion",
+}
+DISPLAY_NAMES = {
+    "Familiar": "Bungalow Familiar",
+    "Junior": "Bungalow Junior",
+    "Habitación": "Habitación Doble",
+}
+
+# ---------------------------------------------------------------------------
+# Bitset room catalogue
+# ---------------------------------------------------------------------------
+
+MATRIMONIAL_ROOMS = ("22", "42", "47", "48", "53")
+CATALOG: Tuple[str, ...] = (
+    tuple(str(n) for n in range(1, 60)) + tuple(f"{n}A" for n in range(1, 15)) + ("Pasadía",)
+)
+_BITS = {room: 1 << index for index, room in enumerate(CATALOG)}
+
+
+def _mask(rooms: Iterable[str]) -> int:
+    mask = 0
+    for room in rooms:
+        mask |= _BITS.get(room, 0)
+    return mask
+
+
+TYPE_MASKS = {
+    "Familiar": _mask(str(n) for n in range(1, 18)),
+    "Junior": _mask(str(n) for n in range(18, 60)),
+    "Matrimonial": _mask(MATRIMONIAL_ROOMS),
+    "Habitación": _mask(f"{n}A" for n in range(1, 15)),
+    "Pasadía": _BITS["Pasadía"],
+}
+# Requests are served most constrained first
+PICK_ORDER = ("Pasadía", "Matrimonial", "Habitación", "Familiar", "Junior")
+
+
+def normalize_room(room: Any) -> Optional[str]:
+    """Catalogue name for a room number from the booking engine ("05" -> "5", "10a" -> "10A")."""
+    text = str(room).strip()
+    if text == "Pasadía":
+        return text
+    if text.upper().endswith("A"):
+        text = text.upper()
+    else:
+        try:
+            text = str(int(text))
+        except ValueError:
+            return None
+    return text if text in _BITS else None
+
+
+def available_mask(available_rooms: Any) -> int:
+    """Bitset of the rooms in a getRooms ``info`` dict (or any iterable of room numbers)."""
+    rooms = available_rooms.values() if isinstance(available_rooms, dict) else available_rooms
+    return _mask(filter(None, (normalize_room(room) for room in rooms)))
+
+
+def rooms_in(mask: int) -> List[str]:
+    return [room for room, bit in _BITS.items() if mask & bit]
+
+
+def counts_by_type(mask: int) -> Dict[str, int]:
+    """Available rooms per availability key, like check_room_availability_counts."""
+    return {key: bin(mask & TYPE_MASKS[room_type]).count("1") for room_type, key in AVAILABILITY_KEYS.items()}
+
+
+def _candidates(mask: int, room_type: str) -> int:
+    if room_type == "Junior":
+        # Keep Matrimonial rooms for couples unless they are the only Juniors left
+        regular = mask & TYPE_MASKS["Junior"] & ~TYPE_MASKS["Matrimonial"]
+        return regular or mask & TYPE_MASKS["Junior"]
+    return mask & TYPE_MASKS.get(room_type, 0)
+
+
+def pick_rooms(available_rooms: Any, room_types: Sequence[str], excluded_rooms: Iterable[Any] = ()) -> List[Optional[str]]:
+    """
+    Pick one concrete room per requested (normalized) room type.
+
+    Returns the rooms in request order; an entry is None when no room of
+    that type was left.
+    """
+    mask = available_mask(available_rooms) & ~available_mask(excluded_rooms)
+    picked: List[Optional[str]] = [None] * len(room_types)
+    order = sorted(
+        range(len(room_types)),
+        key=lambda i: PICK_ORDER.index(room_types[i]) if room_types[i] in PICK_ORDER else len(PICK_ORDER)
+    )
+    for i in order:
+        candidates = _candidates(mask, room_types[i])
+        if not candidates:
+            continue
+        room = random.choice(rooms_in(candidates))
+        picked[i] = room
+        mask &= ~_BITS[room]
+    return picked
+
+
+# ---------------------------------------------------------------------------
+# Feasible room mixes
+# ---------------------------------------------------------------------------
+
+def occupancy_units(adults: int, children_6_10: int) -> int:
+    """Occupancy in half-guests: adults count 2, children 6-10 count 1, children 0-5 count 0."""
+    return 2 * adults + children_6_10
+
+
+def _build_mix_table() -> Dict[int, List[Tuple[str, ...]]]:
+    mixes = []
+    for size in range(1, MAX_ROOMS + 1):
+        for mix in combinations_with_replacement(MIX_TYPES, size):
+            low = sum(2 * ROOM_CAPACITY[t]["min_occupancy"] for t in mix)
+            high = sum(2 * ROOM_CAPACITY[t]["max_occupancy"] for t in mix)
+            mixes.append((mix, low, high))
+
+    # Every mixable type has max > min, so any total between the bounds splits into
+    # rooms with whole adults and children (an odd total just needs one child 6-10).
+    table: Dict[int, List[Tuple[str, ...]]] = {}
+    for units in range(1, max(high for _, _, high in mixes) + 1):
+        fits = [(mix, high - units) for mix, low, high in mixes if low <= units <= high]
+        fits.sort(key=lambda f: (len(f[0]), f[1], [MIX_TYPES.index(t) for t in f[0]]))
+        table[units] = [mix for mix, _ in fits]
+    return table
+
+
+MIX_TABLE = _build_mix_table()
+
+
+def feasible_mixes(
+    adults: int,
+    children_0_5: int = 0,
+    children_6_10: int = 0,
+    available_counts: Optional[Dict[str, int]] = None,
+    max_rooms: int = MAX_ROOMS
+) -> List[Tuple[str, ...]]:
+    """
+    Room mixes (tuples of room types) that fit the group, best first.
+
+    ``children_0_5`` don't count towards occupancy. Every room needs an adult,
+    so mixes with more rooms than adults are skipped. With ``available_counts``
+    (availability key -> free rooms) only mixes that can actually be booked
+    are returned.
+    """
+    mixes = MIX_TABLE.get(occupancy_units(adults, children_6_10), [])
+    result = []
+    for mix in mixes:
+        if len(mix) > min(max_rooms, adults):
+            continue
+        if available_counts is not None and any(
+            mix.count(t) > available_counts.get(AVAILABILITY_KEYS[t], 0) for t in set(mix)
+        ):
+            continue
+        result.append(mix)
+    return result
+
+
+def describe_mix(mix: Sequence[str]) -> str:
+    """"2x Bungalow Junior" / "1x Bungalow Familiar + 1x Bungalow Junior"."""
+    return " + ".join(f"{mix.count(t)}x {DISPLAY_NAMES[t]}" for t in MIX_TYPES if t in mix)
+
+
+def split_group(mix: Sequence[str], adults: int, children_0_5: int = 0, children_6_10: int = 0) -> List[Dict[str, Any]]:
+    """
+    Assign the group's guests to the rooms of a feasible mix.
+
+    Returns one ``room_bookings`` entry per room (bungalow_type, adults,
+    children_0_5, children_6_10). Adults are spread first so every room
+    gets one where possible; children 0-5 go with the adults.
+    """
+    units = occupancy_units(adults, children_6_10)
+    targets = [2 * ROOM_CAPACITY[t]["min_occupancy"] for t in mix]
+    caps = [2 * ROOM_CAPACITY[t]["max_occupancy"] for t in mix]
+    remaining = units - sum(targets)
+    # Fill round-robin two half-guests (one adult) at a time, then any odd child
+    while remaining > 0:
+        progressed = False
+        for i in range(len(mix)):
+            step = min(2 if remaining >= 2 else 1, caps[i] - targets[i])
+            if step > 0 and remaining > 0:
+                targets[i] += step
+                remaining -= step
+                progressed = True
+        if not progressed:
+            raise ValueError(f"Group does not fit in {list(mix)}")
+
+    kids = [target % 2 for target in targets]  # odd targets need a child 6-10
+    even = [target - kid for target, kid in zip(targets, kids)]
+    room_adults = [0] * len(mix)
+    adults_left = adults
+    for i in range(len(mix)):
+        if adults_left and even[i] >= 2:
+            room_adults[i] = 1
+            adults_left -= 1
+    for i in range(len(mix)):
+        extra = min(even[i] // 2 - room_adults[i], adults_left)
+        room_adults[i] += extra
+        adults_left -= extra
+    kids = [kid + even[i] - 2 * room_adults[i] for i, kid in enumerate(kids)]
+
+    small = [0] * len(mix)
+    with_adults = [i for i in range(len(mix)) if room_adults[i]] or list(range(len(mix)))
+    for n in range(children_0_5):
+        small[with_adults[n % len(with_adults)]] += 1
+
+    return [
+        {"bungalow_type": t, "adults": room_adults[i], "children_0_5": small[i], "children_6_10": kids[i]}
+        for i, t in enumerate(mix)
+    ]
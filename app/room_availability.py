@@ -0,0 +1,90 @@
+"""
+Short-lived, coalescing cache for the booking engine's getRooms API.
+
+Within one customer turn the same date range used to be fetched several
+times (availability check, count check, link creation, booking
+revalidation), each a slow round-trip to the booking engine. Now:
+
+- Concurrent requests for the same (check_in, check_out) share one HTTP call.
+- A response is reused for ROOM_AVAILABILITY_TTL_SECONDS (a few seconds).
+- ``invalidate()`` runs whenever this process submits a booking. It drops
+  every cached range, and requests already in flight are neither stored
+  nor joined afterwards, so no caller sees rooms from before the booking.
+"""
+
+import asyncio
+import copy
+import logging
+import time
+from typing import Any, Dict, Tuple
+
+from . import config
+from .clients import http_pool
+
+logger = logging.getLogger(__name__)
+
+GET_ROOMS_URL = "https://booking.lashojasresort.club/api/getRooms"
+
+_cache: Dict[Tuple[str, str], Tuple[float, Dict[str, Any]]] = {}
+_inflight: Dict[Tuple[asyncio.AbstractEventLoop, str, str], Tuple[int, asyncio.Task]] = {}
+_generation = 0
+_stats = {"requests": 0, "fetches": 0, "cache_hits": 0, "coalesced": 0, "invalidations": 0}
+
+
+async def _fetch(check_in_date: str, check_out_date: str, generation: int) -> Dict[str, Any]:
+    params = {
+        "checkIn": check_in_date,
+        "checkOut": check_out_date
+    }
+    _stats["fetches"] += 1
+    async with http_pool.client_for(GET_ROOMS_URL) as client:
+        response = await client.get(GET_ROOMS_URL, params=params, timeout=300.0)
+        response.raise_for_status()
+        data = response.json()
+    if generation == _generation:
+        now = time.monotonic()
+        for stale in [k for k, (fetched_at, _) in _cache.items() if now - fetched_at >= config.ROOM_AVAILABILITY_TTL_SECONDS]:
+            del _cache[stale]
+        _cache[(check_in_date, check_out_date)] = (now, data)
+    return data
+
+
+async def get_rooms(check_in_date: str, check_out_date: str) -> Dict[str, Any]:
+    """
+    getRooms response for the date range (``{"info": {index: room_number}, ...}``).
+
+    Raises whatever the HTTP call raises; failures are not cached.
+    """
+    _stats["requests"] += 1
+    key = (check_in_date, check_out_date)
+    cached = _cache.get(key)
+    if cached is not None and time.monotonic() - cached[0] < config.ROOM_AVAILABILITY_TTL_SECONDS:
+        _stats["cache_hits"] += 1
+        return copy.deepcopy(cached[1])
+
+    loop = asyncio.get_running_loop()
+    inflight_key = (loop, check_in_date, check_out_date)
+    inflight = _inflight.get(inflight_key)
+    if inflight is not None and inflight[0] == _generation and not inflight[1].done():
+        _stats["coalesced"] += 1
+        task = inflight[1]
+    else:
+        task = loop.create_task(_fetch(check_in_date, check_out_date, _generation))
+        _inflight[inflight_key] = (_generation, task)
+        task.add_done_callback(
+            lambda t: _inflight.pop(inflight_key, None) if _inflight.get(inflight_key, (None, None))[1] is t else None
+        )
+    # Shielded: one caller giving up must not cancel the fetch for the others
+    return copy.deepcopy(await asyncio.shield(task))
+
+
+def invalidate() -> None:
+    """Forget all availability (a booking was just submitted by this process)."""
+    global _generation
+    _generation += 1
+    _cache.clear()
+    _stats["invalidations"] += 1
+
+
+def get_metrics() -> Dict[str, int]:
+    return {**_stats, "cached_ranges": len(_cache)}
@@ -0,0 +1,338 @@
+"""
+Materialized room-night occupancy for Las Hojas Resort.
+
+``user_books.reserverooms`` / ``member_books.room_number`` are free text
+("1-ROOM1+ROOM2") with varchar dates, so answering "which rooms are taken
+between X and Y?" straight from the booking tables means parsing every
+booking in history on every query. Instead, this module keeps one row per
+occupied (room_number, night) in ``room_nights`` (indexed on night), and
+availability becomes an indexed range scan.
+
+The table is maintained incrementally; the booking tables are never
+scanned in full after the first backfill:
+
+- New bookings: rows past the per-table id watermark (``room_night_sync``)
+  are parsed and materialized. An index-only ``MAX(id)`` check makes the
+  common "nothing new" case one cheap round-trip, so a booking is visible
+  to the very next availability query. The last ROOM_NIGHTS_ID_OVERLAP ids
+  are re-read each time, catching inserts that committed out of id order.
+- Cancellations and edits: every booking that has not ended yet is tracked
+  in ``room_night_bookings`` with a signature of its rooms, dates and
+  cancel flag. At most every ROOM_NIGHTS_RECHECK_SECONDS those bookings
+  are re-read by primary key and any whose signature changed are
+  re-materialized (cancelled ones keep their tracking row and no nights,
+  so an un-cancelled booking comes back).
+
+Bookings are counted exactly like the old availability CTE: cancel_flag
+must be set and not 'yes', both dates must parse as m/d/Y, and a booking
+occupies the nights check_in <= night < check_out.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from . import config
+from .availability_matrix import parse_room_list
+
+logger = logging.getLogger(__name__)
+
+# Booking table -> column holding its room list
+SOURCES = {
+    "user_books": "reserverooms",
+    "member_books": "room_number",
+}
+
+MAX_ROOM_LENGTH = 32  # longer tokens are typos/notes, not rooms
+
+SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS room_nights (
+        source       VARCHAR(16) NOT NULL,
+        booking_id   BIGINT      NOT NULL,
+        room_number  VARCHAR(32) NOT NULL,
+        night        DATE        NOT NULL,
+        PRIMARY KEY (source, booking_id, room_number, night),
+        KEY idx_night_room (night, room_number)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS room_night_bookings (
+        source      VARCHAR(16) NOT NULL,
+        booking_id  BIGINT      NOT NULL,
+        signature   CHAR(32)    NOT NULL,
+        last_night  DATE        NOT NULL,
+        PRIMARY KEY (source, booking_id),
+        KEY idx_source_last_night (source, last_night)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS room_night_sync (
+        source   VARCHAR(16) NOT NULL PRIMARY KEY,
+        last_id  BIGINT      NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+_schema_ready = False
+_state_lock = threading.Lock()
+_watermarks: Dict[str, int] = {}
+_next_recheck = 0.0
+_stats = {"syncs": 0, "bookings_materialized": 0, "bookings_changed": 0, "rechecks": 0, "range_queries": 0}
+
+
+def _bump(key: str, value: int = 1) -> None:
+    with _state_lock:
+        _stats[key] += value
+
+
+def _parse_date(value) -> Optional[date]:
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if not value:
+        return None
+    try:
+        return datetime.strptime(str(value).strip(), "%m/%d/%Y").date()
+    except ValueError:
+        return None
+
+
+def signature(rooms_field, check_in, check_out, cancel_flag) -> str:
+    """Fingerprint of the booking fields that decide its room-nights."""
+    raw = "|".join("" if v is None else str(v) for v in (rooms_field, check_in, check_out, cancel_flag))
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def booking_nights(rooms_field, check_in, check_out, cancel_flag) -> Tuple[Optional[date], Set[Tuple[str, date]]]:
+    """
+    (last night, occupied (room_number, night) pairs) for one booking row.
+
+    The last night is None when the dates don't parse (nothing to track);
+    the pairs are empty for cancelled bookings.
+    """
+    start, end = _parse_date(check_in), _parse_date(check_out)
+    if not start or not end or start >= end:
+        return None, set()
+    last_night = end - timedelta(days=1)
+    if cancel_flag is None or str(cancel_flag).strip().lower() == "yes":
+        return last_night, set()
+    rooms = [room for room in parse_room_list(rooms_field) if len(room) <= MAX_ROOM_LENGTH]
+    nights = [start + timedelta(days=i) for i in range((end - start).days)]
+    return last_night, {(room, night) for room in rooms for night in nights}
+
+
+def ensure_schema(conn) -> None:
+    """Create the occupancy tables if needed (once per process)."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    cursor = conn.cursor()
+    try:
+        for statement in SCHEMA:
+            cursor.execute(statement)
+        conn.commit()
+    finally:
+        cursor.close()
+    _schema_ready = True
+
+
+def _horizon() -> date:
+    # One day of slack so a booking ending "today" in any timezone is still tracked
+    return date.today() - timedelta(days=1)
+
+
+def _tracked(cursor, source: str, booking_ids: Iterable[int]) -> Dict[int, str]:
+    ids = list(booking_ids)
+    if not ids:
+        return {}
+    placeholders = ", ".join(["%s"] * len(ids))
+    cursor.execute(
+        f"SELECT booking_id, signature FROM room_night_bookings WHERE source = %s AND booking_id IN ({placeholders})",
+        (source, *ids)
+    )
+    return {booking_id: sig for booking_id, sig in cursor.fetchall()}
+
+
+def _reconcile(cursor, source: str, rows: List[tuple], tracked: Dict[int, str], expected_ids: Iterable[int] = ()) -> int:
+    """
+    Bring room_nights in line with the given booking rows; returns how many bookings changed.
+
+    ``expected_ids`` missing from ``rows`` were deleted from the booking table.
+    """
+    horizon = _horizon()
+    changed = 0
+    seen = set()
+    for booking_id, rooms_field, check_in, check_out, cancel_flag in rows:
+        seen.add(booking_id)
+        sig = signature(rooms_field, check_in, check_out, cancel_flag)
+        if tracked.get(booking_id) == sig:
+            continue
+        last_night, pairs = booking_nights(rooms_field, check_in, check_out, cancel_flag)
+        if booking_id not in tracked and (last_night is None or last_night < horizon):
+            continue  # already over (or undated): nothing to track
+        cursor.execute("DELETE FROM room_nights WHERE source = %s AND booking_id = %s", (source, booking_id))
+        if pairs:
+            cursor.executemany(
+                "INSERT INTO room_nights (source, booking_id, room_number, night) VALUES (%s, %s, %s, %s)",
+                [(source, booking_id, room, night) for room, night in sorted(pairs)]
+            )
+        if last_night is None:
+            cursor.execute("DELETE FROM room_night_bookings WHERE source = %s AND booking_id = %s", (source, booking_id))
+        else:
+            cursor.execute(
+                "REPLACE INTO room_night_bookings (source, booking_id, signature, last_night) VALUES (%s, %s, %s, %s)",
+                (source, booking_id, sig, last_night)
+            )
+        changed += 1
+
+    for booking_id in set(expected_ids) - seen:
+        cursor.execute("DELETE FROM room_nights WHERE source = %s AND booking_id = %s", (source, booking_id))
+        cursor.execute("DELETE FROM room_night_bookings WHERE source = %s AND booking_id = %s", (source, booking_id))
+        changed += 1
+    return changed
+
+
+def _sync_new(conn, source: str, rooms_column: str) -> None:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"SELECT COALESCE(MAX(id), 0) FROM {source}")
+        max_id = cursor.fetchone()[0]
+        conn.commit()
+        if _watermarks.get(source) == max_id:
+            return
+
+        # Serializes workers syncing the same table; the lock is held until commit
+        cursor.execute("INSERT IGNORE INTO room_night_sync (source, last_id) VALUES (%s, 0)", (source,))
+        cursor.execute("SELECT last_id FROM room_night_sync WHERE source = %s FOR UPDATE", (source,))
+        last_id = cursor.fetchone()[0]
+        cursor_id = max(last_id - config.ROOM_NIGHTS_ID_OVERLAP, 0) if last_id else 0
+        backfill = last_id == 0
+        materialized = 0
+        while True:
+            cursor.execute(
+                f"SELECT id, {rooms_column}, checkIn, checkOut, cancel_flag FROM {source} "
+                f"WHERE id > %s ORDER BY id LIMIT %s",
+                (cursor_id, config.ROOM_NIGHTS_SYNC_BATCH)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            tracked = {} if backfill else _tracked(cursor, source, [row[0] for row in rows])
+            materialized += _reconcile(cursor, source, rows, tracked)
+            cursor_id = rows[-1][0]
+            if len(rows) < config.ROOM_NIGHTS_SYNC_BATCH:
+                break
+
+        new_last_id = max(cursor_id, last_id)
+        cursor.execute("UPDATE room_night_sync SET last_id = %s WHERE source = %s", (new_last_id, source))
+        conn.commit()
+        with _state_lock:
+            _watermarks[source] = new_last_id
+        if materialized:
+            _bump("bookings_materialized", materialized)
+            logger.info(f"[ROOM_NIGHTS] {source}: materialized {materialized} bookings up to id {new_last_id}")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def _recheck(conn, source: str, rooms_column: str) -> None:
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT booking_id, signature FROM room_night_bookings WHERE source = %s AND last_night >= %s",
+            (source, _horizon())
+        )
+        tracked = dict(cursor.fetchall())
+        ids = list(tracked)
+        changed = 0
+        for i in range(0, len(ids), config.ROOM_NIGHTS_SYNC_BATCH):
+            chunk = ids[i:i + config.ROOM_NIGHTS_SYNC_BATCH]
+            placeholders = ", ".join(["%s"] * len(chunk))
+            cursor.execute(
+                f"SELECT id, {rooms_column}, checkIn, checkOut, cancel_flag FROM {source} WHERE id IN ({placeholders})",
+                tuple(chunk)
+            )
+            changed += _reconcile(cursor, source, cursor.fetchall(), tracked, chunk)
+        conn.commit()
+        if changed:
+            _bump("bookings_changed", changed)
+            logger.info(f"[ROOM_NIGHTS] {source}: re-materialized {changed} edited/cancelled bookings")
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def sync(conn, force_recheck: bool = False) -> None:
+    """
+    Bring room_nights up to date on ``conn`` (a pooled MySQL connection).
+
+    New bookings are always picked up; active bookings are re-read for
+    cancellations/edits at most every ROOM_NIGHTS_RECHECK_SECONDS.
+    """
+    global _next_recheck
+    ensure_schema(conn)
+    _bump("syncs")
+    with _state_lock:
+        due = force_recheck or time.monotonic() >= _next_recheck
+        if due:
+            _next_recheck = time.monotonic() + config.ROOM_NIGHTS_RECHECK_SECONDS
+            # Re-read the id overlap too, even if MAX(id) hasn't moved
+            _watermarks.clear()
+
+    for source, rooms_column in SOURCES.items():
+        _sync_new(conn, source, rooms_column)
+    if due:
+        _bump("rechecks")
+        for source, rooms_column in SOURCES.items():
+            _recheck(conn, source, rooms_column)
+
+
+def prime() -> None:
+    """Create the tables and catch up with bookings in the background (startup hook)."""
+    from .database_client import get_db_connection, release_db_connection
+
+    def _run():
+        conn = None
+        try:
+            conn = get_db_connection()
+            sync(conn, force_recheck=True)
+        except Exception as e:
+            logger.warning(f"[ROOM_NIGHTS] Startup sync failed, the first availability check will sync: {e}")
+        finally:
+            release_db_connection(conn)
+
+    threading.Thread(target=_run, name="room_nights_sync", daemon=True).start()
+
+
+def occupied_room_nights(conn, check_in: date, check_out: date) -> List[Tuple[str, date]]:
+    """(room_number, night) pairs occupied on nights check_in <= night < check_out."""
+    _bump("range_queries")
+    cursor = conn.cursor()
+    try:
+        cursor.execute(
+            "SELECT DISTINCT room_number, night FROM room_nights WHERE night >= %s AND night < %s",
+            (check_in, check_out)
+        )
+        return cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+def booked_rooms(conn, check_in: date, check_out: date) -> Set[str]:
+    """Rooms occupied on at least one night of the stay."""
+    return {room for room, _ in occupied_room_nights(conn, check_in, check_out)}
+
+
+def get_metrics() -> dict:
+    with _state_lock:
+        return {**_stats, "watermarks": dict(_watermarks)}
@@ -0,0 +1,155 @@
+"""
+Single-flight coordination for expensive sync jobs, across workers.
+
+Every "ya transferí" used to start its own BAC sync: a full Playwright login,
+CSV download and import. ``SingleFlight.run(fn)`` makes concurrent callers
+share one run instead:
+
+- Callers in the same process attach to the run already in flight and get
+  its result.
+- Across processes, runs are serialized with an flock on ``lock_path``. The
+  waiting worker blocks on the lock in a thread, so the kernel wakes it as
+  soon as the lock is released (no polling).
+- The last successful result is stored in SQLite (sqlite_store). If it
+  finished less than ``fresh_seconds`` ago, it is returned as-is. Workers
+  that queued behind a run therefore reuse its result instead of starting
+  another one.
+"""
+
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from . import config, sqlite_store
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """One in-flight run of ``fn`` at a time, with results shared within a freshness window."""
+
+    def __init__(self, name: str, lock_path: str, fresh_seconds: float, db_path: str = None):
+        self.name = name
+        self.lock_path = lock_path
+        self.fresh_seconds = fresh_seconds
+        self.db_path = db_path or config.SINGLE_FLIGHT_DB_PATH
+        self._inflight: Dict[asyncio.AbstractEventLoop, asyncio.Task] = {}
+        self._db_ready = False
+        self._stats = {"calls": 0, "runs": 0, "joined_in_flight": 0, "fresh_hits": 0}
+
+    def _init_db(self) -> None:
+        if self._db_ready:
+            return
+        with sqlite_store.connection(self.db_path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS single_flight_results (
+                name TEXT PRIMARY KEY,
+                finished_at REAL NOT NULL,
+                result TEXT NOT NULL
+            )
+            """)
+            conn.commit()
+        self._db_ready = True
+
+    def _fresh_result(self) -> Optional[Dict[str, Any]]:
+        with sqlite_store.connection(self.db_path) as conn:
+            row = conn.execute(
+                "SELECT finished_at, result FROM single_flight_results WHERE name = ?", (self.name,)
+            ).fetchone()
+        if not row:
+            return None
+        age = time.time() - row[0]
+        if age >= self.fresh_seconds:
+            return None
+        result = json.loads(row[1])
+        logger.info(f"[SINGLE_FLIGHT] {self.name}: reusing result from {age:.0f}s ago")
+        return result
+
+    def _store_result(self, result: Dict[str, Any]) -> None:
+        with sqlite_store.connection(self.db_path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO single_flight_results (name, finished_at, result) VALUES (?, ?, ?)",
+                (self.name, time.time(), json.dumps(result, default=str))
+            )
+            conn.commit()
+
+    def _acquire_blocking(self) -> int:
+        fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd
+
+    @staticmethod
+    def _release(fd: int) -> None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
+
+    async def _acquire(self) -> int:
+        future = asyncio.get_running_loop().run_in_executor(None, self._acquire_blocking)
+        try:
+            return await asyncio.shield(future)
+        except asyncio.CancelledError:
+            # The thread may still get the lock after we stop waiting: release it when it does
+            future.add_done_callback(
+                lambda f: self._release(f.result()) if not f.cancelled() and f.exception() is None else None
+            )
+            raise
+
+    async def _run_once(self, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        self._init_db()
+        fresh = self._fresh_result()
+        if fresh is not None:
+            self._stats["fresh_hits"] += 1
+            return fresh
+
+        waited = time.monotonic()
+        fd = await self._acquire()
+        try:
+            waited = time.monotonic() - waited
+            if waited > 1:
+                logger.info(f"[SINGLE_FLIGHT] {self.name}: waited {waited:.1f}s for another worker's run")
+            # Another worker may have finished a run while we were waiting for the lock
+            fresh = self._fresh_result()
+            if fresh is not None:
+                self._stats["fresh_hits"] += 1
+                return fresh
+
+            self._stats["runs"] += 1
+            result = await fn()
+            if result.get("success"):
+                self._store_result(result)
+            return result
+        finally:
+            self._release(fd)
+
+    async def run(self, fn: Callable[[], Awaitable[Dict[str, Any]]]) -> Dict[str, Any]:
+        """
+        Return a fresh shared result, join the run in flight, or run ``fn`` now.
+
+        ``fn`` must return a dict with a ``success`` key; only successful
+        results are shared with later callers.
+        """
+        self._stats["calls"] += 1
+        loop = asyncio.get_running_loop()
+        task = self._inflight.get(loop)
+        if task is not None and not task.done():
+            self._stats["joined_in_flight"] += 1
+            logger.info(f"[SINGLE_FLIGHT] {self.name}: joining run already in flight")
+        else:
+            task = loop.create_task(self._run_once(fn), name=f"single_flight:{self.name}")
+            self._inflight[loop] = task
+            task.add_done_callback(lambda t: self._inflight.pop(loop, None) if self._inflight.get(loop) is t else None)
+        # Shielded: one caller giving up must not cancel the run for everyone else
+        return await asyncio.shield(task)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {**self._stats, "in_flight": any(not t.done() for t in self._inflight.values())}
@@ -7,12 +7,16 @@ When a multi-night stay is unavailable for the full period, this module:
 2. If unavailable, checks each possible sub-period combination  
 3. Returns structured data about available partial periods
 4. Enables the assistant to offer alternative stay options
+
+All periods are answered from a single per-night occupancy matrix query
+(see availability_matrix), so DB time does not grow with the stay length.
 """
 
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime
 from typing import Dict, List, Tuple, Optional
-from app.database_client import check_room_availability
+from app.database_client import get_occupancy_matrix
+from app.availability_matrix import availability_for_period, enumerate_sub_stays, longest_free_runs_by_type
 
 logger = logging.getLogger(__name__)
 
@@ -34,16 +38,19 @@ async def check_smart_availability(check_in_date: str, check_out_date: str) -> D
     logger.info(f"[SMART_AVAILABILITY] Checking availability for {check_in_date} to {check_out_date}")
     
     try:
-        # Step 1: Check full period availability (current behavior)
-        full_availability = await check_room_availability(check_in_date, check_out_date)
+        # Step 1: One query for the whole window, then full period availability from memory
+        occupancy = await get_occupancy_matrix(check_in_date, check_out_date)
         
-        if "error" in full_availability:
+        if "error" in occupancy:
             return {
                 "success": False,
-                "error": full_availability["error"],
+                "error": occupancy["error"],
                 "customer_message": "Error al verificar disponibilidad."
             }
         
+        runs_by_type = longest_free_runs_by_type(occupancy["matrix"], occupancy["nights"])
+        full_availability = availability_for_period(runs_by_type, 0, occupancy["nights"])
+        
         # Check if any room type is available for the full period
         any_available = any(status == "Available" for status in full_availability.values())
         
@@ -67,7 +74,9 @@ async def check_smart_availability(check_in_date: str, check_out_date: str) -> D
         # Step 2: If no rooms available for full period, check partial periods
         logger.info(f"[SMART_AVAILABILITY] No rooms available for full period. Checking partial options...")
         
-        partial_options = await _find_partial_availability_options(check_in_date, check_out_date)
+        partial_options = _find_partial_availability_options(
+            occupancy["window_start"], occupancy["nights"], runs_by_type
+        )
         result["partial_options"] = partial_options
         
         # Step 3: Generate customer recommendation message
@@ -89,10 +98,12 @@ async def check_smart_availability(check_in_date: str, check_out_date: str) -> D
             "customer_message": "Error al verificar opciones de disponibilidad."
         }
 
-async def _find_partial_availability_options(original_checkin: str, original_checkout: str) -> List[Dict]:
+def _find_partial_availability_options(window_start, total_nights: int, runs_by_type: Dict[str, List[int]]) -> List[Dict]:
     """
     Find all possible partial stay periods within the requested date range.
     
+    Computed in memory from the occupancy matrix's free-night runs (no extra queries).
+    
     Returns list of available partial stays with format:
     [
         {
@@ -104,42 +115,11 @@ async def _find_partial_availability_options(original_checkin: str, original_che
         ...
     ]
     """
-    partial_options = []
-    
-    # Convert date strings to datetime objects
-    start_date = datetime.strptime(original_checkin, "%Y-%m-%d")
-    end_date = datetime.strptime(original_checkout, "%Y-%m-%d")
-    total_nights = (end_date - start_date).days
-    
     logger.info(f"[SMART_AVAILABILITY] Checking partial options for {total_nights} nights total")
     
-    # Check all possible sub-periods (minimum 1 night)
-    for nights in range(1, total_nights + 1):
-        for start_offset in range(total_nights - nights + 1):
-            # Calculate the sub-period dates
-            sub_checkin = start_date + timedelta(days=start_offset)
-            sub_checkout = sub_checkin + timedelta(days=nights)
-            
-            sub_checkin_str = sub_checkin.strftime("%Y-%m-%d")
-            sub_checkout_str = sub_checkout.strftime("%Y-%m-%d")
-            
-            logger.info(f"[SMART_AVAILABILITY] Checking sub-period: {sub_checkin_str} to {sub_checkout_str} ({nights} nights)")
-            
-            # Check availability for this sub-period
-            sub_availability = await check_room_availability(sub_checkin_str, sub_checkout_str)
-            
-            if "error" not in sub_availability:
-                available_types = [room_type for room_type, status in sub_availability.items() if status == "Available"]
-                
-                if available_types:
-                    partial_options.append({
-                        "check_in": sub_checkin_str,
-                        "check_out": sub_checkout_str,
-                        "nights": nights,
-                        "available_room_types": available_types,
-                        "availability_detail": sub_availability
-                    })
-                    logger.info(f"[SMART_AVAILABILITY] Found partial availability: {sub_checkin_str} to {sub_checkout_str}, types: {available_types}")
+    partial_options = enumerate_sub_stays(runs_by_type, window_start, total_nights)
+    for option in partial_options:
+        logger.info(f"[SMART_AVAILABILITY] Found partial availability: {option['check_in']} to {option['check_out']}, types: {option['available_room_types']}")
     
     # Sort by preference: longer stays first, then by proximity to original dates
     partial_options.sort(key=lambda x: (-x["nights"], x["check_in"]))
@@ -0,0 +1,146 @@
+"""
+Shared SQLite connection layer for the local state databases.
+
+thread_store, message_buffer, conversation_log and agent_context_injector
+used to open (and close) a fresh sqlite3 connection for every tiny read or
+write, a dozen times per customer turn. Every open re-reads the schema and
+throws away the prepared statements.
+
+Instead, each thread keeps one long-lived connection per database file:
+- WAL journaling, so webhook writes don't block readers in other workers
+- synchronous=NORMAL (durable across app crashes, safe in WAL mode)
+- busy_timeout instead of failing immediately on a locked database
+- a larger prepared-statement cache (sqlite3's per-connection LRU)
+
+Usage mirrors the old per-module helpers:
+
+    with sqlite_store.connection(DB_PATH) as conn:
+        conn.execute(...)
+        conn.commit()
+
+Uncommitted work is rolled back when the block exits, exactly like closing
+the connection used to. ``batch(DB_PATH)`` groups several writes (including
+calls into thread_store helpers that commit on their own) into a single
+transaction.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_CACHE_SIZE = 256
+
+_local = threading.local()
+_stats = {"connections_opened": 0, "checkouts": 0, "batches": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(key: str) -> None:
+    with _stats_lock:
+        _stats[key] += 1
+
+
+def _open(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(
+        path,
+        timeout=config.SQLITE_BUSY_TIMEOUT_SECONDS,
+        cached_statements=STATEMENT_CACHE_SIZE,
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    _count("connections_opened")
+    logger.info(f"[SQLITE] Opened WAL connection to {path} (pid {os.getpid()}, thread {threading.get_ident()})")
+    return conn
+
+
+def _thread_state() -> Dict[str, dict]:
+    # Connections must not cross a fork (gunicorn workers): start over in a new process
+    if getattr(_local, "pid", None) != os.getpid():
+        _local.pid = os.getpid()
+        _local.conns = {}
+        _local.batches = set()
+    return _local.__dict__
+
+
+def get_connection(path: str) -> sqlite3.Connection:
+    """This thread's connection to ``path``, opened on first use."""
+    state = _thread_state()
+    key = os.path.abspath(path)
+    conn = state["conns"].get(key)
+    if conn is None:
+        conn = _open(path)
+        state["conns"][key] = conn
+    return conn
+
+
+class _BatchConnection:
+    """Connection handed out inside ``batch()``: commit() is deferred to the end of the batch."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        object.__setattr__(self, "_conn", conn)
+
+    def commit(self) -> None:
+        pass
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+
+@contextmanager
+def connection(path: str) -> Iterator[sqlite3.Connection]:
+    """Check out this thread's connection to ``path`` for one unit of work."""
+    conn = get_connection(path)
+    _count("checkouts")
+    in_batch = os.path.abspath(path) in _thread_state()["batches"]
+    try:
+        yield _BatchConnection(conn) if in_batch else conn
+    finally:
+        conn.row_factory = None
+        if not in_batch and conn.in_transaction:
+            conn.rollback()
+
+
+@contextmanager
+def batch(path: str) -> Iterator[None]:
+    """
+    Run every write to ``path`` inside the block as one transaction.
+
+    Commits once on success and rolls everything back on error. Nested
+    batches on the same path join the outer one.
+    """
+    batches = _thread_state()["batches"]
+    key = os.path.abspath(path)
+    if key in batches:
+        yield
+        return
+
+    conn = get_connection(path)
+    if conn.in_transaction:
+        conn.rollback()
+    conn.execute("BEGIN IMMEDIATE")
+    batches.add(key)
+    _count("batches")
+    try:
+        yield
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        batches.discard(key)
+
+
+def get_metrics() -> dict:
+    """Connection reuse counters for this worker process."""
+    with _stats_lock:
+        return dict(_stats)
@@ -1,16 +1,13 @@
 import os
 import sqlite3
-from contextlib import contextmanager
+
+from app import sqlite_store
 
 DB_PATH = os.environ.get("THREAD_DB_PATH", "app/thread_store.db")
 
-@contextmanager
 def get_conn():
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        yield conn
-    finally:
-        conn.close()
+    """This thread's shared WAL connection (see sqlite_store); use as a context manager."""
+    return sqlite_store.connection(DB_PATH)
 
 def init_db():
     """Initializes the database and safely migrates the schema."""
@@ -71,7 +68,51 @@ def init_db():
         conn.execute("UPDATE threads SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL")
         conn.commit()
 
-from typing import Optional
+from typing import Optional, Tuple
+
+def batch():
+    """Groups several thread_store writes into one transaction.
+
+    Usage:
+        with thread_store.batch():
+            save_conversation_id(wa_id, new_id)
+            save_response_id(wa_id, None)
+            reset_message_count(wa_id)
+    """
+    return sqlite_store.batch(DB_PATH)
+
+def begin_turn(identifier: str) -> dict:
+    """Increments the message count and loads the conversation state in one transaction.
+
+    Replaces the separate increment_message_count, get_last_updated_timestamp,
+    get_conversation_id and get_last_response_id calls at the start of a turn.
+
+    Returns:
+        Dict with message_count (after incrementing), conversation_id,
+        last_response_id, last_updated and agent_context_injected.
+        Missing values are None.
+    """
+    with batch(), get_conn() as conn:
+        conn.execute(
+            "UPDATE threads SET message_count = COALESCE(message_count, 0) + 1 WHERE wa_id = ?",
+            (identifier,)
+        )
+        row = conn.execute(
+            """SELECT message_count, conversation_id, last_response_id, last_updated, agent_context_injected
+               FROM threads WHERE wa_id = ?""",
+            (identifier,)
+        ).fetchone()
+    if not row:
+        # Same as increment_message_count for an unknown user: count 1, nothing stored
+        return {"message_count": 1, "conversation_id": None, "last_response_id": None,
+                "last_updated": None, "agent_context_injected": None}
+    return {
+        "message_count": row[0],
+        "conversation_id": row[1] or None,
+        "last_response_id": row[2] or None,
+        "last_updated": row[3] or None,
+        "agent_context_injected": row[4],
+    }
 
 def get_thread_id(wa_id: str) -> Optional[dict]:
     """Retrieves the full thread record for a given wa_id."""
@@ -190,6 +231,25 @@ def update_last_webhook_timestamp(wa_id: str):
         """, (wa_id, wa_id))
         conn.commit()
 
+def touch_webhook_timestamp(wa_id: str) -> Tuple[Optional[str], Optional[str]]:
+    """Records an incoming webhook message and returns the timestamps it replaced.
+
+    One transaction for what the webhook handlers used to do in three calls
+    (get_last_webhook_timestamp, get_last_updated_timestamp,
+    update_last_webhook_timestamp).
+
+    Returns:
+        (previous last_webhook_timestamp, last_updated), either may be None.
+    """
+    with batch(), get_conn() as conn:
+        row = conn.execute(
+            "SELECT last_webhook_timestamp, last_updated FROM threads WHERE wa_id = ?", (wa_id,)
+        ).fetchone()
+        update_last_webhook_timestamp(wa_id)
+    if not row:
+        return None, None
+    return row[0] or None, row[1] or None
+
 def get_last_webhook_timestamp(wa_id: str) -> Optional[str]:
     """Retrieves the last webhook message timestamp for missed message detection."""
     with get_conn() as conn:
@@ -202,8 +262,8 @@ def increment_message_count(identifier: str) -> int:
     
     Used to track when to send system_instructions (every 2 messages).
     """
-    with get_conn() as conn:
-        # Get current count
+    with batch(), get_conn() as conn:
+        # Get current count (read and update in one transaction so workers can't interleave)
         cur = conn.execute("SELECT message_count FROM threads WHERE wa_id = ?", (identifier,))
         row = cur.fetchone()
         current_count = row[0] if row and row[0] is not None else 0
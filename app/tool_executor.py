@@ -0,0 +1,160 @@
+"""
+Concurrent execution of the tool calls requested in one Responses round.
+
+The model often asks for several independent lookups at once
+(check_room_availability + get_price_for_date x3 + check_office_status).
+Read-only tools run concurrently, so a round takes as long as its slowest
+lookup. Tools with side effects (messages to the customer, payments,
+bookings, retry processes) act as barriers: each runs alone, in the order
+the model requested it, after every call before it has finished.
+
+Every tool must be declared in TOOL_POLICIES. Unknown tools are treated as
+side-effecting.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class ToolPolicy:
+    # False = side effects or ordering matters: run alone, in request order
+    parallel_safe: bool
+    # Seconds before the call is abandoned with an error output; None = no limit.
+    # Side-effecting tools never time out (cancelling a booking halfway is worse than waiting).
+    timeout: Optional[float] = None
+
+
+READ_ONLY = ToolPolicy(parallel_safe=True, timeout=60)
+SIDE_EFFECT = ToolPolicy(parallel_safe=False)
+
+TOOL_POLICIES: Dict[str, ToolPolicy] = {
+    # Lookups (safe to run together)
+    "get_price_for_date": READ_ONLY,
+    "send_location_pin": READ_ONLY,  # formats text, sends nothing
+    "read_menu_content": READ_ONLY,
+    "read_menu_prices_content": READ_ONLY,
+    "check_office_status": READ_ONLY,
+    "check_room_availability": READ_ONLY,
+    "check_room_availability_counts": ToolPolicy(parallel_safe=True, timeout=300),  # getRooms API is slow
+    "check_smart_availability": READ_ONLY,
+    "lookup_booking": READ_ONLY,
+    "analyze_payment_proof": ToolPolicy(parallel_safe=True, timeout=180),  # vision model on PDFs/images
+    # Outbound messages (customer must receive them in the requested order)
+    "send_menu_pdf": SIDE_EFFECT,
+    "send_menu_prices": SIDE_EFFECT,
+    "send_bungalow_pictures": SIDE_EFFECT,
+    "send_public_areas_pictures": SIDE_EFFECT,
+    "transfer_to_human_agent": SIDE_EFFECT,
+    "send_email": SIDE_EFFECT,
+    "notify_operations_department": SIDE_EFFECT,
+    # Payments, reservations and bookings
+    "create_compraclick_link": SIDE_EFFECT,
+    "sync_compraclick_payments": SIDE_EFFECT,
+    "validate_compraclick_payment": SIDE_EFFECT,
+    "validate_compraclick_payment_fallback": SIDE_EFFECT,
+    "trigger_compraclick_retry_for_missing_payment": SIDE_EFFECT,
+    "sync_bank_transfers": SIDE_EFFECT,
+    "validate_bank_transfer": SIDE_EFFECT,
+    "start_bank_transfer_retry_process": SIDE_EFFECT,
+    "mark_customer_frustrated": SIDE_EFFECT,
+    "handle_customer_transferencia_type_response": SIDE_EFFECT,
+    "make_booking": SIDE_EFFECT,
+    "make_multi_room_booking": SIDE_EFFECT,
+    # Conversation state (overwrites the whole loaded_modules value: concurrent calls would lose modules)
+    "load_additional_modules": SIDE_EFFECT,
+}
+
+
+class ToolTimeout(Exception):
+    """A tool call ran past its declared timeout and was cancelled."""
+
+    def __init__(self, fn_name: str, timeout: Optional[float]):
+        super().__init__(f"{fn_name} timed out" + (f" after {timeout:.0f}s" if timeout is not None else ""))
+        self.fn_name = fn_name
+        self.timeout = timeout
+
+
+def get_policy(fn_name: str) -> ToolPolicy:
+    return TOOL_POLICIES.get(fn_name, SIDE_EFFECT)
+
+
+async def call_with_timeout(fn_name: str, call: Awaitable[Any]) -> Any:
+    """
+    Await a tool's coroutine under its declared timeout.
+
+    Raises ToolTimeout only when the limit itself expires; a TimeoutError the
+    tool raises on its own (e.g. DatabaseDeadlineExceeded) propagates unchanged.
+    """
+    timeout = get_policy(fn_name).timeout
+    if timeout is None:
+        return await call
+    task = asyncio.ensure_future(call)
+    try:
+        done, _ = await asyncio.wait({task}, timeout=timeout)
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
+    if not done:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        raise ToolTimeout(fn_name, timeout)
+    return task.result()
+
+
+async def run_round(
+    calls: List[Any],
+    execute: Callable[[Any], Awaitable[Any]],
+    name_of: Callable[[Any], str],
+    round_label: str = "",
+) -> List[Any]:
+    """
+    Execute one round of tool calls and return their results in request order.
+
+    Args:
+        calls: Tool call objects from the response.
+        execute: Coroutine function running a single call; must not raise.
+        name_of: Returns the tool name for a call.
+        round_label: Prefix for log lines (e.g. "Round 2").
+
+    Returns:
+        ``execute(call)`` results, in the same order as ``calls``.
+    """
+    results: List[Any] = [None] * len(calls)
+    durations: List[float] = [0.0] * len(calls)
+
+    async def timed(index: int) -> None:
+        started = time.perf_counter()
+        try:
+            results[index] = await execute(calls[index])
+        finally:
+            durations[index] = time.perf_counter() - started
+
+    round_started = time.perf_counter()
+    batch: List[int] = []
+    for index, call in enumerate(calls):
+        if get_policy(name_of(call)).parallel_safe:
+            batch.append(index)
+            continue
+        if batch:
+            await asyncio.gather(*(timed(i) for i in batch))
+            batch = []
+        await timed(index)
+    if batch:
+        await asyncio.gather(*(timed(i) for i in batch))
+
+    if len(calls) > 1:
+        wall = time.perf_counter() - round_started
+        breakdown = ", ".join(f"{name_of(c)}={d * 1000:.0f}ms" for c, d in zip(calls, durations))
+        logger.info(
+            f"[TOOL_EXECUTOR] {round_label} ran {len(calls)} tools in {wall * 1000:.0f}ms "
+            f"(serial sum {sum(durations) * 1000:.0f}ms): {breakdown}"
+        )
+    elif calls:
+        logger.info(f"[TOOL_EXECUTOR] {round_label} {name_of(calls[0])} took {durations[0] * 1000:.0f}ms")
+    return results
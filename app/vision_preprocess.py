@@ -0,0 +1,165 @@
+"""
+Shared preprocessing for customer images sent to the vision models.
+
+The image classifier, the general-inquiry handler and the payment proof
+analyzer used to base64 the raw customer file straight into a data URL, so
+multi-megabyte phone photos went to the model unchanged, sometimes twice in
+the same turn. ``to_data_url()`` now:
+
+- applies the EXIF orientation (phone photos are often stored sideways),
+- crops uniform borders (screenshot bars, scanner margins) with a small pad,
+- downscales so the longest side is at most the use case's limit
+  (VISION_MAX_DIMENSION_<USE_CASE>; receipts keep more pixels for OCR),
+- recompresses as JPEG (VISION_JPEG_QUALITY), keeping the original bytes
+  when the result would not be smaller.
+
+Results are memoized by content hash and effective size, so the classifier
+and the analyzer looking at the same upload encode it once (their limits are
+equal by default). An image already under several limits gets one encoding
+shared by all those use cases.
+"""
+
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Tuple, Union
+
+from . import config
+
+logger = logging.getLogger(__name__)
+
+# Use case -> longest side in pixels sent to the model
+USE_CASES = {
+    "classify": lambda: config.VISION_MAX_DIMENSION_CLASSIFY,
+    "inquiry": lambda: config.VISION_MAX_DIMENSION_INQUIRY,
+    "receipt": lambda: config.VISION_MAX_DIMENSION_RECEIPT,
+}
+
+# Pixels within this distance (per channel) of the corner colour count as border
+BORDER_TOLERANCE = 12
+BORDER_PADDING = 8
+# Don't crop away more than this fraction of either side (avoids cutting content on plain images)
+MAX_BORDER_CROP = 0.4
+
+_memo: "OrderedDict[Tuple[str, int], str]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"images": 0, "memo_hits": 0, "bytes_in": 0, "bytes_out": 0, "passthrough": 0}
+
+
+def _crop_borders(img):
+    from PIL import Image, ImageChops
+
+    background = Image.new(img.mode, img.size, img.getpixel((0, 0)))
+    diff = ImageChops.difference(img, background)
+    if img.mode != "L":
+        diff = diff.convert("L")
+    box = diff.point(lambda v: 255 if v > BORDER_TOLERANCE else 0).getbbox()
+    if not box:
+        return img
+    left, top, right, bottom = box
+    left, top = max(0, left - BORDER_PADDING), max(0, top - BORDER_PADDING)
+    right, bottom = min(img.width, right + BORDER_PADDING), min(img.height, bottom + BORDER_PADDING)
+    if (right - left) < img.width * (1 - MAX_BORDER_CROP) or (bottom - top) < img.height * (1 - MAX_BORDER_CROP):
+        return img
+    if (left, top, right, bottom) == (0, 0, img.width, img.height):
+        return img
+    return img.crop((left, top, right, bottom))
+
+
+def _encode(content: bytes, max_dimension: int) -> Tuple[bytes, str]:
+    """(bytes, mime type) of the image prepared for the model."""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(content)) as original:
+        source_format = original.format
+        rotated = original.getexif().get(0x0112, 1) != 1  # EXIF Orientation
+        img = ImageOps.exif_transpose(original)
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            flattened = Image.new("RGB", img.size, (255, 255, 255))
+            flattened.paste(img, mask=img.getchannel("A"))
+            img = flattened
+        elif img.mode not in ("RGB", "L"):
+            img = img.convert("RGB")
+        untouched_size = img.size
+
+        img = _crop_borders(img)
+        img.thumbnail((max_dimension, max_dimension))
+
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=config.VISION_JPEG_QUALITY, optimize=True)
+        encoded = out.getvalue()
+
+    if len(encoded) >= len(content) and img.size == untouched_size and source_format in ("JPEG", "PNG") and not rotated:
+        _stats["passthrough"] += 1
+        return content, f"image/{source_format.lower()}"
+    return encoded, "image/jpeg"
+
+
+def _size_limit(content: bytes, use_case: str) -> int:
+    """Effective max dimension: images smaller than the limit share one encoding across use cases."""
+    max_dimension = USE_CASES[use_case]()
+    try:
+        from PIL import Image
+
+        with Image.open(io.BytesIO(content)) as img:
+            return min(max_dimension, max(img.size))
+    except Exception:
+        return max_dimension
+
+
+def to_data_url_sync(content: bytes, use_case: str) -> str:
+    """Prepared ``data:`` URL for ``content`` (raw bytes of a JPEG/PNG/WebP upload)."""
+    digest = hashlib.sha256(content).hexdigest()
+    key = (digest, _size_limit(content, use_case))
+    with _lock:
+        cached = _memo.get(key)
+        if cached is not None:
+            _memo.move_to_end(key)
+            _stats["memo_hits"] += 1
+            return cached
+
+    try:
+        encoded, mime_type = _encode(content, key[1])
+    except Exception as e:
+        logger.warning(f"[VISION_PREP] Could not preprocess image ({len(content)} bytes), sending as-is: {e}")
+        encoded, mime_type = content, "image/jpeg"
+
+    data_url = f"data:{mime_type};base64,{base64.b64encode(encoded).decode('utf-8')}"
+    with _lock:
+        _memo[key] = data_url
+        while len(_memo) > config.VISION_PREPROCESS_CACHE_SIZE:
+            _memo.popitem(last=False)
+        _stats["images"] += 1
+        _stats["bytes_in"] += len(content)
+        _stats["bytes_out"] += len(encoded)
+    logger.info(f"[VISION_PREP] {use_case}: {len(content)} -> {len(encoded)} bytes")
+    return data_url
+
+
+async def to_data_url(source: Union[str, bytes], use_case: str) -> str:
+    """
+    Prepared ``data:`` URL for an image file path or its raw bytes.
+
+    The decode/resize/encode work runs in a worker thread. Raises OSError if
+    ``source`` is a path that can't be read.
+    """
+    if use_case not in USE_CASES:
+        raise ValueError(f"Unknown vision use case: {use_case}")
+    loop = asyncio.get_running_loop()
+    if isinstance(source, str):
+        source = await loop.run_in_executor(None, _read_file, source)
+    return await loop.run_in_executor(None, to_data_url_sync, source, use_case)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def get_metrics() -> Dict[str, int]:
+    return {**_stats, "memo_entries": len(_memo)}
@@ -0,0 +1,185 @@
+"""
+Persistent cache of vision model results for images a customer sends again.
+
+Customers often resend the same receipt or screenshot, and each copy used to
+re-run the image classifier and the payment proof analyzer. Results are now
+stored in SQLite (sqlite_store) per customer and per kind ("classification",
+"payment_proof"), keyed by:
+
+- the exact SHA-256 of the file,
+- for classifications, a 256-bit difference hash of the picture (16x16
+  gradient grid), so a copy that WhatsApp recompressed or resized still
+  matches within VISION_CACHE_CLASSIFY_MAX_DISTANCE bits, and
+- optionally a hash of the context the model saw (``context=``), since the
+  classifier's verdict depends on the conversation as well as the pixels.
+
+The classifier only stores confident payment_proof verdicts. A look-alike
+that reuses one still goes through the byte-exact payment proof analysis;
+reusing a general_inquiry verdict would let a real receipt skip it.
+
+Payment proofs only ever match byte-for-byte. Two transfers from the same
+banking app differ only in their amount, authorization code and date,
+which barely moves a gradient hash, and reusing the wrong amount or code
+is far worse than one more model call. Entries expire after
+VISION_CACHE_TTL_SECONDS, and results are never shared between customers.
+lookup() and store() block on SQLite; async callers run them with
+asyncio.to_thread.
+"""
+
+import asyncio
+import hashlib
+import io
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Union
+
+from . import config, sqlite_store
+
+logger = logging.getLogger(__name__)
+
+HASH_SIZE = 16
+
+# Kind -> max Hamming distance (of 256 bits) for a perceptual match; kinds not listed match exactly only
+MAX_DISTANCE = {
+    "classification": lambda: config.VISION_CACHE_CLASSIFY_MAX_DISTANCE,
+}
+
+_db_ready = False
+_last_purge = 0.0
+_stats = {"lookups": 0, "exact_hits": 0, "perceptual_hits": 0, "stores": 0}
+
+
+@dataclass(frozen=True)
+class Fingerprint:
+    sha256: str
+    # None when the file isn't a decodable image (e.g. a PDF): exact matches only
+    dhash: Optional[str]
+
+
+def _difference_hash(content: bytes) -> Optional[str]:
+    try:
+        from PIL import Image, ImageOps
+
+        with Image.open(io.BytesIO(content)) as img:
+            gray = ImageOps.exif_transpose(img).convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.LANCZOS)
+            pixels = gray.tobytes()
+    except Exception:
+        return None
+    bits = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            bits = (bits << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return f"{bits:0{HASH_SIZE * HASH_SIZE // 4}x}"
+
+
+def fingerprint_sync(content: bytes) -> Fingerprint:
+    return Fingerprint(hashlib.sha256(content).hexdigest(), _difference_hash(content))
+
+
+async def fingerprint(source: Union[str, bytes]) -> Fingerprint:
+    """Fingerprint of an image file path or its raw bytes (decoding runs in a worker thread)."""
+    loop = asyncio.get_running_loop()
+    if isinstance(source, str):
+        source = await loop.run_in_executor(None, _read_file, source)
+    return await loop.run_in_executor(None, fingerprint_sync, source)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _distance(a: str, b: str) -> int:
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+def _scope_key(scope: str, context: Optional[str]) -> str:
+    if context is None:
+        return scope
+    return f"{scope}:{hashlib.sha256(context.encode('utf-8')).hexdigest()[:16]}"
+
+
+def _init_db() -> None:
+    global _db_ready
+    if _db_ready:
+        return
+    with sqlite_store.connection(config.VISION_CACHE_DB_PATH) as conn:
+        conn.execute("""
+        CREATE TABLE IF NOT EXISTS vision_results (
+            scope TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            sha256 TEXT NOT NULL,
+            dhash TEXT,
+            created_at REAL NOT NULL,
+            result TEXT NOT NULL,
+            PRIMARY KEY (scope, kind, sha256)
+        )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_vision_results_created ON vision_results (created_at)")
+        conn.commit()
+    _db_ready = True
+
+
+def lookup(scope: str, kind: str, fp: Fingerprint, context: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """Cached result for this customer's image under the same context (exact or perceptual match), or None."""
+    if not scope:
+        return None
+    scope = _scope_key(scope, context)
+    _init_db()
+    _stats["lookups"] += 1
+    cutoff = time.time() - config.VISION_CACHE_TTL_SECONDS
+    with sqlite_store.connection(config.VISION_CACHE_DB_PATH) as conn:
+        row = conn.execute(
+            "SELECT result FROM vision_results WHERE scope = ? AND kind = ? AND sha256 = ? AND created_at >= ?",
+            (scope, kind, fp.sha256, cutoff)
+        ).fetchone()
+        if row:
+            _stats["exact_hits"] += 1
+            logger.info(f"[VISION_CACHE] {kind} exact hit for {scope}")
+            return json.loads(row[0])
+        if fp.dhash is None or kind not in MAX_DISTANCE:
+            return None
+        candidates = conn.execute(
+            "SELECT dhash, result FROM vision_results "
+            "WHERE scope = ? AND kind = ? AND dhash IS NOT NULL AND created_at >= ? ORDER BY created_at DESC",
+            (scope, kind, cutoff)
+        ).fetchall()
+
+    max_distance = MAX_DISTANCE[kind]()
+    best = None
+    for dhash, result in candidates:
+        distance = _distance(fp.dhash, dhash)
+        if distance <= max_distance and (best is None or distance < best[0]):
+            best = (distance, result)
+    if best is None:
+        return None
+    _stats["perceptual_hits"] += 1
+    logger.info(f"[VISION_CACHE] {kind} perceptual hit for {scope} (distance {best[0]})")
+    return json.loads(best[1])
+
+
+def store(scope: str, kind: str, fp: Fingerprint, result: Dict[str, Any], context: Optional[str] = None) -> None:
+    """Remember a model result for this customer's image; expired entries are purged along the way."""
+    global _last_purge
+    if not scope:
+        return
+    scope = _scope_key(scope, context)
+    _init_db()
+    now = time.time()
+    with sqlite_store.connection(config.VISION_CACHE_DB_PATH) as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO vision_results (scope, kind, sha256, dhash, created_at, result) VALUES (?, ?, ?, ?, ?, ?)",
+            (scope, kind, fp.sha256, fp.dhash, now, json.dumps(result, default=str))
+        )
+        if now - _last_purge > 3600:
+            conn.execute("DELETE FROM vision_results WHERE created_at < ?", (now - config.VISION_CACHE_TTL_SECONDS,))
+            _last_purge = now
+        conn.commit()
+    _stats["stores"] += 1
+
+
+def get_metrics() -> Dict[str, int]:
+    return dict(_stats)
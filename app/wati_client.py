@@ -33,6 +33,7 @@ def is_within_business_hours():
     return False
 
 from . import config
+from .clients import http_pool
 
 import logging
 
@@ -50,7 +51,7 @@ async def start_chatbot(phone_number: str, chatbot_id: str) -> dict:
     }
     logging.info(f"[DEBUG] Starting chatbot for {phone_number}: {chatbot_id}")
     logging.info(f"[DEBUG] start_chatbot payload: {payload}")
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(url) as client:
         response = await client.post(url, data=payload, headers=headers)
         logging.info(f"[DEBUG] WATI API start_chatbot response: {response.status_code} {response.text}")
         response.raise_for_status()
@@ -70,7 +71,7 @@ async def update_chat_status(phone_number: str, status: str) -> dict:
     }
     logging.info(f"[DEBUG] Updating chat status for {phone_number} to {status}")
     logging.info(f"[DEBUG] update_chat_status payload: {payload}")
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(url) as client:
         response = await client.post(url, json=payload, headers=headers)
         logging.info(f"[DEBUG] WATI API update_chat_status response: {response.status_code} {response.text}")
         response.raise_for_status()
@@ -90,7 +91,7 @@ async def assign_operator(phone_number: str, operator_email: str) -> dict:
     }
     logging.info(f"[DEBUG] Assigning conversation {phone_number} to operator {operator_email}")
     logging.info(f"[DEBUG] assign_operator data: {data}")
-    async with httpx.AsyncClient() as client:
+    async with http_pool.client_for(url) as client:
         response = await client.post(url, data=data, headers=headers)
         logging.info(f"[DEBUG] WATI API assign_operator response: {response.status_code} {response.text}")
         response.raise_for_status()
@@ -165,12 +166,12 @@ async def send_wati_file(phone_number: str, caption: str, file_path: str) -> dic
     if content_type is None:
         content_type = "application/octet-stream"  # Default content type
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
+    async with http_pool.client_for(url) as client:
         try:
             with open(file_path, "rb") as f:
                 files = {"file": (os.path.basename(file_path), f, content_type)}
                 data = {"caption": caption}
-                response = await client.post(url, headers=headers, files=files, data=data)
+                response = await client.post(url, headers=headers, files=files, data=data, timeout=30.0)
 
             response.raise_for_status()
             logging.info(f"Successfully sent file '{file_path}' to {phone_number}. Response: {response.json()}")
@@ -204,7 +205,7 @@ async def send_wati_message(phone_number: str, message: str) -> dict:
         # Send the handover message
         url = f"{config.WATI_API_URL}/api/v1/sendSessionMessage/{phone_number}"
         payload = {"messageText": handover_message}
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(url) as client:
             response = await client.post(url, data=payload, headers=headers)
             logging.info(f"[DEBUG] WATI API handover message response: {response.status_code} {response.text}")
             response.raise_for_status()
@@ -219,7 +220,7 @@ async def send_wati_message(phone_number: str, message: str) -> dict:
         # Send the goodbye message
         url = f"{config.WATI_API_URL}/api/v1/sendSessionMessage/{phone_number}"
         payload = {"messageText": goodbye_message}
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(url) as client:
             response = await client.post(url, data=payload, headers=headers)
             logging.info(f"[DEBUG] WATI API friendly_goodbye message response: {response.status_code} {response.text}")
             response.raise_for_status()
@@ -232,7 +233,7 @@ async def send_wati_message(phone_number: str, message: str) -> dict:
     else:
         url = f"{config.WATI_API_URL}/api/v1/sendSessionMessage/{phone_number}"
         payload = {"messageText": message}
-        async with httpx.AsyncClient() as client:
+        async with http_pool.client_for(url) as client:
             response = await client.post(url, data=payload, headers=headers)
             logging.info(f"[DEBUG] WATI API response: {response.status_code} {response.text}")
             response.raise_for_status()
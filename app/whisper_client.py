@@ -1,45 +1,202 @@
-import httpx
+"""
+Voice note transcription with OpenAI Whisper.
+
+Audio is handled in memory end to end:
+
+- Containers Whisper accepts as-is (WhatsApp's OGG/Opus, MP4/M4A, MP3, WAV,
+  FLAC, WebM) are uploaded without conversion. Anything else is converted
+  to 16 kHz mono FLAC by ffmpeg via ``asyncio.create_subprocess_exec``
+  (event loop never blocked). Stream formats are piped through stdin;
+  MP4-family files (3GP, QuickTime, ...) go through a temp file because
+  ffmpeg must seek to a moov atom stored after the audio. If Whisper
+  rejects a container upload, it is converted and retried once.
+- At most TRANSCRIBE_CONCURRENCY transcriptions run at once per worker.
+- Transcripts are cached by the audio's SHA-256 (a forwarded or resent
+  voice note is not transcribed again).
+- Per-stage timings (download, convert, upload) are exposed via
+  ``get_metrics()``.
+"""
+
+import asyncio
+import hashlib
+import logging
 import os
 import tempfile
-import subprocess
-import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from . import config
+from .clients import http_pool
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_WHISPER_URL = "https://api.openai.com/v1/audio/transcriptions"
+FFMPEG_PATH = "/usr/bin/ffmpeg"
 logger = logging.getLogger(__name__)
 
-async def transcribe_audio_opus(file_path: str, language: str = "es") -> str:
-    """Transcribe an opus audio file using OpenAI Whisper API. Converts to wav before upload. Returns transcribed text or raises Exception."""
-    # Convert opus to wav using ffmpeg
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as wav_tmpfile:
-        wav_path = wav_tmpfile.name
+# ISO BMFF brands that are plain MP4/M4A audio (3GP/AMR voice memos still need converting)
+MP4_BRANDS = (b"isom", b"iso2", b"mp41", b"mp42", b"M4A ", b"M4B ", b"dash", b"avc1")
+
+_transcripts: "OrderedDict[Tuple[str, str], str]" = OrderedDict()
+_limits: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+_stats = {"requests": 0, "cache_hits": 0, "passthrough": 0, "converted": 0, "retried_converted": 0, "errors": 0}
+_stage_stats: Dict[str, Dict[str, float]] = {}
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Record how long a pipeline stage took (count / total / max in ms)."""
+    started = time.monotonic()
     try:
-        ffmpeg_cmd = [
-            "/usr/bin/ffmpeg", "-y", "-i", file_path, "-ar", "16000", "-ac", "1", wav_path
-        ]
-        result = subprocess.run(ffmpeg_cmd, capture_output=True)
-        if result.returncode != 0:
-            logger.error(f"[WHISPER] ffmpeg conversion failed: {result.stderr.decode(errors='ignore')}")
-            raise Exception("Failed to convert opus to wav for Whisper upload.")
-        headers = {
-            "Authorization": f"Bearer {OPENAI_API_KEY}",
-        }
-        files = {
-            "file": (os.path.basename(wav_path), open(wav_path, "rb"), "audio/wav"),
-        }
-        data = {
-            "model": "whisper-1",
-            "response_format": "text",
-            "language": language,
-        }
-        async with httpx.AsyncClient() as client:
-            response = await client.post(OPENAI_WHISPER_URL, headers=headers, data=data, files=files, timeout=60)
-            if response.status_code != 200:
-                logger.error(f"[WHISPER] Whisper API error {response.status_code}: {response.text}")
-                response.raise_for_status()
-            return response.text.strip()
+        yield
     finally:
+        elapsed_ms = (time.monotonic() - started) * 1000
+        stats = _stage_stats.setdefault(stage, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+        stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+
+
+def detect_container(content: bytes) -> Optional[Tuple[str, str]]:
+    """(file extension, MIME type) if Whisper accepts the container as-is, otherwise None."""
+    head = content[:12]
+    if head.startswith(b"OggS"):
+        return "ogg", "audio/ogg"
+    if head.startswith(b"RIFF") and head[8:12] == b"WAVE":
+        return "wav", "audio/wav"
+    if head.startswith(b"fLaC"):
+        return "flac", "audio/flac"
+    # MPEG audio frame sync; layer bits 00 would be ADTS AAC, which Whisper doesn't take
+    if head.startswith(b"ID3") or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0 and head[1] & 0x06):
+        return "mp3", "audio/mpeg"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "webm", "audio/webm"
+    if head[4:8] == b"ftyp" and head[8:12] in MP4_BRANDS:
+        return "m4a", "audio/mp4"
+    return None
+
+
+def needs_seekable_input(content: bytes) -> bool:
+    """ISO BMFF / QuickTime files: the moov atom may follow the audio, which a stdin pipe can't seek back to."""
+    return content[4:8] in (b"ftyp", b"moov", b"mdat", b"wide", b"free")
+
+
+def _write_temp(content: bytes) -> str:
+    with tempfile.NamedTemporaryFile(prefix="voice_", suffix=".mp4", delete=False) as f:
+        f.write(content)
+        return f.name
+
+
+async def convert_to_flac(content: bytes) -> bytes:
+    """16 kHz mono FLAC of ``content``; output is piped, input too unless ffmpeg needs to seek it."""
+    input_path = await asyncio.to_thread(_write_temp, content) if needs_seekable_input(content) else None
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            FFMPEG_PATH, "-hide_banner", "-loglevel", "error",
+            "-i", input_path or "pipe:0", "-ar", "16000", "-ac", "1", "-f", "flac", "pipe:1",
+            stdin=asyncio.subprocess.DEVNULL if input_path else asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                proc.communicate(None if input_path else content), timeout=config.TRANSCRIBE_FFMPEG_TIMEOUT_SECONDS
+            )
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+    finally:
+        if input_path:
+            await asyncio.to_thread(os.unlink, input_path)
+    if proc.returncode != 0 or not stdout:
+        logger.error(f"[WHISPER] ffmpeg conversion failed: {stderr.decode(errors='ignore')}")
+        raise Exception("Failed to convert audio for Whisper upload.")
+    return stdout
+
+
+async def _upload(content: bytes, filename: str, mime_type: str, language: str):
+    headers = {
+        "Authorization": f"Bearer {OPENAI_API_KEY}",
+    }
+    files = {
+        "file": (filename, content, mime_type),
+    }
+    data = {
+        "model": "whisper-1",
+        "response_format": "text",
+        "language": language,
+    }
+    async with http_pool.client_for(OPENAI_WHISPER_URL) as client:
+        return await client.post(OPENAI_WHISPER_URL, headers=headers, data=data, files=files, timeout=60)
+
+
+def _limit() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    limit = _limits.get(loop)
+    if limit is None:
+        limit = _limits[loop] = asyncio.Semaphore(config.TRANSCRIBE_CONCURRENCY)
+    return limit
+
+
+async def _transcribe(content: bytes, language: str) -> str:
+    container = detect_container(content)
+    if container is None:
+        with stage_timer("convert"):
+            content = await convert_to_flac(content)
+        container = ("flac", "audio/flac")
+        _stats["converted"] += 1
+    else:
+        _stats["passthrough"] += 1
+
+    with stage_timer("upload"):
+        response = await _upload(content, f"voice.{container[0]}", container[1], language)
+    if response.status_code == 400 and container[0] != "flac":
+        # Whisper occasionally rejects a container it normally accepts: convert and retry once
+        logger.warning(f"[WHISPER] Whisper rejected {container[0]} upload ({response.text[:200]}), converting")
+        _stats["retried_converted"] += 1
+        with stage_timer("convert"):
+            content = await convert_to_flac(content)
+        with stage_timer("upload"):
+            response = await _upload(content, "voice.flac", "audio/flac", language)
+    if response.status_code != 200:
+        logger.error(f"[WHISPER] Whisper API error {response.status_code}: {response.text}")
+        response.raise_for_status()
+    return response.text.strip()
+
+
+async def transcribe_audio(content: bytes, language: str = "es") -> str:
+    """Transcribe a voice note from its raw bytes. Returns transcribed text or raises Exception."""
+    _stats["requests"] += 1
+    key = (hashlib.sha256(content).hexdigest(), language)
+    cached = _transcripts.get(key)
+    if cached is not None:
+        _transcripts.move_to_end(key)
+        _stats["cache_hits"] += 1
+        logger.info(f"[WHISPER] Reusing transcript for audio {key[0][:12]}")
+        return cached
+
+    async with _limit():
         try:
-            os.remove(wav_path)
-        except Exception as e:
-            logger.warning(f"[WHISPER] Could not delete temp wav file: {wav_path}")
+            with stage_timer("transcribe_total"):
+                text = await _transcribe(content, language)
+        except Exception:
+            _stats["errors"] += 1
+            raise
+
+    _transcripts[key] = text
+    while len(_transcripts) > config.TRANSCRIPT_CACHE_SIZE:
+        _transcripts.popitem(last=False)
+    return text
+
+
+def get_metrics() -> dict:
+    return {
+        **_stats,
+        "cached_transcripts": len(_transcripts),
+        "stages": {
+            stage: {**s, "avg_ms": round(s["total_ms"] / s["count"], 1) if s["count"] else 0.0}
+            for stage, s in _stage_stats.items()
+        },
+    }
@@ -1,3 +1,4 @@
+import asyncio
 import sys
 import os
 
@@ -11,7 +12,7 @@ print("Checking prices for dates:", dates)
 
 for date in dates:
     try:
-        price = get_price_for_date(date)
+        price = asyncio.run(get_price_for_date(date))
         print(f"Price for {date}: {price}")
     except Exception as e:
         print(f"Error for {date}: {e}")
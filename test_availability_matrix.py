@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-night occupancy matrix used by smart availability
+"""
+from datetime import date, timedelta
+
+from app.availability_matrix import (
+    ROOMS_BY_TYPE, availability_for_period, enumerate_sub_stays,
+    longest_free_runs_by_type, matrix_from_room_nights, parse_room_list,
+)
+
+
+def test_parse_room_list():
+    """Room fields with and without the "N-" prefix parse like the SQL CTE"""
+    assert parse_room_list("2-18+19") == ["18", "19"]
+    assert parse_room_list("3a + 4A") == ["3A", "4A"]
+    assert parse_room_list("") == []
+    assert parse_room_list(None) == []
+
+
+def test_partial_stays_from_single_matrix():
+    """Only night 2 is fully booked for habitaciones; every other type is full all week"""
+    window_start = date(2025, 7, 1)
+    nights = 4
+    everything_but_habitacion = ROOMS_BY_TYPE["bungalow_familiar"] + ROOMS_BY_TYPE["bungalow_junior"]
+    room_nights = [
+        (room, window_start + timedelta(days=offset)) for room in everything_but_habitacion for offset in range(nights)
+    ] + [(room.lower(), date(2025, 7, 3)) for room in ROOMS_BY_TYPE["habitacion"]]
+    matrix = matrix_from_room_nights(room_nights, window_start)
+    runs = longest_free_runs_by_type(matrix, nights)
+
+    assert availability_for_period(runs, 0, nights)["habitacion"] == "Not Available"
+    assert availability_for_period(runs, 0, 2)["habitacion"] == "Available"
+    assert availability_for_period(runs, 0, 2)["bungalow_junior"] == "Not Available"
+
+    options = enumerate_sub_stays(runs, window_start, nights)
+    periods = {(o["check_in"], o["check_out"]) for o in options}
+    assert periods == {
+        ("2025-07-01", "2025-07-02"), ("2025-07-02", "2025-07-03"), ("2025-07-04", "2025-07-05"),
+        ("2025-07-01", "2025-07-03"),
+    }
+    assert all(o["available_room_types"] == ["habitacion"] for o in options)
+
+
+if __name__ == "__main__":
+    test_parse_room_list()
+    test_partial_stays_from_single_matrix()
+    print("✅ All availability matrix tests passed")
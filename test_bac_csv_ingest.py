@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Test script for BAC statement CSV parsing used by the bulk ingest
+"""
+import asyncio
+import os
+import tempfile
+from datetime import date
+
+from app import bank_transfer_tool, config
+from app.bank_transfer_tool import parse_bac_csv
+
+
+STATEMENT = """Estado de Cuenta
+Cuenta,200123456,USD
+Fecha de Transacción,Referencia,Código,Descripción,Débito,Crédito,Balance
+01/03/2025,1001,TEF,TRANSFERENCIA JUAN, ,150.00,1150.00
+02/03/2025,1002,TEF,TRANSFERENCIA ANA, ,80.50,1230.50
+02/03/2025,1003,CAR,COMISION,1.00, ,1229.50
+,,,,,,
+Resumen de Estado Bancario
+"""
+
+
+def _write(text):
+    path = os.path.join(tempfile.mkdtemp(), "Transacciones.csv")
+    with open(path, "w", encoding="latin-1") as f:
+        f.write(text)
+    return path
+
+
+def test_parse_statement():
+    """Rows between the header and the summary are parsed, account taken from the header block"""
+    statement = parse_bac_csv(_write(STATEMENT))
+    assert statement["account"] == "200123456", statement["account"]
+    assert [r["reference"] for r in statement["rows"]] == ["1001", "1002", "1003"]
+    assert statement["rows"][1]["credit"] == "80.50"
+    assert statement["rows"][0]["debit"] == ""
+    print("✅ 3 transactions parsed for account 200123456")
+
+
+def test_statement_without_account():
+    """Statements without an account line share the default watermark"""
+    text = STATEMENT.replace("Cuenta,200123456,USD\n", "")
+    statement = parse_bac_csv(_write(text))
+    assert statement["account"] == "default"
+    assert len(statement["rows"]) == 3
+    print("✅ missing account falls back to default watermark")
+
+
+class _FakeBacDb:
+    """Just enough MySQL for the ingest: the bac unique key, INSERT IGNORE rowcount and the watermark table."""
+
+    def __init__(self):
+        self.keys = set()
+        self.watermarks = {}
+        self.sent = []
+
+    def cursor(self):
+        return _FakeBacCursor(self)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class _FakeBacCursor:
+    def __init__(self, db):
+        self.db = db
+        self.rowcount = 0
+        self._row = None
+
+    def execute(self, query, params=None):
+        if "SELECT last_date FROM bac_ingest_watermark" in query:
+            last = self.db.watermarks.get(params[0])
+            self._row = (last,) if last else None
+        elif "INSERT INTO bac_ingest_watermark" in query:
+            account, newest = params
+            self.db.watermarks[account] = max(self.db.watermarks.get(account, newest), newest)
+
+    def executemany(self, query, rows):
+        self.rowcount = 0
+        for row in rows:
+            self.db.sent.append(row[1])
+            key = (row[0], row[1], row[2], row[4], row[5])
+            if key not in self.db.keys:
+                self.db.keys.add(key)
+                self.rowcount += 1
+
+    def fetchone(self):
+        return self._row
+
+    def close(self):
+        pass
+
+
+def test_second_run_skips_rows_below_watermark():
+    """Rows older than the watermark never reach the database; the watermark moves to the newest row"""
+    db = _FakeBacDb()
+    saved = (bank_transfer_tool.get_db_connection, bank_transfer_tool._bac_schema_ready, config.BAC_WATERMARK_LOOKBACK_DAYS)
+    bank_transfer_tool.get_db_connection = lambda: db
+    config.BAC_WATERMARK_LOOKBACK_DAYS = 0
+    try:
+        first = asyncio.run(bank_transfer_tool.process_csv_and_insert_to_db(_write(STATEMENT)))
+        assert first == {"rows_inserted": 3, "rows_skipped": 0, "rows_ignored": 0}, first
+        assert db.watermarks == {"200123456": date(2025, 3, 2)}
+
+        # Next download: an old row, the last day already ingested again, and one new transfer
+        db.sent.clear()
+        later = STATEMENT.replace(
+            "01/03/2025,1001,TEF,TRANSFERENCIA JUAN, ,150.00,1150.00\n",
+            "25/02/2025,0999,TEF,TRANSFERENCIA VIEJA, ,20.00,1000.00\n"
+            "01/03/2025,1001,TEF,TRANSFERENCIA JUAN, ,150.00,1150.00\n"
+        ).replace(
+            "02/03/2025,1003,CAR,COMISION,1.00, ,1229.50\n",
+            "02/03/2025,1003,CAR,COMISION,1.00, ,1229.50\n05/03/2025,1004,TEF,TRANSFERENCIA LUIS, ,300.00,1529.50\n"
+        )
+        second = asyncio.run(bank_transfer_tool.process_csv_and_insert_to_db(_write(later)))
+        # The watermark day itself is re-sent (later same-day transfers) and ignored as duplicates
+        assert db.sent == ["1002", "1003", "1004"], db.sent
+        assert second == {"rows_inserted": 1, "rows_skipped": 4, "rows_ignored": 2}, second
+        assert db.watermarks == {"200123456": date(2025, 3, 5)}
+    finally:
+        (bank_transfer_tool.get_db_connection, bank_transfer_tool._bac_schema_ready,
+         config.BAC_WATERMARK_LOOKBACK_DAYS) = saved
+    print("✅ second ingest skipped rows below the watermark and advanced it")
+
+
+if __name__ == "__main__":
+    test_parse_statement()
+    test_statement_without_account()
+    test_second_run_skips_rows_below_watermark()
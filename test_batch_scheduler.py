@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script for the async per-conversation batch scheduler
+"""
+import asyncio
+
+from app.batch_scheduler import BatchScheduler
+
+
+def test_one_batch_per_conversation_and_orphan_reschedule():
+    """A second schedule for the same key is rejected; a batch can re-schedule itself"""
+    scheduler = BatchScheduler(max_concurrent_turns=2)
+    runs = []
+
+    async def batch(key, generation):
+        await asyncio.sleep(0.01)
+        runs.append((key, generation))
+        if generation == 1:
+            # Orphaned messages: hand over to a fresh batch before returning
+            scheduler.release(key)
+            scheduler.schedule(key, batch, key, 2)
+
+    async def scenario():
+        assert scheduler.schedule("503", batch, "503", 1)
+        assert not scheduler.schedule("503", batch, "503", 99)
+        await asyncio.sleep(0.1)
+        assert runs == [("503", 1), ("503", 2)], runs
+        assert not scheduler.is_scheduled("503")
+
+    asyncio.run(scenario())
+    print("✅ one batch per conversation, orphan reschedule kept")
+
+
+def test_turn_slots_are_bounded():
+    """No more than max_concurrent_turns OpenAI turns run at once"""
+    scheduler = BatchScheduler(max_concurrent_turns=2)
+    peak = 0
+
+    async def batch(key):
+        nonlocal peak
+        async with scheduler.turn_slot(key):
+            peak = max(peak, scheduler.metrics()["running_turns"])
+            await asyncio.sleep(0.02)
+
+    async def scenario():
+        for n in range(6):
+            scheduler.schedule(f"user-{n}", batch, f"user-{n}")
+        await asyncio.sleep(0.2)
+
+    asyncio.run(scenario())
+    metrics = scheduler.metrics()
+    assert peak == 2, peak
+    assert metrics["turns_completed"] == 6
+    assert metrics["pending_batches"] == 0
+    assert metrics["turn_wait_ms_max"] > 0
+    print(f"✅ turn slots bounded (peak={peak}, avg wait={metrics['turn_wait_ms_avg']}ms)")
+
+
+if __name__ == "__main__":
+    test_one_batch_per_conversation_and_orphan_reschedule()
+    test_turn_slots_are_bounded()
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Test script for the warm Playwright browser pool (with a fake Playwright)
+"""
+import asyncio
+import tempfile
+
+from app import config
+from app.clients import browser_pool
+
+config.BROWSER_STATE_DIR = tempfile.mkdtemp()
+
+SESSION = browser_pool.Portal(name="session_portal", persist_session=True)
+FRESH = browser_pool.Portal(name="fresh_portal")
+
+
+class _FakePage:
+    def __init__(self, context):
+        self.context = context
+        context.pages.append(self)
+
+    async def close(self):
+        if self in self.context.pages:
+            self.context.pages.remove(self)
+
+
+class _FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.pages = []
+        self.closed = False
+
+    async def add_init_script(self, script):
+        pass
+
+    async def new_page(self):
+        if not self.browser.healthy:
+            raise RuntimeError("Target page, context or browser has been closed")
+        return _FakePage(self)
+
+    async def storage_state(self):
+        return {"cookies": [], "origins": []}
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeBrowser:
+    def __init__(self):
+        self.connected = True
+        self.healthy = True
+        self.closed = False
+        self.contexts = []
+
+    def is_connected(self):
+        return self.connected
+
+    async def new_context(self, **options):
+        context = _FakeContext(self)
+        self.contexts.append(context)
+        return context
+
+    async def close(self):
+        self.closed = True
+        self.connected = False
+
+
+class _FakeChromium:
+    def __init__(self):
+        self.browsers = []
+
+    async def launch(self, headless=True, args=None):
+        browser = _FakeBrowser()
+        self.browsers.append(browser)
+        return browser
+
+
+class _FakePlaywright:
+    """Stands in for async_playwright(): both ``.start()`` and ``async with`` give the same driver."""
+
+    def __init__(self):
+        self.chromium = _FakeChromium()
+
+    def __call__(self):
+        return self
+
+    async def start(self):
+        return self
+
+    async def stop(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+def _run(scenario):
+    """Run ``scenario(fake)`` with the pool bound to a fresh loop and a fresh fake Playwright."""
+    fake = _FakePlaywright()
+    browser_pool.async_playwright = fake
+    browser_pool._playwright = None
+    for key in browser_pool._stats:
+        browser_pool._stats[key] = 0
+
+    async def main():
+        browser_pool.start()
+        try:
+            await scenario(fake)
+        finally:
+            await browser_pool.aclose()
+
+    asyncio.run(main())
+    return fake
+
+
+def test_warm_browser_reused_and_idle_reaped():
+    """Pages reuse one browser; after the idle timeout it is closed and the next page relaunches"""
+    async def scenario(fake):
+        async with browser_pool.page(FRESH):
+            pass
+        async with browser_pool.page(FRESH) as page:
+            await browser_pool._close_idle()  # in use: never reaped
+            assert page.context.browser.connected
+        assert len(fake.chromium.browsers) == 1
+
+        browser_pool._slots[FRESH.name].last_used -= config.BROWSER_POOL_IDLE_SECONDS
+        await browser_pool._close_idle()
+        assert fake.chromium.browsers[0].closed and browser_pool._stats["idle_closes"] == 1
+
+        async with browser_pool.page(FRESH):
+            pass
+        assert len(fake.chromium.browsers) == 2
+
+    _run(scenario)
+    print("✅ warm browser reused, reaped when idle, relaunched on demand")
+
+
+def test_discard_session():
+    """A discarded or failed session is not handed to the next caller; its context closes once unused"""
+    async def scenario(fake):
+        async with browser_pool.page(SESSION) as page:
+            first = page.context
+        async with browser_pool.page(SESSION) as page:
+            assert page.context is first  # logged-in session shared between operations
+            browser_pool.discard_session(SESSION, page)
+        assert first.closed
+
+        async with browser_pool.page(SESSION) as page:
+            second = page.context
+        assert second is not first
+        try:
+            async with browser_pool.page(SESSION) as page:
+                raise RuntimeError("portal changed mid-flow")
+        except RuntimeError:
+            pass
+        assert second.closed
+        async with browser_pool.page(SESSION) as page:
+            assert page.context not in (first, second)
+        assert browser_pool._stats["contexts_discarded"] == 2
+        assert len(fake.chromium.browsers) == 1
+
+    _run(scenario)
+    print("✅ discarded sessions replaced by new contexts")
+
+
+def test_relaunch_after_crash():
+    """A disconnected browser, or one failing the page probe, is relaunched before the page is handed out"""
+    async def scenario(fake):
+        async with browser_pool.page(FRESH):
+            pass
+        fake.chromium.browsers[0].connected = False
+        async with browser_pool.page(FRESH) as page:
+            assert page.context.browser is fake.chromium.browsers[1]
+
+        fake.chromium.browsers[1].healthy = False  # connected but can't open pages
+        async with browser_pool.page(FRESH) as page:
+            assert page.context.browser is fake.chromium.browsers[2]
+        assert fake.chromium.browsers[1].closed
+        assert browser_pool._stats["launches"] == 3
+
+    _run(scenario)
+    print("✅ crashed browsers relaunched")
+
+
+def test_one_off_outside_the_pool_loop():
+    """Callers on another loop get a one-off browser that is closed on exit"""
+    fake = _FakePlaywright()
+    browser_pool.async_playwright = fake
+
+    async def scenario():
+        async with browser_pool.page(FRESH) as page:
+            assert not page.context.browser.closed
+        return page
+
+    page = asyncio.run(scenario())
+    assert page.context.browser.closed
+    assert browser_pool._slots == {} and browser_pool._stats["one_off"] == 1
+    print("✅ one-off browser used off the pool loop")
+
+
+if __name__ == "__main__":
+    test_warm_browser_reused_and_idle_reaped()
+    test_discard_session()
+    test_relaunch_after_crash()
+    test_one_off_outside_the_pool_loop()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar CompraClick report reader
+"""
+import os
+import tempfile
+
+import pandas as pd
+
+from app.compraclick_tool import read_compraclick_report
+
+
+def _report(rows):
+    """Write rows (lists of 22 cells) below a title row, like the portal export"""
+    path = os.path.join(tempfile.mkdtemp(), "compraclick.xlsx")
+    pd.DataFrame([["Reporte de ventas"] + [None] * 21] + rows).to_excel(path, header=False, index=False)
+    return path
+
+
+def _row(date, importe, autorizacion, cliente="CLIENTE", tarjeta="4111XXXX1111"):
+    row = [None] * 22
+    row[0], row[5], row[10], row[13], row[16], row[21] = date, cliente, tarjeta, importe, autorizacion, "Reserva"
+    return row
+
+
+def test_clean_and_order():
+    """Amounts with thousands separators parse, bad rows drop, rows come back date-ordered"""
+    path = _report([
+        _row("2025-03-02 10:00:00", "1,250.00", "000222"),
+        _row("2025-03-01 09:00:00", 80.5, "000111", cliente="  ANA  "),
+        _row(None, "10.00", "000333"),
+        _row("2025-03-03 08:00:00", "", "000444"),
+    ])
+    df = read_compraclick_report(path)
+    assert list(df["autorizacion"]) == ["000111", "000222"], list(df["autorizacion"])
+    assert list(df["importe"]) == [80.5, 1250.0]
+    assert df["cliente"].iloc[0] == "ANA"
+    assert df["date"].iloc[0] == "2025-03-01 09:00:00"
+    assert df["sucursal"].iloc[0] == ""
+    print("✅ 2 of 4 rows kept, cleaned and sorted by date")
+
+
+if __name__ == "__main__":
+    test_clean_and_order()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled MySQL client: run_db deadlines and connection return
+"""
+import asyncio
+import time
+
+import mysql.connector
+from mysql.connector import pooling
+
+from app import database_client
+
+
+class _FakeConnection:
+    """Pooled connection whose queries take a while and then fail."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self, dictionary=False):
+        return _SlowCursor()
+
+    def close(self):
+        self.pool.returned += 1
+        self.pool.free += 1
+
+
+class _SlowCursor:
+    def execute(self, query, params=None):
+        time.sleep(0.05)
+        raise mysql.connector.Error("Lost connection to MySQL server during query")
+
+    def close(self):
+        pass
+
+
+class _FakePool:
+    def __init__(self, size):
+        self.free = size
+        self.returned = 0
+
+    def get_connection(self):
+        if self.free == 0:
+            raise pooling.PoolError("Failed getting connection; pool exhausted")
+        self.free -= 1
+        return _FakeConnection(self)
+
+
+def _use_pool(pool):
+    database_client._pool = pool
+    database_client.RETRY_DELAY_SECONDS = 0.01
+
+
+def test_deadline_fires_and_connections_are_returned():
+    """A query that keeps failing raises DatabaseDeadlineExceeded, every attempt gives its connection back"""
+    pool = _FakePool(size=2)
+    _use_pool(pool)
+    in_use = database_client.get_pool_metrics()["in_use"]
+
+    def slow_query():
+        conn = database_client.get_db_connection()
+        cursor = None
+        try:
+            cursor = conn.cursor(dictionary=True)
+            cursor.execute("SELECT 1")
+        finally:
+            database_client.release_db_connection(conn, cursor)
+
+    started = time.monotonic()
+    try:
+        asyncio.run(database_client.run_db(slow_query, "slow query", deadline_seconds=0.2))
+        raise AssertionError("deadline did not fire")
+    except database_client.DatabaseDeadlineExceeded as e:
+        assert "slow query failed after 0.2s" in str(e), e
+    elapsed = time.monotonic() - started
+
+    assert elapsed < 1, elapsed
+    assert pool.returned >= 2 and pool.free == 2
+    metrics = database_client.get_pool_metrics()
+    assert metrics["in_use"] == in_use
+    assert metrics["deadline_exceeded"] >= 1 and metrics["executor_running"] == 0
+    print(f"✅ deadline fired after {elapsed * 1000:.0f}ms, {pool.returned} connections returned")
+
+
+def test_exhausted_pool_waits_until_deadline():
+    """Borrowing from an exhausted pool waits, then raises; a returned connection is reusable"""
+    pool = _FakePool(size=1)
+    _use_pool(pool)
+    held = database_client.get_db_connection()
+    try:
+        database_client.get_db_connection(timeout=0.1)
+        raise AssertionError("exhausted pool handed out a connection")
+    except database_client.DatabaseDeadlineExceeded:
+        pass
+    database_client.release_db_connection(held)
+
+    conn = database_client.get_db_connection(timeout=0.1)
+    database_client.release_db_connection(conn)
+    assert pool.free == 1 and pool.returned == 2
+    assert database_client.get_pool_metrics()["exhausted_waits"] >= 1
+    print("✅ exhausted pool waited, then served the returned connection")
+
+
+if __name__ == "__main__":
+    test_deadline_fires_and_connections_are_returned()
+    test_exhausted_pool_waits_until_deadline()
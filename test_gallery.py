@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script for the photo gallery index and ordered delivery
+"""
+import asyncio
+import os
+import random
+import tempfile
+from pathlib import Path
+
+from app import gallery
+
+
+def _gallery_dir(names):
+    root = Path(tempfile.mkdtemp())
+    (root / "bungalow_junior").mkdir()
+    for name in names:
+        (root / "bungalow_junior" / name).write_bytes(b"x" * 10)
+    gallery.PICTURES_DIR = root
+    gallery._index.clear()
+    return root
+
+
+def test_index_and_captions():
+    """Photos are sorted, captioned once and re-listed only when the directory changes"""
+    root = _gallery_dir(["bungalow_junior_terrace.txt", "bungalow_junior_beds_2.txt"])
+    photos = gallery.get_gallery("Bungalow Junior")
+    assert [p.caption for p in photos] == ["Beds 2 - Bungalow Junior", "Terraza - Bungalow Junior"]
+    assert gallery.get_gallery("Bungalow Junior") is photos
+
+    (root / "bungalow_junior" / "bungalow_junior_outside.txt").write_bytes(b"x")
+    os.utime(root / "bungalow_junior", (0, 12345))
+    assert len(gallery.get_gallery("Bungalow Junior")) == 3
+    assert gallery.get_gallery("Habitacion") is None
+    print("✅ gallery indexed with captions, refreshed on directory change")
+
+
+def test_delivery_keeps_order():
+    """Variants prepared out of order are still sent in gallery order, in batches"""
+    _gallery_dir([f"photo_{i}.txt" for i in range(7)])
+    photos = gallery.get_gallery("Bungalow Junior")
+    original = gallery.get_variant
+
+    def slow_variant(path):
+        import time
+        time.sleep(random.uniform(0, 0.02))
+        return original(path)
+
+    gallery.get_variant = slow_variant
+    batches = []
+
+    async def send(batch):
+        batches.append([os.path.basename(path) for path, _ in batch])
+
+    try:
+        sent = asyncio.run(gallery.deliver(photos, send, batch_size=3))
+    finally:
+        gallery.get_variant = original
+    assert sent == 7
+    assert [len(b) for b in batches] == [3, 3, 1]
+    assert sum(batches, []) == [f"photo_{i}.txt" for i in range(7)]
+    print("✅ 7 photos delivered in order in 3 batches")
+
+
+if __name__ == "__main__":
+    test_index_and_captions()
+    test_delivery_keeps_order()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared httpx client registry
+"""
+import asyncio
+
+from app import config
+from app.clients import http_pool
+
+config.WATI_API_URL = "https://live-server.wati.io"
+config.HTTP_POOL_SHARED_HOSTS = "api.openai.com,booking.lashojasresort.club"
+
+
+def test_known_hosts_share_one_client():
+    """API hosts reuse one open client; CDN media hosts get a one-off client and are never registered"""
+
+    async def scenario():
+        http_pool.start()
+        try:
+            async with http_pool.client_for("https://api.openai.com/v1/conversations") as first:
+                pass
+            async with http_pool.client_for("https://API.openai.com/v1/audio/transcriptions") as second:
+                pass
+            async with http_pool.client_for("https://live-server.wati.io/api/v1/getMedia?fileName=x") as wati:
+                pass
+            cdn_clients = []
+            for n in range(5):
+                async with http_pool.client_for(f"https://scontent-{n}.xx.fbcdn.net/v/audio.mp4") as client:
+                    assert not client.is_closed
+                cdn_clients.append(client)
+            assert first is second and not first.is_closed and wati is not first
+            assert all(client.is_closed for client in cdn_clients)
+            assert sorted(http_pool._clients) == ["api.openai.com", "live-server.wati.io"]
+        finally:
+            await http_pool.aclose()
+        assert first.is_closed and http_pool._clients == {}
+
+    asyncio.run(scenario())
+    print("✅ shared clients only for known hosts")
+
+
+def test_off_loop_callers_get_one_off_clients():
+    """Without start() (CLI scripts, worker loops) even known hosts get a client closed on exit"""
+
+    async def scenario():
+        async with http_pool.client_for("https://api.openai.com/v1/conversations") as client:
+            pass
+        return client
+
+    assert asyncio.run(scenario()).is_closed
+    assert http_pool._clients == {}
+    print("✅ off-loop callers use one-off clients")
+
+
+def test_pool_wait_has_its_own_timeout():
+    """Waiting for a pooled connection is not bounded by the short request timeout"""
+    client = http_pool._build_client("api.openai.com")
+    assert client.timeout.read == config.HTTP_TIMEOUT_SECONDS
+    assert client.timeout.connect == config.HTTP_CONNECT_TIMEOUT_SECONDS
+    assert client.timeout.pool == config.HTTP_POOL_ACQUIRE_TIMEOUT_SECONDS > config.HTTP_TIMEOUT_SECONDS
+    asyncio.run(client.aclose())
+    print("✅ pool acquire timeout separate from request timeout")
+
+
+if __name__ == "__main__":
+    test_known_hosts_share_one_client()
+    test_off_loop_callers_get_one_off_clients()
+    test_pool_wait_has_its_own_timeout()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for reusing image classifications from the vision result cache
+"""
+import asyncio
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+from app import config, image_classifier, vision_result_cache
+
+IMAGE_BYTES = b"\x89PNG screenshot bytes"
+
+
+def _verdict(classification, confidence):
+    return {"classification": classification, "confidence": confidence,
+            "should_analyze_as_payment": classification == "payment_proof"}
+
+
+def _run_classifications(wa_id, verdicts, contexts):
+    """Classify the same image once per context, the model returning ``verdicts`` in turn; returns the model call count."""
+    image_path = os.path.join(tempfile.mkdtemp(), "image.png")
+    with open(image_path, "wb") as f:
+        f.write(IMAGE_BYTES)
+    saved = (config.VISION_CACHE_DB_PATH, vision_result_cache._db_ready, image_classifier.call_with_flex_fallback,
+             image_classifier.vision_preprocess.to_data_url, image_classifier.handle_general_inquiry_image)
+    config.VISION_CACHE_DB_PATH = os.path.join(tempfile.mkdtemp(), "vision_cache.db")
+    vision_result_cache._db_ready = False
+    verdicts = iter(verdicts)
+    calls = []
+
+    async def fake_data_url(path, purpose):
+        return "data:image/png;base64,"
+
+    async def fake_model(flex_call, standard_call, operation_name):
+        calls.append(operation_name)
+        message = SimpleNamespace(content=json.dumps(next(verdicts)), refusal=None)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)])
+
+    async def fake_general_inquiry(*args, **kwargs):
+        return {"success": True}
+
+    image_classifier.call_with_flex_fallback = fake_model
+    image_classifier.vision_preprocess.to_data_url = fake_data_url
+    image_classifier.handle_general_inquiry_image = fake_general_inquiry
+    try:
+        for context in contexts:
+            asyncio.run(image_classifier.classify_image_with_context(image_path, context, wa_id, cache_scope=wa_id))
+        return len(calls)
+    finally:
+        (config.VISION_CACHE_DB_PATH, vision_result_cache._db_ready, image_classifier.call_with_flex_fallback,
+         image_classifier.vision_preprocess.to_data_url, image_classifier.handle_general_inquiry_image) = saved
+
+
+def test_payment_proof_reused_under_same_context():
+    """A resent receipt in the same conversation context skips the model"""
+    proof = _verdict("payment_proof", 0.95)
+    assert _run_classifications("50370000011", [proof, proof], ["Cliente: ya pagué", "Cliente: ya pagué"]) == 1
+    print("✅ payment proof verdict reused under the same context")
+
+
+def test_different_context_calls_model():
+    """The same image under a different conversation context is classified again"""
+    proof = _verdict("payment_proof", 0.95)
+    contexts = ["Cliente: ¿tienen piscina?", "Cliente: le envío el comprobante de pago"]
+    assert _run_classifications("50370000012", [proof, proof], contexts) == 2
+    print("✅ different context triggers a new classification")
+
+
+def test_general_inquiry_never_reused():
+    """A general_inquiry (or low-confidence) verdict is not cached, so a later real receipt is still analyzed"""
+    verdicts = [_verdict("general_inquiry", 0.9), _verdict("payment_proof", 0.6), _verdict("payment_proof", 0.95)]
+    assert _run_classifications("50370000013", verdicts, [None, None, None]) == 3
+    print("✅ general inquiry and low-confidence verdicts not reused")
+
+
+if __name__ == "__main__":
+    test_payment_proof_reused_under_same_context()
+    test_different_context_calls_model()
+    test_general_inquiry_never_reused()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script for the parsed-once system instructions registry
+"""
+import json
+import os
+import tempfile
+
+from app import config, instructions_registry
+
+
+def test_hot_reload_and_derived_cache():
+    """Derived values are built once per file version and survive a broken write"""
+    fd, path = tempfile.mkstemp(suffix=".txt")
+    os.close(fd)
+    original_path = instructions_registry.INSTRUCTIONS_PATH
+    original_interval = config.INSTRUCTIONS_RELOAD_CHECK_SECONDS
+    instructions_registry.INSTRUCTIONS_PATH = path
+    instructions_registry._snapshot = None
+    config.INSTRUCTIONS_RELOAD_CHECK_SECONDS = 0
+    builds = []
+
+    def build(data):
+        builds.append(data["MODULE_A"]["rule"])
+        return f"prompt: {data['MODULE_A']['rule']}"
+
+    try:
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"MODULE_A": {"rule": "v1", "micro": {"x": 1}}}, f)
+        assert instructions_registry.derived("prompt", build) == "prompt: v1"
+        assert instructions_registry.derived("prompt", build) == "prompt: v1"
+        assert builds == ["v1"]
+        assert instructions_registry.get_module_json("MODULE_A.micro") == json.dumps({"micro": {"x": 1}}, indent=2)
+        assert instructions_registry.get_module_json("MODULE_B") is None
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"MODULE_A": {"rule": "version-2"}}, f)
+        assert instructions_registry.derived("prompt", build) == "prompt: version-2"
+
+        # A half-written file keeps the previous snapshot serving
+        with open(path, "w", encoding="utf-8") as f:
+            f.write('{"MODULE_A": {"rule": ')
+        assert instructions_registry.derived("prompt", build) == "prompt: version-2"
+        assert builds == ["v1", "version-2"]
+    finally:
+        instructions_registry.INSTRUCTIONS_PATH = original_path
+        instructions_registry._snapshot = None
+        config.INSTRUCTIONS_RELOAD_CHECK_SECONDS = original_interval
+        os.remove(path)
+    print("✅ instructions parsed once per version, hot reload keeps last good copy")
+
+
+if __name__ == "__main__":
+    test_hot_reload_and_derived_cache()
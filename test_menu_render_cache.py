@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script for the content-addressed menu render cache
+"""
+import os
+import tempfile
+from pathlib import Path
+
+import fitz  # PyMuPDF
+
+from app.menu_render_cache import MenuRender
+
+
+def _pdf(path, pages, text="Menu"):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"{text} {i + 1}")
+    doc.save(path)
+    doc.close()
+
+
+def test_render_once_and_reuse():
+    """Same content renders once; a second instance (another worker) reuses the files"""
+    tmp = tempfile.mkdtemp()
+    pdf_path = os.path.join(tmp, "menu.pdf")
+    out_dir = Path(tmp) / "menu_converted"
+    _pdf(pdf_path, 2)
+    (Path(out_dir)).mkdir()
+    (out_dir / "menu_1756480126_p1.png").write_bytes(b"old")
+
+    first = MenuRender(pdf_path, out_dir, "menu").get_pages(dpi=72)
+    mtimes = [os.path.getmtime(p) for p in first]
+    second = MenuRender(pdf_path, out_dir, "menu").get_pages(dpi=72)
+    assert first == second and len(first) == 2
+    assert [os.path.getmtime(p) for p in second] == mtimes
+    assert not (out_dir / "menu_1756480126_p1.png").exists()
+    print("✅ 2 pages rendered once, reused, old timestamped render removed")
+
+
+def test_changed_pdf_rerenders_and_collects():
+    """New PDF content gets a new key and the previous render is deleted"""
+    tmp = tempfile.mkdtemp()
+    pdf_path = os.path.join(tmp, "menu.pdf")
+    out_dir = Path(tmp) / "menu_converted"
+    _pdf(pdf_path, 1)
+    render = MenuRender(pdf_path, out_dir, "menu")
+    old_pages = render.get_pages(dpi=72)
+
+    _pdf(pdf_path, 3, text="Nuevo menu")
+    new_pages = render.get_pages(dpi=72)
+    assert len(new_pages) == 3
+    assert not any(os.path.exists(p) for p in old_pages)
+    assert sorted(p.name for p in out_dir.glob("*.json")) == [Path(new_pages[0]).name.rsplit("_p", 1)[0] + ".json"]
+    print("✅ changed PDF re-rendered with a new key, stale pages collected")
+
+
+if __name__ == "__main__":
+    test_render_once_and_reuse()
+    test_changed_pdf_rerenders_and_collects()
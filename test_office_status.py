@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Test script for the compiled office closure rules
+"""
+from datetime import datetime, timedelta
+
+from app import office_status_tool as office
+from app.office_status_tool import EL_SALVADOR_TZ, ClosureRule
+
+
+def _at(year, month, day, hour, minute):
+    return EL_SALVADOR_TZ.localize(datetime(year, month, day, hour, minute))
+
+
+def test_rule_matching():
+    """Compiled rules keep inclusive ends and wrap-around ranges"""
+    night = ClosureRule("23:00-02:00|*|*|*")
+    assert night.matches(_at(2025, 3, 4, 23, 30)) and night.matches(_at(2025, 3, 4, 2, 0))
+    assert not night.matches(_at(2025, 3, 4, 2, 1))
+
+    weekend = ClosureRule("*|fri-mon|*|*")
+    assert weekend.matches(_at(2025, 3, 2, 12, 0))  # Sunday
+    assert not weekend.matches(_at(2025, 3, 5, 12, 0))  # Wednesday
+
+    christmas = ClosureRule("*|*|24-25|dec")
+    assert christmas.matches(_at(2025, 12, 25, 9, 0)) and not christmas.matches(_at(2025, 11, 25, 9, 0))
+
+    assert not ClosureRule("0800|*|*|*").matches(_at(2025, 3, 4, 8, 0))  # malformed: never matches
+    assert ClosureRule("12:00-13:00").matches(_at(2025, 3, 4, 12, 30))  # missing segments are wildcards
+    print("✅ closure rules compiled with the old matching semantics")
+
+
+def test_next_state_change():
+    """The next change is the first boundary where the office/automation state flips"""
+    snapshot = office._RuleSnapshot(office.compile_rules(["12:00-12:59|mon-fri|*|*"]))
+    now = _at(2025, 3, 4, 10, 0)  # Tuesday, open, human required
+    result = office._evaluate(snapshot, now)
+    assert (result["office_status"], result["can_automate"]) == ("open", False)
+
+    change = office.next_state_change(snapshot, now, ("open", False))
+    assert change == _at(2025, 3, 4, 12, 0)
+    after_lunch = office.next_state_change(snapshot, change, ("closed", True))
+    assert after_lunch == _at(2025, 3, 4, 13, 0)
+    print("✅ next state change found at rule boundaries")
+
+
+def test_answers_from_memory():
+    """Answers are reused until the next change; rules load only once"""
+    loads = []
+
+    def fake_load():
+        loads.append(1)
+        return office.compile_rules(["*|sun|*|*"])
+
+    original = office._load_rules
+    office._load_rules = fake_load
+    office._snapshot, office._answer, office._next_refresh = None, None, 0.0
+    try:
+        first = office.check_office_status()
+        second = office.check_office_status()
+    finally:
+        office._load_rules = original
+    assert len(loads) == 1
+    assert first["office_status"] == second["office_status"]
+    assert second["next_change_at"] == first["next_change_at"]
+    now = datetime.now(EL_SALVADOR_TZ)
+    midnight = EL_SALVADOR_TZ.localize(datetime.combine(now.date() + timedelta(days=1), datetime.min.time()))
+    assert second["valid_for_seconds"] <= (midnight - now).total_seconds()  # reasons change with the day
+    assert office.get_metrics()["answers_from_memory"] >= 1
+    print("✅ office status answered from memory")
+
+
+if __name__ == "__main__":
+    test_rule_matching()
+    test_next_state_change()
+    test_answers_from_memory()
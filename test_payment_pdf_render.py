@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Test script for in-memory PDF receipt rendering (PyMuPDF)
+"""
+import asyncio
+import base64
+
+import fitz  # PyMuPDF
+
+from app import payment_proof_analyzer
+
+
+def _pdf(pages):
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((72, 72), f"Comprobante de pago - página {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_renders_first_pages_only():
+    """Only the first MAX_PDF_PAGES pages are rendered, at the requested resolution"""
+    pages = asyncio.run(payment_proof_analyzer.render_pdf_pages(_pdf(8), dpi=72))
+    assert len(pages) == payment_proof_analyzer.MAX_PDF_PAGES
+    assert all(page[:2] == b"\xff\xd8" for page in pages)  # JPEG
+    pix = fitz.Pixmap(pages[0])
+    assert (pix.width, pix.height) == (595, 842)
+    print("✅ first pages rendered to JPEG in memory")
+
+
+def test_convert_pdf_to_images():
+    """Rendered pages become base64 data URLs; a broken PDF yields no images"""
+    images = asyncio.run(payment_proof_analyzer.convert_pdf_to_images(_pdf(2)))
+    assert len(images) == 2
+    url = images[0]["image_url"]["url"]
+    assert url.startswith("data:image/jpeg;base64,")
+    assert base64.b64decode(url.split(",", 1)[1])[:2] == b"\xff\xd8"
+    assert asyncio.run(payment_proof_analyzer.convert_pdf_to_images(b"not a pdf")) == []
+    print("✅ PDF pages converted to data URLs")
+
+
+if __name__ == "__main__":
+    test_renders_first_pages_only()
+    test_convert_pdf_to_images()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Test script for reusing payment proof analyses from the vision result cache
+"""
+import asyncio
+import os
+import tempfile
+from datetime import date, timedelta
+
+from app import config, payment_proof_analyzer, vision_result_cache
+
+RECEIPT_BYTES = b"%PDF-1.4 receipt bytes"
+
+
+def _analysis(timestamp):
+    return {"success": True, "is_valid_receipt": True, "receipt_type": "bank_transfer", "transfer_method": "365",
+            "extracted_info": {"amount": 150.0, "transaction_id": "053551", "timestamp": timestamp}}
+
+
+def _run_analyses(wa_id, readings, calls):
+    """Analyze the same receipt once per call, the model returning ``readings`` in turn."""
+    saved = (config.VISION_CACHE_DB_PATH, vision_result_cache._db_ready, payment_proof_analyzer.download_file,
+             payment_proof_analyzer.convert_pdf_to_images, payment_proof_analyzer.analyze_with_o4_mini)
+    config.VISION_CACHE_DB_PATH = os.path.join(tempfile.mkdtemp(), "vision_cache.db")
+    vision_result_cache._db_ready = False
+    readings = iter(readings)
+
+    async def fake_download(file_url):
+        return RECEIPT_BYTES, "application/pdf"
+
+    async def fake_render(content):
+        return [{"type": "image"}]
+
+    async def fake_model(image_data):
+        return next(readings)
+
+    payment_proof_analyzer.download_file = fake_download
+    payment_proof_analyzer.convert_pdf_to_images = fake_render
+    payment_proof_analyzer.analyze_with_o4_mini = fake_model
+    try:
+        return [asyncio.run(call("receipt.pdf", wa_id=wa_id)) for call in calls]
+    finally:
+        (config.VISION_CACHE_DB_PATH, vision_result_cache._db_ready, payment_proof_analyzer.download_file,
+         payment_proof_analyzer.convert_pdf_to_images, payment_proof_analyzer.analyze_with_o4_mini) = saved
+
+
+def test_tool_reanalysis_skips_cache():
+    """The agent's analyze_payment_proof call reads the receipt again instead of reusing the cached result"""
+    analyze, reanalyze = payment_proof_analyzer.analyze_payment_proof, payment_proof_analyzer.reanalyze_payment_proof
+    first, resent, tool = _run_analyses(
+        "50370000001", [_analysis("12/13/2025"), _analysis("12/14/2025")], [analyze, analyze, reanalyze]
+    )
+    assert resent["extracted_info"]["timestamp"] == "12/13/2025"  # resent receipt: cache hit
+    assert tool["extracted_info"]["timestamp"] == "12/14/2025"  # explicit re-analysis: model called
+    print("✅ tool re-analysis bypasses the payment proof cache")
+
+
+def test_implausible_dates_not_cached():
+    """Missing, unreadable or future dates are never reused, so re-analysis can fix them"""
+    future = (date.today() + timedelta(days=400)).strftime("%m/%d/%Y")
+    analyze = payment_proof_analyzer.analyze_payment_proof
+    for bad in ("", "fecha ilegible", future):
+        first, second = _run_analyses("50370000002", [_analysis(bad), _analysis("12/13/2025")], [analyze, analyze])
+        assert second["extracted_info"]["timestamp"] == "12/13/2025", bad
+    assert payment_proof_analyzer._has_plausible_date(_analysis("2025-12-13 10:31"))
+    assert payment_proof_analyzer._has_plausible_date(_analysis("13/12/2025"))
+    print("✅ results with implausible dates not cached")
+
+
+if __name__ == "__main__":
+    test_tool_reanalysis_skips_cache()
+    test_implausible_dates_not_cached()
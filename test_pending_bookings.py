@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the SQLite pending bookings store
+"""
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+
+from app import config, pending_bookings
+
+_saved = {}
+
+
+def setup_module(module=None):
+    """Point the store at a temp DB for this module only."""
+    tmp = tempfile.mkdtemp()
+    _saved.update(db_path=config.PENDING_BOOKINGS_DB_PATH, legacy=pending_bookings.LEGACY_JSON_PATH)
+    config.PENDING_BOOKINGS_DB_PATH = os.path.join(tmp, "pending_bookings.db")
+    pending_bookings.LEGACY_JSON_PATH = os.path.join(tmp, "pending_bookings.json")
+    _reset_store()
+
+
+def teardown_module(module=None):
+    config.PENDING_BOOKINGS_DB_PATH = _saved["db_path"]
+    pending_bookings.LEGACY_JSON_PATH = _saved["legacy"]
+    _reset_store()
+
+
+def _reset_store():
+    # Schema and negative-cache state belong to the DB they were built against
+    pending_bookings._db_ready = False
+    pending_bookings._local.__dict__.clear()
+
+
+BOOKING = {"customer_name": "Ana Pérez", "check_in_date": "2025-07-01", "payment_method": "CompraClick"}
+
+
+def test_legacy_file_imported_once():
+    """Entries from the old JSON file are imported on first use"""
+    with open(pending_bookings.LEGACY_JSON_PATH, "w") as f:
+        json.dump({"50370000009": BOOKING}, f)
+    assert pending_bookings.get("50370000009") == BOOKING
+    assert not os.path.exists(pending_bookings.LEGACY_JSON_PATH)
+    assert pending_bookings.remove("50370000009")
+    print("✅ legacy JSON pending bookings imported")
+
+
+def test_put_get_remove():
+    """Bookings are stored per phone and removed after processing"""
+    pending_bookings.put("50370000001", BOOKING)
+    assert pending_bookings.get("50370000001") == BOOKING
+    assert pending_bookings.get("50370000002") is None
+    assert pending_bookings.remove("50370000001")
+    assert not pending_bookings.remove("50370000001")
+    assert pending_bookings.get("50370000001") is None
+    print("✅ pending bookings stored, read and removed by phone")
+
+
+def test_negative_cache_sees_other_writers():
+    """Repeated misses skip the query, but a write from another connection is seen at once"""
+    assert pending_bookings.get("50370000003") is None
+    before = pending_bookings.get_metrics()["negative_hits"]
+    assert pending_bookings.get("50370000003") is None
+    assert pending_bookings.get_metrics()["negative_hits"] == before + 1
+
+    # Another worker process writing through its own connection
+    other = sqlite3.connect(config.PENDING_BOOKINGS_DB_PATH)
+    other.execute(
+        "INSERT INTO pending_bookings (phone, booking_data, created_at, expires_at) VALUES (?, ?, 0, 9e12)",
+        ("50370000003", json.dumps(BOOKING))
+    )
+    other.commit()
+    other.close()
+    assert pending_bookings.get("50370000003") == BOOKING
+
+    # A write from another thread of this process
+    thread = threading.Thread(target=pending_bookings.remove, args=("50370000003",))
+    thread.start()
+    thread.join()
+    assert pending_bookings.get("50370000003") is None
+    print("✅ negative cache invalidated by other writers")
+
+
+def test_entries_expire():
+    """Bookings older than the TTL are treated as absent"""
+    ttl = config.PENDING_BOOKING_TTL_SECONDS
+    config.PENDING_BOOKING_TTL_SECONDS = -1
+    try:
+        pending_bookings.put("50370000004", BOOKING)
+    finally:
+        config.PENDING_BOOKING_TTL_SECONDS = ttl
+    assert pending_bookings.get("50370000004") is None
+    print("✅ expired pending bookings ignored")
+
+
+if __name__ == "__main__":
+    setup_module()
+    try:
+        test_legacy_file_imported_once()
+        test_put_get_remove()
+        test_negative_cache_sees_other_writers()
+        test_entries_expire()
+    finally:
+        teardown_module()
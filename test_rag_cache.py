@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for the RAG query embedding cache and in-memory vector index
+"""
+import asyncio
+import os
+import tempfile
+import threading
+
+from app.rag import chunk_store, embedder, embedding_cache, vector_index
+
+embedding_cache.DB_PATH = os.path.join(tempfile.mkdtemp(), "embedding_cache.db")
+
+
+def _off_loop(fn, threads):
+    """Wrap a blocking function to record which thread ran it."""
+    def wrapper(*args, **kwargs):
+        threads.append(threading.get_ident())
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def test_embedding_cache_hit_and_miss():
+    """A miss embeds once; repeats hit memory, then disk after a restart, all SQLite I/O off the loop"""
+    calls = []
+    threads = []
+
+    async def fake_embed_query(query, client=None):
+        calls.append(query)
+        return [0.25, 0.5, 0.75]
+
+    embedder.embed_query = fake_embed_query
+    embedding_cache._load_from_disk = _off_loop(embedding_cache._load_from_disk, threads)
+    embedding_cache._save_to_disk = _off_loop(embedding_cache._save_to_disk, threads)
+
+    async def lookups():
+        first = await embedding_cache.get_query_embedding("Precio para  MAÑANA")
+        again = await embedding_cache.get_query_embedding("precio para mañana")
+        embedding_cache._lru.clear()  # like a restart: only the SQLite copy is left
+        from_disk = await embedding_cache.get_query_embedding("precio para mañana")
+        return first, again, from_disk
+
+    first, again, from_disk = asyncio.run(lookups())
+    assert first == again == from_disk == [0.25, 0.5, 0.75]
+    assert calls == ["Precio para  MAÑANA"]
+    stats = embedding_cache.get_cache_stats()
+    assert (stats["misses"], stats["memory_hits"], stats["disk_hits"]) == (1, 1, 1), stats
+    assert len(threads) == 3 and threading.get_ident() not in threads
+    print("✅ query embeddings cached in memory and on disk")
+
+
+class _FakeCollection:
+    def __init__(self, threads):
+        self.threads = threads
+
+    def get(self, include=None):
+        self.threads.append(threading.get_ident())
+        return {
+            "ids": ["a", "b", "c"],
+            "embeddings": [[1.0, 0.0], [0.0, 2.0], [1.0, 1.0]],
+            "documents": ["doc a", "doc b", "doc c"],
+            "metadatas": [{"module_name": "M", "section": str(i), "char_count": 5} for i in range(3)],
+        }
+
+
+def test_vector_index_loads_off_loop():
+    """A cold index loads from the collection on a worker thread, then answers top-K by cosine"""
+    threads = []
+    chunk_store.get_or_create_collection = lambda persist_dir=None: _FakeCollection(threads)
+    vector_index.invalidate()
+
+    results = asyncio.run(vector_index.query_async([0.0, 3.0], n_results=2))
+    assert [r["chunk_id"] for r in results] == ["b", "c"]
+    assert abs(results[0]["distance"]) < 1e-6 and results[1]["module_name"] == "M"
+    assert len(threads) == 1 and threads[0] != threading.get_ident()
+
+    # Loaded once; later queries are pure matrix products
+    asyncio.run(vector_index.query_async([1.0, 0.0], n_results=1))
+    assert len(threads) == 1 and vector_index.is_loaded()
+    print("✅ vector index loaded off the event loop")
+
+
+def test_vector_index_load_failure_falls_back():
+    """If the collection can't be read the caller gets None and falls back to ChromaDB"""
+    def broken(persist_dir=None):
+        raise RuntimeError("chroma unavailable")
+
+    chunk_store.get_or_create_collection = broken
+    vector_index.invalidate()
+    assert asyncio.run(vector_index.query_async([1.0, 0.0])) is None
+    print("✅ vector index load failure reported as None")
+
+
+if __name__ == "__main__":
+    test_embedding_cache_hit_and_miss()
+    test_vector_index_loads_off_loop()
+    test_vector_index_load_failure_falls_back()
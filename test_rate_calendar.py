@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-process tarifarios rate calendar
+"""
+import asyncio
+from datetime import date
+
+from app import config, rate_calendar
+
+RATE = {"lh_adulto": 50.0, "lh_nino": 25.0, "pa_adulto": 30.0, "pa_nino": 15.0, "es_adulto": 40.0, "es_nino": 20.0}
+
+
+class _FakeDb:
+    """Stands in for run_db: returns the calendar it holds, or raises while it is down."""
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.down = False
+        self.loads = 0
+
+    async def __call__(self, operation, operation_name="", deadline_seconds=None):
+        self.loads += 1
+        if self.down:
+            raise TimeoutError("MySQL unreachable")
+        return dict(self.rates)
+
+
+def _fresh(db):
+    rate_calendar.run_db = db
+    rate_calendar._rates = {}
+    rate_calendar._loaded_at = 0.0
+    rate_calendar._retry_at = 0.0
+    rate_calendar._reload_lock = None
+
+
+def test_nights_served_from_memory():
+    """One bulk load answers every night; missing nights are reported"""
+    db = _FakeDb({date(2025, 7, 1): RATE, date(2025, 7, 2): RATE})
+    _fresh(db)
+
+    async def lookups():
+        first = await rate_calendar.get_prices_for_range("2025-07-01", "2025-07-03")
+        again = await rate_calendar.get_prices_for_range("2025-07-02", "2025-07-03")
+        missing = await rate_calendar.get_prices_for_range("2025-07-02", "2025-07-04")
+        return first, again, missing
+
+    first, again, missing = asyncio.run(lookups())
+    assert first["success"] and [night for night, _ in first["prices"]] == ["2025-07-01", "2025-07-02"]
+    assert again["prices"][0][1]["lh_adulto"] == 50.0
+    assert not missing["success"] and missing["missing_dates"] == ["2025-07-03"]
+    assert db.loads == 1
+    print("✅ nightly rates answered from one bulk load")
+
+
+def test_failed_reload_keeps_last_calendar():
+    """After the TTL a failing reload is logged and the old calendar is still served, without retrying every call"""
+    db = _FakeDb({date(2025, 7, 1): RATE})
+    _fresh(db)
+    asyncio.run(rate_calendar.get_prices_for_range("2025-07-01", "2025-07-02"))
+
+    db.down = True
+    rate_calendar._loaded_at -= config.RATE_CACHE_TTL_SECONDS + 1
+    for _ in range(3):
+        result = asyncio.run(rate_calendar.get_prices_for_range("2025-07-01", "2025-07-02"))
+        assert result["success"] and result["prices"][0][1] == RATE, result
+    assert db.loads == 2  # one failed reload, then no retry until the retry time
+
+    # Once MySQL is back the next retry refreshes the calendar
+    db.down = False
+    db.rates = {date(2025, 7, 1): dict(RATE, lh_adulto=55.0)}
+    rate_calendar._retry_at = 0.0
+    result = asyncio.run(rate_calendar.get_prices_for_range("2025-07-01", "2025-07-02"))
+    assert result["prices"][0][1]["lh_adulto"] == 55.0 and db.loads == 3
+    print("✅ failed reload kept serving the last good calendar")
+
+
+def test_cold_start_failure_raises():
+    """With nothing loaded yet there is no calendar to fall back to"""
+    db = _FakeDb({})
+    db.down = True
+    _fresh(db)
+    try:
+        asyncio.run(rate_calendar.get_prices_for_range("2025-07-01", "2025-07-02"))
+        raise AssertionError("cold start failure was swallowed")
+    except TimeoutError:
+        pass
+    print("✅ cold start failure surfaced")
+
+
+if __name__ == "__main__":
+    test_nights_served_from_memory()
+    test_failed_reload_keeps_last_calendar()
+    test_cold_start_failure_raises()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Test script for the durable payment retry scheduler
+"""
+import asyncio
+import os
+import sqlite3
+import tempfile
+import time
+
+from app import retry_scheduler
+from app.retry_scheduler import RetryScheduler
+
+
+def _scheduler(db_path):
+    return RetryScheduler(db_path, rescan_seconds=60, lease_seconds=600, error_backoff_seconds=300)
+
+
+def test_due_jobs_share_one_prepare():
+    """Three customers due together cost one sync; finished jobs are deleted"""
+    db_path = os.path.join(tempfile.mkdtemp(), "retry_jobs.db")
+    scheduler = _scheduler(db_path)
+    prepares, attempts = [], []
+
+    async def prepare():
+        prepares.append(1)
+        return {"success": True}
+
+    async def handler(job_id, state, prepared):
+        attempts.append((job_id, state["stage"], prepared["success"]))
+        return None if job_id == "503001" else 300
+
+    scheduler.register("bank_transfer", handler, prepare=prepare)
+    for phone in ("503001", "503002", "503003"):
+        scheduler.schedule("bank_transfer", phone, {"stage": 1})
+    scheduler.schedule("bank_transfer", "503004", {"stage": 1}, delay=3600)
+
+    ran = asyncio.run(scheduler.run_due_jobs())
+    assert ran == 3, ran
+    assert len(prepares) == 1
+    assert sorted(a[0] for a in attempts) == ["503001", "503002", "503003"]
+    assert scheduler.get_state("bank_transfer", "503001") is None
+    assert scheduler.get_state("bank_transfer", "503002") == {"stage": 1}
+
+    # Nothing due again until the 5-minute reschedule
+    assert asyncio.run(scheduler.run_due_jobs()) == 0
+    print("✅ 3 due jobs ran with 1 shared prepare, finished job deleted, others rescheduled")
+
+
+def test_state_updates_and_restart_resume():
+    """State merges are durable and a new scheduler instance picks pending jobs up"""
+    db_path = os.path.join(tempfile.mkdtemp(), "retry_jobs.db")
+    first = _scheduler(db_path)
+    first.schedule("compraclick", "503010", {"stage": 1, "attempt_count": 0})
+    assert first.update_state("compraclick", "503010", attempt_count=2, escalated=False)
+    assert not first.update_state("compraclick", "missing", attempt_count=1)
+
+    seen = []
+
+    async def handler(job_id, state, prepared):
+        seen.append(state)
+        return None
+
+    restarted = _scheduler(db_path)
+    restarted.register("compraclick", handler)
+    assert asyncio.run(restarted.run_due_jobs()) == 1
+    assert seen == [{"stage": 1, "attempt_count": 2, "escalated": False}]
+    print("✅ state updates persisted and resumed by a fresh scheduler")
+
+
+def test_leased_jobs_are_not_claimed_twice():
+    """A job leased by one worker is skipped by another"""
+    db_path = os.path.join(tempfile.mkdtemp(), "retry_jobs.db")
+    worker_a, worker_b = _scheduler(db_path), _scheduler(db_path)
+    for worker in (worker_a, worker_b):
+        worker.register("bank_transfer", lambda *args: None)
+    worker_a.schedule("bank_transfer", "503020", {"stage": 1})
+
+    assert len(worker_a._claim_due(time.time())) == 1
+    assert worker_b._claim_due(time.time()) == []
+    print("✅ leased job not claimed by a second worker")
+
+
+def test_only_dead_workers_lose_their_leases():
+    """A lease is released when its pid is gone, kept when the pid belongs to another user"""
+    db_path = os.path.join(tempfile.mkdtemp(), "retry_jobs.db")
+    scheduler = _scheduler(db_path)
+    scheduler.register("bank_transfer", lambda *args: None)
+    scheduler.schedule("bank_transfer", "503030", {"stage": 1})
+    scheduler.schedule("bank_transfer", "503031", {"stage": 1})
+    assert len(scheduler._claim_due(time.time())) == 2
+
+    conn = sqlite3.connect(db_path)
+    conn.execute("UPDATE retry_jobs SET lease_pid = 999001 WHERE job_key LIKE '%503030'")
+    conn.execute("UPDATE retry_jobs SET lease_pid = 999002 WHERE job_key LIKE '%503031'")
+    conn.commit()
+    conn.close()
+
+    def fake_kill(pid, signal):
+        raise ProcessLookupError() if pid == 999001 else PermissionError()
+
+    original = retry_scheduler.os.kill
+    retry_scheduler.os.kill = fake_kill
+    try:
+        assert scheduler._release_dead_leases() == 1
+    finally:
+        retry_scheduler.os.kill = original
+    assert [job[2] for job in scheduler._claim_due(time.time())] == ["503030"]
+    print("✅ dead worker lease released, other user's lease kept")
+
+
+if __name__ == "__main__":
+    test_due_jobs_share_one_prepare()
+    test_state_updates_and_restart_resume()
+    test_leased_jobs_are_not_claimed_twice()
+    test_only_dead_workers_lose_their_leases()
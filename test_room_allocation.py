@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script for the room allocation engine (mix table + bitset room picking)
+"""
+from app import room_allocation
+from app.room_allocation import ROOM_CAPACITY
+
+
+def test_feasible_mixes():
+    """Mixes come best first and respect what is actually available"""
+    assert room_allocation.feasible_mixes(2)[0] == ("Habitación",)
+    assert room_allocation.feasible_mixes(12)[0] == ("Junior", "Habitación")
+    assert room_allocation.feasible_mixes(12, 0, 0, {"bungalow_junior": 2, "habitacion": 0})[0] == ("Junior", "Junior")
+    assert room_allocation.feasible_mixes(12, 0, 0, {"bungalow_familiar": 1}) == []
+    assert room_allocation.feasible_mixes(40) == []  # more than MAX_ROOMS can hold
+    # 1 adult + 10 children 6-10 only fits Habitaciones as two rooms, one of them without an adult
+    assert room_allocation.feasible_mixes(1, 0, 10, {"habitacion": 3}) == []
+    assert all(len(mix) == 1 for mix in room_allocation.feasible_mixes(1, 0, 10))
+    assert room_allocation.describe_mix(("Junior", "Familiar", "Junior")) == "2x Bungalow Junior + 1x Bungalow Familiar"
+    print("✅ feasible room mixes from the precomputed table")
+
+
+def test_split_group_respects_capacity():
+    """Every feasible mix splits into rooms within their min/max occupancy"""
+    for adults in range(0, 20):
+        for children_6_10 in range(0, 12):
+            for mix in room_allocation.feasible_mixes(adults, 0, children_6_10):
+                rooms = room_allocation.split_group(mix, adults, 3, children_6_10)
+                assert sum(r["adults"] for r in rooms) == adults
+                assert sum(r["children_6_10"] for r in rooms) == children_6_10
+                assert sum(r["children_0_5"] for r in rooms) == 3
+                for room in rooms:
+                    assert room["adults"] >= 1, (mix, rooms)
+                    occupancy = room["adults"] + room["children_6_10"] * 0.5
+                    capacity = ROOM_CAPACITY[room["bungalow_type"]]
+                    assert capacity["min_occupancy"] <= occupancy <= capacity["max_occupancy"], (mix, rooms)
+    print("✅ groups split within room capacity")
+
+
+def test_pick_rooms():
+    """Constrained types are served first; excluded and taken rooms are never reused"""
+    available = {"1": "22", "2": "42", "3": "05", "4": "3a", "5": "Pasadía"}
+    picked = room_allocation.pick_rooms(available, ["Junior", "Matrimonial", "Familiar", "Habitación", "Junior"])
+    assert picked[2:4] == ["5", "3A"]
+    assert sorted(picked[:2]) == ["22", "42"] and picked[4] is None
+
+    assert room_allocation.pick_rooms({"1": "24", "2": "22"}, ["Junior"]) == ["24"]  # Matrimonial kept for couples
+    assert room_allocation.pick_rooms(available, ["Matrimonial"], excluded_rooms=["22", "42"]) == [None]
+    assert room_allocation.counts_by_type(room_allocation.available_mask(available)) == {
+        "bungalow_familiar": 1, "bungalow_junior": 2, "habitacion": 1
+    }
+    print("✅ rooms picked from the availability bitset")
+
+
+if __name__ == "__main__":
+    test_feasible_mixes()
+    test_split_group_respects_capacity()
+    test_pick_rooms()
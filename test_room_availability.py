@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for the coalescing getRooms availability cache
+"""
+import asyncio
+from contextlib import asynccontextmanager
+
+from app import room_availability
+
+
+class _FakeEngine:
+    """Stands in for http_pool: counts getRooms calls and returns the current free rooms."""
+
+    def __init__(self):
+        self.calls = 0
+        self.rooms = {"0": "18", "1": "19"}
+
+    @asynccontextmanager
+    async def client_for(self, url):
+        yield self
+
+    async def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        rooms = dict(self.rooms)
+
+        class _Response:
+            def raise_for_status(self):
+                pass
+
+            def json(self):
+                return {"info": rooms}
+
+        return _Response()
+
+
+def _with_engine(test):
+    def run():
+        engine = _FakeEngine()
+        original = room_availability.http_pool
+        room_availability.http_pool = engine
+        room_availability._cache.clear()
+        try:
+            test(engine)
+        finally:
+            room_availability.http_pool = original
+    return run
+
+
+@_with_engine
+def test_coalesced_and_cached(engine):
+    """Concurrent and back-to-back requests for the same range share one call"""
+    async def turn():
+        results = await asyncio.gather(*[room_availability.get_rooms("2025-03-01", "2025-03-03") for _ in range(4)])
+        again = await room_availability.get_rooms("2025-03-01", "2025-03-03")
+        other = await room_availability.get_rooms("2025-03-02", "2025-03-03")
+        return results, again, other
+
+    results, again, other = asyncio.run(turn())
+    assert engine.calls == 2
+    assert all(r == {"info": {"0": "18", "1": "19"}} for r in results + [again, other])
+    results[0]["info"].clear()
+    assert asyncio.run(room_availability.get_rooms("2025-03-01", "2025-03-03"))["info"], "callers share a mutable copy"
+    print("✅ identical requests coalesced and cached")
+
+
+@_with_engine
+def test_booking_invalidates(engine):
+    """A booking drops cached rooms and results fetched before it"""
+    async def turn():
+        before = asyncio.ensure_future(room_availability.get_rooms("2025-03-01", "2025-03-03"))
+        await asyncio.sleep(0.01)
+        engine.rooms = {"1": "19"}  # room 18 booked while the first fetch was in flight
+        room_availability.invalidate()
+        after = await room_availability.get_rooms("2025-03-01", "2025-03-03")
+        await before
+        return after, await room_availability.get_rooms("2025-03-01", "2025-03-03")
+
+    after, cached = asyncio.run(turn())
+    assert after == {"info": {"1": "19"}}
+    assert cached == {"info": {"1": "19"}}
+    assert engine.calls == 2
+    print("✅ booking invalidated cached and in-flight availability")
+
+
+if __name__ == "__main__":
+    test_coalesced_and_cached()
+    test_booking_invalidates()
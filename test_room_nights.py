@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for the materialized room-night occupancy table
+"""
+from datetime import date, timedelta
+
+from app import room_nights
+from app.availability_matrix import matrix_from_room_nights
+
+
+class _RecordingCursor:
+    """Collects the writes _reconcile issues for one booking table."""
+
+    def __init__(self):
+        self.nights = set()
+        self.tracked = {}
+
+    def execute(self, statement, params):
+        if statement.startswith("DELETE FROM room_nights"):
+            self.nights = {n for n in self.nights if n[0] != params[1]}
+        elif statement.startswith("DELETE FROM room_night_bookings"):
+            self.tracked.pop(params[1], None)
+        elif statement.startswith("REPLACE INTO room_night_bookings"):
+            self.tracked[params[1]] = params[2]
+
+    def executemany(self, statement, rows):
+        self.nights |= {(booking_id, room, night) for _, booking_id, room, night in rows}
+
+
+def _us(day):
+    return day.strftime("%m/%d/%Y")
+
+
+def test_booking_nights():
+    """Bookings count like the old CTE: nights [check_in, check_out), cancelled/undated rows excluded"""
+    last_night, pairs = room_nights.booking_nights("2-18+19a", "07/01/2025", "07/03/2025", "no")
+    assert last_night == date(2025, 7, 2)
+    assert pairs == {("18", date(2025, 7, 1)), ("18", date(2025, 7, 2)),
+                     ("19A", date(2025, 7, 1)), ("19A", date(2025, 7, 2))}
+    assert room_nights.booking_nights("18", "07/01/2025", "07/03/2025", "YES") == (date(2025, 7, 2), set())
+    assert room_nights.booking_nights("18", "07/01/2025", "07/03/2025", None)[1] == set()
+    assert room_nights.booking_nights("18", "", "07/03/2025", "no") == (None, set())
+    print("✅ booking rows expand to room-nights")
+
+
+def test_reconcile_new_cancelled_and_past():
+    """New bookings materialize, cancellations drop their nights, finished bookings are skipped"""
+    today = date.today()
+    cursor = _RecordingCursor()
+    rows = [
+        (1, "18+19", _us(today), _us(today + timedelta(days=2)), "no"),
+        (2, "1A", _us(today - timedelta(days=30)), _us(today - timedelta(days=28)), "no"),
+    ]
+    assert room_nights._reconcile(cursor, "user_books", rows, {}) == 1
+    assert {(room, night) for _, room, night in cursor.nights} == {
+        ("18", today), ("18", today + timedelta(days=1)), ("19", today), ("19", today + timedelta(days=1))
+    }
+    assert list(cursor.tracked) == [1]
+
+    # Unchanged rows are skipped; the cancelled booking keeps its tracking row but loses its nights
+    assert room_nights._reconcile(cursor, "user_books", rows[:1], dict(cursor.tracked)) == 0
+    cancelled = [(1, "18+19", rows[0][2], rows[0][3], "yes")]
+    assert room_nights._reconcile(cursor, "user_books", cancelled, dict(cursor.tracked), [1]) == 1
+    assert cursor.nights == set() and 1 in cursor.tracked
+
+    # A booking deleted from the source table is forgotten
+    assert room_nights._reconcile(cursor, "user_books", [], dict(cursor.tracked), [1]) == 1
+    assert cursor.tracked == {}
+    print("✅ room-nights reconciled incrementally")
+
+
+def test_matrix_from_room_nights():
+    """Materialized rows become the same bitsets smart availability uses"""
+    start = date(2025, 7, 1)
+    matrix = matrix_from_room_nights([("18", date(2025, 7, 1)), ("18", date(2025, 7, 3)), ("2a", date(2025, 7, 2))], start)
+    assert matrix == {"18": 0b101, "2A": 0b010}
+    print("✅ occupancy matrix built from room-nights")
+
+
+if __name__ == "__main__":
+    test_booking_nights()
+    test_reconcile_new_cancelled_and_past()
+    test_matrix_from_room_nights()
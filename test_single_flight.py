@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for the single-flight sync coordinator
+"""
+import asyncio
+import os
+import tempfile
+
+from app.single_flight import SingleFlight
+
+
+def _flight(fresh_seconds=60):
+    tmp = tempfile.mkdtemp()
+    return SingleFlight(
+        "bank_sync",
+        os.path.join(tmp, "sync.lock"),
+        fresh_seconds,
+        db_path=os.path.join(tmp, "single_flight.db"),
+    )
+
+
+def test_concurrent_callers_share_one_run():
+    """Five customers asking at once cost one sync"""
+    flight = _flight()
+    runs = []
+
+    async def sync():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return {"success": True, "data": {"rows_inserted": 3}, "error": ""}
+
+    async def main():
+        return await asyncio.gather(*(flight.run(sync) for _ in range(5)))
+
+    results = asyncio.run(main())
+    assert len(runs) == 1, runs
+    assert all(r["data"]["rows_inserted"] == 3 for r in results)
+    assert flight.metrics()["joined_in_flight"] == 4
+    print("✅ 5 concurrent callers shared 1 sync")
+
+
+def test_fresh_result_reused_across_instances():
+    """A second worker (new instance, same lock/db) reuses a fresh result"""
+    first = _flight()
+    second = SingleFlight("bank_sync", first.lock_path, 60, db_path=first.db_path)
+    runs = []
+
+    async def sync():
+        runs.append(1)
+        return {"success": True, "data": {"rows_inserted": len(runs)}, "error": ""}
+
+    asyncio.run(first.run(sync))
+    result = asyncio.run(second.run(sync))
+    assert len(runs) == 1
+    assert result["data"]["rows_inserted"] == 1
+    assert second.metrics()["fresh_hits"] == 1
+    print("✅ fresh result reused by another worker")
+
+
+def test_stale_or_failed_results_rerun():
+    """Failures are never shared and stale results trigger a new sync"""
+    flight = _flight(fresh_seconds=0)
+    outcomes = [{"success": False, "data": {}, "error": "no credentials"}, {"success": True, "data": {}, "error": ""}]
+    runs = []
+
+    async def sync():
+        runs.append(1)
+        return outcomes[min(len(runs), 2) - 1]
+
+    assert not asyncio.run(flight.run(sync))["success"]
+    assert asyncio.run(flight.run(sync))["success"]
+    asyncio.run(flight.run(sync))
+    assert len(runs) == 3
+    print("✅ failed and stale results re-run the sync")
+
+
+if __name__ == "__main__":
+    test_concurrent_callers_share_one_run()
+    test_fresh_result_reused_across_instances()
+    test_stale_or_failed_results_rerun()
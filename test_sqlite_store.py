@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared WAL SQLite connection layer and thread_store turn helpers
+"""
+import pathlib
+import tempfile
+import threading
+
+import pytest
+
+from app import sqlite_store, thread_store
+
+
+def _use_temp_db(monkeypatch, tmp_path):
+    """Point thread_store at a fresh database in this test's temp dir"""
+    monkeypatch.setattr(thread_store, "DB_PATH", str(tmp_path / "thread_store.db"))
+    thread_store.init_db()
+
+
+def test_connection_reused_per_thread_in_wal_mode(monkeypatch, tmp_path):
+    """One connection per thread and file, opened in WAL mode"""
+    _use_temp_db(monkeypatch, tmp_path)
+    with thread_store.get_conn() as a:
+        mode = a.execute("PRAGMA journal_mode").fetchone()[0]
+    with thread_store.get_conn() as b:
+        pass
+    assert a is b
+    assert mode == "wal", mode
+
+    other = []
+    t = threading.Thread(target=lambda: other.append(sqlite_store.get_connection(thread_store.DB_PATH)))
+    t.start(); t.join()
+    assert other[0] is not a
+    print("✅ connection reused within a thread, separate per thread, WAL enabled")
+
+
+def test_begin_turn_and_touch_webhook_timestamp(monkeypatch, tmp_path):
+    """Combined state fetch and webhook timestamp update"""
+    _use_temp_db(monkeypatch, tmp_path)
+    wa_id = "50370000001"
+
+    assert thread_store.touch_webhook_timestamp(wa_id) == (None, None)
+    old_webhook, old_updated = thread_store.touch_webhook_timestamp(wa_id)
+    assert old_webhook and old_updated
+
+    thread_store.save_conversation_id(wa_id, "conv_abc")
+    thread_store.save_response_id(wa_id, "resp_1")
+    state = thread_store.begin_turn(wa_id)
+    assert state["message_count"] == 1
+    assert state["conversation_id"] == "conv_abc"
+    assert state["last_response_id"] == "resp_1"
+    assert thread_store.begin_turn(wa_id)["message_count"] == 2
+    assert thread_store.begin_turn("unknown_user")["message_count"] == 1
+    print("✅ begin_turn increments and loads state, touch_webhook_timestamp returns previous values")
+
+
+def test_batch_commits_once_and_rolls_back_on_error(monkeypatch, tmp_path):
+    """Writes inside batch() are atomic"""
+    _use_temp_db(monkeypatch, tmp_path)
+    wa_id = "50370000002"
+    thread_store.set_thread_id(wa_id, "conv_old")
+
+    try:
+        with thread_store.batch():
+            thread_store.save_conversation_id(wa_id, "conv_new")
+            thread_store.reset_message_count(wa_id)
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert thread_store.get_conversation_id(wa_id) is None  # set_thread_id doesn't set conversation_id
+
+    with thread_store.batch():
+        thread_store.save_conversation_id(wa_id, "conv_new")
+        thread_store.save_response_id(wa_id, None)
+        count = thread_store.increment_message_count(wa_id)
+    assert count == 1
+    assert thread_store.get_conversation_id(wa_id) == "conv_new"
+    print("✅ batch() rolls back on error and commits once on success")
+
+
+if __name__ == "__main__":
+    for test in (test_connection_reused_per_thread_in_wal_mode, test_begin_turn_and_touch_webhook_timestamp,
+                 test_batch_commits_once_and_rolls_back_on_error):
+        with pytest.MonkeyPatch.context() as mp:
+            test(mp, pathlib.Path(tempfile.mkdtemp()))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Test script for concurrent tool execution within a Responses round
+"""
+import asyncio
+import time
+
+from app import tool_executor
+
+
+def test_lookups_overlap_and_side_effects_stay_ordered():
+    """Read-only calls run together; make_booking waits for them and runs alone"""
+    calls = ["check_room_availability", "get_price_for_date", "get_price_for_date", "make_booking", "check_office_status"]
+    events = []
+
+    async def execute(name):
+        events.append(("start", name))
+        await asyncio.sleep(0.05)
+        events.append(("end", name))
+        return f"{name}-done"
+
+    started = time.perf_counter()
+    results = asyncio.run(tool_executor.run_round(calls, execute, lambda c: c, "Round 1"))
+    elapsed = time.perf_counter() - started
+
+    assert results == [f"{c}-done" for c in calls]
+    # Three lookups in parallel, then the booking, then the last lookup: ~3 sleeps, not 5
+    assert elapsed < 0.2, elapsed
+    booking_start = events.index(("start", "make_booking"))
+    assert all(kind == "end" for kind, _ in events[booking_start - 3:booking_start])
+    assert events[booking_start + 1] == ("end", "make_booking")
+    print(f"✅ 5 tools ran in {elapsed * 1000:.0f}ms with make_booking serialized")
+
+
+def test_unknown_tools_are_serialized_and_timeouts_apply():
+    """Undeclared tools never run concurrently; declared timeouts raise"""
+    assert not tool_executor.get_policy("brand_new_tool").parallel_safe
+
+    async def slow():
+        await asyncio.sleep(1)
+
+    original = tool_executor.TOOL_POLICIES["lookup_booking"]
+    tool_executor.TOOL_POLICIES["lookup_booking"] = tool_executor.ToolPolicy(parallel_safe=True, timeout=0.01)
+    try:
+        asyncio.run(tool_executor.call_with_timeout("lookup_booking", slow()))
+        raise AssertionError("expected timeout")
+    except tool_executor.ToolTimeout as e:
+        assert str(e) == "lookup_booking timed out after 0s"
+    finally:
+        tool_executor.TOOL_POLICIES["lookup_booking"] = original
+    print("✅ unknown tools serialized, per-tool timeout enforced")
+
+
+def test_tool_deadline_errors_are_not_tool_timeouts():
+    """A TimeoutError raised by the tool itself (e.g. a DB deadline) is not reported as the tool timeout"""
+    class DeadlineExceeded(TimeoutError):
+        pass
+
+    async def db_down():
+        raise DeadlineExceeded("validate failed after 30s")
+
+    for fn_name in ("lookup_booking", "validate_bank_transfer"):  # read-only (60s) and side-effecting (no limit)
+        try:
+            asyncio.run(tool_executor.call_with_timeout(fn_name, db_down()))
+            raise AssertionError("expected the tool's own error")
+        except tool_executor.ToolTimeout:
+            raise AssertionError(f"{fn_name}: database deadline misreported as a tool timeout")
+        except DeadlineExceeded:
+            pass
+    assert str(tool_executor.ToolTimeout("make_booking", None)) == "make_booking timed out"
+    print("✅ tool-raised TimeoutError propagates unchanged")
+
+
+if __name__ == "__main__":
+    test_lookups_overlap_and_side_effects_stay_ordered()
+    test_unknown_tools_are_serialized_and_timeouts_apply()
+    test_tool_deadline_errors_are_not_tool_timeouts()
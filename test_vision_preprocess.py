@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared vision image preprocessing
+"""
+import asyncio
+import base64
+import io
+import tempfile
+
+from app import vision_preprocess
+
+
+def _decode(data_url):
+    header, payload = data_url.split(",", 1)
+    return header, base64.b64decode(payload)
+
+
+def _photo(size, orientation=None, border=0):
+    from PIL import Image, ImageDraw
+
+    img = Image.new("RGB", size, (255, 255, 255))
+    ImageDraw.Draw(img).rectangle(
+        (border, border, size[0] - border - 1, size[1] - border - 1), fill=(30, 120, 200)
+    )
+    out = io.BytesIO()
+    exif = Image.Exif()
+    if orientation:
+        exif[0x0112] = orientation
+    img.save(out, "JPEG", quality=98, exif=exif.tobytes())
+    return out.getvalue()
+
+
+def test_downscale_rotate_and_crop():
+    """Large photos are rotated per EXIF, cropped and downscaled to the use case's limit"""
+    from PIL import Image
+
+    vision_preprocess._memo.clear()
+    content = _photo((4000, 3000), orientation=6)
+    header, encoded = _decode(vision_preprocess.to_data_url_sync(content, "inquiry"))
+    img = Image.open(io.BytesIO(encoded))
+    assert header == "data:image/jpeg;base64"
+    assert img.size == (vision_preprocess.config.VISION_MAX_DIMENSION_INQUIRY * 3 // 4,
+                        vision_preprocess.config.VISION_MAX_DIMENSION_INQUIRY), img.size
+    assert len(encoded) < len(content)
+
+    _, cropped = _decode(vision_preprocess.to_data_url_sync(_photo((800, 600), border=100), "receipt"))
+    width, height = Image.open(io.BytesIO(cropped)).size
+    # Content box 600x400 plus padding on each side (JPEG noise may add a pixel or two)
+    assert abs(width - 616) <= 4 and abs(height - 416) <= 4, (width, height)
+    print("✅ EXIF rotation, downscale and border crop applied")
+
+
+def test_encoded_once_and_shared():
+    """The classifier and the receipt analyzer share the encoding of the same upload"""
+    vision_preprocess._memo.clear()
+    content = _photo((3000, 2000))
+    with tempfile.NamedTemporaryFile(suffix=".jpg") as f:
+        f.write(content)
+        f.flush()
+        first = asyncio.run(vision_preprocess.to_data_url(f.name, "classify"))
+    hits = vision_preprocess._stats["memo_hits"]
+    second = asyncio.run(vision_preprocess.to_data_url(content, "receipt"))
+    assert first is second
+    assert vision_preprocess._stats["memo_hits"] == hits + 1
+    print("✅ one encoding shared between classifier and analyzer")
+
+
+def test_unreadable_image_sent_as_is():
+    """Bytes PIL can't decode still reach the model unchanged"""
+    vision_preprocess._memo.clear()
+    header, payload = _decode(vision_preprocess.to_data_url_sync(b"not an image", "classify"))
+    assert header == "data:image/jpeg;base64" and payload == b"not an image"
+    try:
+        asyncio.run(vision_preprocess.to_data_url(b"x", "selfie"))
+        assert False, "unknown use case accepted"
+    except ValueError:
+        pass
+    print("✅ undecodable image passed through, unknown use case rejected")
+
+
+if __name__ == "__main__":
+    test_unreadable_image_sent_as_is()
+    test_downscale_rotate_and_crop()
+    test_encoded_once_and_shared()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Test script for the vision result cache (resent receipts/screenshots)
+"""
+import io
+import os
+import tempfile
+
+from app import config, vision_result_cache
+
+config.VISION_CACHE_DB_PATH = os.path.join(tempfile.mkdtemp(), "vision_cache.db")
+
+RECEIPT = {"success": True, "receipt_type": "bank_transfer",
+           "extracted_info": {"amount": 150.0, "transaction_id": "053551", "timestamp": "13/12/2025"}}
+
+
+def test_exact_match_scoped_per_customer():
+    """An identical file hits for the same customer only"""
+    fp = vision_result_cache.fingerprint_sync(b"%PDF-1.4 receipt bytes")
+    assert fp.dhash is None
+    vision_result_cache.store("50370000001", "payment_proof", fp, RECEIPT)
+
+    assert vision_result_cache.lookup("50370000001", "payment_proof", fp) == RECEIPT
+    assert vision_result_cache.lookup("50370000002", "payment_proof", fp) is None
+    assert vision_result_cache.lookup("50370000001", "classification", fp) is None
+    assert vision_result_cache.lookup(None, "payment_proof", fp) is None
+    print("✅ exact match reused only for the same customer and kind")
+
+
+def test_context_scoped_results():
+    """A result stored under one conversation context is not reused under another"""
+    fp = vision_result_cache.fingerprint_sync(b"banking app screenshot")
+    verdict = {"classification": "payment_proof", "confidence": 0.95}
+    vision_result_cache.store("50370000006", "classification", fp, verdict, context="Cliente: ya pagué")
+
+    assert vision_result_cache.lookup("50370000006", "classification", fp, context="Cliente: ya pagué") == verdict
+    assert vision_result_cache.lookup("50370000006", "classification", fp, context="Cliente: ¿hay piscina?") is None
+    assert vision_result_cache.lookup("50370000006", "classification", fp) is None
+    print("✅ results reused only under the same context")
+
+
+def test_entries_expire():
+    """Results older than the TTL are ignored"""
+    fp = vision_result_cache.fingerprint_sync(b"old screenshot")
+    vision_result_cache.store("50370000003", "classification", fp, {"classification": "general_inquiry"})
+    ttl = config.VISION_CACHE_TTL_SECONDS
+    config.VISION_CACHE_TTL_SECONDS = -1
+    try:
+        assert vision_result_cache.lookup("50370000003", "classification", fp) is None
+    finally:
+        config.VISION_CACHE_TTL_SECONDS = ttl
+    assert vision_result_cache.lookup("50370000003", "classification", fp) is not None
+    print("✅ expired results ignored")
+
+
+def test_recompressed_copy_matches():
+    """A resized, recompressed copy matches perceptually; a different picture does not"""
+    from PIL import Image, ImageDraw
+
+    def screenshot(amount, size=(1080, 1920), quality=95):
+        img = Image.new("RGB", (1080, 1920), (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 0, 1080, 300), fill=(200, 30, 40))
+        draw.rectangle((100, 600, 980, 600 + amount), fill=(20, 20, 20))
+        out = io.BytesIO()
+        img.resize(size).save(out, "JPEG", quality=quality)
+        return out.getvalue()
+
+    classification = {"classification": "payment_proof", "confidence": 0.95}
+    original = vision_result_cache.fingerprint_sync(screenshot(400))
+    vision_result_cache.store("50370000004", "classification", original, classification)
+
+    resent = vision_result_cache.fingerprint_sync(screenshot(400, size=(720, 1280), quality=60))
+    assert resent.sha256 != original.sha256
+    assert vision_result_cache.lookup("50370000004", "classification", resent) == classification
+
+    # A different kind of picture (striped photo) is well outside the distance
+    photo = Image.new("RGB", (1080, 1920), (30, 120, 60))
+    draw = ImageDraw.Draw(photo)
+    for x in range(0, 1080, 90):
+        draw.rectangle((x, 0, x + 45, 1920), fill=(240, 220, 180))
+    out = io.BytesIO()
+    photo.save(out, "JPEG")
+    other = vision_result_cache.fingerprint_sync(out.getvalue())
+    assert vision_result_cache.lookup("50370000004", "classification", other) is None
+    print("✅ recompressed copy matched, different picture missed")
+
+
+def test_receipts_differing_only_in_text_never_match():
+    """A second transfer from the same banking app is analyzed again, even though its dHash is nearly identical"""
+    from PIL import Image, ImageDraw
+
+    def receipt(amount, authorization, day):
+        img = Image.new("RGB", (1080, 1920), (255, 255, 255))
+        draw = ImageDraw.Draw(img)
+        draw.rectangle((0, 0, 1080, 300), fill=(0, 80, 160))
+        draw.text((120, 700), f"Monto: ${amount}", fill=(0, 0, 0))
+        draw.text((120, 800), f"Autorizacion: {authorization}", fill=(0, 0, 0))
+        draw.text((120, 900), f"Fecha: {day}/12/2025", fill=(0, 0, 0))
+        out = io.BytesIO()
+        img.save(out, "JPEG", quality=90)
+        return out.getvalue()
+
+    deposit = vision_result_cache.fingerprint_sync(receipt("150.00", "053551", 13))
+    balance = vision_result_cache.fingerprint_sync(receipt("420.00", "071902", 20))
+    assert vision_result_cache._distance(deposit.dhash, balance.dhash) <= config.VISION_CACHE_CLASSIFY_MAX_DISTANCE
+
+    vision_result_cache.store("50370000005", "payment_proof", deposit, RECEIPT)
+    assert vision_result_cache.lookup("50370000005", "payment_proof", balance) is None
+    assert vision_result_cache.lookup("50370000005", "payment_proof", deposit) == RECEIPT
+    print("✅ look-alike receipts with different amounts are not reused")
+
+
+if __name__ == "__main__":
+    test_exact_match_scoped_per_customer()
+    test_context_scoped_results()
+    test_entries_expire()
+    test_recompressed_copy_matches()
+    test_receipts_differing_only_in_text_never_match()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory voice note transcription pipeline
+"""
+import asyncio
+import os
+import struct
+import subprocess
+import tempfile
+
+from app import whisper_client
+
+
+class _Response:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+
+    def raise_for_status(self):
+        raise Exception(f"HTTP {self.status_code}")
+
+
+def test_detect_container():
+    """Containers Whisper accepts are recognized; others need converting"""
+    assert whisper_client.detect_container(b"OggS\x00\x02" + b"\x00" * 20) == ("ogg", "audio/ogg")
+    assert whisper_client.detect_container(b"\x00\x00\x00\x20ftypM4A \x00") == ("m4a", "audio/mp4")
+    assert whisper_client.detect_container(b"ID3\x04" + b"\x00" * 10) == ("mp3", "audio/mpeg")
+    assert whisper_client.detect_container(b"\x00\x00\x00\x14ftyp3gp4\x00") is None
+    assert whisper_client.detect_container(b"\xff\xf1\x50\x80") is None  # ADTS AAC
+    assert whisper_client.detect_container(b"#!AMR\n") is None
+    print("✅ accepted containers detected")
+
+
+def test_passthrough_and_cache():
+    """An OGG voice note is uploaded as-is once; the same bytes reuse the transcript"""
+    uploads = []
+
+    async def fake_upload(content, filename, mime_type, language):
+        uploads.append((filename, mime_type))
+        return _Response(200, " hola, quiero reservar \n")
+
+    async def no_convert(content):
+        raise AssertionError("ffmpeg must not run for OGG")
+
+    original = whisper_client._upload, whisper_client.convert_to_flac
+    whisper_client._upload, whisper_client.convert_to_flac = fake_upload, no_convert
+    try:
+        note = b"OggS" + b"\x01" * 64
+        assert asyncio.run(whisper_client.transcribe_audio(note)) == "hola, quiero reservar"
+        assert asyncio.run(whisper_client.transcribe_audio(note)) == "hola, quiero reservar"
+    finally:
+        whisper_client._upload, whisper_client.convert_to_flac = original
+    assert uploads == [("voice.ogg", "audio/ogg")]
+    assert whisper_client.get_metrics()["cache_hits"] >= 1
+    print("✅ OGG uploaded without conversion, transcript cached")
+
+
+def test_rejected_container_converted_and_retried():
+    """A container Whisper rejects is converted to FLAC and uploaded again"""
+    uploads = []
+
+    async def fake_upload(content, filename, mime_type, language):
+        uploads.append(filename)
+        return _Response(400 if filename.endswith(".m4a") else 200, "ok")
+
+    async def fake_convert(content):
+        return b"fLaC converted"
+
+    original = whisper_client._upload, whisper_client.convert_to_flac
+    whisper_client._upload, whisper_client.convert_to_flac = fake_upload, fake_convert
+    try:
+        text = asyncio.run(whisper_client.transcribe_audio(b"\x00\x00\x00\x20ftypisom" + b"\x02" * 32))
+    finally:
+        whisper_client._upload, whisper_client.convert_to_flac = original
+    assert text == "ok"
+    assert uploads == ["voice.m4a", "voice.flac"]
+    assert whisper_client.get_metrics()["stages"]["convert"]["count"] >= 1
+    print("✅ rejected upload converted and retried")
+
+
+def _atom(kind, payload):
+    return struct.pack(">I", 8 + len(payload)) + kind + payload
+
+
+# 3GP voice memo as phones write it: ftyp, then the audio, then the moov index at the end
+MOOV_AT_END_3GP = (
+    _atom(b"ftyp", b"3gp4" + b"\x00\x00\x02\x00" + b"isom3gp4")
+    + _atom(b"mdat", b"\x21" * 256)
+    + _atom(b"moov", _atom(b"mvhd", b"\x00" * 100))
+)
+
+
+class _FakeFfmpeg:
+    """Records how ffmpeg was invoked and what it could read."""
+
+    def __init__(self):
+        self.args = None
+        self.input_bytes = None
+        self.returncode = 0
+
+    async def __call__(self, *args, **kwargs):
+        self.args, self.kwargs = args, kwargs
+        source = args[args.index("-i") + 1]
+        if source != "pipe:0":
+            with open(source, "rb") as f:
+                self.input_bytes = f.read()
+        return self
+
+    async def communicate(self, data=None):
+        if data is not None:
+            self.input_bytes = data
+        return b"fLaC converted", b""
+
+
+def test_mp4_family_converted_from_seekable_file():
+    """3GP (moov after mdat) is handed to ffmpeg as a temp file, stream formats through stdin"""
+    assert whisper_client.detect_container(MOOV_AT_END_3GP) is None
+    original = asyncio.create_subprocess_exec
+    try:
+        asyncio.create_subprocess_exec = fake = _FakeFfmpeg()
+        assert asyncio.run(whisper_client.convert_to_flac(MOOV_AT_END_3GP)) == b"fLaC converted"
+        source = fake.args[fake.args.index("-i") + 1]
+        assert source != "pipe:0" and fake.input_bytes == MOOV_AT_END_3GP
+        assert fake.kwargs["stdin"] == asyncio.subprocess.DEVNULL
+        assert not os.path.exists(source)
+
+        asyncio.create_subprocess_exec = fake = _FakeFfmpeg()
+        asyncio.run(whisper_client.convert_to_flac(b"#!AMR\n" + b"\x00" * 32))
+        assert fake.args[fake.args.index("-i") + 1] == "pipe:0"
+    finally:
+        asyncio.create_subprocess_exec = original
+    print("✅ MP4-family input converted from a seekable temp file")
+
+
+def test_real_moov_at_end_3gp_decodes():
+    """With ffmpeg installed, a real 3GP whose moov follows the audio converts to FLAC"""
+    if not os.path.exists(whisper_client.FFMPEG_PATH):
+        print("⚠️ ffmpeg not installed, skipping real 3GP conversion")
+        return
+    path = os.path.join(tempfile.mkdtemp(), "voice.3gp")
+    subprocess.run(
+        [whisper_client.FFMPEG_PATH, "-hide_banner", "-loglevel", "error", "-f", "lavfi", "-i",
+         "sine=frequency=440:duration=1", "-ar", "16000", "-c:a", "aac", "-f", "3gp", path],
+        check=True,
+    )
+    with open(path, "rb") as f:
+        sample = f.read()
+    assert sample.find(b"moov") > sample.find(b"mdat")  # index written after the audio
+    assert asyncio.run(whisper_client.convert_to_flac(sample)).startswith(b"fLaC")
+    print("✅ real moov-at-end 3GP converted")
+
+
+if __name__ == "__main__":
+    test_detect_container()
+    test_passthrough_and_cache()
+    test_rejected_container_converted_and_retried()
+    test_mp4_family_converted_from_seekable_file()
+    test_real_moov_at_end_3gp_decodes()